@@ -184,6 +184,11 @@ public:
 	void GradientPerturb(FN_DECIMAL& x, FN_DECIMAL& y) const;
 	void GradientPerturbFractal(FN_DECIMAL& x, FN_DECIMAL& y) const;
 
+	// Returns the same value as GetNoise(x, y) and writes its partial derivatives to dx and dy
+	// Derivatives are analytic for Perlin, Simplex and Cubic (including fractal) noise,
+	// other noise types fall back to central differences
+	FN_DECIMAL GetNoiseDeriv(FN_DECIMAL x, FN_DECIMAL y, FN_DECIMAL& dx, FN_DECIMAL& dy) const;
+
 	//3D
 	FN_DECIMAL GetValue(FN_DECIMAL x, FN_DECIMAL y, FN_DECIMAL z) const;
 	FN_DECIMAL GetValueFractal(FN_DECIMAL x, FN_DECIMAL y, FN_DECIMAL z) const;
@@ -266,6 +271,12 @@ private:
 
 	void SingleGradientPerturb(unsigned char offset, FN_DECIMAL warpAmp, FN_DECIMAL frequency, FN_DECIMAL& x, FN_DECIMAL& y) const;
 
+	typedef FN_DECIMAL (FastNoise::*SingleDerivFunc)(unsigned char offset, FN_DECIMAL x, FN_DECIMAL y, FN_DECIMAL& dx, FN_DECIMAL& dy) const;
+	FN_DECIMAL SingleFractalDeriv(SingleDerivFunc func, FN_DECIMAL x, FN_DECIMAL y, FN_DECIMAL& dx, FN_DECIMAL& dy) const;
+	FN_DECIMAL SinglePerlinDeriv(unsigned char offset, FN_DECIMAL x, FN_DECIMAL y, FN_DECIMAL& dx, FN_DECIMAL& dy) const;
+	FN_DECIMAL SingleSimplexDeriv(unsigned char offset, FN_DECIMAL x, FN_DECIMAL y, FN_DECIMAL& dx, FN_DECIMAL& dy) const;
+	FN_DECIMAL SingleCubicDeriv(unsigned char offset, FN_DECIMAL x, FN_DECIMAL y, FN_DECIMAL& dx, FN_DECIMAL& dy) const;
+
 	//3D
 	FN_DECIMAL SingleValueFractalFBM(FN_DECIMAL x, FN_DECIMAL y, FN_DECIMAL z) const;
 	FN_DECIMAL SingleValueFractalBillow(FN_DECIMAL x, FN_DECIMAL y, FN_DECIMAL z) const;
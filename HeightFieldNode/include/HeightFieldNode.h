@@ -8,10 +8,13 @@
 #include <maya/MFnDependencyNode.h>
 #include <maya/MObject.h>
 #include <maya/MPlug.h>
+#include <maya/MPointArray.h>
 #include <maya/MPxNode.h>
 #include <maya/MStatus.h>
 #include <maya/MTypeId.h>
+#include <vector>
 #include "FastNoise.h"
+#include "HeightFieldShaper.h"
 
 class HeightField : public MPxNode
 {
@@ -46,8 +49,13 @@ class HeightField : public MPxNode
     //-----------------------------------------------------------------------------
     virtual ~HeightField();
 
-
   private:
+    //-----------------------------------------------------------------------------
+    // previewNoise
+    // Evaluate the noise on a coarse lattice over the XZ bounds of the vertices
+    // and bilinearly interpolate the height of every vertex from it
+    //-----------------------------------------------------------------------------
+    void previewNoise(MPointArray &_vertices, int _stride, float _amplitude);
     //-----------------------------------------------------------------------------
     // Input mesh
     //-----------------------------------------------------------------------------
@@ -85,13 +93,45 @@ class HeightField : public MPxNode
     //-----------------------------------------------------------------------------
     static MObject m_fractalGain;
     //-----------------------------------------------------------------------------
+    // Preview toggle, set while the user is interacting with the node
+    //-----------------------------------------------------------------------------
+    static MObject m_preview;
+    //-----------------------------------------------------------------------------
+    // Vertex stride of the preview lattice
+    //-----------------------------------------------------------------------------
+    static MObject m_previewStride;
+    //-----------------------------------------------------------------------------
+    // Maximum fractal octaves used in preview
+    //-----------------------------------------------------------------------------
+    static MObject m_previewOctaves;
+    //-----------------------------------------------------------------------------
+    // Write analytic noise normals to the output mesh
+    //-----------------------------------------------------------------------------
+    static MObject m_analyticNormals;
+    //-----------------------------------------------------------------------------
+    // Domain warp distance
+    //-----------------------------------------------------------------------------
+    static MObject m_domainWarp;
+    //-----------------------------------------------------------------------------
+    // Terrain shape
+    //-----------------------------------------------------------------------------
+    static MObject m_terrainShape;
+    //-----------------------------------------------------------------------------
+    // Number of plateau levels
+    //-----------------------------------------------------------------------------
+    static MObject m_plateauLevels;
+    //-----------------------------------------------------------------------------
+    // Crater radius relative to the cell size
+    //-----------------------------------------------------------------------------
+    static MObject m_craterRadius;
+    //-----------------------------------------------------------------------------
     // Output mesh
     //-----------------------------------------------------------------------------
     static MObject m_outMesh;
     //-----------------------------------------------------------------------------
-    // FastNoise object
+    // Noise and terrain shaping for the current compute
     //-----------------------------------------------------------------------------
-    FastNoise m_fastNoise;
+    HeightFieldShaper m_shaper;
 };
 
 #endif
@@ -0,0 +1,65 @@
+/// @file HeightFieldShaper.h
+/// Evaluate shaped FastNoise terrain heights, kept free of Maya so the
+/// benchmarks can build it on its own
+
+#ifndef HEIGHTFIELDSHAPER_H__
+#define HEIGHTFIELDSHAPER_H__
+
+#include <vector>
+#include "FastNoise.h"
+
+class HeightFieldShaper
+{
+  public:
+    //-----------------------------------------------------------------------------
+    // Shapes applied to the noise
+    //-----------------------------------------------------------------------------
+    enum TerrainShape { kNone, kRidges, kPlateaus, kCraters };
+    //-----------------------------------------------------------------------------
+    // Constructor
+    //-----------------------------------------------------------------------------
+    HeightFieldShaper();
+    //-----------------------------------------------------------------------------
+    // noise
+    // The FastNoise object, set up by the caller before evaluating
+    //-----------------------------------------------------------------------------
+    FastNoise &noise() { return m_fastNoise; }
+    //-----------------------------------------------------------------------------
+    // setShape
+    // Set the domain warp and the terrain shape parameters
+    //-----------------------------------------------------------------------------
+    void setShape(float _warpAmount, TerrainShape _shapeType, int _numPlateaus, float _craterSize);
+    //-----------------------------------------------------------------------------
+    // evaluateHeights
+    // Evaluate the shaped terrain height in [-1, 1] for a batch of XZ positions,
+    // optionally with its derivatives with respect to x and z
+    //-----------------------------------------------------------------------------
+    void evaluateHeights(const std::vector<double> &_x, const std::vector<double> &_z, std::vector<double> &_heights, std::vector<double> *_dx, std::vector<double> *_dz);
+
+  private:
+    //-----------------------------------------------------------------------------
+    // cellularBatch
+    // Find the distance to the nearest cellular feature point for a batch of
+    // positions in noise space, binning them in a hashed grid so each cell's
+    // neighbourhood of feature points is only generated once
+    //-----------------------------------------------------------------------------
+    void cellularBatch(const std::vector<double> &_x, const std::vector<double> &_z, std::vector<double> &_distance, std::vector<double> &_dx, std::vector<double> &_dz, std::vector<double> &_radius) const;
+    //-----------------------------------------------------------------------------
+    // cellFeaturePoint
+    // The jittered feature point and crater radius of a cell
+    //-----------------------------------------------------------------------------
+    void cellFeaturePoint(int _cellX, int _cellZ, double &_x, double &_z, double &_radius) const;
+    //-----------------------------------------------------------------------------
+    // FastNoise object
+    //-----------------------------------------------------------------------------
+    FastNoise m_fastNoise;
+    //-----------------------------------------------------------------------------
+    // Shaping parameters
+    //-----------------------------------------------------------------------------
+    float m_warpAmount;
+    TerrainShape m_shapeType;
+    int m_numPlateaus;
+    float m_craterSize;
+};
+
+#endif
@@ -2254,3 +2254,275 @@ void FastNoise::SingleGradientPerturb(unsigned char offset, FN_DECIMAL warpAmp,
 	x += Lerp(lx0x, lx1x, ys) * warpAmp;
 	y += Lerp(ly0x, ly1x, ys) * warpAmp;
 }
+
+// Analytic Derivatives
+static FN_DECIMAL InterpHermiteDeriv(FN_DECIMAL t) { return 6 * t * (1 - t); }
+static FN_DECIMAL InterpQuinticDeriv(FN_DECIMAL t) { return 30 * t * t * (t * (t - 2) + 1); }
+static FN_DECIMAL CubicLerpDeriv(FN_DECIMAL a, FN_DECIMAL b, FN_DECIMAL c, FN_DECIMAL d, FN_DECIMAL t)
+{
+	FN_DECIMAL p = (d - c) - (a - b);
+	return 3 * t * t * p + 2 * t * ((a - b) - p) + (c - a);
+}
+static FN_DECIMAL FastSign(FN_DECIMAL f) { return (f < 0) ? FN_DECIMAL(-1) : FN_DECIMAL(1); }
+
+FN_DECIMAL FastNoise::GetNoiseDeriv(FN_DECIMAL x, FN_DECIMAL y, FN_DECIMAL& dx, FN_DECIMAL& dy) const
+{
+	FN_DECIMAL xf = x * m_frequency;
+	FN_DECIMAL yf = y * m_frequency;
+	FN_DECIMAL value;
+
+	switch (m_noiseType)
+	{
+	case Perlin:
+		value = SinglePerlinDeriv(0, xf, yf, dx, dy);
+		break;
+	case PerlinFractal:
+		value = SingleFractalDeriv(&FastNoise::SinglePerlinDeriv, xf, yf, dx, dy);
+		break;
+	case Simplex:
+		value = SingleSimplexDeriv(0, xf, yf, dx, dy);
+		break;
+	case SimplexFractal:
+		value = SingleFractalDeriv(&FastNoise::SingleSimplexDeriv, xf, yf, dx, dy);
+		break;
+	case Cubic:
+		value = SingleCubicDeriv(0, xf, yf, dx, dy);
+		break;
+	case CubicFractal:
+		value = SingleFractalDeriv(&FastNoise::SingleCubicDeriv, xf, yf, dx, dy);
+		break;
+	default:
+	{
+		// Central differences with a step of a hundredth of the noise period
+		FN_DECIMAL h = FN_DECIMAL(0.01) / m_frequency;
+		dx = (GetNoise(x + h, y) - GetNoise(x - h, y)) / (2 * h);
+		dy = (GetNoise(x, y + h) - GetNoise(x, y - h)) / (2 * h);
+		return GetNoise(x, y);
+	}
+	}
+
+	// Chain rule for the frequency scaling
+	dx *= m_frequency;
+	dy *= m_frequency;
+	return value;
+}
+
+FN_DECIMAL FastNoise::SingleFractalDeriv(SingleDerivFunc func, FN_DECIMAL x, FN_DECIMAL y, FN_DECIMAL& dx, FN_DECIMAL& dy) const
+{
+	FN_DECIMAL ndx, ndy;
+	FN_DECIMAL n = (this->*func)(m_perm[0], x, y, ndx, ndy);
+	FN_DECIMAL sum, sign;
+
+	switch (m_fractalType)
+	{
+	default:
+	case FBM:
+		sum = n;
+		dx = ndx;
+		dy = ndy;
+		break;
+	case Billow:
+		sign = FastSign(n) * 2;
+		sum = FastAbs(n) * 2 - 1;
+		dx = ndx * sign;
+		dy = ndy * sign;
+		break;
+	case RigidMulti:
+		sign = FastSign(n);
+		sum = 1 - FastAbs(n);
+		dx = -ndx * sign;
+		dy = -ndy * sign;
+		break;
+	}
+
+	FN_DECIMAL amp = 1;
+	FN_DECIMAL freq = 1;
+	int i = 0;
+
+	while (++i < m_octaves)
+	{
+		x *= m_lacunarity;
+		y *= m_lacunarity;
+		freq *= m_lacunarity;
+
+		amp *= m_gain;
+		n = (this->*func)(m_perm[i], x, y, ndx, ndy);
+		FN_DECIMAL scale = amp * freq;
+
+		switch (m_fractalType)
+		{
+		default:
+		case FBM:
+			sum += n * amp;
+			dx += ndx * scale;
+			dy += ndy * scale;
+			break;
+		case Billow:
+			sign = FastSign(n) * 2;
+			sum += (FastAbs(n) * 2 - 1) * amp;
+			dx += ndx * sign * scale;
+			dy += ndy * sign * scale;
+			break;
+		case RigidMulti:
+			sign = FastSign(n);
+			sum -= (1 - FastAbs(n)) * amp;
+			dx += ndx * sign * scale;
+			dy += ndy * sign * scale;
+			break;
+		}
+	}
+
+	// Rigid multi is not scaled by the fractal bounding
+	if (m_fractalType == RigidMulti)
+		return sum;
+
+	dx *= m_fractalBounding;
+	dy *= m_fractalBounding;
+	return sum * m_fractalBounding;
+}
+
+FN_DECIMAL FastNoise::SinglePerlinDeriv(unsigned char offset, FN_DECIMAL x, FN_DECIMAL y, FN_DECIMAL& dx, FN_DECIMAL& dy) const
+{
+	int x0 = FastFloor(x);
+	int y0 = FastFloor(y);
+	int x1 = x0 + 1;
+	int y1 = y0 + 1;
+
+	FN_DECIMAL xd0 = x - (FN_DECIMAL)x0;
+	FN_DECIMAL yd0 = y - (FN_DECIMAL)y0;
+	FN_DECIMAL xd1 = xd0 - 1;
+	FN_DECIMAL yd1 = yd0 - 1;
+
+	FN_DECIMAL xs, ys, dxs, dys;
+	switch (m_interp)
+	{
+	default:
+	case Linear:
+		xs = xd0;
+		ys = yd0;
+		dxs = 1;
+		dys = 1;
+		break;
+	case Hermite:
+		xs = InterpHermiteFunc(xd0);
+		ys = InterpHermiteFunc(yd0);
+		dxs = InterpHermiteDeriv(xd0);
+		dys = InterpHermiteDeriv(yd0);
+		break;
+	case Quintic:
+		xs = InterpQuinticFunc(xd0);
+		ys = InterpQuinticFunc(yd0);
+		dxs = InterpQuinticDeriv(xd0);
+		dys = InterpQuinticDeriv(yd0);
+		break;
+	}
+
+	// Gradients at the four corners and their dot products with the offsets
+	unsigned char lut00 = Index2D_12(offset, x0, y0);
+	unsigned char lut10 = Index2D_12(offset, x1, y0);
+	unsigned char lut01 = Index2D_12(offset, x0, y1);
+	unsigned char lut11 = Index2D_12(offset, x1, y1);
+
+	FN_DECIMAL g00 = xd0 * GRAD_X[lut00] + yd0 * GRAD_Y[lut00];
+	FN_DECIMAL g10 = xd1 * GRAD_X[lut10] + yd0 * GRAD_Y[lut10];
+	FN_DECIMAL g01 = xd0 * GRAD_X[lut01] + yd1 * GRAD_Y[lut01];
+	FN_DECIMAL g11 = xd1 * GRAD_X[lut11] + yd1 * GRAD_Y[lut11];
+
+	FN_DECIMAL xf0 = Lerp(g00, g10, xs);
+	FN_DECIMAL xf1 = Lerp(g01, g11, xs);
+
+	FN_DECIMAL dxf0dx = Lerp(GRAD_X[lut00], GRAD_X[lut10], xs) + (g10 - g00) * dxs;
+	FN_DECIMAL dxf1dx = Lerp(GRAD_X[lut01], GRAD_X[lut11], xs) + (g11 - g01) * dxs;
+	FN_DECIMAL dxf0dy = Lerp(GRAD_Y[lut00], GRAD_Y[lut10], xs);
+	FN_DECIMAL dxf1dy = Lerp(GRAD_Y[lut01], GRAD_Y[lut11], xs);
+
+	dx = Lerp(dxf0dx, dxf1dx, ys);
+	dy = Lerp(dxf0dy, dxf1dy, ys) + (xf1 - xf0) * dys;
+
+	return Lerp(xf0, xf1, ys);
+}
+
+FN_DECIMAL FastNoise::SingleSimplexDeriv(unsigned char offset, FN_DECIMAL x, FN_DECIMAL y, FN_DECIMAL& dx, FN_DECIMAL& dy) const
+{
+	FN_DECIMAL t = (x + y) * F2;
+	int i = FastFloor(x + t);
+	int j = FastFloor(y + t);
+
+	t = (i + j) * G2;
+	FN_DECIMAL X0 = i - t;
+	FN_DECIMAL Y0 = j - t;
+
+	int i1, j1;
+	FN_DECIMAL xc[3], yc[3];
+	xc[0] = x - X0;
+	yc[0] = y - Y0;
+
+	if (xc[0] > yc[0])
+	{
+		i1 = 1; j1 = 0;
+	}
+	else
+	{
+		i1 = 0; j1 = 1;
+	}
+
+	xc[1] = xc[0] - (FN_DECIMAL)i1 + G2;
+	yc[1] = yc[0] - (FN_DECIMAL)j1 + G2;
+	xc[2] = xc[0] - 1 + 2*G2;
+	yc[2] = yc[0] - 1 + 2*G2;
+
+	int ic[3] = { i, i + i1, i + 1 };
+	int jc[3] = { j, j + j1, j + 1 };
+
+	FN_DECIMAL n = 0;
+	dx = 0;
+	dy = 0;
+
+	// Each corner contributes t^4 * g, where t = 0.5 - |d|^2 and g is the gradient dot product
+	for (int c = 0; c < 3; c++)
+	{
+		t = FN_DECIMAL(0.5) - xc[c]*xc[c] - yc[c]*yc[c];
+		if (t < 0)
+			continue;
+
+		unsigned char lutPos = Index2D_12(offset, ic[c], jc[c]);
+		FN_DECIMAL g = xc[c] * GRAD_X[lutPos] + yc[c] * GRAD_Y[lutPos];
+		FN_DECIMAL t2 = t * t;
+		FN_DECIMAL t3 = t2 * t;
+
+		n += t2 * t2 * g;
+		dx += t2 * t2 * GRAD_X[lutPos] - 8 * t3 * xc[c] * g;
+		dy += t2 * t2 * GRAD_Y[lutPos] - 8 * t3 * yc[c] * g;
+	}
+
+	dx *= 70;
+	dy *= 70;
+	return 70 * n;
+}
+
+FN_DECIMAL FastNoise::SingleCubicDeriv(unsigned char offset, FN_DECIMAL x, FN_DECIMAL y, FN_DECIMAL& dx, FN_DECIMAL& dy) const
+{
+	int x1 = FastFloor(x);
+	int y1 = FastFloor(y);
+
+	FN_DECIMAL xs = x - (FN_DECIMAL)x1;
+	FN_DECIMAL ys = y - (FN_DECIMAL)y1;
+
+	// Interpolate each row in x, keeping the x derivative of every row
+	FN_DECIMAL rows[4], rowsDx[4];
+	for (int r = 0; r < 4; r++)
+	{
+		int yr = y1 - 1 + r;
+		FN_DECIMAL a = ValCoord2DFast(offset, x1 - 1, yr);
+		FN_DECIMAL b = ValCoord2DFast(offset, x1, yr);
+		FN_DECIMAL c = ValCoord2DFast(offset, x1 + 1, yr);
+		FN_DECIMAL d = ValCoord2DFast(offset, x1 + 2, yr);
+		rows[r] = CubicLerp(a, b, c, d, xs);
+		rowsDx[r] = CubicLerpDeriv(a, b, c, d, xs);
+	}
+
+	dx = CubicLerp(rowsDx[0], rowsDx[1], rowsDx[2], rowsDx[3], ys) * CUBIC_2D_BOUNDING;
+	dy = CubicLerpDeriv(rows[0], rows[1], rows[2], rows[3], ys) * CUBIC_2D_BOUNDING;
+
+	return CubicLerp(rows[0], rows[1], rows[2], rows[3], ys) * CUBIC_2D_BOUNDING;
+}
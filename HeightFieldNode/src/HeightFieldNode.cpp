@@ -1,3 +1,6 @@
+#include <algorithm>
+#include <cmath>
+#include <vector>
 #include <maya/MDataHandle.h>
 #include <maya/MFnEnumAttribute.h>
 #include <maya/MFnData.h>
@@ -10,8 +13,10 @@
 #include <maya/MPoint.h>
 #include <maya/MPointArray.h>
 #include <maya/MVector.h>
+#include <maya/MVectorArray.h>
 #include "HeightFieldNode.h"
 #include "FastNoise.h"
+#include "HeightFieldShaper.h"
 
 //-----------------------------------------------------------------------------
 // Set static members
@@ -26,6 +31,14 @@ MObject HeightField::m_frequency;
 MObject HeightField::m_fractalOctaves;
 MObject HeightField::m_lacunarity;
 MObject HeightField::m_fractalGain;
+MObject HeightField::m_preview;
+MObject HeightField::m_previewStride;
+MObject HeightField::m_previewOctaves;
+MObject HeightField::m_analyticNormals;
+MObject HeightField::m_domainWarp;
+MObject HeightField::m_terrainShape;
+MObject HeightField::m_plateauLevels;
+MObject HeightField::m_craterRadius;
 MObject HeightField::m_outMesh;
 //-----------------------------------------------------------------------------
 void* HeightField::creator()
@@ -54,6 +67,7 @@ MStatus HeightField::initialize()
     enumAttr.addField("Simplex", FastNoise::SimplexFractal);
     enumAttr.addField("Perlin", FastNoise::PerlinFractal);
     enumAttr.addField("Cubic", FastNoise::CubicFractal);
+    enumAttr.addField("Cellular", FastNoise::Cellular);
     stat = addAttribute(m_noiseType);
     if (!stat)
         return stat;
@@ -115,6 +129,79 @@ MStatus HeightField::initialize()
     if (!stat)
         return stat;
 
+    // Preview is set by the UI while a slider is being dragged
+    m_preview = numericAttr.create("preview", "pv", MFnNumericData::kBoolean, false);
+    numericAttr.setReadable(false);
+    numericAttr.setWritable(true);
+    numericAttr.setStorable(false);
+    stat = addAttribute(m_preview);
+    if (!stat)
+        return stat;
+
+    m_previewStride = numericAttr.create("previewStride", "pvs", MFnNumericData::kInt, 4);
+    numericAttr.setReadable(false);
+    numericAttr.setWritable(true);
+    numericAttr.setStorable(true);
+    numericAttr.setMin(1);
+    stat = addAttribute(m_previewStride);
+    if (!stat)
+        return stat;
+
+    m_previewOctaves = numericAttr.create("previewOctaves", "pvo", MFnNumericData::kInt, 2);
+    numericAttr.setReadable(false);
+    numericAttr.setWritable(true);
+    numericAttr.setStorable(true);
+    numericAttr.setMin(1);
+    stat = addAttribute(m_previewOctaves);
+    if (!stat)
+        return stat;
+
+    m_analyticNormals = numericAttr.create("analyticNormals", "an", MFnNumericData::kBoolean, true);
+    numericAttr.setReadable(false);
+    numericAttr.setWritable(true);
+    numericAttr.setStorable(true);
+    stat = addAttribute(m_analyticNormals);
+    if (!stat)
+        return stat;
+
+    // Maximum distance the sample positions are warped by, 0 disables the domain warp
+    m_domainWarp = numericAttr.create("domainWarp", "dw", MFnNumericData::kFloat, 0.0f);
+    numericAttr.setReadable(false);
+    numericAttr.setWritable(true);
+    numericAttr.setStorable(true);
+    numericAttr.setMin(0.0);
+    stat = addAttribute(m_domainWarp);
+    if (!stat)
+        return stat;
+
+    m_terrainShape = enumAttr.create("terrainShape", "ts", HeightFieldShaper::kNone);
+    enumAttr.addField("None", HeightFieldShaper::kNone);
+    enumAttr.addField("Ridges", HeightFieldShaper::kRidges);
+    enumAttr.addField("Plateaus", HeightFieldShaper::kPlateaus);
+    enumAttr.addField("Craters", HeightFieldShaper::kCraters);
+    stat = addAttribute(m_terrainShape);
+    if (!stat)
+        return stat;
+
+    m_plateauLevels = numericAttr.create("plateauLevels", "pl", MFnNumericData::kInt, 4);
+    numericAttr.setReadable(false);
+    numericAttr.setWritable(true);
+    numericAttr.setStorable(true);
+    numericAttr.setMin(1);
+    stat = addAttribute(m_plateauLevels);
+    if (!stat)
+        return stat;
+
+    // Crater radius relative to the noise cell size
+    m_craterRadius = numericAttr.create("craterRadius", "cr", MFnNumericData::kFloat, 0.35f);
+    numericAttr.setReadable(false);
+    numericAttr.setWritable(true);
+    numericAttr.setStorable(true);
+    numericAttr.setMin(0.01);
+    stat = addAttribute(m_craterRadius);
+    if (!stat)
+        return stat;
+
     // Output node attributes
     m_outMesh = typedAttr.create("outMesh", "om", MFnData::kMesh);
 	typedAttr.setReadable(true);
@@ -134,6 +221,14 @@ MStatus HeightField::initialize()
     attributeAffects(m_fractalOctaves, m_outMesh);
     attributeAffects(m_lacunarity, m_outMesh);
     attributeAffects(m_fractalGain, m_outMesh);
+    attributeAffects(m_preview, m_outMesh);
+    attributeAffects(m_previewStride, m_outMesh);
+    attributeAffects(m_previewOctaves, m_outMesh);
+    attributeAffects(m_analyticNormals, m_outMesh);
+    attributeAffects(m_domainWarp, m_outMesh);
+    attributeAffects(m_terrainShape, m_outMesh);
+    attributeAffects(m_plateauLevels, m_outMesh);
+    attributeAffects(m_craterRadius, m_outMesh);
 
 	// Return success
 	return MStatus::kSuccess;
@@ -173,18 +268,48 @@ MStatus HeightField::compute(const MPlug &_plug, MDataBlock &_data)
         MDataHandle fractalGainDataHandle = _data.inputValue(m_fractalGain);
         float fractalGainValue = fractalGainDataHandle.asFloat();
 
+        MDataHandle previewDataHandle = _data.inputValue(m_preview);
+        bool previewValue = previewDataHandle.asBool();
+
+        MDataHandle previewStrideDataHandle = _data.inputValue(m_previewStride);
+        int previewStrideValue = previewStrideDataHandle.asInt();
+
+        MDataHandle previewOctavesDataHandle = _data.inputValue(m_previewOctaves);
+        int previewOctavesValue = previewOctavesDataHandle.asInt();
+
+        MDataHandle analyticNormalsDataHandle = _data.inputValue(m_analyticNormals);
+        bool analyticNormalsValue = analyticNormalsDataHandle.asBool();
+
+        MDataHandle domainWarpDataHandle = _data.inputValue(m_domainWarp);
+        float domainWarpValue = domainWarpDataHandle.asFloat();
+
+        MDataHandle terrainShapeDataHandle = _data.inputValue(m_terrainShape);
+        HeightFieldShaper::TerrainShape terrainShapeValue = (HeightFieldShaper::TerrainShape)terrainShapeDataHandle.asShort();
+
+        MDataHandle plateauLevelsDataHandle = _data.inputValue(m_plateauLevels);
+        int plateauLevelsValue = plateauLevelsDataHandle.asInt();
+
+        MDataHandle craterRadiusDataHandle = _data.inputValue(m_craterRadius);
+        float craterRadiusValue = craterRadiusDataHandle.asFloat();
+
+        // Use fewer octaves while previewing
+        if (previewValue && previewOctavesValue < fractalOctavesValue)
+            fractalOctavesValue = previewOctavesValue;
+
         // Get the data handle for the output value
         MDataHandle outMeshDataHandle = _data.outputValue(m_outMesh);
 
 		// Set FastNoise parameters
-        m_fastNoise.SetNoiseType(noiseTypeValue);
+        FastNoise &fastNoise = m_shaper.noise();
+        fastNoise.SetNoiseType(noiseTypeValue);
         // Only set the seed if it has changed
-        if (m_fastNoise.GetSeed() != seedValue)
-            m_fastNoise.SetSeed(seedValue);
-        m_fastNoise.SetFrequency(frequencyValue);
-        m_fastNoise.SetFractalOctaves(fractalOctavesValue);
-        m_fastNoise.SetFractalLacunarity(lacunarityValue);
-        m_fastNoise.SetFractalGain(fractalGainValue);
+        if (fastNoise.GetSeed() != seedValue)
+            fastNoise.SetSeed(seedValue);
+        fastNoise.SetFrequency(frequencyValue);
+        fastNoise.SetFractalOctaves(fractalOctavesValue);
+        fastNoise.SetFractalLacunarity(lacunarityValue);
+        fastNoise.SetFractalGain(fractalGainValue);
+        m_shaper.setShape(domainWarpValue, terrainShapeValue, plateauLevelsValue, craterRadiusValue);
 
 		// Create a function set for the input mesh
         MFnMesh inMeshFn(inMeshValue);
@@ -200,19 +325,59 @@ MStatus HeightField::compute(const MPlug &_plug, MDataBlock &_data)
 		MPointArray vertices;
         stat = inMeshFn.getPoints(vertices, spaceTypeValue);
 
-		// Iterate through each point and adjust the y value
-		float height = 0.0f;
-		MVector heightDisplacement(0.0, 0.0, 0.0);
-        size_t numVertices = vertices.length();
-		for (size_t i = 0; i < numVertices; ++i)
-		{
-			MPoint& currentPoint = vertices[i];
-            height = m_fastNoise.GetNoise(currentPoint.x, currentPoint.z) * amplitudeValue;
-			heightDisplacement.y = height;
-			currentPoint += heightDisplacement;
-		}
+        // Normals are only filled in when they are computed analytically
+        MVectorArray normals;
+        MIntArray normalVertexIds;
+
+        if (previewValue && previewStrideValue > 1)
+        {
+            // Sample a coarse lattice and interpolate the rest
+            previewNoise(vertices, previewStrideValue, amplitudeValue);
+        }
+        else
+        {
+            // Gather the sample positions so every vertex is evaluated in one batch
+            unsigned int numVertices = vertices.length();
+            std::vector<double> sampleX(numVertices);
+            std::vector<double> sampleZ(numVertices);
+            for (unsigned int i = 0; i < numVertices; ++i)
+            {
+                sampleX[i] = vertices[i].x;
+                sampleZ[i] = vertices[i].z;
+            }
+
+            // The domain warp has no analytic derivative, so normals are left to Maya when it is used
+            // Preview mode leaves them to Maya as well, even when every vertex is sampled
+            bool computeNormals = analyticNormalsValue && !previewValue && domainWarpValue <= 0.0f;
+            std::vector<double> heights;
+            std::vector<double> heightsDx;
+            std::vector<double> heightsDz;
+            if (computeNormals)
+                m_shaper.evaluateHeights(sampleX, sampleZ, heights, &heightsDx, &heightsDz);
+            else
+                m_shaper.evaluateHeights(sampleX, sampleZ, heights, NULL, NULL);
+
+            if (computeNormals)
+            {
+                normals.setLength(numVertices);
+                normalVertexIds.setLength(numVertices);
+            }
+            for (unsigned int i = 0; i < numVertices; ++i)
+            {
+                vertices[i].y += heights[i] * amplitudeValue;
+                if (computeNormals)
+                {
+                    // The normal of the surface y = amplitude * height(x, z)
+                    normals[i] = MVector(-heightsDx[i] * amplitudeValue, 1.0, -heightsDz[i] * amplitudeValue).normal();
+                    normalVertexIds[i] = i;
+                }
+            }
+        }
 		// Set the output mesh vertices
         newMeshFn.setPoints(vertices);
+        // Set the analytic normals so they do not need to be recomputed from the geometry, in the same space as the points
+        if (normals.length() > 0)
+            newMeshFn.setVertexNormals(normals, normalVertexIds, spaceTypeValue);
 
         newMeshFn.setObject(outMeshObj);
 
@@ -229,6 +394,65 @@ MStatus HeightField::compute(const MPlug &_plug, MDataBlock &_data)
     return MStatus::kUnknownParameter;
 }
 //-----------------------------------------------------------------------------
+void HeightField::previewNoise(MPointArray &_vertices, int _stride, float _amplitude)
+{
+    unsigned int numVertices = _vertices.length();
+    if (numVertices == 0)
+        return;
+
+    // Find the XZ bounds of the vertices
+    double minX = _vertices[0].x;
+    double maxX = minX;
+    double minZ = _vertices[0].z;
+    double maxZ = minZ;
+    for (unsigned int i = 1; i < numVertices; ++i)
+    {
+        const MPoint& currentPoint = _vertices[i];
+        if (currentPoint.x < minX) minX = currentPoint.x;
+        if (currentPoint.x > maxX) maxX = currentPoint.x;
+        if (currentPoint.z < minZ) minZ = currentPoint.z;
+        if (currentPoint.z > maxZ) maxZ = currentPoint.z;
+    }
+
+    // The lattice has roughly one sample every _stride vertices along each axis
+    int resolution = (int)(std::sqrt((double)numVertices) / _stride) + 2;
+    double stepX = (maxX - minX) / (resolution - 1);
+    double stepZ = (maxZ - minZ) / (resolution - 1);
+
+    // Evaluate the heights at the lattice points
+    std::vector<double> latticeX(resolution * resolution);
+    std::vector<double> latticeZ(resolution * resolution);
+    for (int j = 0; j < resolution; ++j)
+    {
+        for (int i = 0; i < resolution; ++i)
+        {
+            latticeX[j * resolution + i] = minX + i * stepX;
+            latticeZ[j * resolution + i] = minZ + j * stepZ;
+        }
+    }
+    std::vector<double> lattice;
+    m_shaper.evaluateHeights(latticeX, latticeZ, lattice, NULL, NULL);
+
+    // Bilinearly interpolate the height of each vertex
+    for (unsigned int v = 0; v < numVertices; ++v)
+    {
+        MPoint& currentPoint = _vertices[v];
+        double u = (stepX > 0.0) ? (currentPoint.x - minX) / stepX : 0.0;
+        double w = (stepZ > 0.0) ? (currentPoint.z - minZ) / stepZ : 0.0;
+        int i = std::min((int)u, resolution - 2);
+        int j = std::min((int)w, resolution - 2);
+        double fu = u - i;
+        double fw = w - j;
+        double h00 = lattice[j * resolution + i];
+        double h10 = lattice[j * resolution + i + 1];
+        double h01 = lattice[(j + 1) * resolution + i];
+        double h11 = lattice[(j + 1) * resolution + i + 1];
+        double h0 = h00 + (h10 - h00) * fu;
+        double h1 = h01 + (h11 - h01) * fu;
+        currentPoint.y += (h0 + (h1 - h0) * fw) * _amplitude;
+    }
+}
+//-----------------------------------------------------------------------------
 HeightField::HeightField(){}
 //-----------------------------------------------------------------------------
 HeightField::~HeightField(){}
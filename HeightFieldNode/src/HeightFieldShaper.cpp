@@ -0,0 +1,252 @@
+#include <cmath>
+#include <unordered_map>
+#include "HeightFieldShaper.h"
+
+//-----------------------------------------------------------------------------
+// Quintic smoothing used to round off the plateau steps
+static double quinticStep(double _t, double &_deriv)
+{
+    _deriv = 30.0 * _t * _t * (_t * (_t - 2.0) + 1.0);
+    return _t * _t * _t * (_t * (_t * 6.0 - 15.0) + 10.0);
+}
+//-----------------------------------------------------------------------------
+// Crater profile over the ratio of the distance to the crater radius,
+// a bowl inside the rim and a raised rim falling off on both sides
+static double craterProfile(double _ratio, double &_deriv)
+{
+    const double rimHeight = 0.3;
+    const double rimWidth = 0.3;
+    double rimT = (_ratio - 1.0) / rimWidth;
+    double rim = rimHeight * std::exp(-rimT * rimT);
+    double rimDeriv = rim * -2.0 * rimT / rimWidth;
+    if (_ratio < 1.0)
+    {
+        _deriv = 2.0 * _ratio + rimDeriv;
+        return _ratio * _ratio - 1.0 + rim;
+    }
+    _deriv = rimDeriv;
+    return rim;
+}
+//-----------------------------------------------------------------------------
+void HeightFieldShaper::evaluateHeights(const std::vector<double> &_x, const std::vector<double> &_z, std::vector<double> &_heights, std::vector<double> *_dx, std::vector<double> *_dz)
+{
+    size_t numSamples = _x.size();
+    bool derivatives = (_dx != NULL) && (_dz != NULL);
+    _heights.resize(numSamples);
+    if (derivatives)
+    {
+        _dx->resize(numSamples);
+        _dz->resize(numSamples);
+    }
+
+    // Warp the sample positions
+    std::vector<double> sampleX(_x);
+    std::vector<double> sampleZ(_z);
+    if (m_warpAmount > 0.0f)
+    {
+        m_fastNoise.SetGradientPerturbAmp(m_warpAmount);
+        for (size_t i = 0; i < numSamples; ++i)
+        {
+            FN_DECIMAL warpX = sampleX[i];
+            FN_DECIMAL warpZ = sampleZ[i];
+            m_fastNoise.GradientPerturbFractal(warpX, warpZ);
+            sampleX[i] = warpX;
+            sampleZ[i] = warpZ;
+        }
+    }
+
+    // Look up the nearest cellular feature point of every sample in one batch
+    double frequency = m_fastNoise.GetFrequency();
+    bool cellularNoise = (m_fastNoise.GetNoiseType() == FastNoise::Cellular);
+    std::vector<double> cellDistance;
+    std::vector<double> cellDx;
+    std::vector<double> cellDz;
+    std::vector<double> cellRadius;
+    if (cellularNoise || m_shapeType == kCraters)
+    {
+        std::vector<double> cellX(numSamples);
+        std::vector<double> cellZ(numSamples);
+        for (size_t i = 0; i < numSamples; ++i)
+        {
+            cellX[i] = sampleX[i] * frequency;
+            cellZ[i] = sampleZ[i] * frequency;
+        }
+        cellularBatch(cellX, cellZ, cellDistance, cellDx, cellDz, cellRadius);
+    }
+
+    FN_DECIMAL noiseDx = 0.0f;
+    FN_DECIMAL noiseDz = 0.0f;
+    for (size_t i = 0; i < numSamples; ++i)
+    {
+        // Base noise in [-1, 1] and its derivatives with respect to x and z
+        double height;
+        double dx = 0.0;
+        double dz = 0.0;
+        if (cellularNoise)
+        {
+            // Worley noise, the distance to the nearest feature point
+            height = cellDistance[i] * 2.0 - 1.0;
+            dx = cellDx[i] * 2.0 * frequency;
+            dz = cellDz[i] * 2.0 * frequency;
+        }
+        else if (derivatives)
+        {
+            height = m_fastNoise.GetNoiseDeriv(sampleX[i], sampleZ[i], noiseDx, noiseDz);
+            dx = noiseDx;
+            dz = noiseDz;
+        }
+        else
+        {
+            height = m_fastNoise.GetNoise(sampleX[i], sampleZ[i]);
+        }
+
+        // Shape the terrain
+        switch (m_shapeType)
+        {
+        case kRidges:
+        {
+            double sign = (height < 0.0) ? -1.0 : 1.0;
+            height = 1.0 - 2.0 * std::fabs(height);
+            dx *= -2.0 * sign;
+            dz *= -2.0 * sign;
+            break;
+        }
+        case kPlateaus:
+        {
+            double levels = (double)m_numPlateaus;
+            double t = (height + 1.0) * 0.5 * levels;
+            double step = std::floor(t);
+            double stepDeriv;
+            double smooth = quinticStep(t - step, stepDeriv);
+            height = (step + smooth) / levels * 2.0 - 1.0;
+            dx *= stepDeriv;
+            dz *= stepDeriv;
+            break;
+        }
+        case kCraters:
+        {
+            // Each feature point is the centre of a crater
+            double profileDeriv;
+            double ratio = cellDistance[i] / cellRadius[i];
+            height += craterProfile(ratio, profileDeriv);
+            dx += profileDeriv * cellDx[i] * frequency / cellRadius[i];
+            dz += profileDeriv * cellDz[i] * frequency / cellRadius[i];
+            break;
+        }
+        default:
+            break;
+        }
+
+        _heights[i] = height;
+        if (derivatives)
+        {
+            (*_dx)[i] = dx;
+            (*_dz)[i] = dz;
+        }
+    }
+}
+//-----------------------------------------------------------------------------
+void HeightFieldShaper::cellFeaturePoint(int _cellX, int _cellZ, double &_x, double &_z, double &_radius) const
+{
+    // The white noise hash gives each cell a jittered point and a crater radius
+    const double jitter = 0.45;
+    _x = _cellX + 0.5 + jitter * m_fastNoise.GetWhiteNoiseInt(_cellX, _cellZ);
+    _z = _cellZ + 0.5 + jitter * m_fastNoise.GetWhiteNoiseInt(_cellX + 1619, _cellZ - 31337);
+    _radius = m_craterSize * (0.75 + 0.25 * m_fastNoise.GetWhiteNoiseInt(_cellX - 6971, _cellZ + 1013));
+}
+//-----------------------------------------------------------------------------
+void HeightFieldShaper::cellularBatch(const std::vector<double> &_x, const std::vector<double> &_z, std::vector<double> &_distance, std::vector<double> &_dx, std::vector<double> &_dz, std::vector<double> &_radius) const
+{
+    size_t numSamples = _x.size();
+    _distance.resize(numSamples);
+    _dx.resize(numSamples);
+    _dz.resize(numSamples);
+    _radius.resize(numSamples);
+
+    // Bin the samples into a hashed grid of unit cells
+    struct Cell
+    {
+        int x;
+        int z;
+        std::vector<unsigned int> samples;
+    };
+    std::unordered_map<unsigned long long, Cell> cells;
+    for (size_t i = 0; i < numSamples; ++i)
+    {
+        int cellX = (int)std::floor(_x[i]);
+        int cellZ = (int)std::floor(_z[i]);
+        // Shift the unsigned bits, shifting a negative signed cell index is undefined
+        unsigned long long key = ((unsigned long long)(unsigned int)cellX << 32) | (unsigned int)cellZ;
+        Cell &cell = cells[key];
+        cell.x = cellX;
+        cell.z = cellZ;
+        cell.samples.push_back((unsigned int)i);
+    }
+
+    // Generate the feature points around each occupied cell once and test all of its samples against them
+    double pointX[9];
+    double pointZ[9];
+    double pointRadius[9];
+    for (std::unordered_map<unsigned long long, Cell>::const_iterator it = cells.begin(); it != cells.end(); ++it)
+    {
+        const Cell &cell = it->second;
+        int k = 0;
+        for (int j = -1; j <= 1; ++j)
+        {
+            for (int i = -1; i <= 1; ++i)
+            {
+                cellFeaturePoint(cell.x + i, cell.z + j, pointX[k], pointZ[k], pointRadius[k]);
+                ++k;
+            }
+        }
+
+        size_t numCellSamples = cell.samples.size();
+        for (size_t s = 0; s < numCellSamples; ++s)
+        {
+            unsigned int sample = cell.samples[s];
+            double closestDistance = 1e30;
+            int closest = 0;
+            for (k = 0; k < 9; ++k)
+            {
+                double dX = _x[sample] - pointX[k];
+                double dZ = _z[sample] - pointZ[k];
+                double distance = dX * dX + dZ * dZ;
+                if (distance < closestDistance)
+                {
+                    closestDistance = distance;
+                    closest = k;
+                }
+            }
+            closestDistance = std::sqrt(closestDistance);
+            _distance[sample] = closestDistance;
+            _radius[sample] = pointRadius[closest];
+            // Gradient of the distance to the closest point
+            if (closestDistance > 0.0)
+            {
+                _dx[sample] = (_x[sample] - pointX[closest]) / closestDistance;
+                _dz[sample] = (_z[sample] - pointZ[closest]) / closestDistance;
+            }
+            else
+            {
+                _dx[sample] = 0.0;
+                _dz[sample] = 0.0;
+            }
+        }
+    }
+}
+//-----------------------------------------------------------------------------
+HeightFieldShaper::HeightFieldShaper() :
+    m_warpAmount(0.0f),
+    m_shapeType(kNone),
+    m_numPlateaus(4),
+    m_craterSize(0.35f)
+{}
+//-----------------------------------------------------------------------------
+void HeightFieldShaper::setShape(float _warpAmount, TerrainShape _shapeType, int _numPlateaus, float _craterSize)
+{
+    m_warpAmount = _warpAmount;
+    m_shapeType = _shapeType;
+    m_numPlateaus = _numPlateaus;
+    m_craterSize = _craterSize;
+}
+//-----------------------------------------------------------------------------
@@ -1,3 +1,6 @@
+from __future__ import print_function
+import os
+import time
 import maya.api.OpenMaya as om
 import maya.cmds as mc
 
@@ -13,6 +16,7 @@ class UserInterface(object):
 		self.m_windowTitle = "Terrain Deformation and Sculpting Tools"
 		self.m_window = mc.window()
 		self.warpControlPoints = []
+		self.m_hfNodeName = None
 
 	## Show the window
 	def start(self):
@@ -56,7 +60,30 @@ class UserInterface(object):
 		fractalOctavesValue = mc.intSliderGrp(self.m_hfFractalOctavesControl, query=True, value=True)
 		lacunarityValue = mc.floatSliderGrp(self.m_hfLacunarityControl, query=True, value=True)
 		fractalGainValue = mc.floatSliderGrp(self.m_hfFractalGainControl, query=True, value=True)
-		mc.createHeightField(n=nodeName, ws=worldSpaceValue, nt=noiseTypeStr, a=amplitudeValue, s=seedValue, f=frequencyValue, fo=fractalOctavesValue, l=lacunarityValue, fg=fractalGainValue)
+		domainWarpValue = mc.floatSliderGrp(self.m_hfDomainWarpControl, query=True, value=True)
+		rbCollection = mc.radioCollection(self.m_hfTerrainShapeCollection, query=True, select=True)
+		terrainShapeStr = mc.radioButton(rbCollection, query=True, label=True)
+		plateauLevelsValue = mc.intSliderGrp(self.m_hfPlateauLevelsControl, query=True, value=True)
+		craterRadiusValue = mc.floatSliderGrp(self.m_hfCraterRadiusControl, query=True, value=True)
+		self.m_hfNodeName = mc.createHeightField(n=nodeName, ws=worldSpaceValue, nt=noiseTypeStr, a=amplitudeValue, s=seedValue, f=frequencyValue, fo=fractalOctavesValue, l=lacunarityValue, fg=fractalGainValue, dw=domainWarpValue, ts=terrainShapeStr, pl=plateauLevelsValue, cr=craterRadiusValue)
+
+	## Update the last created height field node at preview quality while a slider is dragged
+	# @param _attribute The name of the attribute driven by the slider
+	# @param _value The current slider value
+	def hfPreviewDrag(self, _attribute, _value):
+		if (self.m_hfNodeName is None) or (not mc.objExists(self.m_hfNodeName)):
+			return
+		mc.setAttr(self.m_hfNodeName + ".preview", True)
+		mc.setAttr(self.m_hfNodeName + "." + _attribute, _value)
+
+	## Update the last created height field node at full quality once the slider is released
+	# @param _attribute The name of the attribute driven by the slider
+	# @param _value The final slider value
+	def hfPreviewSettle(self, _attribute, _value):
+		if (self.m_hfNodeName is None) or (not mc.objExists(self.m_hfNodeName)):
+			return
+		mc.setAttr(self.m_hfNodeName + "." + _attribute, _value)
+		mc.setAttr(self.m_hfNodeName + ".preview", False)
 
 	## Get the values from the UI and call the createRiver command
 	def createRiver(self, *args):
@@ -81,7 +108,7 @@ class UserInterface(object):
 		sculptedMesh = mc.textFieldGrp(self.m_slSculptedMeshText, query=True, tx=True)
 		curveMask = mc.textFieldGrp(self.m_slCurveMaskText, query=True, tx=True)
 		if (terrain == "") or (sculptedMesh == "") or (curveMask == ""):
-			print "Error. Missing info for the input objects."
+			print("Error. Missing info for the input objects.")
 		else:
 			nodeName = mc.textFieldGrp(self.m_slNameTextField, query=True, tx=True)
 			if nodeName == "":
@@ -90,14 +117,18 @@ class UserInterface(object):
 			curveOff = mc.floatSliderGrp(self.m_slCurveOffsetControl, query=True, value=True)
 			maxProj = mc.floatSliderGrp(self.m_slMaxProjectionControl, query=True, value=True)
 			rebuildStatus = mc.checkBox(self.m_slRebuildCurveCheckBox, query=True, value=True)
-			mc.createSculptLayer(curveMask, sculptedMesh, terrain, n=nodeName, ss=sculptStr, co=curveOff, mpd=maxProj, rb=rebuildStatus)
+			stackName = mc.textFieldGrp(self.m_slStackTextField, query=True, tx=True)
+			if stackName == "":
+				mc.createSculptLayer(curveMask, sculptedMesh, terrain, n=nodeName, ss=sculptStr, co=curveOff, mpd=maxProj, rb=rebuildStatus)
+			else:
+				mc.createSculptLayer(curveMask, sculptedMesh, terrain, ss=sculptStr, co=curveOff, mpd=maxProj, rb=rebuildStatus, st=stackName)
 
 	## Get the values from the UI and create the warp node and connect nodes
 	# Note this is not written as a command as it becomes tedious to validate the input objects
 	def createWarp(self, *args):
 		terrain = mc.textFieldGrp(self.m_warpTerrainText, query=True, tx=True)
 		if (terrain == "") or (self.warpControlPoints == []):
-			print "Error. Missing info for the input objects"
+			print("Error. Missing info for the input objects")
 		else:
 			nodeName = mc.textFieldGrp(self.m_warpNameTextField, query=True, tx=True)
 			if nodeName == "":
@@ -129,7 +160,7 @@ class UserInterface(object):
 		selectionList = om.MGlobal.getActiveSelectionList()
 		iterator = om.MItSelectionList(selectionList, om.MFn.kDagNode)
 		if iterator.isDone():
-			print "Error. Nothing selected."
+			print("Error. Nothing selected.")
 			return ""
 		else:
 			dagPath = om.MDagPath()
@@ -169,7 +200,7 @@ class UserInterface(object):
 		iterator = om.MItSelectionList(selectionList, om.MFn.kDagNode)
 		# Check if nothing is selected
 		if iterator.isDone():
-			print "Error. Nothing selected."
+			print("Error. Nothing selected.")
 			self.warpControlPoints = []
 		else:
 			# Create a set of items so duplicates are not added
@@ -245,20 +276,37 @@ class UserInterface(object):
 		simplexNoiseRB = mc.radioButton(label="Simplex", cl=self.m_hfNoiseTypeCollection, p=self.m_heightFieldTabLayout)
 		perlinNoiseRB = mc.radioButton(label="Perlin", cl=self.m_hfNoiseTypeCollection, p=self.m_heightFieldTabLayout)
 		cubicNoiseRB = mc.radioButton(label="Cubic", cl=self.m_hfNoiseTypeCollection, p=self.m_heightFieldTabLayout)
+		cellularNoiseRB = mc.radioButton(label="Cellular", cl=self.m_hfNoiseTypeCollection, p=self.m_heightFieldTabLayout)
 		mc.radioCollection(self.m_hfNoiseTypeCollection, edit=True, select=simplexNoiseRB)
 		mc.separator(h=5)
+		mc.text(label="Terrain shape:")
+		self.m_hfTerrainShapeCollection = mc.radioCollection()
+		noShapeRB = mc.radioButton(label="None", cl=self.m_hfTerrainShapeCollection, p=self.m_heightFieldTabLayout)
+		ridgesShapeRB = mc.radioButton(label="Ridges", cl=self.m_hfTerrainShapeCollection, p=self.m_heightFieldTabLayout)
+		plateausShapeRB = mc.radioButton(label="Plateaus", cl=self.m_hfTerrainShapeCollection, p=self.m_heightFieldTabLayout)
+		cratersShapeRB = mc.radioButton(label="Craters", cl=self.m_hfTerrainShapeCollection, p=self.m_heightFieldTabLayout)
+		mc.radioCollection(self.m_hfTerrainShapeCollection, edit=True, select=noShapeRB)
+		mc.separator(h=5)
+		self.m_hfPlateauLevelsControl = mc.intSliderGrp(label="Plateau Levels:", field=True, minValue=1, maxValue=16, value=4)
+		mc.separator(h=5)
+		self.m_hfCraterRadiusControl = mc.floatSliderGrp(label="Crater Radius:", field=True, minValue=0.01, maxValue=1.0, value=0.35)
+		mc.separator(h=5)
 		self.m_hfAmplitudeControl = mc.floatSliderGrp(label="Amplitude:", field=True, minValue=0.0, value=1.0)
 		mc.separator(h=5)
 		self.m_hfSeedControl = mc.intSliderGrp(label="Seed:", field=True, minValue=0, maxValue=10000, value=1337)
 		mc.separator(h=5)
 		self.m_hfFrequencyControl = mc.floatSliderGrp(label="Frequency:", field=True, minValue=0.0, value=0.0)
+		mc.floatSliderGrp(self.m_hfFrequencyControl, edit=True, dragCommand=lambda value: self.hfPreviewDrag("frequency", value), changeCommand=lambda value: self.hfPreviewSettle("frequency", value))
 		mc.separator(h=5)
 		self.m_hfFractalOctavesControl = mc.intSliderGrp(label="Fractal Octaves:", field=True, minValue=0, maxValue=15, value=8)
+		mc.intSliderGrp(self.m_hfFractalOctavesControl, edit=True, dragCommand=lambda value: self.hfPreviewDrag("fractalOctaves", int(value)), changeCommand=lambda value: self.hfPreviewSettle("fractalOctaves", int(value)))
 		mc.separator(h=5)
 		self.m_hfLacunarityControl = mc.floatSliderGrp(label="Lacunarity:", field=True, minValue=0.0, value=2.0)
 		mc.separator(h=5)
 		self.m_hfFractalGainControl = mc.floatSliderGrp(label="Fractal Gain:", field=True, minValue=0.0, value=0.5)
 		mc.separator(h=5)
+		self.m_hfDomainWarpControl = mc.floatSliderGrp(label="Domain Warp:", field=True, minValue=0.0, maxValue=100.0, value=0.0)
+		mc.separator(h=5)
 		mc.button(label="Create Height Field", command=self.createHeightField)
 		mc.separator(st="out")
 		mc.setParent("..")
@@ -303,6 +351,8 @@ class UserInterface(object):
 		mc.separator(h=5)
 		self.m_slRebuildCurveCheckBox = mc.checkBox(label="Rebuild Curve")
 		mc.separator(h=5)
+		self.m_slStackTextField = mc.textFieldGrp(label="Add to stack:", pht="Separate node")
+		mc.separator(h=5)
 		mc.text(label="Select the desired object and then use the buttons to store the selection")
 		mc.separator(h=5)
 		self.m_slTerrainText = mc.textFieldGrp(label="Terrain:", pht="Terrain", ed=False)
@@ -371,16 +421,54 @@ class UserInterface(object):
 		status = mc.pluginInfo("SculptLayerCmd.py", query=True, loaded=True)
 		self.m_miscSculptLayerCmdCB = mc.checkBox(label="Sculpt Layer Cmd", value=status, onc=self.loadSculptLayerCmd)
 		mc.separator(h=5)
+		status = mc.pluginInfo("SculptStackNode.py", query=True, loaded=True)
+		self.m_miscSculptStackNodeCB = mc.checkBox(label="Sculpt Stack Node", value=status, onc=self.loadSculptStackNode)
+		mc.separator(h=5)
+		status = mc.pluginInfo("OperatorChainNode.py", query=True, loaded=True)
+		self.m_miscOperatorChainNodeCB = mc.checkBox(label="Operator Chain Node", value=status, onc=self.loadOperatorChainNode)
+		mc.separator(h=5)
 		status = mc.pluginInfo("WarpNode.py", query=True, loaded=True)
 		self.m_miscWarpNodeCB = mc.checkBox(label="Warp Node", value=status, onc=self.loadWarpNode)
 		mc.separator(h=5)
+		status = mc.pluginInfo("TerrainRasterData.py", query=True, loaded=True)
+		self.m_miscTerrainRasterDataCB = mc.checkBox(label="Terrain Raster Data", value=status, onc=self.loadTerrainRasterData)
+		mc.separator(h=5)
+		status = mc.pluginInfo("ExportHeightmapCmd.py", query=True, loaded=True)
+		self.m_miscExportHeightmapCmdCB = mc.checkBox(label="Export Heightmap Cmd", value=status, onc=self.loadExportHeightmapCmd)
+		mc.separator(h=5)
+		status = mc.pluginInfo("HeightmapImportCmd.py", query=True, loaded=True)
+		self.m_miscHeightmapImportCmdCB = mc.checkBox(label="Heightmap Import Cmd", value=status, onc=self.loadHeightmapImportCmd)
+		mc.separator(h=5)
+		status = mc.pluginInfo("ExportTerrainMeshCmd.py", query=True, loaded=True)
+		self.m_miscExportTerrainMeshCmdCB = mc.checkBox(label="Export Terrain Mesh Cmd", value=status, onc=self.loadExportTerrainMeshCmd)
+		mc.separator(h=5)
 		mc.button(label="Load all", command=self.loadAllPlugins)
 		mc.separator(st="out")
+		mc.text(label="Slowest nodes:")
+		mc.separator(h=5)
+		self.m_miscNodeStatsField = mc.scrollField(editable=False, wordWrap=False, font="fixedWidthFont", height=150)
+		mc.separator(h=5)
+		from terrain_core import stats
+		self.m_miscComputeLogCB = mc.checkBox(label="Log node computes", value=stats.isLogging(), onc=self.startComputeLog, ofc=self.stopComputeLog)
+		mc.separator(st="out")
+		mc.text(label="Profile node computes:")
+		mc.separator(h=5)
+		self.m_miscProfileNodeTextField = mc.textFieldGrp(label="Node name:", pht="All nodes")
+		mc.separator(h=5)
+		self.m_miscProfileComputesControl = mc.intSliderGrp(label="Computes:", field=True, minValue=1, maxValue=20, fieldMaxValue=1000, value=5)
+		mc.separator(h=5)
+		mc.button(label="Profile next computes", command=self.startProfiling)
+		mc.separator(h=5)
+		mc.button(label="Stop profiling", command=self.stopProfiling)
+		mc.separator(st="out")
 		mc.setParent("..")
+		# Refresh the table whenever Maya finishes evaluating, the job is deleted with the window
+		mc.scriptJob(event=["idle", self.refreshNodeStats], parent=self.m_window)
+		self.refreshNodeStats()
 
 	## Try to load all of the plugins
 	def loadAllPlugins(self, *args):
-		functions = [self.loadCaveCmd, self.loadCaveNode, self.loadHeightFieldCmd, self.loadHeightFieldNode, self.loadRiverCmd, self.loadRiverNode, self.loadCombineCmd, self.loadSculptLayerCmd, self.loadSculptLayerNode, self.loadWarpNode]
+		functions = [self.loadTerrainRasterData, self.loadCaveCmd, self.loadCaveNode, self.loadHeightFieldCmd, self.loadHeightFieldNode, self.loadRiverCmd, self.loadRiverNode, self.loadCombineCmd, self.loadSculptLayerCmd, self.loadSculptLayerNode, self.loadSculptStackNode, self.loadOperatorChainNode, self.loadWarpNode, self.loadExportHeightmapCmd, self.loadHeightmapImportCmd, self.loadExportTerrainMeshCmd]
 		for func in functions:
 			try:
 				func(args)
@@ -459,6 +547,22 @@ class UserInterface(object):
 			status = mc.pluginInfo("SculptLayerCmd.py", query=True, loaded=True)
 			mc.checkBox(self.m_miscSculptLayerCmdCB, edit=True, value=status)
 
+	## Load the sculpt stack node
+	def loadSculptStackNode(self, *args):
+		status = mc.pluginInfo("SculptStackNode.py", query=True, loaded=True)
+		if status == False:
+			mc.loadPlugin("SculptStackNode.py")
+			status = mc.pluginInfo("SculptStackNode.py", query=True, loaded=True)
+			mc.checkBox(self.m_miscSculptStackNodeCB, edit=True, value=status)
+
+	## Load the operator chain node
+	def loadOperatorChainNode(self, *args):
+		status = mc.pluginInfo("OperatorChainNode.py", query=True, loaded=True)
+		if status == False:
+			mc.loadPlugin("OperatorChainNode.py")
+			status = mc.pluginInfo("OperatorChainNode.py", query=True, loaded=True)
+			mc.checkBox(self.m_miscOperatorChainNodeCB, edit=True, value=status)
+
 	## Load the warp node
 	def loadWarpNode(self, *args):
 		status = mc.pluginInfo("WarpNode.py", query=True, loaded=True)
@@ -466,3 +570,86 @@ class UserInterface(object):
 			mc.loadPlugin("WarpNode.py")
 			status = mc.pluginInfo("WarpNode.py", query=True, loaded=True)
 			mc.checkBox(self.m_miscWarpNodeCB, edit=True, value=status)
+
+	## Load the terrain raster data type and its conversion nodes
+	def loadTerrainRasterData(self, *args):
+		status = mc.pluginInfo("TerrainRasterData.py", query=True, loaded=True)
+		if status == False:
+			mc.loadPlugin("TerrainRasterData.py")
+			status = mc.pluginInfo("TerrainRasterData.py", query=True, loaded=True)
+			mc.checkBox(self.m_miscTerrainRasterDataCB, edit=True, value=status)
+
+	## Load the export heightmap command
+	def loadExportHeightmapCmd(self, *args):
+		status = mc.pluginInfo("ExportHeightmapCmd.py", query=True, loaded=True)
+		if status == False:
+			mc.loadPlugin("ExportHeightmapCmd.py")
+			status = mc.pluginInfo("ExportHeightmapCmd.py", query=True, loaded=True)
+			mc.checkBox(self.m_miscExportHeightmapCmdCB, edit=True, value=status)
+
+	## Load the heightmap import command
+	def loadHeightmapImportCmd(self, *args):
+		status = mc.pluginInfo("HeightmapImportCmd.py", query=True, loaded=True)
+		if status == False:
+			mc.loadPlugin("HeightmapImportCmd.py")
+			status = mc.pluginInfo("HeightmapImportCmd.py", query=True, loaded=True)
+			mc.checkBox(self.m_miscHeightmapImportCmdCB, edit=True, value=status)
+
+	## Load the export terrain mesh command
+	def loadExportTerrainMeshCmd(self, *args):
+		status = mc.pluginInfo("ExportTerrainMeshCmd.py", query=True, loaded=True)
+		if status == False:
+			mc.loadPlugin("ExportTerrainMeshCmd.py")
+			status = mc.pluginInfo("ExportTerrainMeshCmd.py", query=True, loaded=True)
+			mc.checkBox(self.m_miscExportTerrainMeshCmdCB, edit=True, value=status)
+
+#---------------------------------------------------------------------------------------
+# Functions for the node statistics
+#---------------------------------------------------------------------------------------
+
+	## Update the table of the slowest nodes from their statistics attributes
+	def refreshNodeStats(self, *args):
+		if not mc.scrollField(self.m_miscNodeStatsField, exists=True):
+			return
+		rows = []
+		for nodeType in ["SculptLayerNode", "WarpNode", "RiverNode", "CaveNode"]:
+			if not mc.pluginInfo(nodeType + ".py", query=True, loaded=True):
+				continue
+			for nodeName in mc.ls(type=nodeType):
+				values = [mc.getAttr(nodeName + "." + attribute) for attribute in ["totalComputeTime", "lastComputeTime", "computeCount", "verticesProcessed", "raysCast", "cacheHits"]]
+				rows.append([nodeName, nodeType] + values)
+		# Sort by the cumulative compute time, slowest first
+		rows.sort(key=lambda row: row[2], reverse=True)
+		lines = ["%-24s %-16s %10s %10s %7s %10s %10s %6s" % ("Node", "Type", "Total(ms)", "Last(ms)", "Count", "Vertices", "Rays", "Hits")]
+		for row in rows[:10]:
+			lines.append("%-24s %-16s %10.1f %10.1f %7d %10d %10d %6d" % (row[0], row[1], row[2] * 1000.0, row[3] * 1000.0, row[4], row[5], row[6], row[7]))
+		mc.scrollField(self.m_miscNodeStatsField, edit=True, text="\n".join(lines))
+
+	## Start logging every node compute to a JSON file for this session
+	def startComputeLog(self, *args):
+		from terrain_core import stats
+		path = os.path.join(mc.internalVar(userTmpDir=True), "terrainComputeLog_" + time.strftime("%Y%m%d_%H%M%S") + ".json")
+		stats.startLog(path)
+		print("Logging node computes to " + path)
+
+	## Stop logging node computes
+	def stopComputeLog(self, *args):
+		from terrain_core import stats
+		stats.stopLog()
+
+	## Profile the next computes of a node, or of every node if no name is given
+	def startProfiling(self, *args):
+		from terrain_core import profiling
+		nodeName = mc.textFieldGrp(self.m_miscProfileNodeTextField, query=True, tx=True)
+		numComputes = mc.intSliderGrp(self.m_miscProfileComputesControl, query=True, value=True)
+		directory = os.path.join(mc.internalVar(userTmpDir=True), "terrainProfiles")
+		if nodeName == "":
+			profiling.requestCapture(numComputes, None, directory)
+		else:
+			profiling.requestCapture(numComputes, nodeName, directory)
+		print("Profiles will be written to " + directory)
+
+	## Cancel any profiles that have not been captured yet
+	def stopProfiling(self, *args):
+		from terrain_core import profiling
+		profiling.cancelCapture()
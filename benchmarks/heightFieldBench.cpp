@@ -0,0 +1,71 @@
+// Times the HeightFieldNode height evaluation without Maya
+// Build from the repository root with:
+// g++ -O2 -std=c++11 -IHeightFieldNode/include benchmarks/heightFieldBench.cpp HeightFieldNode/src/HeightFieldShaper.cpp HeightFieldNode/src/FastNoise.cpp -o benchmarks/heightFieldBench
+// Usage: heightFieldBench <resolution> <noiseType> <terrainShape> <domainWarp> <repeats>
+// Prints one JSON object with the time of every repeat in seconds
+
+#include <chrono>
+#include <cstdio>
+#include <cstdlib>
+#include <vector>
+#include "HeightFieldShaper.h"
+
+int main(int argc, char** argv)
+{
+    if (argc < 6)
+    {
+        std::fprintf(stderr, "Usage: %s <resolution> <noiseType> <terrainShape> <domainWarp> <repeats>\n", argv[0]);
+        return 1;
+    }
+    const int resolution = std::atoi(argv[1]);
+    const int noiseType = std::atoi(argv[2]);
+    const int terrainShape = std::atoi(argv[3]);
+    const float domainWarp = (float)std::atof(argv[4]);
+    const int repeats = std::atoi(argv[5]);
+
+    // Match the default settings of the HeightFieldNode
+    HeightFieldShaper shaper;
+    FastNoise &noise = shaper.noise();
+    noise.SetSeed(1337);
+    noise.SetFrequency(0.01f);
+    noise.SetNoiseType(FastNoise::NoiseType(noiseType));
+    noise.SetFractalOctaves(8);
+    noise.SetFractalLacunarity(2.0f);
+    noise.SetFractalGain(0.5f);
+    shaper.setShape(domainWarp, HeightFieldShaper::TerrainShape(terrainShape), 4, 0.35f);
+
+    // The vertices of a grid with unit spacing, evaluated in one batch like the node's compute
+    std::vector<double> sampleX(resolution * resolution);
+    std::vector<double> sampleZ(resolution * resolution);
+    for (int z = 0; z < resolution; ++z)
+    {
+        for (int x = 0; x < resolution; ++x)
+        {
+            sampleX[z * resolution + x] = x;
+            sampleZ[z * resolution + x] = z;
+        }
+    }
+
+    // The node only computes the derivatives for analytic normals, which the domain warp turns off
+    bool derivatives = domainWarp <= 0.0f;
+    std::vector<double> heights;
+    std::vector<double> heightsDx;
+    std::vector<double> heightsDz;
+    std::printf("{\"resolution\": %d, \"noiseType\": %d, \"terrainShape\": %d, \"domainWarp\": %g, \"times\": [", resolution, noiseType, terrainShape, domainWarp);
+    for (int r = 0; r < repeats; ++r)
+    {
+        auto start = std::chrono::steady_clock::now();
+        if (derivatives)
+            shaper.evaluateHeights(sampleX, sampleZ, heights, &heightsDx, &heightsDz);
+        else
+            shaper.evaluateHeights(sampleX, sampleZ, heights, NULL, NULL);
+        std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - start;
+        std::printf(r == 0 ? "%.9f" : ", %.9f", elapsed.count());
+    }
+    // Print a checksum so the evaluation cannot be optimised away
+    double checksum = 0.0;
+    for (size_t i = 0; i < heights.size(); ++i)
+        checksum += heights[i];
+    std::printf("], \"checksum\": %.6f}\n", checksum);
+    return 0;
+}
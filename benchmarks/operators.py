@@ -0,0 +1,149 @@
+## operators.py
+# The benchmarked terrain operators
+# Each operator runs the terrain_core code path of a node, with the queries that need Maya geometry replaced by NumPy equivalents
+
+import numpy
+from terrain_core import cave, river, sculpt, topology, warp
+from terrain_core import TerrainRaster
+import terrains
+
+## Sculpt layer region selection and soft selection for a raster, as in SculptNodeClass
+# @param _raster The terrain
+# @param _radiusFraction The size of the curve mask as a fraction of the terrain width
+# @return A function running the operator
+def sculptRegion(_raster, _radiusFraction):
+	curve = terrains.curveLoop(_raster, _radiusFraction)
+	centre = sculpt.curveCentre(curve)
+	closestPoints = lambda _points: sculpt.closestPointsOnPolyline(_points, curve)
+	return lambda: sculpt.rasterSamplesInsideCurve(_raster, curve, centre, 1.1, closestPoints)
+
+## Sculpt layer flood fill over the faces of a grid mesh, as in SculptNodeClass
+# The adjacency comes from the shared topology cache, so it is built once before timing like in a scene
+# @param _raster The terrain
+# @param _radiusFraction The size of the curve mask as a fraction of the terrain width
+# @return A function running the operator
+def sculptFloodFill(_raster, _radiusFraction):
+	curve = terrains.curveLoop(_raster, _radiusFraction)
+	centre = sculpt.curveCentre(curve)
+	numRows, numColumns = _raster.resolution()
+	numFaceColumns = numColumns - 1
+	faceCounts, faceConnects = _raster.gridFaces()
+	meshTopology = topology.meshTopology(faceCounts, faceConnects, _raster.numSamples())
+	points = _raster.positions()
+	startFace = int((numRows // 2) * numFaceColumns + numFaceColumns // 2)
+
+	## Test a ring of faces
+	def inside(_faces):
+		faceCentres = meshTopology.faceCentres(points, _faces)
+		return sculpt.insideCurve(centre, faceCentres, sculpt.closestPointsOnPolyline(faceCentres, curve), 1.1)
+
+	return lambda: meshTopology.facesVertices(sculpt.floodFill(startFace, meshTopology.faceNeighbours, inside, None, meshTopology.numFaces()))
+
+## Sculpt layer projection onto a sculpted surface, as in SculptNodeClass
+# The vertical ray cast is replaced by sampling a raised copy of the terrain
+# @param _raster The terrain
+# @param _radiusFraction The size of the curve mask as a fraction of the terrain width
+# @return A function running the operator
+def sculptProjection(_raster, _radiusFraction):
+	curve = terrains.curveLoop(_raster, _radiusFraction)
+	centre = sculpt.curveCentre(curve)
+	indices, softSelect = sculpt.rasterSamplesInsideCurve(_raster, curve, centre, 1.1, lambda _points: sculpt.closestPointsOnPolyline(_points, curve))
+	sculptedSurface = TerrainRaster(_raster.m_heights + 5.0, _raster.m_origin, _raster.m_spacing)
+	positions = _raster.positions()
+
+	def run():
+		points = positions.copy()
+		hitPoints = points[indices].copy()
+		hitPoints[:, 1] = sculptedSurface.sample(hitPoints[:, 0], hitPoints[:, 2])
+		sculpt.applySculpt(points, indices, hitPoints, numpy.ones(len(indices), dtype=bool), 1.0, softSelect)
+		return points
+
+	return run
+
+## Warp weights for the vertices of a mesh, computed once per node
+# @param _raster The terrain
+# @param _numControlPoints The number of control points
+# @return A function running the operator
+def warpWeights(_raster, _numControlPoints):
+	original, moved = terrains.controlPoints(_raster, _numControlPoints)
+	points = _raster.positions()
+	maxRadius = 0.1 * (_raster.bounds()[1] - _raster.bounds()[0])
+	return lambda: warp.controlPointWeights(points, original, warp.controlPointRadii(original, maxRadius))
+
+## Warp deformation of mesh vertices, computed every time a control point moves
+# @param _raster The terrain
+# @param _numControlPoints The number of control points
+# @return A function running the operator
+def warpDeform(_raster, _numControlPoints):
+	original, moved = terrains.controlPoints(_raster, _numControlPoints)
+	points = _raster.positions()
+	maxRadius = 0.1 * (_raster.bounds()[1] - _raster.bounds()[0])
+	weights = warp.controlPointWeights(points, original, warp.controlPointRadii(original, maxRadius))
+	return lambda: warp.warpPoints(points, weights, moved - original)
+
+## Warp of a raster, including the weights
+# @param _raster The terrain
+# @param _numControlPoints The number of control points
+# @return A function running the operator
+def warpRaster(_raster, _numControlPoints):
+	original, moved = terrains.controlPoints(_raster, _numControlPoints)
+	maxRadius = 0.1 * (_raster.bounds()[1] - _raster.bounds()[0])
+
+	def run():
+		weights = warp.rasterControlPointWeights(_raster, original, warp.controlPointRadii(original, maxRadius))
+		return warp.warpRaster(_raster, weights, moved - original)
+
+	return run
+
+## River frames and curves, as in RiverNodeClass
+# The closest terrain normal is replaced by the normal of the nearest grid sample
+# @param _raster The terrain
+# @param _numPoints The number of points along the river
+# @return A function running the operator
+def riverCurves(_raster, _numPoints):
+	curve = terrains.curveAcross(_raster, _numPoints)
+	numRows, numColumns = _raster.resolution()
+
+	def run():
+		normals = _raster.normals()
+		columns = numpy.clip(numpy.rint((curve[:, 0] - _raster.m_origin[0]) / _raster.m_spacing[0]).astype(numpy.int64), 0, numColumns - 1)
+		rows = numpy.clip(numpy.rint((curve[:, 2] - _raster.m_origin[1]) / _raster.m_spacing[1]).astype(numpy.int64), 0, numRows - 1)
+		return river.riverCurves(curve, normals[rows * numColumns + columns], 2.0, 1.0)
+
+	return run
+
+## Cave curve offset, as in CaveNodeClass
+# @param _raster The terrain
+# @param _numPoints The number of CVs on the cave curve
+# @return A function running the operator
+def caveOffset(_raster, _numPoints):
+	curve = terrains.curveLoop(_raster, 0.05, _numPoints)
+	centre = sculpt.curveCentre(curve)
+	return lambda: cave.caveOffsetPoints(curve, centre, (0.0, 1.0, 0.0), 2.0)
+
+## Height field mesh to raster conversion and normals, the Python side of the height field path
+# @param _raster The terrain
+# @param _unused Unused parameter so every operator has the same signature
+# @return A function running the operator
+def heightFieldRaster(_raster, _unused):
+	points = _raster.positions()
+
+	def run():
+		raster, sampleIndices = TerrainRaster.fromPoints(points)
+		raster.gridFaces()
+		return raster.normals()
+
+	return run
+
+# The operators and the parameter values they are swept over
+kOperators = [
+	("sculptRegion", sculptRegion, "radiusFraction", [0.1, 0.25]),
+	("sculptFloodFill", sculptFloodFill, "radiusFraction", [0.1, 0.25]),
+	("sculptProjection", sculptProjection, "radiusFraction", [0.1, 0.25]),
+	("warpWeights", warpWeights, "controlPoints", [4, 16, 64]),
+	("warpDeform", warpDeform, "controlPoints", [4, 16, 64]),
+	("warpRaster", warpRaster, "controlPoints", [4, 16, 64]),
+	("riverCurves", riverCurves, "curvePoints", [16, 256]),
+	("caveOffset", caveOffset, "curvePoints", [16, 256]),
+	("heightFieldRaster", heightFieldRaster, "none", [0]),
+]
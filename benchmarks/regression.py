@@ -0,0 +1,108 @@
+## regression.py
+# Compare the core terrain operators against a committed baseline and fail if any have become slower or use more memory
+# Usage: python benchmarks/regression.py [--baseline benchmarks/baseline.json] [--update] [--allow-skip]
+
+import argparse
+import json
+import os
+import sys
+
+kBenchmarkDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, kBenchmarkDir)
+
+import run
+
+# The operators and sizes checked by the gate, with fixed seeds from the terrain generators
+kOperators = ["sculptRegion", "sculptProjection", "warpDeform", "warpRaster", "riverCurves", "heightFieldNoise"]
+kSizes = ["100k", "1M"]
+kDefaultBaseline = os.path.join(kBenchmarkDir, "baseline.json")
+
+## Create a key identifying a benchmark result
+# @param _result A result dictionary
+# @return A string key
+def resultKey(_result):
+	return "%s/%s/%s=%s" % (_result["operator"], _result["size"], _result["parameter"], _result["value"])
+
+## Compare results against a baseline
+# @param _results A list of result dictionaries
+# @param _baseline The baseline dictionary
+# @param _timeTolerance The allowed ratio of the median time to the baseline
+# @param _memoryTolerance The allowed ratio of the peak memory to the baseline
+# @param _timeFloor Times below this many seconds are not compared, they are dominated by noise
+# @param _allowSkip Pass even if some baseline operators were not run
+# @return A list of report lines and whether every operator passed
+def compareResults(_results, _baseline, _timeTolerance, _memoryTolerance, _timeFloor, _allowSkip=False):
+	baselineResults = dict((resultKey(result), result) for result in _baseline["results"])
+	lines = []
+	passed = True
+	for result in _results:
+		key = resultKey(result)
+		if key not in baselineResults:
+			lines.append("NEW   %-45s median %.4fs" % (key, result["median"]))
+			continue
+		expected = baselineResults[key]
+		status = "OK"
+		timeRatio = result["median"] / expected["median"] if expected["median"] > 0 else 1.0
+		if max(result["median"], expected["median"]) >= _timeFloor and timeRatio > _timeTolerance:
+			status = "SLOW"
+		memoryRatio = None
+		if result.get("peakMemory") and expected.get("peakMemory"):
+			memoryRatio = float(result["peakMemory"]) / expected["peakMemory"]
+			if memoryRatio > _memoryTolerance:
+				status = "SLOW" if status == "SLOW" else "MEM"
+		if status != "OK":
+			passed = False
+		memoryText = "" if memoryRatio is None else " memory %.2fx (%d -> %d bytes)" % (memoryRatio, expected["peakMemory"], result["peakMemory"])
+		lines.append("%-5s %-45s median %.4fs -> %.4fs (%.2fx)%s" % (status, key, expected["median"], result["median"], timeRatio, memoryText))
+	missing = set(baselineResults.keys()) - set(resultKey(result) for result in _results)
+	for key in sorted(missing):
+		lines.append("SKIP  %-45s not run" % key)
+		if not _allowSkip:
+			passed = False
+	return lines, passed
+
+## Parse the command line arguments
+# @param _args The command line arguments
+# @return The parsed arguments
+def parseArguments(_args):
+	parser = argparse.ArgumentParser(description="Check the terrain operators for performance regressions")
+	parser.add_argument("--baseline", default=kDefaultBaseline, help="Baseline JSON file")
+	parser.add_argument("--update", action="store_true", help="Write the current results as the new baseline")
+	parser.add_argument("--repeat", type=int, default=7, help="Number of timed runs of each operator")
+	parser.add_argument("--time-tolerance", type=float, default=1.5, help="Allowed ratio of the median time to the baseline")
+	parser.add_argument("--memory-tolerance", type=float, default=1.25, help="Allowed ratio of the peak memory to the baseline")
+	parser.add_argument("--time-floor", type=float, default=0.005, help="Ignore times below this many seconds")
+	parser.add_argument("--allow-skip", action="store_true", help="Pass even if some baseline operators could not be run")
+	return parser.parse_args(_args)
+
+## Run the regression gate from the command line
+# @param _args The command line arguments
+# @return The exit code, 1 if an operator regressed
+def main(_args):
+	arguments = parseArguments(_args)
+	results = run.runBenchmarks(kSizes, kOperators, arguments.repeat)
+	notRun = sorted(set(kOperators) - set(result["operator"] for result in results))
+	if arguments.update and notRun and not arguments.allow_skip:
+		sys.stdout.write("Baseline not written, these operators were not run: " + ", ".join(notRun) + "\n")
+		return 1
+	if arguments.update:
+		with open(arguments.baseline, "w") as baselineFile:
+			json.dump({"environment": run.environment(), "repeat": arguments.repeat, "results": results}, baselineFile, indent=1)
+		sys.stdout.write("Baseline written to " + arguments.baseline + "\n")
+		return 0
+	with open(arguments.baseline) as baselineFile:
+		baseline = json.load(baselineFile)
+	lines, passed = compareResults(results, baseline, arguments.time_tolerance, arguments.memory_tolerance, arguments.time_floor, arguments.allow_skip)
+	sys.stdout.write("Baseline from revision %s (Python %s, NumPy %s)\n" % (baseline["environment"].get("revision"), baseline["environment"].get("python"), baseline["environment"].get("numpy")))
+	sys.stdout.write("\n".join(lines) + "\n")
+	if not passed:
+		if any(line.startswith("SKIP") for line in lines) and not arguments.allow_skip:
+			sys.stdout.write("Some operators were not run, see the messages above, or pass --allow-skip to ignore them\n")
+		if any(line.startswith(("SLOW", "MEM")) for line in lines):
+			sys.stdout.write("Performance regression detected\n")
+		return 1
+	sys.stdout.write("No performance regressions\n")
+	return 0
+
+if __name__ == "__main__":
+	sys.exit(main(sys.argv[1:]))
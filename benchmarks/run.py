@@ -0,0 +1,188 @@
+## run.py
+# Benchmark the terrain operators on synthetic terrains and write the results as JSON
+# Usage: python benchmarks/run.py [--sizes 10k 100k 1M 4M] [--operators warpDeform ...] [--repeat 5] [--output results.json]
+
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# The benchmarks run outside Maya, so import terrain_core from the plugin folder
+kBenchmarkDir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(kBenchmarkDir), "plugin"))
+sys.path.insert(0, kBenchmarkDir)
+
+import numpy
+import operators
+import terrains
+
+try:
+	import tracemalloc
+except ImportError:
+	tracemalloc = None
+
+# A high resolution clock on both Python 2 and 3
+kClock = getattr(time, "perf_counter", time.time)
+
+# The compiled height field noise benchmark and the sources it is built from
+kRootDir = os.path.dirname(kBenchmarkDir)
+kHeightFieldBench = os.path.join(kBenchmarkDir, "heightFieldBench")
+kHeightFieldSources = [os.path.join(kBenchmarkDir, "heightFieldBench.cpp"), os.path.join(kRootDir, "HeightFieldNode", "src", "HeightFieldShaper.cpp"), os.path.join(kRootDir, "HeightFieldNode", "src", "FastNoise.cpp")]
+kHeightFieldHeaders = [os.path.join(kRootDir, "HeightFieldNode", "include", "HeightFieldShaper.h"), os.path.join(kRootDir, "HeightFieldNode", "include", "FastNoise.h")]
+
+# The height field cases, named after the noise type, terrain shape and domain warp of the node
+kHeightFieldCases = [
+	("simplexFractal", 5, 0, 0.0),
+	("ridgesWarped", 5, 1, 30.0),
+	("plateaus", 3, 2, 0.0),
+	("craters", 5, 3, 0.0),
+	("cellular", 6, 0, 0.0)
+]
+
+## Time a function
+# @param _function The function to time
+# @param _repeat The number of timed runs
+# @return A list of times in seconds
+def timeFunction(_function, _repeat):
+	times = []
+	for i in range(_repeat):
+		gc.collect()
+		start = kClock()
+		_function()
+		times.append(kClock() - start)
+	return times
+
+## Measure the peak memory allocated while a function runs
+# NumPy reports its buffers to tracemalloc, so this includes the arrays
+# @param _function The function to measure
+# @return The peak number of bytes, or None if tracemalloc is not available
+def peakMemory(_function):
+	if tracemalloc is None:
+		return None
+	gc.collect()
+	tracemalloc.start()
+	try:
+		_function()
+		return tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+## Find the median of a list
+# @param _values A list of numbers
+# @return The median
+def median(_values):
+	values = sorted(_values)
+	middle = len(values) // 2
+	if len(values) % 2 == 1:
+		return values[middle]
+	return 0.5 * (values[middle - 1] + values[middle])
+
+## Build the height field noise benchmark if it is missing or older than its sources
+# The compiler is taken from the CXX environment variable, or g++
+# @return None if the benchmark is built, otherwise a message saying why it could not be
+def buildHeightFieldBench():
+	if os.path.exists(kHeightFieldBench):
+		built = os.path.getmtime(kHeightFieldBench)
+		if all(os.path.getmtime(path) <= built for path in kHeightFieldSources + kHeightFieldHeaders):
+			return None
+	compiler = os.environ.get("CXX", "g++")
+	command = [compiler, "-O2", "-std=c++11", "-I" + os.path.join(kRootDir, "HeightFieldNode", "include")] + kHeightFieldSources + ["-o", kHeightFieldBench]
+	try:
+		subprocess.check_output(command, stderr=subprocess.STDOUT)
+	except OSError as error:
+		return "could not run the C++ compiler %s (%s), set CXX to a C++11 compiler" % (compiler, error)
+	except subprocess.CalledProcessError as error:
+		return "building %s failed:\n%s" % (kHeightFieldBench, error.output.decode("utf-8", "replace"))
+	return None
+
+## Run the compiled height field noise benchmark, building it first if needed
+# @param _resolution The number of samples along each side
+# @param _repeat The number of timed runs
+# @param _log A stream for progress messages
+# @return A list of result dictionaries, empty if the benchmark could not be built
+def runHeightFieldNoise(_resolution, _repeat, _log=sys.stderr):
+	results = []
+	error = buildHeightFieldBench()
+	if error is not None:
+		_log.write("heightFieldNoise not run, " + error + "\n")
+		return results
+	for name, noiseType, terrainShape, domainWarp in kHeightFieldCases:
+		output = subprocess.check_output([kHeightFieldBench, str(_resolution), str(noiseType), str(terrainShape), str(domainWarp), str(_repeat)])
+		result = json.loads(output.decode("ascii"))
+		results.append({"operator": "heightFieldNoise", "parameter": "case", "value": name, "times": result["times"], "median": median(result["times"]), "min": min(result["times"]), "peakMemory": None})
+	return results
+
+## Run the benchmarks
+# @param _sizes The names of the terrain sizes to run
+# @param _operatorNames The operators to run, or None for all
+# @param _repeat The number of timed runs of each operator
+# @param _log A stream for progress messages
+# @return A list of result dictionaries
+def runBenchmarks(_sizes, _operatorNames, _repeat, _log=sys.stderr):
+	results = []
+	for sizeName in _sizes:
+		resolution = terrains.kSizes[sizeName]
+		raster = terrains.fractalTerrain(resolution)
+		sizeResults = []
+		for name, create, parameter, values in operators.kOperators:
+			if _operatorNames is not None and name not in _operatorNames:
+				continue
+			for value in values:
+				function = create(raster, value)
+				# The first run warms up caches and is not recorded
+				function()
+				times = timeFunction(function, _repeat)
+				sizeResults.append({"operator": name, "parameter": parameter, "value": value, "times": times, "median": median(times), "min": min(times), "peakMemory": peakMemory(function)})
+				_log.write("%-18s %-8s %s=%-6s median %.4fs\n" % (name, sizeName, parameter, value, median(times)))
+		if _operatorNames is None or "heightFieldNoise" in _operatorNames:
+			for result in runHeightFieldNoise(resolution, _repeat, _log):
+				sizeResults.append(result)
+				_log.write("%-18s %-8s %s=%-6s median %.4fs\n" % (result["operator"], sizeName, result["parameter"], result["value"], result["median"]))
+		for result in sizeResults:
+			result["size"] = sizeName
+			result["vertices"] = resolution * resolution
+		results += sizeResults
+	return results
+
+## Describe the machine and versions the benchmarks ran on
+# @return A dictionary
+def environment():
+	try:
+		revision = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=kBenchmarkDir, stderr=subprocess.STDOUT).decode("ascii").strip()
+	except (OSError, subprocess.CalledProcessError):
+		revision = None
+	return {"revision": revision, "python": platform.python_version(), "numpy": numpy.__version__, "machine": platform.machine(), "platform": platform.platform(), "time": datetime.datetime.utcnow().isoformat() + "Z"}
+
+## Parse the command line arguments
+# @param _args The command line arguments
+# @return The parsed arguments
+def parseArguments(_args):
+	parser = argparse.ArgumentParser(description="Benchmark the terrain operators")
+	parser.add_argument("--sizes", nargs="+", default=["10k", "100k", "1M", "4M"], choices=sorted(terrains.kSizes.keys()))
+	parser.add_argument("--operators", nargs="+", default=None, help="Only run these operators")
+	parser.add_argument("--repeat", type=int, default=5, help="Number of timed runs of each operator")
+	parser.add_argument("--output", default=None, help="JSON file to write, defaults to benchmarks/results/<time>.json")
+	return parser.parse_args(_args)
+
+## Run the benchmarks from the command line
+# @param _args The command line arguments
+def main(_args):
+	arguments = parseArguments(_args)
+	results = runBenchmarks(arguments.sizes, arguments.operators, arguments.repeat)
+	output = arguments.output
+	if output is None:
+		resultsDir = os.path.join(kBenchmarkDir, "results")
+		if not os.path.isdir(resultsDir):
+			os.makedirs(resultsDir)
+		output = os.path.join(resultsDir, datetime.datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+	with open(output, "w") as resultsFile:
+		json.dump({"environment": environment(), "repeat": arguments.repeat, "results": results}, resultsFile, indent=1)
+	sys.stderr.write("Results written to " + output + "\n")
+
+if __name__ == "__main__":
+	main(sys.argv[1:])
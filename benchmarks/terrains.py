@@ -0,0 +1,73 @@
+## terrains.py
+# Synthetic terrains and inputs for the benchmarks, generated from fixed seeds
+
+import math
+import numpy
+from terrain_core import TerrainRaster
+
+# Vertex counts of the benchmark terrains
+kSizes = {"10k": 100, "100k": 317, "1M": 1000, "4M": 2000}
+
+## Create a fractal height field on a square grid
+# Octaves of bilinearly interpolated value noise, so the terrain looks like the height field node output
+# @param _resolution The number of samples along each side
+# @param _seed The random seed
+# @param _octaves The number of noise octaves
+# @return A TerrainRaster with unit spacing centred on the origin
+def fractalTerrain(_resolution, _seed=1337, _octaves=6):
+	random = numpy.random.RandomState(_seed)
+	heights = numpy.zeros((_resolution, _resolution), dtype=numpy.float64)
+	amplitude = _resolution * 0.1
+	for octave in range(_octaves):
+		cells = 2 ** (octave + 2)
+		lattice = random.uniform(-1.0, 1.0, (cells + 1, cells + 1))
+		coordinates = numpy.linspace(0.0, cells, _resolution)
+		lattice = TerrainRaster(lattice)
+		x = numpy.tile(coordinates, _resolution)
+		z = numpy.repeat(coordinates, _resolution)
+		heights += amplitude * lattice.sample(x, z).reshape(_resolution, _resolution)
+		amplitude *= 0.5
+	origin = -0.5 * (_resolution - 1)
+	return TerrainRaster(heights, (origin, origin), (1.0, 1.0))
+
+## Create the points of a closed curve around the centre of a terrain
+# @param _raster The terrain
+# @param _radiusFraction The radius of the curve as a fraction of the terrain width
+# @param _numPoints The number of points along the curve
+# @param _seed The random seed used to wobble the radius
+# @return An (N, 3) array of points
+def curveLoop(_raster, _radiusFraction, _numPoints=64, _seed=7):
+	random = numpy.random.RandomState(_seed)
+	minX, maxX, minZ, maxZ = _raster.bounds()
+	centreX = 0.5 * (minX + maxX)
+	centreZ = 0.5 * (minZ + maxZ)
+	radius = _radiusFraction * (maxX - minX)
+	angles = numpy.linspace(0.0, 2.0 * math.pi, _numPoints, endpoint=False)
+	radii = radius * (1.0 + 0.1 * random.uniform(-1.0, 1.0, _numPoints))
+	x = centreX + radii * numpy.cos(angles)
+	z = centreZ + radii * numpy.sin(angles)
+	return numpy.column_stack((x, _raster.sample(x, z), z))
+
+## Create a curve that crosses a terrain
+# @param _raster The terrain
+# @param _numPoints The number of points along the curve
+# @return An (N, 3) array of points
+def curveAcross(_raster, _numPoints):
+	minX, maxX, minZ, maxZ = _raster.bounds()
+	x = numpy.linspace(minX, maxX, _numPoints)
+	z = 0.5 * (minZ + maxZ) + 0.25 * (maxZ - minZ) * numpy.sin(numpy.linspace(0.0, 2.0 * math.pi, _numPoints))
+	return numpy.column_stack((x, _raster.sample(x, z), z))
+
+## Scatter control points over a terrain
+# @param _raster The terrain
+# @param _numControlPoints The number of control points
+# @param _seed The random seed
+# @return The original positions and the moved positions as (N, 3) arrays
+def controlPoints(_raster, _numControlPoints, _seed=11):
+	random = numpy.random.RandomState(_seed)
+	minX, maxX, minZ, maxZ = _raster.bounds()
+	x = random.uniform(minX, maxX, _numControlPoints)
+	z = random.uniform(minZ, maxZ, _numControlPoints)
+	original = numpy.column_stack((x, _raster.sample(x, z), z))
+	moved = original + random.uniform(-2.0, 2.0, original.shape)
+	return original, moved
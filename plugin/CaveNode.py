@@ -2,7 +2,10 @@
 # This node creats a secondary curve inward from the mesh
 
 import sys
+import numpy
 import maya.api.OpenMaya as om
+from terrain_nodes import NodeFingerprints, NodeStats
+from terrain_core import cave, fingerprints, sculpt, stats
 
 #----------------------------------------------------------
 # Plugin
@@ -26,13 +29,39 @@ class CaveNodeClass(om.MPxNode):
 	## Constructor
 	def __init__(self):
 		om.MPxNode.__init__(self)
+		self.m_stats = stats.ComputeStats(kPluginNodeName)
+		self.m_fingerprints = fingerprints.InputFingerprints()
+		# The curve centre and terrain normal, kept while only the depth changes
+		self.m_normalKey = None
+		self.m_curveCentre = None
+		self.m_normal = None
 
 	## The function that is called when the node is dirty
+	# The compute is only wrapped in a profiler when a capture has been requested for this node or every node
 	# @param _plug A plug for one of the i/o attributes
 	# @param _dataBlock The data used for the computations
 	def compute(self, _plug, _dataBlock):
+		NodeStats.compute(self, _plug, _dataBlock)
+
+	## Record which input has been dirtied, so the next compute only fingerprints that input
+	# @param _plug The plug being dirtied
+	# @param _plugArray The plugs affected by it
+	def setDependentsDirty(self, _plug, _plugArray):
+		NodeFingerprints.setDependentsDirty(self, _plug)
+
+	## Record the dirtied inputs before the evaluation manager computes the node
+	# @param _context The context of the evaluation
+	# @param _evaluationNode The evaluation node, which knows the dirty plugs
+	def preEvaluation(self, _context, _evaluationNode):
+		NodeFingerprints.preEvaluation(self, _evaluationNode, [CaveNodeClass.inCurve, CaveNodeClass.inTerrain])
+
+	## Compute one of the outputs
+	# @param _plug A plug for one of the i/o attributes
+	# @param _dataBlock The data used for the computations
+	def computePlug(self, _plug, _dataBlock):
 		# Check if the plug is the output
 		if (_plug == CaveNodeClass.outCurve):
+			self.m_stats.begin()
 
 			# Get data handles and typecast
 			inCurveDataHandle = _dataBlock.inputValue(CaveNodeClass.inCurve)
@@ -52,29 +81,29 @@ class CaveNodeClass(om.MPxNode):
 			curvePoints = inCurveFn.cvPositions(om.MSpace.kWorld)
 			knots = inCurveFn.knots()
 
-			# Find the curve centre
-			numPoints = inCurveFn.numCVs * 2
-			curveCentre = om.MVector(0.0,0.0,0.0)
-			for i in range(numPoints):
-				point = inCurveFn.getPointAtParam(float(i) / numPoints, om.MSpace.kWorld)
-				curveCentre += om.MVector(point)
-			curveCentre /= float(numPoints)
-			curveCentre = om.MPoint(curveCentre)
-
-			# Get the normal from the closest point to the centre
+			# Only find the centre and normal again when the curve or terrain change
 			meshFn = om.MFnMesh(inTerrainValue)
-			normal = meshFn.getClosestNormal(curveCentre, om.MSpace.kWorld)[0]
-			normal.normalize()
-			# Scale the normal
-			normalScaled = normal * depthValue
+			inputs = NodeFingerprints.computeFingerprints(self, _dataBlock)
+			# Fingerprinting the terrain would cost more than the normal, so any change to it counts
+			normalKey = (NodeFingerprints.inputFingerprint(inputs, CaveNodeClass.inCurve, NodeFingerprints.curveFingerprint, inCurveFn), NodeFingerprints.inputVersion(inputs, CaveNodeClass.inTerrain))
+			if self.m_normalKey != normalKey:
+				# Find the curve centre
+				numPoints = inCurveFn.numCVs * 2
+				curveSamples = [inCurveFn.getPointAtParam(float(i) / numPoints, om.MSpace.kWorld) for i in range(numPoints)]
+				self.m_curveCentre = sculpt.curveCentre(numpy.array(curveSamples, dtype=numpy.float64))
+
+				# Get the normal from the closest point to the centre
+				normal = meshFn.getClosestNormal(om.MPoint(self.m_curveCentre[0], self.m_curveCentre[1], self.m_curveCentre[2]), om.MSpace.kWorld)[0]
+				self.m_normal = (normal.x, normal.y, normal.z)
+				self.m_normalKey = normalKey
+				self.m_stats.addRays(1)
+			else:
+				self.m_stats.addCacheHit()
+			self.m_stats.addVertices(len(curvePoints))
 
 			# Move the curve points
-			for curvePoint in curvePoints:
-				# Calculate the vector from the centre to the curve point
-				centreToCurvePoint = curvePoint - curveCentre
-				offset = (centreToCurvePoint * normalScaled) / depthValue
-				# Move the point
-				curvePoint -= (offset + depthValue) * normal
+			movedPoints = cave.caveOffsetPoints(numpy.array(curvePoints, dtype=numpy.float64), self.m_curveCentre, self.m_normal, depthValue)
+			curvePoints = om.MPointArray([om.MPoint(point) for point in movedPoints.tolist()])
 
 			# Create a new curve data fn and object
 			curveDataFn = om.MFnNurbsCurveData()
@@ -88,6 +117,7 @@ class CaveNodeClass(om.MPxNode):
 
 			# Mark the plug as clean
 			outCurveDataHandle.setClean()
+			NodeStats.endCompute(self, _plug, _dataBlock)
 
 
 #----------------------------------------------------------
@@ -134,6 +164,9 @@ def nodeInitializer():
 	typedAttr.storable = False
 	CaveNodeClass.addAttribute(CaveNodeClass.outCurve)
 
+	# Read only compute statistics
+	NodeStats.addStatsAttributes(CaveNodeClass)
+
 	# Connect input/output dependencies
 	CaveNodeClass.attributeAffects(CaveNodeClass.inTerrain, CaveNodeClass.outCurve)
 	CaveNodeClass.attributeAffects(CaveNodeClass.inCurve, CaveNodeClass.outCurve)
@@ -0,0 +1,185 @@
+## ExportHeightmapCmd.py
+# This command exports a terrain as a 16-bit heightmap
+
+from __future__ import print_function
+import sys
+import maya.api.OpenMaya as om
+import TerrainRasterData
+from terrain_core import TerrainRaster, TiledTerrainStore
+from terrain_core import heightmap
+
+#----------------------------------------------------------
+# Plugin
+#----------------------------------------------------------
+
+# The name of the command
+kPluginCmdName = "exportHeightmap"
+
+# Flag details
+shortFlagNames = ["-f","-fm","-rx","-rz","-sr","-lo","-hi","-ts"]
+longFlagNames = ["-file","-format","-resolutionX","-resolutionZ","-stripRows","-low","-high","-tileStore"]
+
+## This class creates the command to export a heightmap
+class ExportHeightmapCmdClass(om.MPxCommand):
+
+	## Constructor
+	def __init__(self):
+		om.MPxCommand.__init__(self)
+
+	## The command writes a file, so it cannot be undone
+	def isUndoable(self):
+		return False
+
+	## doIt function, called once when the command is first executed
+	# @param args The arguments when the command is executed
+	def doIt(self, args):
+		# Initialise values
+		self.nodeName = None
+		self.fileName = None
+		self.format = None
+		self.resolutionX = 1025
+		self.resolutionZ = 1025
+		self.stripRows = 64
+		self.low = None
+		self.high = None
+		self.tileStore = None
+		if (self.parseArguments(args) == True):
+			self.redoIt()
+
+	## redoIt function, all the computation occurs here
+	def redoIt(self):
+		if self.format is None:
+			self.format = heightmap.formatFromPath(self.fileName)
+		if self.format not in heightmap.kFormats:
+			print("Error. The heightmap format must be raw, pgm or png.")
+			return
+		if self.tileStore is not None:
+			# Export the tiled store at its own resolution, reading one strip at a time
+			with TiledTerrainStore.open(self.tileStore, True) as store:
+				numRows, numColumns = store.resolution()
+				if self.low is None or self.high is None:
+					low, high = heightmap.storeHeightRange(store, self.stripRows)
+					self.low = low if self.low is None else self.low
+					self.high = high if self.high is None else self.high
+				heightmap.exportHeightmap(self.fileName, heightmap.storeStrips(store, self.stripRows), numRows, numColumns, self.low, self.high, self.format)
+		else:
+			terrain = TerrainRasterData.terrainOutput(self.nodeName)
+			if terrain is None:
+				print("Error. " + self.nodeName + " does not have a terrain output.")
+				return
+			if isinstance(terrain, TerrainRaster):
+				heights = terrain.m_heights
+				strips = heightmap.rasterStrips(terrain, self.resolutionZ, self.resolutionX, self.stripRows)
+			else:
+				# Pull the points and triangles once, then rasterise them strip by strip
+				meshFn = om.MFnMesh(terrain)
+				points = TerrainRasterData.pointsAsArray(meshFn)
+				heights = points[:, 1]
+				strips = heightmap.meshStrips(points, TerrainRasterData.trianglesAsArray(meshFn), self.resolutionZ, self.resolutionX, self.stripRows)
+			if self.low is None:
+				self.low = float(heights.min())
+			if self.high is None:
+				self.high = float(heights.max())
+			heightmap.exportHeightmap(self.fileName, strips, self.resolutionZ, self.resolutionX, self.low, self.high, self.format)
+		# Return the height range so the engine import can be scaled to match
+		self.setResult([self.low, self.high])
+
+	## Parse arguments and flags
+	# @param args The arguments from when the command is executed
+	def parseArguments(self, args):
+		argData = om.MArgParser(self.syntax(), args)
+		# The argument is the node to export, otherwise use the selection
+		try:
+			self.nodeName = argData.commandArgumentString(0)
+		except:
+			selectionList = om.MGlobal.getActiveSelectionList()
+			if selectionList.length() > 0:
+				self.nodeName = selectionList.getSelectionStrings(0)[0]
+		# Parse the flags
+		if argData.isFlagSet("-f"):
+			self.fileName = argData.flagArgumentString("-f",0)
+		if argData.isFlagSet("-file"):
+			self.fileName = argData.flagArgumentString("-file",0)
+		if argData.isFlagSet("-fm"):
+			self.format = argData.flagArgumentString("-fm",0).lower()
+		if argData.isFlagSet("-format"):
+			self.format = argData.flagArgumentString("-format",0).lower()
+		if argData.isFlagSet("-rx"):
+			self.resolutionX = argData.flagArgumentInt("-rx",0)
+		if argData.isFlagSet("-resolutionX"):
+			self.resolutionX = argData.flagArgumentInt("-resolutionX",0)
+		if argData.isFlagSet("-rz"):
+			self.resolutionZ = argData.flagArgumentInt("-rz",0)
+		if argData.isFlagSet("-resolutionZ"):
+			self.resolutionZ = argData.flagArgumentInt("-resolutionZ",0)
+		if argData.isFlagSet("-sr"):
+			self.stripRows = argData.flagArgumentInt("-sr",0)
+		if argData.isFlagSet("-stripRows"):
+			self.stripRows = argData.flagArgumentInt("-stripRows",0)
+		if argData.isFlagSet("-lo"):
+			self.low = argData.flagArgumentDouble("-lo",0)
+		if argData.isFlagSet("-low"):
+			self.low = argData.flagArgumentDouble("-low",0)
+		if argData.isFlagSet("-hi"):
+			self.high = argData.flagArgumentDouble("-hi",0)
+		if argData.isFlagSet("-high"):
+			self.high = argData.flagArgumentDouble("-high",0)
+		if argData.isFlagSet("-ts"):
+			self.tileStore = argData.flagArgumentString("-ts",0)
+		if argData.isFlagSet("-tileStore"):
+			self.tileStore = argData.flagArgumentString("-tileStore",0)
+		# Check the inputs
+		if self.fileName is None:
+			print("Error. No file name given.")
+			return False
+		if self.nodeName is None and self.tileStore is None:
+			print("Error. Nothing selected.")
+			return False
+		if self.resolutionX < 2 or self.resolutionZ < 2 or self.stripRows < 1:
+			print("Error. The resolution must be at least 2 and the strip rows at least 1.")
+			return False
+		return True
+
+## Tell Maya to use Python API 2.0
+def maya_useNewAPI():
+	pass
+
+## Create an instance of the command
+def cmdCreator():
+	return ExportHeightmapCmdClass()
+
+## Define the argument and syntax for the command
+def syntaxCreator():
+	syntax = om.MSyntax()
+	# The node to export
+	syntax.addArg(om.MSyntax.kString)
+	# Flag arguments
+	syntax.addFlag(shortFlagNames[0], longFlagNames[0], om.MSyntax.kString)
+	syntax.addFlag(shortFlagNames[1], longFlagNames[1], om.MSyntax.kString)
+	syntax.addFlag(shortFlagNames[2], longFlagNames[2], om.MSyntax.kLong)
+	syntax.addFlag(shortFlagNames[3], longFlagNames[3], om.MSyntax.kLong)
+	syntax.addFlag(shortFlagNames[4], longFlagNames[4], om.MSyntax.kLong)
+	syntax.addFlag(shortFlagNames[5], longFlagNames[5], om.MSyntax.kDouble)
+	syntax.addFlag(shortFlagNames[6], longFlagNames[6], om.MSyntax.kDouble)
+	syntax.addFlag(shortFlagNames[7], longFlagNames[7], om.MSyntax.kString)
+	return syntax
+
+## Initialise the plugin when Maya loads it
+def initializePlugin(mobject):
+	mplugin = om.MFnPlugin(mobject)
+	# Rasters are read from the outRaster data of the nodes
+	TerrainRasterData.loadDataPlugin()
+	try:
+		mplugin.registerCommand(kPluginCmdName, cmdCreator, syntaxCreator)
+	except:
+		sys.stderr.write("Failed to register command: " + kPluginCmdName)
+		raise
+
+## Uninitialise the plugin when Maya unloads it
+def uninitializePlugin(mobject):
+	mplugin = om.MFnPlugin(mobject)
+	try:
+		mplugin.deregisterCommand(kPluginCmdName)
+	except:
+		sys.stderr.write("Failed to unregister command: " + kPluginCmdName)
+		raise
@@ -0,0 +1,139 @@
+## ExportTerrainMeshCmd.py
+# This command exports a terrain as a binary PLY or ASCII OBJ file
+
+from __future__ import print_function
+import sys
+import maya.api.OpenMaya as om
+import TerrainRasterData
+from terrain_core import TerrainRaster
+from terrain_core import meshio
+
+#----------------------------------------------------------
+# Plugin
+#----------------------------------------------------------
+
+# The name of the command
+kPluginCmdName = "exportTerrainMesh"
+
+# Flag details
+shortFlagNames = ["-f","-fm","-cs"]
+longFlagNames = ["-file","-format","-chunkSize"]
+
+## This class creates the command to export a terrain mesh
+class ExportTerrainMeshCmdClass(om.MPxCommand):
+
+	## Constructor
+	def __init__(self):
+		om.MPxCommand.__init__(self)
+
+	## The command writes a file, so it cannot be undone
+	def isUndoable(self):
+		return False
+
+	## doIt function, called once when the command is first executed
+	# @param args The arguments when the command is executed
+	def doIt(self, args):
+		# Initialise values
+		self.nodeName = None
+		self.fileName = None
+		self.format = None
+		self.chunkSize = 65536
+		if (self.parseArguments(args) == True):
+			self.redoIt()
+
+	## redoIt function, all the computation occurs here
+	def redoIt(self):
+		if self.format is None:
+			self.format = meshio.formatFromPath(self.fileName)
+		if self.format not in meshio.kFormats:
+			print("Error. The mesh format must be ply or obj.")
+			return
+		terrain = TerrainRasterData.terrainOutput(self.nodeName)
+		if terrain is None:
+			print("Error. " + self.nodeName + " does not have a terrain output.")
+			return
+		# Pull the points and faces once as arrays, the writer streams them in chunks
+		if isinstance(terrain, TerrainRaster):
+			points = terrain.positions()
+			faceCounts, faceConnects = terrain.gridFaces()
+		else:
+			meshFn = om.MFnMesh(terrain)
+			points = TerrainRasterData.pointsAsArray(meshFn)
+			faceCounts, faceConnects = TerrainRasterData.facesAsArrays(meshFn)
+		meshio.writeMesh(self.fileName, points, faceCounts, faceConnects, self.format, self.chunkSize)
+		self.setResult(self.fileName)
+
+	## Parse arguments and flags
+	# @param args The arguments from when the command is executed
+	def parseArguments(self, args):
+		argData = om.MArgParser(self.syntax(), args)
+		# The argument is the node to export, otherwise use the selection
+		try:
+			self.nodeName = argData.commandArgumentString(0)
+		except:
+			selectionList = om.MGlobal.getActiveSelectionList()
+			if selectionList.length() > 0:
+				self.nodeName = selectionList.getSelectionStrings(0)[0]
+		# Parse the flags
+		if argData.isFlagSet("-f"):
+			self.fileName = argData.flagArgumentString("-f",0)
+		if argData.isFlagSet("-file"):
+			self.fileName = argData.flagArgumentString("-file",0)
+		if argData.isFlagSet("-fm"):
+			self.format = argData.flagArgumentString("-fm",0).lower()
+		if argData.isFlagSet("-format"):
+			self.format = argData.flagArgumentString("-format",0).lower()
+		if argData.isFlagSet("-cs"):
+			self.chunkSize = argData.flagArgumentInt("-cs",0)
+		if argData.isFlagSet("-chunkSize"):
+			self.chunkSize = argData.flagArgumentInt("-chunkSize",0)
+		# Check the inputs
+		if self.fileName is None:
+			print("Error. No file name given.")
+			return False
+		if self.nodeName is None:
+			print("Error. Nothing selected.")
+			return False
+		if self.chunkSize < 1:
+			print("Error. The chunk size must be at least 1.")
+			return False
+		return True
+
+## Tell Maya to use Python API 2.0
+def maya_useNewAPI():
+	pass
+
+## Create an instance of the command
+def cmdCreator():
+	return ExportTerrainMeshCmdClass()
+
+## Define the argument and syntax for the command
+def syntaxCreator():
+	syntax = om.MSyntax()
+	# The node to export
+	syntax.addArg(om.MSyntax.kString)
+	# Flag arguments
+	syntax.addFlag(shortFlagNames[0], longFlagNames[0], om.MSyntax.kString)
+	syntax.addFlag(shortFlagNames[1], longFlagNames[1], om.MSyntax.kString)
+	syntax.addFlag(shortFlagNames[2], longFlagNames[2], om.MSyntax.kLong)
+	return syntax
+
+## Initialise the plugin when Maya loads it
+def initializePlugin(mobject):
+	mplugin = om.MFnPlugin(mobject)
+	# Rasters are read from the outRaster data of the nodes
+	TerrainRasterData.loadDataPlugin()
+	try:
+		mplugin.registerCommand(kPluginCmdName, cmdCreator, syntaxCreator)
+	except:
+		sys.stderr.write("Failed to register command: " + kPluginCmdName)
+		raise
+
+## Uninitialise the plugin when Maya unloads it
+def uninitializePlugin(mobject):
+	mplugin = om.MFnPlugin(mobject)
+	try:
+		mplugin.deregisterCommand(kPluginCmdName)
+	except:
+		sys.stderr.write("Failed to unregister command: " + kPluginCmdName)
+		raise
@@ -13,8 +13,8 @@ import maya.cmds as mc
 kPluginCmdName = "createHeightField"
 
 # Flag details
-shortFlagNames = ["-n","-ws","-nt","-a","-s","-f","-fo","l","fg"]
-longFlagNames = ["-name","-worldSpace","-noiseType","-amplitude","-seed","-frequency","-fractalOctaves","-lacunarity","-fractalGain"]
+shortFlagNames = ["-n","-ws","-nt","-a","-s","-f","-fo","-l","-fg","-dw","-ts","-pl","-cr"]
+longFlagNames = ["-name","-worldSpace","-noiseType","-amplitude","-seed","-frequency","-fractalOctaves","-lacunarity","-fractalGain","-domainWarp","-terrainShape","-plateauLevels","-craterRadius"]
 
 ## This class creates the command to create a height field
 class HeightFieldCmdClass(om.MPxCommand):
@@ -41,13 +41,27 @@ class HeightFieldCmdClass(om.MPxCommand):
 		self.seed = 1337
 		self.frequency = 0.01
 		self.noiseTypeStr = "Simplex"
+		self.domainWarp = 0.0
+		self.terrainShapeStr = "None"
+		self.plateauLevels = 4
+		self.craterRadius = 0.35
 		self.parseArguments(args)
 		if self.noiseTypeStr == "Perlin":
 			self.noiseType = 3
 		elif self.noiseTypeStr == "Cubic":
 			self.noiseType = 9
+		elif self.noiseTypeStr == "Cellular":
+			self.noiseType = 6
 		else:
 			self.noiseType = 5
+		if self.terrainShapeStr == "Ridges":
+			self.terrainShape = 1
+		elif self.terrainShapeStr == "Plateaus":
+			self.terrainShape = 2
+		elif self.terrainShapeStr == "Craters":
+			self.terrainShape = 3
+		else:
+			self.terrainShape = 0
 		if self.worldSpaceBool == True:
 			self.worldSpace = 4
 		else:
@@ -74,6 +88,12 @@ class HeightFieldCmdClass(om.MPxCommand):
 		mc.setAttr(nodeName + ".fractalOctaves", self.fractalOctaves)
 		mc.setAttr(nodeName + ".lacunarity", self.lacunarity)
 		mc.setAttr(nodeName + ".fractalGain", self.fractalGain)
+		mc.setAttr(nodeName + ".domainWarp", self.domainWarp)
+		mc.setAttr(nodeName + ".terrainShape", self.terrainShape)
+		mc.setAttr(nodeName + ".plateauLevels", self.plateauLevels)
+		mc.setAttr(nodeName + ".craterRadius", self.craterRadius)
+		# Return the node name so the UI can drive it
+		self.setResult(nodeName)
 
 	## Delete all the created nodes
 	def undoIt(self):
@@ -129,6 +149,22 @@ class HeightFieldCmdClass(om.MPxCommand):
 			self.fractalGain = argData.flagArgumentFloat("-fg",0)
 		if argData.isFlagSet("-fractalGain"):
 			self.fractalGain = argData.flagArgumentFloat("-fractalGain",0)
+		if argData.isFlagSet("-dw"):
+			self.domainWarp = argData.flagArgumentFloat("-dw",0)
+		if argData.isFlagSet("-domainWarp"):
+			self.domainWarp = argData.flagArgumentFloat("-domainWarp",0)
+		if argData.isFlagSet("-ts"):
+			self.terrainShapeStr = argData.flagArgumentString("-ts",0)
+		if argData.isFlagSet("-terrainShape"):
+			self.terrainShapeStr = argData.flagArgumentString("-terrainShape",0)
+		if argData.isFlagSet("-pl"):
+			self.plateauLevels = argData.flagArgumentInt("-pl",0)
+		if argData.isFlagSet("-plateauLevels"):
+			self.plateauLevels = argData.flagArgumentInt("-plateauLevels",0)
+		if argData.isFlagSet("-cr"):
+			self.craterRadius = argData.flagArgumentFloat("-cr",0)
+		if argData.isFlagSet("-craterRadius"):
+			self.craterRadius = argData.flagArgumentFloat("-craterRadius",0)
 
 	## Find the mesh and curve from the selection
 	# @param selectionList Selected items from the Maya scene
@@ -179,6 +215,10 @@ def syntaxCreator():
 	syntax.addFlag(shortFlagNames[6], longFlagNames[6], om.MSyntax.kLong)
 	syntax.addFlag(shortFlagNames[7], longFlagNames[7], om.MSyntax.kDouble)
 	syntax.addFlag(shortFlagNames[8], longFlagNames[8], om.MSyntax.kDouble)
+	syntax.addFlag(shortFlagNames[9], longFlagNames[9], om.MSyntax.kDouble)
+	syntax.addFlag(shortFlagNames[10], longFlagNames[10], om.MSyntax.kString)
+	syntax.addFlag(shortFlagNames[11], longFlagNames[11], om.MSyntax.kLong)
+	syntax.addFlag(shortFlagNames[12], longFlagNames[12], om.MSyntax.kDouble)
 
 	return syntax
 
@@ -0,0 +1,179 @@
+## HeightmapImportCmd.py
+# This command creates a terrain mesh from a heightmap file
+
+from __future__ import print_function
+import sys
+import numpy
+import maya.api.OpenMaya as om
+import maya.cmds as mc
+import TerrainRasterData
+from terrain_core import TerrainRaster
+from terrain_core import heightmap
+
+#----------------------------------------------------------
+# Plugin
+#----------------------------------------------------------
+
+# The name of the command
+kPluginCmdName = "createTerrainFromHeightmap"
+
+# Flag details
+shortFlagNames = ["-n","-rx","-rz","-sp","-hs","-ds","-wo","-wsz"]
+longFlagNames = ["-name","-resolutionX","-resolutionZ","-spacing","-heightScale","-downsample","-windowOrigin","-windowSize"]
+
+## This class creates the command to import a heightmap as a terrain mesh
+class HeightmapImportCmdClass(om.MPxCommand):
+
+	## Constructor
+	def __init__(self):
+		om.MPxCommand.__init__(self)
+
+	## Let Maya know that the command is undoable
+	def isUndoable(self):
+		return True
+
+	## doIt function, called once when the command is first executed
+	# @param args The arguments when the command is executed
+	def doIt(self, args):
+		# Initialise values
+		self.name = "Terrain"
+		self.fileName = None
+		self.resolutionX = None
+		self.resolutionZ = None
+		self.spacing = 1.0
+		self.heightScale = 100.0
+		self.downsample = 1
+		self.windowOrigin = (0, 0)
+		self.windowSize = None
+		self.transform = None
+		if (self.parseArguments(args) == True):
+			self.redoIt()
+
+	## redoIt function, all the computation occurs here
+	def redoIt(self):
+		# Map the file, nothing is read until the window is sliced
+		try:
+			heights, maxValue = heightmap.mapHeightmap(self.fileName, self.resolutionZ, self.resolutionX)
+		except (IOError, OSError, ValueError) as error:
+			print("Error. " + str(error))
+			return
+		row, column = self.windowOrigin
+		if self.windowSize is None:
+			numRows, numColumns = heights.shape[0] - row, heights.shape[1] - column
+		else:
+			numRows, numColumns = self.windowSize
+		if row < 0 or column < 0 or numRows < 2 or numColumns < 2 or row + numRows > heights.shape[0] or column + numColumns > heights.shape[1]:
+			print("Error. The window is outside the heightmap.")
+			return
+		# Downsampling takes every nth sample, so only the rows that are used are paged in
+		window = heights[row:row + numRows:self.downsample, column:column + numColumns:self.downsample]
+		window = window.astype(numpy.float32) * (self.heightScale / maxValue)
+		# Place the window so neighbouring windows line up
+		raster = TerrainRaster(window, (column * self.spacing, row * self.spacing), (self.spacing * self.downsample, self.spacing * self.downsample))
+		del heights
+
+		self.transform = TerrainRasterData.meshFromRaster(raster, om.MObject.kNullObj)
+		dagFn = om.MFnDagNode(self.transform)
+		dagFn.setName(self.name)
+		# Add the shape to the default shading group so it is visible
+		shapeName = om.MFnDagNode(dagFn.child(0)).name()
+		mc.sets(shapeName, edit=True, forceElement="initialShadingGroup")
+		self.setResult(dagFn.name())
+
+	## Delete all the created nodes
+	def undoIt(self):
+		if self.transform is None:
+			return
+		dagModifier = om.MDagModifier()
+		dagModifier.deleteNode(self.transform)
+		dagModifier.doIt()
+
+	## Parse arguments and flags
+	# @param args The arguments from when the command is executed
+	def parseArguments(self, args):
+		argData = om.MArgParser(self.syntax(), args)
+		# The argument is the heightmap file
+		try:
+			self.fileName = argData.commandArgumentString(0)
+		except:
+			print("Error. No heightmap file given.")
+			return False
+		# Parse the flags
+		if argData.isFlagSet("-n"):
+			self.name = argData.flagArgumentString("-n",0)
+		if argData.isFlagSet("-name"):
+			self.name = argData.flagArgumentString("-name",0)
+		if argData.isFlagSet("-rx"):
+			self.resolutionX = argData.flagArgumentInt("-rx",0)
+		if argData.isFlagSet("-resolutionX"):
+			self.resolutionX = argData.flagArgumentInt("-resolutionX",0)
+		if argData.isFlagSet("-rz"):
+			self.resolutionZ = argData.flagArgumentInt("-rz",0)
+		if argData.isFlagSet("-resolutionZ"):
+			self.resolutionZ = argData.flagArgumentInt("-resolutionZ",0)
+		if argData.isFlagSet("-sp"):
+			self.spacing = argData.flagArgumentDouble("-sp",0)
+		if argData.isFlagSet("-spacing"):
+			self.spacing = argData.flagArgumentDouble("-spacing",0)
+		if argData.isFlagSet("-hs"):
+			self.heightScale = argData.flagArgumentDouble("-hs",0)
+		if argData.isFlagSet("-heightScale"):
+			self.heightScale = argData.flagArgumentDouble("-heightScale",0)
+		if argData.isFlagSet("-ds"):
+			self.downsample = argData.flagArgumentInt("-ds",0)
+		if argData.isFlagSet("-downsample"):
+			self.downsample = argData.flagArgumentInt("-downsample",0)
+		if argData.isFlagSet("-wo"):
+			self.windowOrigin = (argData.flagArgumentInt("-wo",0), argData.flagArgumentInt("-wo",1))
+		if argData.isFlagSet("-windowOrigin"):
+			self.windowOrigin = (argData.flagArgumentInt("-windowOrigin",0), argData.flagArgumentInt("-windowOrigin",1))
+		if argData.isFlagSet("-wsz"):
+			self.windowSize = (argData.flagArgumentInt("-wsz",0), argData.flagArgumentInt("-wsz",1))
+		if argData.isFlagSet("-windowSize"):
+			self.windowSize = (argData.flagArgumentInt("-windowSize",0), argData.flagArgumentInt("-windowSize",1))
+		if self.downsample < 1:
+			print("Error. The downsample step must be at least 1.")
+			return False
+		return True
+
+## Tell Maya to use Python API 2.0
+def maya_useNewAPI():
+	pass
+
+## Create an instance of the command
+def cmdCreator():
+	return HeightmapImportCmdClass()
+
+## Define the argument and syntax for the command
+def syntaxCreator():
+	syntax = om.MSyntax()
+	# The heightmap file
+	syntax.addArg(om.MSyntax.kString)
+	# Flag arguments
+	syntax.addFlag(shortFlagNames[0], longFlagNames[0], om.MSyntax.kString)
+	syntax.addFlag(shortFlagNames[1], longFlagNames[1], om.MSyntax.kLong)
+	syntax.addFlag(shortFlagNames[2], longFlagNames[2], om.MSyntax.kLong)
+	syntax.addFlag(shortFlagNames[3], longFlagNames[3], om.MSyntax.kDouble)
+	syntax.addFlag(shortFlagNames[4], longFlagNames[4], om.MSyntax.kDouble)
+	syntax.addFlag(shortFlagNames[5], longFlagNames[5], om.MSyntax.kLong)
+	syntax.addFlag(shortFlagNames[6], longFlagNames[6], om.MSyntax.kLong, om.MSyntax.kLong)
+	syntax.addFlag(shortFlagNames[7], longFlagNames[7], om.MSyntax.kLong, om.MSyntax.kLong)
+	return syntax
+
+## Initialise the plugin when Maya loads it
+def initializePlugin(mobject):
+	mplugin = om.MFnPlugin(mobject)
+	try:
+		mplugin.registerCommand(kPluginCmdName, cmdCreator, syntaxCreator)
+	except:
+		sys.stderr.write("Failed to register command: " + kPluginCmdName)
+		raise
+
+## Uninitialise the plugin when Maya unloads it
+def uninitializePlugin(mobject):
+	mplugin = om.MFnPlugin(mobject)
+	try:
+		mplugin.deregisterCommand(kPluginCmdName)
+	except:
+		sys.stderr.write("Failed to unregister command: " + kPluginCmdName)
+		raise
@@ -0,0 +1,447 @@
+## OperatorChainNode.py
+# This node evaluates an ordered chain of terrain operators on one vertex buffer
+# Each operator moves the buffer in place and keeps its own cache, and only one mesh is created at the end, rather than a mesh for every node in a chain of WarpNodes and SculptLayerNodes
+# The vertices moved by the terrain and the changed operators are passed down the chain, so the operators after them only update around those vertices
+
+import sys
+import numpy
+import maya.api.OpenMaya as om
+import TerrainRasterData
+from terrain_nodes import NodeFingerprints, NodeStats, ProgressWindow
+import WarpNode
+import SculptLayerNode
+from terrain_core import fingerprints, regions, stats, warp
+
+#----------------------------------------------------------
+# Plugin
+#----------------------------------------------------------
+
+# Node info
+kPluginNodeName = "OperatorChainNode"
+kPluginNodeID = om.MTypeId(0x100B)
+
+# The operations, the values of the operation attribute
+kWarp = 0
+kSculpt = 1
+kOperationNames = ["Warp", "Sculpt"]
+
+## The cached state of one operator of the chain
+class OperatorState(object):
+
+	## Constructor
+	def __init__(self):
+		self.m_fingerprints = fingerprints.InputFingerprints()
+		# The warp weights, for the input buffer, original control points and radius in m_weightsKey
+		self.m_weightsKey = None
+		self.m_weights = []
+		# The moved vertices and their displacements of a warp, for the weights and control points in m_warpKey
+		self.m_warpKey = None
+		self.m_indices = numpy.zeros(0, dtype=numpy.int64)
+		self.m_offsets = numpy.zeros((0, 3), dtype=numpy.float64)
+		# The selection and displacements of a sculpt
+		self.m_sculptLayer = SculptLayerNode.SculptLayerState()
+		# The key of the buffer the operator was last evaluated on, and the displacements it returned
+		self.m_inputKey = None
+		self.m_outIndices = numpy.zeros(0, dtype=numpy.int64)
+		self.m_outOffsets = numpy.zeros((0, 3), dtype=numpy.float64)
+
+## This class is used to compute the operator chain
+class OperatorChainNodeClass(om.MPxNode):
+	# Define the attributes
+	# Input objects
+	m_terrain = om.MObject()
+	# The operators in order, each with an operation and the inputs of a warp and a sculpt
+	m_operators = om.MObject()
+	m_operation = om.MObject()
+	m_controlPoints = om.MObject()
+	m_controlPointsOriginal = om.MObject()
+	m_maxRadius = om.MObject()
+	m_curveMask = om.MObject()
+	m_sculptedMesh = om.MObject()
+	m_sculptStrength = om.MObject()
+	m_curveOffset = om.MObject()
+	m_maxProjectionDistance = om.MObject()
+	# Output
+	m_outMesh = om.MObject()
+
+	## Constructor
+	def __init__(self):
+		om.MPxNode.__init__(self)
+		self.m_fingerprints = fingerprints.InputFingerprints()
+		# The OperatorState of each operator by logical index
+		self.m_operatorStates = {}
+		# The terrain positions and the order of the operators of the last compute, to find the vertices moved since then
+		self.m_terrainKey = None
+		self.m_terrainPoints = None
+		self.m_operatorOrder = []
+		self.m_stats = stats.ComputeStats(kPluginNodeName)
+
+	## The function that is called when the node is dirty
+	# The compute is only wrapped in a profiler when a capture has been requested for this node or every node
+	# @param _plug A plug for one of the i/o attributes
+	# @param _dataBlock The data used for the computations
+	def compute(self, _plug, _dataBlock):
+		NodeStats.compute(self, _plug, _dataBlock)
+
+	## Record which input has been dirtied, the inputs of an operator are tracked by the operator so the others are not fingerprinted again
+	# @param _plug The plug being dirtied
+	# @param _plugArray The plugs affected by it
+	def setDependentsDirty(self, _plug, _plugArray):
+		plug = _plug
+		while plug.isElement or plug.isChild:
+			if plug.isElement and plug.attribute() == OperatorChainNodeClass.m_operators:
+				# A whole operator has changed
+				self.operatorState(plug.logicalIndex()).m_fingerprints.clear()
+				return
+			parent = plug.array() if plug.isElement else plug.parent()
+			if plug.isChild and parent.isElement and parent.attribute() == OperatorChainNodeClass.m_operators:
+				self.operatorState(parent.logicalIndex()).m_fingerprints.setDirty(om.MFnAttribute(plug.attribute()).name)
+				return
+			plug = parent
+		if _plug.attribute() == OperatorChainNodeClass.m_operators:
+			for state in self.m_operatorStates.values():
+				state.m_fingerprints.clear()
+		else:
+			NodeFingerprints.setDependentsDirty(self, _plug)
+
+	## Record the dirtied inputs before the evaluation manager computes the node
+	# The evaluation manager does not say which operator is dirty, so every operator is fingerprinted again, but only the changed operators are evaluated
+	# @param _context The context of the evaluation
+	# @param _evaluationNode The evaluation node, which knows the dirty plugs
+	def preEvaluation(self, _context, _evaluationNode):
+		NodeFingerprints.preEvaluation(self, _evaluationNode, [OperatorChainNodeClass.m_terrain])
+		operatorAttributes = [OperatorChainNodeClass.m_operators, OperatorChainNodeClass.m_curveMask, OperatorChainNodeClass.m_sculptedMesh]
+		if any(_evaluationNode.dirtyPlugExists(attribute) for attribute in operatorAttributes):
+			for state in self.m_operatorStates.values():
+				state.m_fingerprints.clear()
+
+	## Get the state of an operator, creating it for a new operator
+	# @param _logicalIndex The logical index of the operator
+	# @return The OperatorState
+	def operatorState(self, _logicalIndex):
+		if _logicalIndex not in self.m_operatorStates:
+			self.m_operatorStates[_logicalIndex] = OperatorState()
+		return self.m_operatorStates[_logicalIndex]
+
+	## Get the logical indices of the operators in order
+	# @param _operatorsDataHandle The array data handle of the operators
+	# @return A list of logical indices
+	def operatorOrder(self, _operatorsDataHandle):
+		order = []
+		if len(_operatorsDataHandle) > 0:
+			_operatorsDataHandle.jumpToPhysicalElement(0)
+			while not _operatorsDataHandle.isDone():
+				order.append(_operatorsDataHandle.elementLogicalIndex())
+				_operatorsDataHandle.next()
+		return order
+
+	## Compute one of the outputs
+	# @param _plug A plug for one of the i/o attributes
+	# @param _dataBlock The data used for the computations
+	def computePlug(self, _plug, _dataBlock):
+		# Check if the plug is the output
+		if (_plug == OperatorChainNodeClass.m_outMesh):
+			self.m_stats.begin()
+
+			# Get data handles and typecast
+			terrainDataHandle = _dataBlock.inputValue(OperatorChainNodeClass.m_terrain)
+			terrainValue = terrainDataHandle.asMesh()
+
+			operatorsDataHandle = _dataBlock.inputArrayValue(OperatorChainNodeClass.m_operators)
+
+			outMeshDataHandle = _dataBlock.outputValue(OperatorChainNodeClass.m_outMesh)
+
+			# Computation
+			inTerrainFn = om.MFnMesh(terrainValue)
+			vertexPositions = inTerrainFn.getPoints()
+
+			# Only the inputs dirtied since the last compute are fingerprinted again
+			inputs = NodeFingerprints.computeFingerprints(self, _dataBlock)
+			terrainKey = NodeFingerprints.inputFingerprint(inputs, OperatorChainNodeClass.m_terrain, NodeFingerprints.meshFingerprint, inTerrainFn)
+
+			# Run the operators in order on one buffer, the key of the buffer identifies the operators applied to it so far
+			points = TerrainRasterData.pointsAsArray(inTerrainFn)
+			pointsKey = terrainKey
+			sculptedMeshes = {}
+			operatorIndices = set()
+			movedVertices = []
+
+			# The vertices of the buffer that have moved since the last compute, starting with the terrain vertices
+			# They are not known if the topology changed or operators were added, removed or reordered, then every operator is evaluated in full
+			operatorOrder = self.operatorOrder(operatorsDataHandle)
+			changedVertices = None
+			if self.m_terrainKey == terrainKey:
+				changedVertices = numpy.zeros(0, dtype=numpy.int64)
+			elif self.m_terrainKey is not None and self.m_terrainKey[1] == terrainKey[1]:
+				changedVertices = regions.fromPoints(self.m_terrainKey, self.m_terrainPoints, points).m_indices
+			if self.m_terrainKey != terrainKey:
+				self.m_terrainKey = terrainKey
+				self.m_terrainPoints = points.copy()
+			if operatorOrder != self.m_operatorOrder:
+				changedVertices = None
+				self.m_operatorOrder = operatorOrder
+			if len(operatorsDataHandle) > 0:
+				operatorsDataHandle.jumpToPhysicalElement(0)
+				while not operatorsDataHandle.isDone():
+					logicalIndex = operatorsDataHandle.elementLogicalIndex()
+					operatorIndices.add(logicalIndex)
+					state = self.operatorState(logicalIndex)
+					# Dirtied inputs are only reported for the normal context, so other times fingerprint every input of the operator
+					operatorInputs = state.m_fingerprints if _dataBlock.context().isNormal() else fingerprints.InputFingerprints()
+					operatorDataHandle = operatorsDataHandle.inputValue()
+					operation = operatorDataHandle.child(OperatorChainNodeClass.m_operation).asShort()
+					label = kOperationNames[operation].lower() + " operator " + str(logicalIndex)
+					# The region is only used against state calculated from the previous input of the operator
+					dirtyRegion = None
+					if changedVertices is not None and state.m_inputKey is not None:
+						dirtyRegion = regions.DirtyRegion(state.m_inputKey, changedVertices)
+					state.m_inputKey = pointsKey
+					if operation == kWarp:
+						pointsKey, indices, offsets = self.evaluateWarp(state, operatorDataHandle, points, pointsKey, dirtyRegion, label)
+					else:
+						pointsKey, indices, offsets = self.evaluateSculpt(state, operatorInputs, operatorDataHandle, inTerrainFn, points, pointsKey, dirtyRegion, sculptedMeshes, label)
+					# The output of the operator has also moved where its displacements changed
+					if changedVertices is not None and (indices is not state.m_outIndices or offsets is not state.m_outOffsets):
+						changedVertices = numpy.union1d(changedVertices, regions.changedOffsets(state.m_outIndices, state.m_outOffsets, indices, offsets))
+					state.m_outIndices = indices
+					state.m_outOffsets = offsets
+					# Move the buffer in place for the next operator
+					points[indices] += offsets
+					movedVertices.append(indices)
+					operatorsDataHandle.next()
+
+			# Free the accelerators from memory as they are not automatically managed
+			for sculptedMeshFn, accelerationParams in sculptedMeshes.values():
+				sculptedMeshFn.freeCachedIntersectionAccelerator()
+
+			# Forget the operators that have been removed
+			for logicalIndex in list(self.m_operatorStates.keys()):
+				if logicalIndex not in operatorIndices:
+					del self.m_operatorStates[logicalIndex]
+
+			# Copy the moved vertices of the buffer back to the mesh points
+			movedVertices = numpy.unique(numpy.concatenate(movedVertices)) if len(movedVertices) > 0 else numpy.zeros(0, dtype=numpy.int64)
+			for index in movedVertices:
+				vertexPositions[index] = om.MPoint(points[index][0], points[index][1], points[index][2])
+
+			# Create the one output mesh
+			meshDataFn = om.MFnMeshData()
+			outTerrain = meshDataFn.create()
+			outTerrainFn = om.MFnMesh()
+			outTerrainFn.copy(terrainValue, outTerrain)
+
+			# Set the new vertices of the mesh
+			outTerrainFn.setPoints(vertexPositions)
+			# Normals may be locked upstream (e.g. analytic height field normals), unlock them around the moved vertices
+			TerrainRasterData.unlockMovedNormals(outTerrainFn, movedVertices)
+
+			# Set the output value
+			outMeshDataHandle.setMObject(outTerrain)
+
+			# Mark the plug as clean
+			outMeshDataHandle.setClean()
+			NodeStats.endCompute(self, _plug, _dataBlock)
+
+	## Warp the buffer, calculating the weights again only when the buffer, original control points or radius change
+	# The control points are read and fingerprinted on every compute, they are small
+	# @param _state The OperatorState of the operator
+	# @param _operatorDataHandle The data handle of the operator element
+	# @param _points The (N, 3) vertex buffer
+	# @param _pointsKey The key of the buffer
+	# @param _dirtyRegion The terrain_core.regions.DirtyRegion of the vertices of the buffer moved since the last compute, or None
+	# @param _label The name of the operator shown in the progress window
+	# @return The key of the warped buffer, and the moved vertices and their displacements
+	def evaluateWarp(self, _state, _operatorDataHandle, _points, _pointsKey, _dirtyRegion, _label):
+		controlPointsOriginal = WarpNode.readControlPoints(om.MArrayDataHandle(_operatorDataHandle.child(OperatorChainNodeClass.m_controlPointsOriginal)))
+		controlPoints = WarpNode.readControlPoints(om.MArrayDataHandle(_operatorDataHandle.child(OperatorChainNodeClass.m_controlPoints)))
+		maxRadiusValue = _operatorDataHandle.child(OperatorChainNodeClass.m_maxRadius).asFloat()
+		# The weights key of the first operator matches a WarpNode on the same terrain, so they share the disk cache
+		weightsKey = (_pointsKey, fingerprints.fingerprint(controlPointsOriginal), maxRadiusValue, warp.falloffTable(None).key())
+		warpKey = (weightsKey, fingerprints.fingerprint(controlPoints))
+		if _state.m_warpKey == warpKey:
+			self.m_stats.addCacheHit()
+			return warpKey, _state.m_indices, _state.m_offsets
+
+		_state.m_warpKey = None
+		if _dirtyRegion is not None and _state.m_weightsKey is not None and _state.m_weightsKey == (_dirtyRegion.m_previousKey,) + weightsKey[1:]:
+			# Only the buffer has moved, update the weights of the moved vertices
+			self.m_stats.addVertices(len(_dirtyRegion.m_indices))
+			_state.m_weights = warp.updateControlPointWeights(_state.m_weights, _dirtyRegion.m_indices, _points[_dirtyRegion.m_indices], controlPointsOriginal, warp.controlPointRadii(controlPointsOriginal, maxRadiusValue))
+			_state.m_weightsKey = weightsKey
+		elif _state.m_weightsKey != weightsKey:
+			savedWeights = WarpNode.loadWeights("warpWeights", weightsKey)
+			if savedWeights is not None:
+				self.m_stats.addCacheHit()
+				_state.m_weights = savedWeights
+				_state.m_weightsKey = weightsKey
+			else:
+				# If the artist cancels, the operator does not move the buffer and calculates its weights again on the next compute
+				_state.m_weightsKey = None
+				_state.m_weights = []
+				with ProgressWindow.ProgressWindow("Calculating the weights of " + _label) as window:
+					_state.m_weights = warp.controlPointWeights(_points, controlPointsOriginal, warp.controlPointRadii(controlPointsOriginal, maxRadiusValue), window.token())
+					_state.m_weightsKey = weightsKey
+				if _state.m_weightsKey != weightsKey:
+					return _pointsKey, numpy.zeros(0, dtype=numpy.int64), numpy.zeros((0, 3), dtype=numpy.float64)
+				WarpNode.saveWeights("warpWeights", weightsKey, _state.m_weights)
+		else:
+			self.m_stats.addCacheHit()
+
+		numControlPoints = min(len(controlPoints), len(controlPointsOriginal))
+		_state.m_indices, _state.m_offsets = warp.affectedDisplacements(_state.m_weights, controlPoints[:numControlPoints] - controlPointsOriginal[:numControlPoints])
+		_state.m_warpKey = warpKey
+		self.m_stats.addVertices(len(_state.m_indices))
+		return warpKey, _state.m_indices, _state.m_offsets
+
+	## Sculpt the buffer, selecting and projecting again only when the buffer or the sculpt inputs change
+	# @param _state The OperatorState of the operator
+	# @param _inputs The InputFingerprints of the operator for this compute
+	# @param _operatorDataHandle The data handle of the operator element
+	# @param _terrainFn The input terrain mesh function set, for its topology
+	# @param _points The (N, 3) vertex buffer
+	# @param _pointsKey The key of the buffer
+	# @param _dirtyRegion The terrain_core.regions.DirtyRegion of the vertices of the buffer moved since the last compute, or None
+	# @param _sculptedMeshes The sculpted mesh function sets and acceleration parameters by fingerprint, shared by the operators
+	# @param _label The name of the operator shown in the progress window
+	# @return The key of the sculpted buffer, and the moved vertices and their displacements
+	def evaluateSculpt(self, _state, _inputs, _operatorDataHandle, _terrainFn, _points, _pointsKey, _dirtyRegion, _sculptedMeshes, _label):
+		curveMaskValue = _operatorDataHandle.child(OperatorChainNodeClass.m_curveMask).asNurbsCurve()
+		sculptedMeshValue = _operatorDataHandle.child(OperatorChainNodeClass.m_sculptedMesh).asMesh()
+		noDisplacement = (_pointsKey, numpy.zeros(0, dtype=numpy.int64), numpy.zeros((0, 3), dtype=numpy.float64))
+		if curveMaskValue.isNull() or sculptedMeshValue.isNull():
+			return noDisplacement
+		sculptStrengthValue = _operatorDataHandle.child(OperatorChainNodeClass.m_sculptStrength).asFloat()
+		curveOffsetValue = _operatorDataHandle.child(OperatorChainNodeClass.m_curveOffset).asFloat()
+		maxProjectionDistanceValue = _operatorDataHandle.child(OperatorChainNodeClass.m_maxProjectionDistance).asFloat()
+
+		curveFn = om.MFnNurbsCurve(curveMaskValue)
+		curveKey = NodeFingerprints.inputFingerprint(_inputs, OperatorChainNodeClass.m_curveMask, NodeFingerprints.curveFingerprint, curveFn)
+		sculptedMeshKey = NodeFingerprints.inputFingerprint(_inputs, OperatorChainNodeClass.m_sculptedMesh, NodeFingerprints.meshFingerprint, om.MFnMesh(sculptedMeshValue))
+		# The buffer has moved away from the input mesh, so the normals and closest face come from the buffer
+		terrain = SculptLayerNode.TerrainQueries(_terrainFn, _points)
+		layer = _state.m_sculptLayer
+		if not SculptLayerNode.evaluateSculptLayer(layer, terrain, _pointsKey, curveFn, curveKey, sculptedMeshValue, sculptedMeshKey, sculptStrengthValue, curveOffsetValue, maxProjectionDistanceValue, _sculptedMeshes, self.m_stats, _label, _dirtyRegion):
+			return noDisplacement
+		return layer.m_projectionKey, layer.m_indices, layer.m_offsets
+
+#----------------------------------------------------------
+# Plugin Initialisation
+#----------------------------------------------------------
+
+## This function tells Maya to use the Python API 2.0
+def maya_useNewAPI():
+	pass
+
+## Create an instance of the node
+def nodeCreator():
+	return OperatorChainNodeClass()
+
+## Initialise the node attributes
+def nodeInitializer():
+	# Create a numeric, typed, enum and compound attribute function set
+	numericAttr = om.MFnNumericAttribute()
+	typedAttr = om.MFnTypedAttribute()
+	enumAttr = om.MFnEnumAttribute()
+	compoundAttr = om.MFnCompoundAttribute()
+
+	# Input node attributes
+	OperatorChainNodeClass.m_terrain = typedAttr.create("terrain", "t", om.MFnData.kMesh)
+	typedAttr.readable = False
+	typedAttr.writable = True
+	typedAttr.storable = True
+	OperatorChainNodeClass.addAttribute(OperatorChainNodeClass.m_terrain)
+
+	# The children of each operator
+	OperatorChainNodeClass.m_operation = enumAttr.create("operation", "op", kWarp)
+	for value, name in enumerate(kOperationNames):
+		enumAttr.addField(name, value)
+	enumAttr.readable = False
+	enumAttr.writable = True
+	enumAttr.storable = True
+
+	# Warp inputs
+	OperatorChainNodeClass.m_controlPoints = numericAttr.create("controlPoints", "cp", om.MFnNumericData.k3Double)
+	numericAttr.readable = False
+	numericAttr.writable = True
+	numericAttr.storable = True
+	numericAttr.array = True
+
+	OperatorChainNodeClass.m_controlPointsOriginal = numericAttr.create("controlPointsOriginal", "cpo", om.MFnNumericData.k3Double)
+	numericAttr.readable = False
+	numericAttr.writable = True
+	numericAttr.storable = True
+	numericAttr.array = True
+
+	OperatorChainNodeClass.m_maxRadius = numericAttr.create("maxRadius", "mr", om.MFnNumericData.kFloat, 10.0)
+	numericAttr.readable = False
+	numericAttr.writable = True
+	numericAttr.storable = True
+
+	# Sculpt inputs
+	OperatorChainNodeClass.m_curveMask = typedAttr.create("curveMask", "cm", om.MFnData.kNurbsCurve)
+	typedAttr.readable = False
+	typedAttr.writable = True
+	typedAttr.storable = True
+
+	OperatorChainNodeClass.m_sculptedMesh = typedAttr.create("sculptedMesh", "sm", om.MFnData.kMesh)
+	typedAttr.readable = False
+	typedAttr.writable = True
+	typedAttr.storable = True
+
+	OperatorChainNodeClass.m_sculptStrength = numericAttr.create("sculptStrength", "ss", om.MFnNumericData.kFloat, 1.0)
+	numericAttr.readable = False
+	numericAttr.writable = True
+	numericAttr.storable = True
+
+	OperatorChainNodeClass.m_curveOffset = numericAttr.create("curveOffset", "co", om.MFnNumericData.kFloat, 1.1)
+	numericAttr.readable = False
+	numericAttr.writable = True
+	numericAttr.storable = True
+
+	OperatorChainNodeClass.m_maxProjectionDistance = numericAttr.create("maxProjectionDistance", "mpd", om.MFnNumericData.kFloat, 1000)
+	numericAttr.readable = False
+	numericAttr.writable = True
+	numericAttr.storable = True
+
+	OperatorChainNodeClass.m_operators = compoundAttr.create("operators", "ops")
+	for child in [OperatorChainNodeClass.m_operation, OperatorChainNodeClass.m_controlPoints, OperatorChainNodeClass.m_controlPointsOriginal, OperatorChainNodeClass.m_maxRadius, OperatorChainNodeClass.m_curveMask, OperatorChainNodeClass.m_sculptedMesh, OperatorChainNodeClass.m_sculptStrength, OperatorChainNodeClass.m_curveOffset, OperatorChainNodeClass.m_maxProjectionDistance]:
+		compoundAttr.addChild(child)
+	compoundAttr.array = True
+	compoundAttr.readable = False
+	compoundAttr.writable = True
+	compoundAttr.storable = True
+	OperatorChainNodeClass.addAttribute(OperatorChainNodeClass.m_operators)
+
+	# Output node attribute
+	OperatorChainNodeClass.m_outMesh = typedAttr.create("outMesh", "m", om.MFnData.kMesh)
+	typedAttr.readable = True
+	typedAttr.writable = False
+	typedAttr.storable = False
+	OperatorChainNodeClass.addAttribute(OperatorChainNodeClass.m_outMesh)
+
+	# Read only compute statistics
+	NodeStats.addStatsAttributes(OperatorChainNodeClass)
+
+	# Connect input/output dependencies
+	OperatorChainNodeClass.attributeAffects(OperatorChainNodeClass.m_terrain, OperatorChainNodeClass.m_outMesh)
+	OperatorChainNodeClass.attributeAffects(OperatorChainNodeClass.m_operators, OperatorChainNodeClass.m_outMesh)
+	for child in [OperatorChainNodeClass.m_operation, OperatorChainNodeClass.m_controlPoints, OperatorChainNodeClass.m_controlPointsOriginal, OperatorChainNodeClass.m_maxRadius, OperatorChainNodeClass.m_curveMask, OperatorChainNodeClass.m_sculptedMesh, OperatorChainNodeClass.m_sculptStrength, OperatorChainNodeClass.m_curveOffset, OperatorChainNodeClass.m_maxProjectionDistance]:
+		OperatorChainNodeClass.attributeAffects(child, OperatorChainNodeClass.m_outMesh)
+
+## Initialise the plugin when Maya loads it
+def initializePlugin(mobject):
+	mplugin = om.MFnPlugin(mobject)
+	try:
+		mplugin.registerNode(kPluginNodeName, kPluginNodeID, nodeCreator, nodeInitializer)
+	except:
+		sys.stderr.write("Failed to register node: " + kPluginNodeName)
+		raise
+
+## Uninitialise the plugin when Maya unloads it
+def uninitializePlugin(mobject):
+	mplugin = om.MFnPlugin(mobject)
+	try:
+		mplugin.deregisterNode(kPluginNodeID)
+	except:
+		sys.stderr.write("Failed to unregister node: " + kPluginNodeName)
+		raise
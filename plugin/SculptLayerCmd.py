@@ -10,8 +10,8 @@ import maya.cmds as mc
 #----------------------------------------------------------
 
 # Flag names
-shortFlagNames = ["-n", "-ss", "-co", "-mpd", "-rb"]
-longFlagNames = ["-name", "-sculptStrength", "-curveOffset", "-maxProjection", "-rebuildCurve"]
+shortFlagNames = ["-n", "-ss", "-co", "-mpd", "-rb", "-st"]
+longFlagNames = ["-name", "-sculptStrength", "-curveOffset", "-maxProjection", "-rebuildCurve", "-stack"]
 
 # The name of the command
 kPluginCmdName = "createSculptLayer"
@@ -36,6 +36,7 @@ class SculptLayerCmdClass(om.MPxCommand):
 		self.curveOffset = 1.1
 		self.maxProjection = 1000
 		self.rebuild = False
+		self.stack = None
 		self.parseArguments(args)
 		# Check if the arguments were parsed correctly
 		if self.rebuild == True:
@@ -44,6 +45,9 @@ class SculptLayerCmdClass(om.MPxCommand):
 
 	## redoIt function, all the computation occurs here
 	def redoIt(self):
+		if self.stack is not None:
+			self.addStackLayer()
+			return
 		# Create a dg and dag modifier
 		dgModifier = om.MDGModifier()
 		dagModifier = om.MDagModifier()
@@ -62,8 +66,42 @@ class SculptLayerCmdClass(om.MPxCommand):
 		mc.connectAttr(self.sculptedMesh + ".worldMesh[0]", nodeName + ".sculptedMesh")
 		mc.connectAttr(self.terrain + ".worldMesh[0]", nodeName + ".terrain")
 
+	## Add the layer to a sculpt stack node, creating the stack for the terrain if it does not exist
+	# An existing stack has to sculpt the same terrain
+	# Every layer of a stack is evaluated on one copy of the terrain, rather than one copy per sculpt layer node
+	def addStackLayer(self):
+		self.stackCreated = not mc.objExists(self.stack)
+		# A layer of an existing stack would sculpt the stack's terrain rather than the one given, so the command fails before changing anything
+		if not self.stackCreated and not mc.isConnected(self.terrain + ".worldMesh[0]", self.stack + ".terrain"):
+			raise RuntimeError("Error. The stack " + self.stack + " does not sculpt " + self.terrain + ".")
+		if self.stackCreated:
+			dgModifier = om.MDGModifier()
+			self.sculptStackNode = dgModifier.createNode("SculptStackNode")
+			dgModifier.renameNode(self.sculptStackNode, self.stack)
+			dgModifier.doIt()
+			self.stack = om.MFnDependencyNode(self.sculptStackNode).name()
+			mc.connectAttr(self.terrain + ".worldMesh[0]", self.stack + ".terrain")
+		# Use the next free layer
+		layerIndices = mc.getAttr(self.stack + ".layers", multiIndices=True) or []
+		self.layerIndex = max(layerIndices) + 1 if len(layerIndices) > 0 else 0
+		layer = self.stack + ".layers[" + str(self.layerIndex) + "]"
+		# Set the parameters
+		mc.setAttr(layer + ".sculptStrength", self.sculptStrength)
+		mc.setAttr(layer + ".curveOffset", self.curveOffset)
+		mc.setAttr(layer + ".maxProjectionDistance", self.maxProjection)
+		# Connect the attributes
+		mc.connectAttr(self.curveMask + ".worldSpace[0]", layer + ".curveMask")
+		mc.connectAttr(self.sculptedMesh + ".worldMesh[0]", layer + ".sculptedMesh")
+
 	## Delete all the created nodes
 	def undoIt(self):
+		if self.stack is not None:
+			mc.removeMultiInstance(self.stack + ".layers[" + str(self.layerIndex) + "]", b=True)
+			if self.stackCreated:
+				dgModifier = om.MDGModifier()
+				dgModifier.deleteNode(self.sculptStackNode)
+				dgModifier.doIt()
+			return
 		dgModifier = om.MDGModifier()
 		dgModifier.deleteNode(self.sculptLayerNode)
 		dgModifier.doIt()
@@ -97,6 +135,10 @@ class SculptLayerCmdClass(om.MPxCommand):
 			self.rebuild = argData.flagArgumentBool("-rb", 0)
 		if argData.isFlagSet("-rebuildCurve"):
 			self.rebuild = argData.flagArgumentBool("-rebuildCurve", 0)
+		if argData.isFlagSet("-st"):
+			self.stack = argData.flagArgumentString("-st", 0)
+		if argData.isFlagSet("-stack"):
+			self.stack = argData.flagArgumentString("-stack", 0)
 
 ## Tell Maya to use Python API 2.0
 def maya_useNewAPI():
@@ -117,6 +159,7 @@ def syntaxCreator():
 	syntax.addFlag(shortFlagNames[2], longFlagNames[2], om.MSyntax.kDouble)
 	syntax.addFlag(shortFlagNames[3], longFlagNames[3], om.MSyntax.kDouble)
 	syntax.addFlag(shortFlagNames[4], longFlagNames[4], om.MSyntax.kBoolean)
+	syntax.addFlag(shortFlagNames[5], longFlagNames[5], om.MSyntax.kString)
 	return syntax
 
 ## Initialise the plugin when Maya loads it
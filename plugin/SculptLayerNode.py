@@ -2,7 +2,11 @@
 # This node creats a sculpt layer
 
 import sys
+import numpy
 import maya.api.OpenMaya as om
+import TerrainRasterData
+from terrain_nodes import BackgroundNode, FrameCacheNode, NodeBuffers, NodeDiskCache, NodeFalloff, NodeFingerprints, NodeStats, ProgressWindow
+from terrain_core import TerrainRaster, background, falloff, fingerprints, framecache, masks, progress, regions, sculpt, stats
 
 #----------------------------------------------------------
 # Plugin
@@ -12,6 +16,341 @@ import maya.api.OpenMaya as om
 kPluginNodeName = "SculptLayerNode"
 kPluginNodeID = om.MTypeId(0x1005)
 
+# The number of points per CV when a curve is sampled as a polyline for the background worker
+kPolylineSamplesPerCV = 8
+# The number of closest point queries between checks for cancellation
+kClosestPointsChunk = 1024
+
+# The ways the curve masks the terrain, the values of the maskMode attribute
+# Curve tests each vertex against the curve, Texture samples the weight textures of the curve and the extra curves (terrain_core.masks)
+kCurveMask = 0
+kTextureMask = 1
+kMaskModeNames = ["Curve", "Texture"]
+
+# The SculptStackNode and OperatorChainNode use these curve queries and layer evaluation for each of their layers
+
+## Find the centre of a curve
+# @param _curveFn The curve function set
+# @return The centre of the curve as a MPoint
+def findCurveCentre(_curveFn):
+	numPoints = _curveFn.numCVs * 2
+	curveSamples = [_curveFn.getPointAtParam(float(i) / numPoints, om.MSpace.kWorld) for i in range(numPoints)]
+	centre = sculpt.curveCentre(numpy.array(curveSamples, dtype=numpy.float64))
+	return om.MPoint(centre[0], centre[1], centre[2])
+
+## Find the closest points on a curve
+# @param _curveFn The curve function set
+# @param _points An (N, 3) array of points
+# @param _progress A ProgressToken checked every kClosestPointsChunk points, or None
+# @return An (N, 3) array of the closest points on the curve
+def closestPointsOnCurve(_curveFn, _points, _progress=None):
+	closestPoints = numpy.empty((len(_points), 3), dtype=numpy.float64)
+	for i in range(len(_points)):
+		if i % kClosestPointsChunk == 0:
+			progress.check(_progress, i, len(_points))
+		point = _curveFn.closestPoint(om.MPoint(float(_points[i][0]), float(_points[i][1]), float(_points[i][2])), space=om.MSpace.kWorld)[0]
+		closestPoints[i] = (point.x, point.y, point.z)
+	return closestPoints
+
+## Find all the faces inside the curve
+# @param _topology The MeshTopology of the terrain
+# @param _points An (N, 3) array of the terrain vertices
+# @param _startIndex The face to start the flood fill from
+# @param _curveFn The curve function set
+# @param _curveCentre The centre of the curve
+# @param _curveOffset Offset the curve so it is still visible
+# @param _progress A ProgressToken checked after each ring of faces, or None
+# @return A list of the indices of every face inside the curve connected to the starting face
+def findFacesInsideCurve(_topology, _points, _startIndex, _curveFn, _curveCentre, _curveOffset, _progress=None):
+	## Test a ring of faces using their centres
+	def facesInside(_faces):
+		faceCentres = _topology.faceCentres(_points, _faces)
+		return sculpt.insideCurve(_curveCentre, faceCentres, closestPointsOnCurve(_curveFn, faceCentres), _curveOffset)
+
+	# Flood fill from the starting face
+	return sculpt.floodFill(_startIndex, _topology.faceNeighbours, facesInside, _progress, _topology.numFaces())
+
+## Find all the vertices inside the curve
+# @param _topology The MeshTopology of the terrain
+# @param _points An (N, 3) array of the terrain vertices
+# @param _startIndex The face to start the flood fill from
+# @param _curveFn The curve function set
+# @param _curveCentre The centre of the curve
+# @param _curveOffset Offset the curve so it is still visible
+# @param _progress A ProgressToken checked after each ring of faces, or None
+# @return A list of the indices of the vertices of every face inside the curve
+def findVerticesInsideCurve(_topology, _points, _startIndex, _curveFn, _curveCentre, _curveOffset, _progress=None):
+	facesInsideCurve = findFacesInsideCurve(_topology, _points, _startIndex, _curveFn, _curveCentre, _curveOffset, _progress)
+	return _topology.facesVertices(facesInsideCurve).tolist()
+
+## The cached selection and displacements of a sculpt layer, for a layer of a stack or chain, or a node in a chain of vertex buffers
+class SculptLayerState(object):
+
+	## Constructor
+	def __init__(self):
+		self.m_fingerprints = fingerprints.InputFingerprints()
+		# The vertices inside the curve, for the terrain, curve and offset in m_selectionKey
+		self.m_selectionKey = None
+		self.m_affectedVertices = []
+		# The faces inside the curve, the face they were flood filled from and the squared distance of its centre from the curve centre
+		# These are not known for a selection loaded from the disk cache, which is selected again rather than updated for a dirty region
+		self.m_selectedFaces = None
+		self.m_startFace = None
+		self.m_startDistance = None
+		# The moved vertices and their displacements, for the selection and sculpt parameters in m_projectionKey
+		self.m_projectionKey = None
+		self.m_indices = numpy.zeros(0, dtype=numpy.int64)
+		self.m_offsets = numpy.zeros((0, 3), dtype=numpy.float64)
+
+## The terrain data shared by the layers evaluated in one compute
+# Each part is only read from the mesh when the first layer needs it, so a compute where no layer changed does not read them
+# The OperatorChainNode and the nodes in a chain of vertex buffers pass buffer positions, which have moved away from the mesh, so the normals and closest faces are found from the buffer
+class TerrainQueries(object):
+
+	## Constructor
+	# @param _meshFn The terrain mesh function set
+	# @param _points An (N, 3) array of positions to use instead of the mesh positions, or None
+	# @param _buffer A terrain_core.buffers.VertexBuffer to use instead of the mesh positions, or None. It is only gathered into one array when every vertex is needed
+	def __init__(self, _meshFn, _points=None, _buffer=None):
+		self.m_meshFn = _meshFn
+		self.m_points = _points
+		self.m_buffer = _buffer
+		self.m_fromMesh = _points is None and _buffer is None
+		self.m_normals = None
+		self.m_topology = None
+
+	## Get the vertex positions
+	# @return An (N, 3) array of positions
+	def points(self):
+		if self.m_points is None and self.m_buffer is not None:
+			self.m_points = self.m_buffer.points()
+		elif self.m_points is None:
+			self.m_points = TerrainRasterData.pointsAsArray(self.m_meshFn)
+		return self.m_points
+
+	## Get the positions of some vertices, without gathering a buffer into one array
+	# @param _indices An array of vertex indices
+	# @return An (M, 3) array of positions
+	def take(self, _indices):
+		if self.m_points is None and self.m_buffer is not None:
+			return self.m_buffer.take(_indices)
+		return self.points()[numpy.asarray(_indices, dtype=numpy.int64)]
+
+	## Get the vertex normals in world space, angle weighted by Maya for the mesh or area weighted for a buffer
+	# @return An (N, 3) array of normals
+	def normals(self):
+		if self.m_normals is None and self.m_fromMesh:
+			self.m_normals = numpy.array(self.m_meshFn.getVertexNormals(True, om.MSpace.kWorld), dtype=numpy.float64).reshape(-1, 3)
+		elif self.m_normals is None:
+			self.m_normals = self.topology().vertexNormals(self.points())
+		return self.m_normals
+
+	## Get the normals of some vertices, a buffer only reads the faces around them
+	# @param _indices An array of vertex indices
+	# @return An (M, 3) array of normals
+	def normalsOf(self, _indices):
+		indices = numpy.asarray(_indices, dtype=numpy.int64)
+		if self.m_fromMesh or self.m_normals is not None:
+			return self.normals()[indices]
+		return self.topology().vertexNormalsOf(self.take, indices)
+
+	## Calculate the centres of some faces
+	# @param _faces An array of face indices
+	# @return An (M, 3) array of the face centres
+	def faceCentres(self, _faces):
+		if self.m_points is not None or self.m_buffer is None:
+			return self.topology().faceCentres(self.points(), _faces)
+		corners, counts = self.topology().faceCorners(_faces)
+		if len(counts) == 0:
+			return numpy.zeros((0, 3), dtype=numpy.float64)
+		sums = numpy.add.reduceat(self.take(self.topology().m_faceVertices[corners]), numpy.cumsum(counts) - counts, axis=0)
+		return sums / counts[:, numpy.newaxis]
+
+	## Find the face closest to a point
+	# @param _point The point as a MPoint
+	# @return The face index
+	def closestFace(self, _point):
+		if self.m_fromMesh:
+			return self.m_meshFn.getClosestPoint(_point, om.MSpace.kWorld)[1]
+		# The face with the nearest centre, the mesh does not have the positions of the buffer
+		offsets = self.topology().faceCentres(self.points()) - numpy.array([_point.x, _point.y, _point.z])
+		return int((offsets * offsets).sum(axis=1).argmin())
+
+	## Get the adjacency of the terrain from the shared topology cache
+	# @return The terrain_core.topology.MeshTopology
+	def topology(self):
+		if self.m_topology is None:
+			self.m_topology = TerrainRasterData.meshTopology(self.m_meshFn)
+		return self.m_topology
+
+## Calculate the disk cache key of a selection from the terrain, the curve and the offset
+# The selection key holds fingerprints that can collide, so the saved selections are found by a digest of the inputs themselves
+# @param _points An (N, 3) array of the terrain vertices
+# @param _topology The terrain_core.topology.MeshTopology of the terrain
+# @param _curveFn The curve mask function set
+# @param _curveOffset Offset the curve so it is still visible
+# @return The key
+def selectionDiskKey(_points, _topology, _curveFn, _curveOffset):
+	terrainDigest = fingerprints.digest(numpy.asarray(_points, dtype=numpy.float64)[:, :3], _topology.m_faceOffsets, numpy.asarray(_topology.m_faceVertices, dtype=numpy.int64))
+	return (terrainDigest, NodeFingerprints.curveDigest(_curveFn), _curveOffset)
+
+## Project vertices along their normals onto a sculpted mesh, scaled by their soft selection values and the strength
+# @param _indices An array of vertex indices
+# @param _points An (M, 3) array of the positions of the vertices
+# @param _normals An (M, 3) array of the normals of the vertices
+# @param _curveFn The curve mask function set
+# @param _curveCentre The centre of the curve as a MPoint
+# @param _sculptedMeshFn The sculpted mesh function set
+# @param _accelerationParams The acceleration parameters of the sculpted mesh
+# @param _sculptStrength The sculpt strength
+# @param _maxProjectionDistance The furthest a vertex is projected
+# @param _falloff The terrain_core.falloff.FalloffTable of the soft selection, or None for the sculpt kernel
+# @param _softSelect An (M,) array of the soft selection values of the vertices, e.g. sampled from a mask texture, or None to calculate them from the curve
+# @return An array of the vertices that hit the sculpted mesh and an (K, 3) array of their displacements
+def projectVertices(_indices, _points, _normals, _curveFn, _curveCentre, _sculptedMeshFn, _accelerationParams, _sculptStrength, _maxProjectionDistance, _falloff=None, _softSelect=None):
+	hitSlots = []
+	hitPoints = []
+	for slot in range(len(_indices)):
+		raySource = om.MFloatPoint(float(_points[slot][0]), float(_points[slot][1]), float(_points[slot][2]))
+		rayDirection = om.MFloatVector(float(_normals[slot][0]), float(_normals[slot][1]), float(_normals[slot][2]))
+		intersection = _sculptedMeshFn.closestIntersection(raySource, rayDirection, om.MSpace.kWorld, _maxProjectionDistance, True, accelParams=_accelerationParams)
+		# A hit face of -1 means there was no intersection
+		if intersection[2] >= 0:
+			hitSlots.append(slot)
+			hitPoints.append((intersection[0].x, intersection[0].y, intersection[0].z))
+	if len(hitSlots) == 0:
+		return numpy.zeros(0, dtype=numpy.int64), numpy.zeros((0, 3), dtype=numpy.float64)
+
+	# Scale the displacements by the soft selection values and the strength
+	hitSlots = numpy.array(hitSlots, dtype=numpy.int64)
+	sourcePoints = numpy.asarray(_points, dtype=numpy.float64)[hitSlots]
+	if _softSelect is None:
+		softSelect = sculpt.softSelectValues(_curveCentre, sourcePoints, closestPointsOnCurve(_curveFn, sourcePoints), _falloff) * _sculptStrength
+	else:
+		softSelect = numpy.asarray(_softSelect, dtype=numpy.float64)[hitSlots] * _sculptStrength
+	return numpy.asarray(_indices, dtype=numpy.int64)[hitSlots], (numpy.array(hitPoints, dtype=numpy.float64) - sourcePoints) * softSelect[:, numpy.newaxis]
+
+## Update a sculpt layer for a dirty region of the terrain, rather than selecting and projecting every vertex again
+# The selection is kept if no face around the moved vertices has moved into or out of the curve and the flood fill would start from the same face
+# Only the selected vertices whose position or normal has changed are projected again
+# @param _state The SculptLayerState of the layer, evaluated for the terrain before it changed
+# @param _terrain The TerrainQueries of the changed terrain
+# @param _dirtyRegion The terrain_core.regions.DirtyRegion of the change
+# @param _curveFn The curve mask function set
+# @param _curveCentre The centre of the curve as a MPoint
+# @param _curveOffset Offset the curve so it is still visible
+# @param _project A function projecting an array of vertices, returning the hit vertices and their displacements
+# @return Whether the layer was updated, False if it has to be selected again
+def updateSculptLayer(_state, _terrain, _dirtyRegion, _curveFn, _curveCentre, _curveOffset, _project):
+	if _dirtyRegion.isEmpty():
+		return True
+	topology = _terrain.topology()
+	movedFaces = topology.verticesFaces(_dirtyRegion.m_indices)
+	if numpy.any(movedFaces == _state.m_startFace):
+		return False
+	faceCentres = _terrain.faceCentres(movedFaces)
+	curveCentre = numpy.array([_curveCentre.x, _curveCentre.y, _curveCentre.z])
+	if _terrain.m_fromMesh:
+		if _terrain.closestFace(_curveCentre) != _state.m_startFace:
+			return False
+	elif len(movedFaces) > 0 and ((faceCentres - curveCentre) ** 2).sum(axis=1).min() < _state.m_startDistance:
+		return False
+	inside = sculpt.insideCurve(curveCentre, faceCentres, closestPointsOnCurve(_curveFn, faceCentres), _curveOffset)
+	if numpy.any(inside != regions.contains(_state.m_selectedFaces, movedFaces)):
+		return False
+
+	# The normals of the vertices of the moved faces have changed as well as the moved vertices
+	changedVertices = topology.facesVertices(movedFaces)
+	changedVertices = changedVertices[regions.contains(numpy.asarray(_state.m_affectedVertices, dtype=numpy.int64), changedVertices)]
+	hitVertices, hitOffsets = _project(changedVertices)
+	kept = ~regions.contains(changedVertices, _state.m_indices)
+	_state.m_indices = numpy.concatenate((_state.m_indices[kept], hitVertices))
+	_state.m_offsets = numpy.concatenate((_state.m_offsets[kept], hitOffsets))
+	return True
+
+## Select and project a sculpt layer if its inputs have changed
+# The SculptStackNode, the sculpt operators of the OperatorChainNode and the SculptLayerNode in a chain of vertex buffers evaluate their layers with this
+# @param _state The SculptLayerState of the layer
+# @param _terrain The TerrainQueries of the terrain being sculpted
+# @param _terrainKey The fingerprint of the terrain
+# @param _curveFn The curve mask function set
+# @param _curveKey The fingerprint of the curve mask
+# @param _sculptedMeshValue The sculpted mesh data
+# @param _sculptedMeshKey The fingerprint of the sculpted mesh
+# @param _sculptStrength The sculpt strength
+# @param _curveOffset Offset the curve so it is still visible
+# @param _maxProjectionDistance The furthest a vertex is projected
+# @param _sculptedMeshes The sculpted mesh function sets and acceleration parameters by fingerprint, the caller frees the accelerators
+# @param _stats The ComputeStats of the node
+# @param _label The name of the layer shown in the progress window
+# @param _dirtyRegion The terrain_core.regions.DirtyRegion of the vertices moved since the last evaluation, or None if it is not known
+# @param _falloff The terrain_core.falloff.FalloffTable of the soft selection, or None for the sculpt kernel
+# @return Whether the layer has displacements, False if the selection was cancelled
+def evaluateSculptLayer(_state, _terrain, _terrainKey, _curveFn, _curveKey, _sculptedMeshValue, _sculptedMeshKey, _sculptStrength, _curveOffset, _maxProjectionDistance, _sculptedMeshes, _stats, _label, _dirtyRegion=None, _falloff=None):
+	falloffTable = falloff.kernelTable(falloff.kSculpt) if _falloff is None else _falloff
+	# The selection depends on the terrain, the curve and the offset, the same key as a SculptLayerNode so they share the disk cache
+	selectionKey = (_terrainKey, _curveKey, _curveOffset)
+	projectionKey = (selectionKey, _sculptedMeshKey, _sculptStrength, _maxProjectionDistance, falloffTable.key())
+	if _state.m_projectionKey == projectionKey:
+		_stats.addCacheHit()
+		return True
+
+	curveCentre = findCurveCentre(_curveFn)
+
+	## Project vertices of the terrain, building the accelerator once for the layers sharing a sculpted mesh
+	def project(_indices):
+		if _sculptedMeshKey not in _sculptedMeshes:
+			sculptedMeshFn = om.MFnMesh(_sculptedMeshValue)
+			_sculptedMeshes[_sculptedMeshKey] = (sculptedMeshFn, sculptedMeshFn.autoUniformGridParams())
+		sculptedMeshFn, accelerationParams = _sculptedMeshes[_sculptedMeshKey]
+		_stats.addVertices(len(_indices))
+		_stats.addRays(len(_indices))
+		return projectVertices(_indices, _terrain.take(_indices), _terrain.normalsOf(_indices), _curveFn, curveCentre, sculptedMeshFn, accelerationParams, _sculptStrength, _maxProjectionDistance, falloffTable)
+
+	# If only the terrain has moved, update the layer around the moved vertices
+	if _dirtyRegion is not None and _state.m_selectedFaces is not None:
+		previousProjectionKey = ((_dirtyRegion.m_previousKey, _curveKey, _curveOffset), _sculptedMeshKey, _sculptStrength, _maxProjectionDistance, falloffTable.key())
+		if _state.m_projectionKey == previousProjectionKey:
+			_state.m_projectionKey = None
+			if updateSculptLayer(_state, _terrain, _dirtyRegion, _curveFn, curveCentre, _curveOffset, project):
+				_state.m_selectionKey = selectionKey
+				_state.m_projectionKey = projectionKey
+				return True
+
+	_state.m_projectionKey = None
+	if _state.m_selectionKey != selectionKey:
+		diskKey = selectionDiskKey(_terrain.points(), _terrain.topology(), _curveFn, _curveOffset)
+		savedSelection = NodeDiskCache.load("sculptSelection", diskKey)
+		if savedSelection is not None:
+			_stats.addCacheHit()
+			_state.m_affectedVertices = savedSelection["affected"].tolist()
+			_state.m_selectedFaces = None
+			_state.m_selectionKey = selectionKey
+		else:
+			# Find the closest face on the terrain
+			centreFaceIndex = _terrain.closestFace(curveCentre)
+			# If the artist cancels, the layer does not move the terrain and is selected again on the next compute
+			_state.m_selectionKey = None
+			_state.m_affectedVertices = []
+			_state.m_selectedFaces = None
+			with ProgressWindow.ProgressWindow("Selecting the sculpt region of " + _label) as window:
+				facesInsideCurve = findFacesInsideCurve(_terrain.topology(), _terrain.points(), centreFaceIndex, _curveFn, curveCentre, _curveOffset, window.token())
+				_state.m_selectionKey = selectionKey
+			if _state.m_selectionKey != selectionKey:
+				return False
+			_state.m_affectedVertices = _terrain.topology().facesVertices(facesInsideCurve).tolist()
+			_state.m_selectedFaces = numpy.unique(numpy.array(facesInsideCurve, dtype=numpy.int64))
+			_state.m_startFace = centreFaceIndex
+			_state.m_startDistance = ((_terrain.faceCentres([centreFaceIndex])[0] - numpy.array([curveCentre.x, curveCentre.y, curveCentre.z])) ** 2).sum()
+			NodeDiskCache.save("sculptSelection", diskKey, {"affected": numpy.array(_state.m_affectedVertices, dtype=numpy.int64)})
+	else:
+		_stats.addCacheHit()
+
+	# Project the affected vertices along the terrain normals onto the sculpted mesh
+	_state.m_indices, _state.m_offsets = project(numpy.array(_state.m_affectedVertices, dtype=numpy.int64))
+	_state.m_projectionKey = projectionKey
+	return True
+
 ## This class is used to compute the sculpt layer
 class SculptNodeClass(om.MPxNode):
 	# Define the attributes
@@ -19,28 +358,97 @@ class SculptNodeClass(om.MPxNode):
 	m_terrain = om.MObject()
 	m_curveMask = om.MObject()
 	m_sculptedMesh = om.MObject()
+	m_inRaster = om.MObject()
 	# Parameters
 	m_sculptStrength = om.MObject()
 	m_curveOffset = om.MObject()
 	m_maxProjectionDistance = om.MObject()
+	m_asyncCompute = om.MObject()
+	# Mask textures
+	m_maskMode = om.MObject()
+	m_extraCurveMasks = om.MObject()
+	m_maskOperation = om.MObject()
+	m_maskResolution = om.MObject()
 	# Output
 	m_outMesh = om.MObject()
+	m_outRaster = om.MObject()
+	# The vertex buffer attributes are added by NodeBuffers
+	m_inBuffer = om.MObject()
+	m_outBuffer = om.MObject()
+	# The falloff attributes are added by NodeFalloff
+	m_falloff = om.MObject()
+	m_falloffRamp = om.MObject()
 
 	## Constructor
 	def __init__(self):
 		om.MPxNode.__init__(self)
-		self.m_curveOriginalPoints = None
+		self.m_fingerprints = fingerprints.InputFingerprints()
+		self.m_selectionKey = None
 		self.m_affectedVertices = []
-		self.m_lastCurveOffset = 0.0
-		self.m_lastNumVertices = 0
-		self.m_lastCurveCentreClosestVertex = 0
+		self.m_rasterKey = None
+		self.m_rasterIndices = []
+		self.m_rasterSoftSelect = []
+		# The signed distances of the curve masks, kept while the curves and the terrain bounds do not change
+		self.m_maskCache = masks.MaskCache()
+		self.m_stats = stats.ComputeStats(kPluginNodeName)
+		# The background workers are created on the first asynchronous compute
+		self.m_meshBackground = None
+		self.m_rasterBackground = None
+		self.m_lastOutMesh = None
+		self.m_lastOutRaster = None
+		# The frames computed synchronously, replayed when the timeline is scrubbed
+		self.m_meshFrames = framecache.FrameCache()
+		self.m_rasterFrames = framecache.FrameCache()
+		# The buffer of the terrain at the start of a chain, the layer sculpting the input buffer, and the sculpted buffer for the inputs in m_outBufferKey
+		self.m_terrainBufferKey = None
+		self.m_terrainBuffer = None
+		self.m_bufferLayer = SculptLayerState()
+		# The input buffer the layer was last evaluated for, compared with the next input buffer to find the moved vertices
+		self.m_sculptedBuffer = None
+		self.m_outBufferKey = None
+		self.m_outBuffer = None
 
 	## The function that is called when the node is dirty
+	# The compute is only wrapped in a profiler when a capture has been requested for this node or every node
 	# @param _plug A plug for one of the i/o attributes
 	# @param _dataBlock The data used for the computations
 	def compute(self, _plug, _dataBlock):
-		# Check if the plug is the output
-		if (_plug == SculptNodeClass.m_outMesh):
+		NodeStats.compute(self, _plug, _dataBlock)
+
+	## Record which input has been dirtied, so the next compute only fingerprints that input
+	# @param _plug The plug being dirtied
+	# @param _plugArray The plugs affected by it
+	def setDependentsDirty(self, _plug, _plugArray):
+		NodeFingerprints.setDependentsDirty(self, _plug)
+
+	## Record the dirtied inputs before the evaluation manager computes the node
+	# @param _context The context of the evaluation
+	# @param _evaluationNode The evaluation node, which knows the dirty plugs
+	def preEvaluation(self, _context, _evaluationNode):
+		NodeFingerprints.preEvaluation(self, _evaluationNode, [SculptNodeClass.m_terrain, SculptNodeClass.m_curveMask, SculptNodeClass.m_sculptedMesh, SculptNodeClass.m_inRaster])
+
+	## Compute one of the outputs
+	# @param _plug A plug for one of the i/o attributes
+	# @param _dataBlock The data used for the computations
+	def computePlug(self, _plug, _dataBlock):
+		# Check if the plug is the output buffer, or the output mesh of a node in a chain of buffers
+		if (_plug == SculptNodeClass.m_outBuffer or (_plug == SculptNodeClass.m_outMesh and NodeBuffers.hasInputBuffer(self, _dataBlock))):
+			self.m_stats.begin()
+			outBuffer = self.sculptBuffer(_dataBlock)
+			if (_plug == SculptNodeClass.m_outBuffer):
+				outBufferDataHandle = _dataBlock.outputValue(SculptNodeClass.m_outBuffer)
+				TerrainRasterData.setBufferDataHandle(outBufferDataHandle, outBuffer)
+				outBufferDataHandle.setClean()
+			else:
+				# Only the end of a chain needs a mesh, it is made from the terrain at the start of the chain
+				outMeshDataHandle = _dataBlock.outputValue(SculptNodeClass.m_outMesh)
+				outMeshDataHandle.setMObject(NodeBuffers.meshFromBuffer(kPluginNodeName, _dataBlock.inputValue(SculptNodeClass.m_terrain).asMesh(), outBuffer))
+				outMeshDataHandle.setClean()
+			NodeStats.endCompute(self, _plug, _dataBlock)
+
+		# Check if the plug is the output mesh
+		elif (_plug == SculptNodeClass.m_outMesh):
+			self.m_stats.begin()
 
 			# Get data handles and typecast
 			terrainDataHandle = _dataBlock.inputValue(SculptNodeClass.m_terrain)
@@ -61,6 +469,8 @@ class SculptNodeClass(om.MPxNode):
 			maxProjectionDistanceDataHandle = _dataBlock.inputValue(SculptNodeClass.m_maxProjectionDistance)
 			maxProjectionDistanceValue = maxProjectionDistanceDataHandle.asFloat()
 
+			asyncDataHandle = _dataBlock.inputValue(SculptNodeClass.m_asyncCompute)
+
 			outMeshDataHandle = _dataBlock.outputValue(SculptNodeClass.m_outMesh)
 
 			# Computation
@@ -76,160 +486,442 @@ class SculptNodeClass(om.MPxNode):
 
 			# Create a function set for the curve and find the centre
 			curveFn = om.MFnNurbsCurve(curveMaskValue)
-			curveCentre = self.findCurveCentre(curveFn)
-
-			# If this is the first computation, store the curve positions as the original and compute the affectedVertices
-			if self.m_curveOriginalPoints == None:
-				self.m_curveOriginalPoints = curveFn.cvPositions(om.MSpace.kWorld)
-				# Create a polygon iterator
-				polygonIterator = om.MItMeshPolygon(terrainValue)
-				# Find the closest face on the terrain
-				centreFaceIndex = inTerrainFn.getClosestPoint(curveCentre, om.MSpace.kWorld)[1]
-				# Calculate the affected vertices
-				self.findVerticesInsideCurve(polygonIterator, centreFaceIndex, curveFn, curveCentre, curveOffsetValue)
-				# Store values
-				self.m_lastCurveOffset = curveOffsetValue
-				self.m_lastNumVertices = inTerrainFn.numVertices
-				self.m_lastCurveCentreClosestVertex = centreFaceIndex
-			# Check if the input terrain, curve offset or the curve has changed
+			curveCentre = findCurveCentre(curveFn)
+			falloffTable = NodeFalloff.falloffTable(self, _dataBlock)
+
+			# The mask textures are quick to sample, so they are used synchronously even for an asynchronous compute
+			textureMask = _dataBlock.inputValue(SculptNodeClass.m_maskMode).asShort() == kTextureMask
+			if textureMask:
+				terrainPoints = TerrainRasterData.pointsAsArray(inTerrainFn)
+				texture, textureKey = self.maskTexture(_dataBlock, curveFn, regions.xzBounds(terrainPoints), curveOffsetValue, falloffTable)
+
+			frameKey = None
+			if not asyncDataHandle.asBool():
+				# Only the inputs dirtied since the last compute are fingerprinted again
+				inputs = NodeFingerprints.computeFingerprints(self, _dataBlock)
+				terrainKey = NodeFingerprints.inputFingerprint(inputs, SculptNodeClass.m_terrain, NodeFingerprints.meshFingerprint, inTerrainFn)
+				curveKey = NodeFingerprints.inputFingerprint(inputs, SculptNodeClass.m_curveMask, NodeFingerprints.curveFingerprint, curveFn)
+				sculptedMeshKey = NodeFingerprints.inputFingerprint(inputs, SculptNodeClass.m_sculptedMesh, NodeFingerprints.meshFingerprint, om.MFnMesh(sculptedMeshValue))
+				# The selection depends on the terrain, the curve and the offset, or on the terrain and the mask texture
+				selectionKey = (terrainKey, textureKey) if textureMask else (terrainKey, curveKey, curveOffsetValue)
+
+				# Replay the frame if it has been computed with the same inputs
+				FrameCacheNode.updateBudget(self, self.m_meshFrames, _dataBlock)
+				frameTime = FrameCacheNode.evaluationTime(_dataBlock)
+				frameKey = (selectionKey, sculptedMeshKey, sculptStrengthValue, maxProjectionDistanceValue, falloffTable.key())
+				frame = self.m_meshFrames.get(frameTime, frameKey)
+				if frame is not None:
+					self.m_stats.addCacheHit()
+					TerrainRasterData.setPointsFromArray(outTerrainFn, framecache.applyDelta(TerrainRasterData.pointsAsArray(inTerrainFn), frame))
+					TerrainRasterData.unlockMovedNormals(outTerrainFn, frame[0])
+					outMeshDataHandle.setMObject(outTerrain)
+					self.m_lastOutMesh = outTerrain
+					outMeshDataHandle.setClean()
+					NodeStats.endCompute(self, _plug, _dataBlock)
+					return
+
+			if textureMask:
+				# Sample the mask texture at every vertex rather than testing them against the curves
+				affectedIndices, affectedSoftSelect = masks.selectPoints(texture, terrainPoints)
+				affectedVertices = affectedIndices.tolist()
+			elif asyncDataHandle.asBool():
+				# Select the region on the background worker, and show the last finished mesh until it is ready
+				selection = self.selectVerticesInBackground(TerrainRasterData.pointsAsArray(inTerrainFn), curveFn, curveCentre, curveOffsetValue, falloffTable)
+				if selection is None:
+					if self.m_lastOutMesh is not None and om.MFnMesh(self.m_lastOutMesh).numVertices == inTerrainFn.numVertices:
+						outTerrain = self.m_lastOutMesh
+					outMeshDataHandle.setMObject(outTerrain)
+					outMeshDataHandle.setClean()
+					NodeStats.endCompute(self, _plug, _dataBlock)
+					return
+				affectedVertices, affectedSoftSelect = selection
 			else:
-				recomputeAffectedVertices = False
-				centreFaceIndex = inTerrainFn.getClosestPoint(curveCentre, om.MSpace.kWorld)[1]
-				if self.m_lastNumVertices != inTerrainFn.numVertices:
-					recomputeAffectedVertices = True
-					self.m_lastNumVertices = inTerrainFn.numVertices
-				elif curveOffsetValue != self.m_lastCurveOffset:
-					recomputeAffectedVertices = True
-					self.m_lastCurveOffset = curveOffsetValue
-				elif self.m_lastCurveCentreClosestVertex != centreFaceIndex:
-					recomputeAffectedVertices = True
-					self.m_lastCurveCentreClosestVertex = centreFaceIndex
-				elif len(self.m_curveOriginalPoints) != curveFn.numCVs:
-					recomputeAffectedVertices = True
+				# Select the region again only when the terrain, curve or offset change, the sculpt parameters reuse it
+				if self.m_selectionKey != selectionKey:
+					# Load the selection saved with the scene if it was made from the same inputs
+					terrainPoints = TerrainRasterData.pointsAsArray(inTerrainFn)
+					terrainTopology = TerrainRasterData.meshTopology(inTerrainFn)
+					diskKey = selectionDiskKey(terrainPoints, terrainTopology, curveFn, curveOffsetValue)
+					savedSelection = NodeDiskCache.load("sculptSelection", diskKey)
+					if savedSelection is not None:
+						self.m_stats.addCacheHit()
+						self.m_affectedVertices = savedSelection["affected"].tolist()
+						self.m_selectionKey = selectionKey
+					else:
+						# Find the closest face on the terrain
+						centreFaceIndex = inTerrainFn.getClosestPoint(curveCentre, om.MSpace.kWorld)[1]
+						# Calculate the affected vertices, if the artist cancels nothing is sculpted and the region is selected again on the next compute
+						self.m_selectionKey = None
+						self.m_affectedVertices = []
+						with ProgressWindow.ProgressWindow("Selecting the sculpt region") as window:
+							self.m_affectedVertices = findVerticesInsideCurve(terrainTopology, terrainPoints, centreFaceIndex, curveFn, curveCentre, curveOffsetValue, window.token())
+							self.m_selectionKey = selectionKey
+						if self.m_selectionKey == selectionKey:
+							NodeDiskCache.save("sculptSelection", diskKey, {"affected": numpy.array(self.m_affectedVertices, dtype=numpy.int64)})
 				else:
-					curvePoints = curveFn.cvPositions(om.MSpace.kWorld)
-					for originalPos, newPos in zip(self.m_curveOriginalPoints, curvePoints):
-						if originalPos != newPos:
-							recomputeAffectedVertices = True
-							break
-				if recomputeAffectedVertices == True:
-					# Create a polygon iterator
-					polygonIterator = om.MItMeshPolygon(terrainValue)
-					# Find the closest face on the terrain
-					centreFaceIndex = inTerrainFn.getClosestPoint(curveCentre, om.MSpace.kWorld)[1]
-					self.findVerticesInsideCurve(polygonIterator, centreFaceIndex, curveFn, curveCentre, curveOffsetValue)
-					self.m_curveOriginalPoints == curveFn.cvPositions(om.MSpace.kWorld)
+					self.m_stats.addCacheHit()
+				affectedVertices = self.m_affectedVertices
+				affectedSoftSelect = None
 
 			# Create a function set for the sculpted mesh
 			sculptedMeshFn = om.MFnMesh(sculptedMeshValue)
 			accelerationParams = sculptedMeshFn.autoUniformGridParams()
 
 			# Iterate through affected vertices and project onto the sculpted mesh
-			numVertices = len(self.m_affectedVertices)
-			for i in xrange(numVertices):
+			self.m_stats.addVertices(len(affectedVertices))
+			self.m_stats.addRays(len(affectedVertices))
+			hitVertices = []
+			hitDifferences = []
+			hitSlots = []
+			for slot, index in enumerate(affectedVertices):
 				# Find a ray intersection from the original point in the direction of the normal to the scul mesh
-				raySource = om.MFloatPoint(vertexPositions[self.m_affectedVertices[i]])
-				normal = inTerrainFn.getVertexNormal(self.m_affectedVertices[i], True, om.MSpace.kWorld)
+				raySource = om.MFloatPoint(vertexPositions[index])
+				normal = inTerrainFn.getVertexNormal(index, True, om.MSpace.kWorld)
 				intersection = sculptedMeshFn.closestIntersection(raySource, om.MFloatVector(normal), om.MSpace.kWorld, maxProjectionDistanceValue, True, accelParams=accelerationParams)
+				# A hit face of -1 means there was no intersection
+				if intersection[2] < 0:
+					continue
 				# Calculate a vector from the original point to the new point
-				difference = om.MPoint(intersection[0]) - vertexPositions[self.m_affectedVertices[i]]
+				difference = om.MPoint(intersection[0]) - vertexPositions[index]
 				# Ensure the vertices are not sliding perpendicular to the normal
 				if difference * normal != 0.0:
-					closestPointOnCurve = curveFn.closestPoint(vertexPositions[self.m_affectedVertices[i]], space=om.MSpace.kWorld)[0]
-					vertexPositions[self.m_affectedVertices[i]] += difference * sculptStrengthValue * self.calculateSoftSelectValue(curveCentre, vertexPositions[self.m_affectedVertices[i]], closestPointOnCurve)
+					hitVertices.append(index)
+					hitDifferences.append(difference)
+					hitSlots.append(slot)
+
+			# Scale the projections by their soft selection values
+			offsets = numpy.array([(difference.x, difference.y, difference.z) for difference in hitDifferences], dtype=numpy.float64).reshape(-1, 3)
+			if len(hitVertices) > 0:
+				if affectedSoftSelect is None:
+					hitPoints = numpy.array([vertexPositions[index] for index in hitVertices], dtype=numpy.float64)[:, :3]
+					softSelect = sculpt.softSelectValues(curveCentre, hitPoints, closestPointsOnCurve(curveFn, hitPoints), falloffTable) * sculptStrengthValue
+				else:
+					softSelect = affectedSoftSelect[hitSlots] * sculptStrengthValue
+				offsets *= numpy.asarray(softSelect, dtype=numpy.float64)[:, numpy.newaxis]
+			delta = (numpy.array(hitVertices, dtype=numpy.int64), offsets)
+
+			# Store the moved vertices as a frame, unless the selection was cancelled, a texture selection cannot be
+			if frameKey is not None and (textureMask or self.m_selectionKey == selectionKey):
+				self.m_meshFrames.put(frameTime, frameKey, delta)
 
 			# Free the accelerator from memory as it is not automatically managed
 			sculptedMeshFn.freeCachedIntersectionAccelerator()
 
-			# Set the new vertices of the mesh
-			outTerrainFn.setPoints(vertexPositions)
+			# Set the new vertices of the mesh in one call
+			TerrainRasterData.setPointsFromArray(outTerrainFn, framecache.applyDelta(TerrainRasterData.pointsAsArray(inTerrainFn), delta))
+			# Normals may be locked upstream (e.g. analytic height field normals), unlock them around the moved vertices
+			TerrainRasterData.unlockMovedNormals(outTerrainFn, delta[0])
 
-			# Set the output value
+			# Set the output value, and keep it to show while the next selection is computed in the background
 			outMeshDataHandle.setMObject(outTerrain)
+			self.m_lastOutMesh = outTerrain
 
 			# Mark the plug as clean
 			outMeshDataHandle.setClean()
+			NodeStats.endCompute(self, _plug, _dataBlock)
 
-	## Calculate the soft selection value
-	# @param _centre The centre of the curve
-	# @param _vertex The vertex position to calculate for
-	# @param _curvePoint The closest point on the curve to the vertex
-	# @return A float value in the range [0,1]
-	def calculateSoftSelectValue(self, _centre, _vertex, _curvePoint):
-		centreVertexLenSquared = ((_centre.x - _vertex.x) * (_centre.x - _vertex.x)) + ((_centre.y - _vertex.y) * (_centre.y - _vertex.y)) + ((_centre.z - _vertex.z) * (_centre.z - _vertex.z))
-		centreCurvePointLenSquared = ((_centre.x - _curvePoint.x) * (_centre.x - _curvePoint.x)) + ((_centre.y - _curvePoint.y) * (_centre.y - _curvePoint.y)) + ((_centre.z - _curvePoint.z) * (_centre.z - _curvePoint.z))
-		ratio = centreVertexLenSquared / centreCurvePointLenSquared
-		return 2 + 2.0/(ratio - 2)
-
-	## Find the centre of a curve
+		# Check if the plug is the output raster
+		elif (_plug == SculptNodeClass.m_outRaster):
+			self.m_stats.begin()
+
+			# Get data handles and typecast
+			inRasterDataHandle = _dataBlock.inputValue(SculptNodeClass.m_inRaster)
+			raster = TerrainRasterData.rasterFromDataHandle(inRasterDataHandle)
+
+			curveMaskDataHandle = _dataBlock.inputValue(SculptNodeClass.m_curveMask)
+			curveMaskValue = curveMaskDataHandle.asNurbsCurve()
+
+			sculptedMeshDataHandle = _dataBlock.inputValue(SculptNodeClass.m_sculptedMesh)
+			sculptedMeshValue = sculptedMeshDataHandle.asMesh()
+
+			sculptStrengthDataHandle = _dataBlock.inputValue(SculptNodeClass.m_sculptStrength)
+			sculptStrengthValue = sculptStrengthDataHandle.asFloat()
+
+			curveOffsetDataHandle = _dataBlock.inputValue(SculptNodeClass.m_curveOffset)
+			curveOffsetValue = curveOffsetDataHandle.asFloat()
+
+			maxProjectionDistanceDataHandle = _dataBlock.inputValue(SculptNodeClass.m_maxProjectionDistance)
+			maxProjectionDistanceValue = maxProjectionDistanceDataHandle.asFloat()
+
+			asyncDataHandle = _dataBlock.inputValue(SculptNodeClass.m_asyncCompute)
+
+			outRasterDataHandle = _dataBlock.outputValue(SculptNodeClass.m_outRaster)
+			falloffTable = NodeFalloff.falloffTable(self, _dataBlock)
+
+			if raster is not None:
+				# Recompute the samples inside the curve if the grid, curve or offset has changed
+				curveFn = om.MFnNurbsCurve(curveMaskValue)
+
+				# The mask textures are made over the raster and used synchronously, as for the mesh
+				textureMask = _dataBlock.inputValue(SculptNodeClass.m_maskMode).asShort() == kTextureMask
+				if textureMask:
+					minX, maxX, minZ, maxZ = raster.bounds()
+					texture, textureKey = self.maskTexture(_dataBlock, curveFn, (minX, minZ, maxX, maxZ), curveOffsetValue, falloffTable)
+					rasterKey = (raster.resolution(), raster.m_origin, raster.m_spacing, textureKey)
+
+				frameKey = None
+				if not asyncDataHandle.asBool():
+					# Only the inputs dirtied since the last compute are fingerprinted again
+					inputs = NodeFingerprints.computeFingerprints(self, _dataBlock)
+					rasterInputKey = NodeFingerprints.inputFingerprint(inputs, SculptNodeClass.m_inRaster, fingerprints.rasterFingerprint, raster)
+					curveKey = NodeFingerprints.inputFingerprint(inputs, SculptNodeClass.m_curveMask, NodeFingerprints.curveFingerprint, curveFn)
+					sculptedMeshKey = NodeFingerprints.inputFingerprint(inputs, SculptNodeClass.m_sculptedMesh, NodeFingerprints.meshFingerprint, om.MFnMesh(sculptedMeshValue))
+					# The selection and its soft selection values depend on the grid, the curve, the offset and the falloff, which the texture key includes
+					if not textureMask:
+						rasterKey = (raster.resolution(), raster.m_origin, raster.m_spacing, curveKey, curveOffsetValue, falloffTable.key())
+
+					# Replay the frame if it has been computed with the same inputs
+					FrameCacheNode.updateBudget(self, self.m_rasterFrames, _dataBlock)
+					frameTime = FrameCacheNode.evaluationTime(_dataBlock)
+					frameKey = (rasterInputKey, rasterKey, sculptedMeshKey, sculptStrengthValue, maxProjectionDistanceValue)
+					frame = self.m_rasterFrames.get(frameTime, frameKey)
+					if frame is not None:
+						self.m_stats.addCacheHit()
+						raster = TerrainRaster(framecache.applyDelta(raster.m_heights.ravel(), frame).reshape(raster.resolution()), raster.m_origin, raster.m_spacing)
+						self.m_lastOutRaster = raster
+						TerrainRasterData.setRasterDataHandle(outRasterDataHandle, raster)
+						outRasterDataHandle.setClean()
+						NodeStats.endCompute(self, _plug, _dataBlock)
+						return
+
+				if textureMask:
+					# Sample the mask texture at every sample of the raster
+					if self.m_rasterKey != rasterKey:
+						self.m_rasterIndices, self.m_rasterSoftSelect = masks.selectPoints(texture, raster.positions())
+						self.m_rasterKey = rasterKey
+					else:
+						self.m_stats.addCacheHit()
+				elif asyncDataHandle.asBool():
+					# Select the samples on the background worker, and show the last finished raster until it is ready
+					selection = self.selectRasterSamplesInBackground(raster, curveFn, curveOffsetValue, falloffTable)
+					if selection is None:
+						if self.m_lastOutRaster is not None and self.m_lastOutRaster.resolution() == raster.resolution():
+							raster = self.m_lastOutRaster
+						TerrainRasterData.setRasterDataHandle(outRasterDataHandle, raster)
+						outRasterDataHandle.setClean()
+						NodeStats.endCompute(self, _plug, _dataBlock)
+						return
+					self.m_rasterIndices, self.m_rasterSoftSelect = selection
+					# The synchronous selection has to be rebuilt if the node switches back
+					self.m_rasterKey = None
+				elif self.m_rasterKey != rasterKey:
+					# The saved selection is found by a digest of the grid, curve, offset and falloff rather than their fingerprints
+					diskKey = (fingerprints.digest(raster.resolution(), raster.m_origin, raster.m_spacing, curveOffsetValue, falloffTable.m_values), NodeFingerprints.curveDigest(curveFn))
+					savedSelection = NodeDiskCache.load("sculptRasterSelection", diskKey)
+					if savedSelection is not None:
+						self.m_stats.addCacheHit()
+						self.m_rasterIndices, self.m_rasterSoftSelect = savedSelection["indices"], savedSelection["softSelect"]
+						self.m_rasterKey = rasterKey
+					else:
+						curveCVs = numpy.array(curveFn.cvPositions(om.MSpace.kWorld), dtype=numpy.float64)[:, :3]
+						# The selection of the previous inputs cannot be used if the artist cancels
+						self.m_rasterKey = None
+						self.m_rasterIndices = []
+						self.m_rasterSoftSelect = []
+						with ProgressWindow.ProgressWindow("Selecting the sculpt region") as window:
+							token = window.token()
+							closestPoints = lambda _points: closestPointsOnCurve(curveFn, _points, token)
+							self.m_rasterIndices, self.m_rasterSoftSelect = sculpt.rasterSamplesInsideCurve(raster, curveCVs, findCurveCentre(curveFn), curveOffsetValue, closestPoints, falloffTable)
+							self.m_rasterKey = rasterKey
+						if self.m_rasterKey == rasterKey:
+							NodeDiskCache.save("sculptRasterSelection", diskKey, {"indices": numpy.asarray(self.m_rasterIndices, dtype=numpy.int64), "softSelect": numpy.asarray(self.m_rasterSoftSelect, dtype=numpy.float64)})
+				else:
+					self.m_stats.addCacheHit()
+				self.m_stats.addVertices(len(self.m_rasterIndices))
+				self.m_stats.addRays(len(self.m_rasterIndices))
+
+				# Project the affected samples vertically onto the sculpted mesh
+				sculptedMeshFn = om.MFnMesh(sculptedMeshValue)
+				accelerationParams = sculptedMeshFn.autoUniformGridParams()
+				positions = raster.positions()
+				rayDirection = om.MFloatVector(0.0, 1.0, 0.0)
+				heights = raster.m_heights.ravel().copy()
+				for index, softSelectValue in zip(self.m_rasterIndices, self.m_rasterSoftSelect):
+					raySource = om.MFloatPoint(float(positions[index][0]), float(positions[index][1]), float(positions[index][2]))
+					intersection = sculptedMeshFn.closestIntersection(raySource, rayDirection, om.MSpace.kWorld, maxProjectionDistanceValue, True, accelParams=accelerationParams)
+					# A hit face of -1 means there was no intersection
+					if intersection[2] >= 0:
+						heights[index] += (intersection[0].y - positions[index][1]) * sculptStrengthValue * float(softSelectValue)
+
+				# Free the accelerator from memory as it is not automatically managed
+				sculptedMeshFn.freeCachedIntersectionAccelerator()
+
+				# Store the sculpted heights as a frame, unless the selection was cancelled
+				if frameKey is not None and self.m_rasterKey == rasterKey:
+					self.m_rasterFrames.put(frameTime, frameKey, framecache.sparseDelta(raster.m_heights.ravel(), heights))
+
+				raster = TerrainRaster(heights.reshape(raster.m_heights.shape), raster.m_origin, raster.m_spacing)
+				self.m_lastOutRaster = raster
+
+			TerrainRasterData.setRasterDataHandle(outRasterDataHandle, raster)
+			outRasterDataHandle.setClean()
+			NodeStats.endCompute(self, _plug, _dataBlock)
+
+	## Sculpt the vertex buffer, only the pages with moved vertices are copied and the rest are shared with the input buffer
+	# This is always synchronous and does not cache frames. The buffer has moved away from the terrain mesh, so its normals are area weighted from the buffer
+	# When the input buffer has moved since the last compute, only the selected vertices around the moved vertices are projected again, a texture mask selects and projects every vertex again
+	# @param _dataBlock The data used for the computations
+	# @return The sculpted VertexBuffer
+	def sculptBuffer(self, _dataBlock):
+		terrainValue = _dataBlock.inputValue(SculptNodeClass.m_terrain).asMesh()
+		curveMaskValue = _dataBlock.inputValue(SculptNodeClass.m_curveMask).asNurbsCurve()
+		sculptedMeshValue = _dataBlock.inputValue(SculptNodeClass.m_sculptedMesh).asMesh()
+		sculptStrengthValue = _dataBlock.inputValue(SculptNodeClass.m_sculptStrength).asFloat()
+		curveOffsetValue = _dataBlock.inputValue(SculptNodeClass.m_curveOffset).asFloat()
+		maxProjectionDistanceValue = _dataBlock.inputValue(SculptNodeClass.m_maxProjectionDistance).asFloat()
+
+		# Only the inputs dirtied since the last compute are fingerprinted again, the buffers know their own fingerprints
+		inputs = NodeFingerprints.computeFingerprints(self, _dataBlock)
+		inBuffer = NodeBuffers.inputBuffer(self, _dataBlock, inputs)
+		if curveMaskValue.isNull() or sculptedMeshValue.isNull():
+			return inBuffer
+		curveFn = om.MFnNurbsCurve(curveMaskValue)
+		curveKey = NodeFingerprints.inputFingerprint(inputs, SculptNodeClass.m_curveMask, NodeFingerprints.curveFingerprint, curveFn)
+		sculptedMeshKey = NodeFingerprints.inputFingerprint(inputs, SculptNodeClass.m_sculptedMesh, NodeFingerprints.meshFingerprint, om.MFnMesh(sculptedMeshValue))
+		falloffTable = NodeFalloff.falloffTable(self, _dataBlock)
+		textureMask = _dataBlock.inputValue(SculptNodeClass.m_maskMode).asShort() == kTextureMask
+		if textureMask:
+			# The texture key includes the curves, offset, falloff and operation
+			bufferPoints = inBuffer.points()
+			texture, textureKey = self.maskTexture(_dataBlock, curveFn, regions.xzBounds(bufferPoints), curveOffsetValue, falloffTable)
+			outBufferKey = ((inBuffer.key(), textureKey), sculptedMeshKey, sculptStrengthValue, maxProjectionDistanceValue)
+		else:
+			outBufferKey = ((inBuffer.key(), curveKey, curveOffsetValue), sculptedMeshKey, sculptStrengthValue, maxProjectionDistanceValue, falloffTable.key())
+		if self.m_outBufferKey == outBufferKey:
+			self.m_stats.addCacheHit()
+			return self.m_outBuffer
+
+		if textureMask:
+			# Sample the mask texture at every vertex and project the selected ones, the texture is quick enough to sample again for dirty regions
+			indices, softSelect = masks.selectPoints(texture, bufferPoints)
+			terrain = TerrainQueries(om.MFnMesh(terrainValue), _buffer=inBuffer)
+			sculptedMeshFn = om.MFnMesh(sculptedMeshValue)
+			self.m_stats.addVertices(len(indices))
+			self.m_stats.addRays(len(indices))
+			hitIndices, offsets = projectVertices(indices, bufferPoints[indices], terrain.normalsOf(indices), curveFn, None, sculptedMeshFn, sculptedMeshFn.autoUniformGridParams(), sculptStrengthValue, maxProjectionDistanceValue, _softSelect=softSelect)
+			sculptedMeshFn.freeCachedIntersectionAccelerator()
+			self.m_outBuffer = inBuffer.moved(hitIndices, offsets)
+			self.m_outBufferKey = outBufferKey
+			return self.m_outBuffer
+
+		sculptedMeshes = {}
+		# The pages of the input buffer that changed give the vertices moved upstream, the buffer is only gathered into one array if the layer is selected again
+		terrain = TerrainQueries(om.MFnMesh(terrainValue), _buffer=inBuffer)
+		dirtyRegion = inBuffer.dirtyRegion(self.m_sculptedBuffer)
+		evaluated = evaluateSculptLayer(self.m_bufferLayer, terrain, inBuffer.key(), curveFn, curveKey, sculptedMeshValue, sculptedMeshKey, sculptStrengthValue, curveOffsetValue, maxProjectionDistanceValue, sculptedMeshes, self.m_stats, NodeStats.nodeName(self), dirtyRegion, falloffTable)
+		self.m_sculptedBuffer = inBuffer if evaluated else None
+		# Free the accelerator from memory as it is not automatically managed
+		for sculptedMeshFn, accelerationParams in sculptedMeshes.values():
+			sculptedMeshFn.freeCachedIntersectionAccelerator()
+
+		# The node holds the buffer it outputs, the registry does not keep it alive
+		self.m_outBufferKey = None
+		self.m_outBuffer = inBuffer
+		if evaluated:
+			self.m_outBuffer = inBuffer.moved(self.m_bufferLayer.m_indices, self.m_bufferLayer.m_offsets)
+			self.m_outBufferKey = outBufferKey
+		return self.m_outBuffer
+
+	## Sample a curve as a polyline, so it can be used without Maya on the background worker
 	# @param _curveFn The curve function set
-	# @return The centre of the curve as a MPoint
-	def findCurveCentre(self, _curveFn):
-		curvePoints = om.MPointArray()
-		numPoints = _curveFn.numCVs * 2
-		curvePoints.setLength(numPoints)
-		curveCentre = om.MVector(0.0,0.0,0.0)
-		for i in range(numPoints):
-			point = _curveFn.getPointAtParam(float(i) / numPoints, om.MSpace.kWorld)
-			curvePoints[i] = point
-			curveCentre += om.MVector(point)
-		# Find the centre of the curve and then typecast to MPoint
-		curveCentre /= float(numPoints)
-		return om.MPoint(curveCentre)
-
-	## Find all the vertices inside the curve
-	# @param _polygonIt The iterator for the mesh polygons
-	# @param _startIndex The starting index for the iterator
+	# @return An (N, 3) array of points along the curve
+	def curvePolyline(self, _curveFn):
+		start, end = _curveFn.knotDomain
+		numPoints = _curveFn.numCVs * kPolylineSamplesPerCV
+		curveSamples = [_curveFn.getPointAtParam(start + (end - start) * float(i) / numPoints, om.MSpace.kWorld) for i in range(numPoints)]
+		return numpy.array(curveSamples, dtype=numpy.float64)[:, :3]
+
+	## Get the weight texture of the curve masks, combining the curve mask with the extra curve masks
+	# The signed distances of a curve are only calculated again when the curve or the terrain bounds change, the offset and falloff only make new weights from them
+	# @param _dataBlock The data used for the computations
+	# @param _curveFn The curve mask function set
+	# @param _bounds The XZ bounds (minX, minZ, maxX, maxZ) of the terrain
+	# @param _curveOffset Offset the curves so they are still visible
+	# @param _falloff The terrain_core.falloff.FalloffTable of the soft selection
+	# @return The weights as a TerrainRaster, and the fingerprint of the curves, grid, offset, falloff and operation
+	def maskTexture(self, _dataBlock, _curveFn, _bounds, _curveOffset, _falloff):
+		polylines = [self.curvePolyline(_curveFn)]
+		extraCurveMasksDataHandle = _dataBlock.inputArrayValue(SculptNodeClass.m_extraCurveMasks)
+		for i in range(len(extraCurveMasksDataHandle)):
+			extraCurveMasksDataHandle.jumpToPhysicalElement(i)
+			extraCurveValue = extraCurveMasksDataHandle.inputValue().asNurbsCurve()
+			if not extraCurveValue.isNull():
+				polylines.append(self.curvePolyline(om.MFnNurbsCurve(extraCurveValue)))
+		operation = _dataBlock.inputValue(SculptNodeClass.m_maskOperation).asShort()
+		resolution = _dataBlock.inputValue(SculptNodeClass.m_maskResolution).asInt()
+
+		curveMasks, numRasterized = self.m_maskCache.curveMasks(polylines, _bounds, resolution)
+		if numRasterized == 0:
+			self.m_stats.addCacheHit()
+		weights = masks.combineWeights([mask.weights(_curveOffset, _falloff) for mask in curveMasks], operation)
+		textureKey = (tuple(mask.key() for mask in curveMasks), _curveOffset, _falloff.key(), operation)
+		return masks.weightTexture(weights, curveMasks[0]), textureKey
+
+	## Select the vertices inside the curve on the background worker
+	# @param _points An (N, 3) array of the terrain vertices
 	# @param _curveFn The curve function set
 	# @param _curveCentre The centre of the curve
 	# @param _curveOffset Offset the curve so it is still visible
-	def findVerticesInsideCurve(self, _polygonIt, _startIndex, _curveFn, _curveCentre, _curveOffset):
-		# Create a list and set containing face IDs
-		uncheckedFaces = om.MIntArray() # This is a list of face IDs to check if they lie inside the curve
-		checkedFaces = set() # This is a list of all the faces already checked, to avoid adding duplicates to uncheckedFaces
-		# Add the starting index to this list and set
-		uncheckedFaces.append(_startIndex)
-		checkedFaces.add(_startIndex)
-
-		# Create a list of vertex IDs that lie within the curve
-		polyVertices = om.MIntArray()
-
-		# Loop through and check the array of unchecked faces
-		while (len(uncheckedFaces) > 0):
-			# Set the iterator to the last item in the list of unchecked faces
-			_polygonIt.setIndex(uncheckedFaces[-1])
-			# Pop from the list of unchecked faces
-			uncheckedFaces.remove(-1)
-			# Find the centre of this face and the closest point on the curve
-			faceCentre = _polygonIt.center(om.MSpace.kWorld)
-			closestPointOnCurve = _curveFn.closestPoint(faceCentre, space=om.MSpace.kWorld)[0]
-			# Calculate two vectors from the centre of the curve to the face and to the closest point on the curve
-			centreToFace = (faceCentre - _curveCentre) * _curveOffset
-			centreToCurve = closestPointOnCurve - _curveCentre
-			# Use the dot product to see if the point is inside
-			if centreToFace * centreToCurve.normal() < centreToCurve.length():
-				# Add the vertices to the list of vertices that lie inside
-				thisFaceVertices = _polygonIt.getVertices()
-				polyVertices += thisFaceVertices
-				# Find the connected faces and append to the list of unchecked faces
-				connectedFaces = _polygonIt.getConnectedFaces()
-				for faceId in connectedFaces:
-					if faceId not in checkedFaces:
-						uncheckedFaces.append(faceId)
-						checkedFaces.add(faceId)
-		self.m_affectedVertices = self.removeDuplicates(polyVertices)
-
-	## Given a list, remove duplicate items
-	# @param _list The list containing duplicates
-	# @return A new list without any duplicates
-	def removeDuplicates(self, _list):
-		newList = []
-		seenElements = set()
-		for item in _list:
-			if item not in seenElements:
-				newList.append(item)
-				seenElements.add(item)
-		return newList
+	# @param _falloff The terrain_core.falloff.FalloffTable of the soft selection
+	# @return The affected vertex indices and their soft selection values, or None if the selection for these inputs has not finished
+	def selectVerticesInBackground(self, _points, _curveFn, _curveCentre, _curveOffset, _falloff):
+		if self.m_meshBackground is None:
+			self.m_meshBackground = background.BackgroundCompute(BackgroundNode.dirtyOnFinish(self, SculptNodeClass.m_outMesh))
+		polyline = self.curvePolyline(_curveFn)
+		centre = numpy.array([_curveCentre.x, _curveCentre.y, _curveCentre.z])
+		key = fingerprints.fingerprint(_points, polyline, _curveOffset, _falloff.key())
+		self.m_meshBackground.submit(key, self.selectPointsJob, _points, polyline, centre, _curveOffset, _falloff)
+		BackgroundNode.reportError(self, self.m_meshBackground, key)
+		resultKey, result = self.m_meshBackground.result()
+		if resultKey != key:
+			return None
+		self.m_stats.addCacheHit()
+		return result[0].tolist(), result[1]
+
+	## Select the raster samples inside the curve on the background worker
+	# @param _raster The TerrainRaster to sculpt
+	# @param _curveFn The curve function set
+	# @param _curveOffset Offset the curve so it is still visible
+	# @param _falloff The terrain_core.falloff.FalloffTable of the soft selection
+	# @return The affected sample indices and their soft selection values, or None if the selection for these inputs has not finished
+	def selectRasterSamplesInBackground(self, _raster, _curveFn, _curveOffset, _falloff):
+		if self.m_rasterBackground is None:
+			self.m_rasterBackground = background.BackgroundCompute(BackgroundNode.dirtyOnFinish(self, SculptNodeClass.m_outRaster))
+		polyline = self.curvePolyline(_curveFn)
+		curveCentre = findCurveCentre(_curveFn)
+		centre = numpy.array([curveCentre.x, curveCentre.y, curveCentre.z])
+		key = fingerprints.fingerprint(_raster.m_heights, _raster.m_origin, _raster.m_spacing, polyline, _curveOffset, _falloff.key())
+		self.m_rasterBackground.submit(key, self.selectRasterJob, _raster.copy(), polyline, centre, _curveOffset, _falloff)
+		BackgroundNode.reportError(self, self.m_rasterBackground, key)
+		resultKey, result = self.m_rasterBackground.result()
+		if resultKey != key:
+			return None
+		self.m_stats.addCacheHit()
+		return result
+
+	## Select the points inside a curve, this runs on the background worker so it does not use Maya
+	# @param _points An (N, 3) array of points
+	# @param _polyline An (M, 3) array of points along the curve
+	# @param _centre The centre of the curve
+	# @param _curveOffset Offset the curve so it is still visible
+	# @param _falloff The terrain_core.falloff.FalloffTable of the soft selection
+	# @param _progress The ProgressToken of the job, cancelled when newer inputs are submitted
+	# @return The indices of the points inside the curve and their soft selection values
+	def selectPointsJob(self, _points, _polyline, _centre, _curveOffset, _falloff, _progress):
+		closestPoints = lambda _samples: sculpt.closestPointsOnPolyline(_samples, _polyline, _progress=_progress)
+		return sculpt.pointsInsideCurve(_points, _polyline, _centre, _curveOffset, closestPoints, _falloff)
+
+	## Select the raster samples inside a curve, this runs on the background worker so it does not use Maya
+	# @param _raster The TerrainRaster to sculpt
+	# @param _polyline An (M, 3) array of points along the curve
+	# @param _centre The centre of the curve
+	# @param _curveOffset Offset the curve so it is still visible
+	# @param _falloff The terrain_core.falloff.FalloffTable of the soft selection
+	# @param _progress The ProgressToken of the job, cancelled when newer inputs are submitted
+	# @return The row major indices of the samples inside the curve and their soft selection values
+	def selectRasterJob(self, _raster, _polyline, _centre, _curveOffset, _falloff, _progress):
+		closestPoints = lambda _samples: sculpt.closestPointsOnPolyline(_samples, _polyline, _progress=_progress)
+		return sculpt.rasterSamplesInsideCurve(_raster, _polyline, _centre, _curveOffset, closestPoints, _falloff)
 
 #----------------------------------------------------------
 # Plugin Initialisation
@@ -268,6 +960,12 @@ def nodeInitializer():
 	typedAttr.storable = True
 	SculptNodeClass.addAttribute(SculptNodeClass.m_sculptedMesh)
 
+	SculptNodeClass.m_inRaster = typedAttr.create("inRaster", "ir", TerrainRasterData.kPluginDataID)
+	typedAttr.readable = False
+	typedAttr.writable = True
+	typedAttr.storable = False
+	SculptNodeClass.addAttribute(SculptNodeClass.m_inRaster)
+
 	SculptNodeClass.m_sculptStrength = numericAttr.create("sculptStrength", "ss", om.MFnNumericData.kFloat, 1.0)
 	numericAttr.readable = False
 	numericAttr.writable = True
@@ -286,6 +984,45 @@ def nodeInitializer():
 	numericAttr.storable = True
 	SculptNodeClass.addAttribute(SculptNodeClass.m_maxProjectionDistance)
 
+	SculptNodeClass.m_asyncCompute = numericAttr.create("asyncCompute", "ac", om.MFnNumericData.kBoolean, False)
+	numericAttr.readable = False
+	numericAttr.writable = True
+	numericAttr.storable = True
+	SculptNodeClass.addAttribute(SculptNodeClass.m_asyncCompute)
+
+	# How the curve masks the terrain, and the extra curves combined with it by the mask textures
+	enumAttr = om.MFnEnumAttribute()
+	SculptNodeClass.m_maskMode = enumAttr.create("maskMode", "mkm", kCurveMask)
+	for value, name in enumerate(kMaskModeNames):
+		enumAttr.addField(name, value)
+	enumAttr.readable = False
+	enumAttr.writable = True
+	enumAttr.storable = True
+	SculptNodeClass.addAttribute(SculptNodeClass.m_maskMode)
+
+	SculptNodeClass.m_extraCurveMasks = typedAttr.create("extraCurveMasks", "ecm", om.MFnData.kNurbsCurve)
+	typedAttr.readable = False
+	typedAttr.writable = True
+	typedAttr.storable = True
+	typedAttr.array = True
+	SculptNodeClass.addAttribute(SculptNodeClass.m_extraCurveMasks)
+
+	SculptNodeClass.m_maskOperation = enumAttr.create("maskOperation", "mko", masks.kUnion)
+	for value, name in enumerate(masks.kOperationNames):
+		enumAttr.addField(name, value)
+	enumAttr.readable = False
+	enumAttr.writable = True
+	enumAttr.storable = True
+	SculptNodeClass.addAttribute(SculptNodeClass.m_maskOperation)
+
+	# The number of texels along the longer side of the terrain
+	SculptNodeClass.m_maskResolution = numericAttr.create("maskResolution", "mkr", om.MFnNumericData.kInt, 512)
+	numericAttr.readable = False
+	numericAttr.writable = True
+	numericAttr.storable = True
+	numericAttr.setMin(2)
+	SculptNodeClass.addAttribute(SculptNodeClass.m_maskResolution)
+
 	# Output node attribute
 	SculptNodeClass.m_outMesh = typedAttr.create("outMesh", "m", om.MFnData.kMesh)
 	typedAttr.readable = True
@@ -293,6 +1030,23 @@ def nodeInitializer():
 	typedAttr.storable = False
 	SculptNodeClass.addAttribute(SculptNodeClass.m_outMesh)
 
+	SculptNodeClass.m_outRaster = typedAttr.create("outRaster", "or", TerrainRasterData.kPluginDataID)
+	typedAttr.readable = True
+	typedAttr.writable = False
+	typedAttr.storable = False
+	SculptNodeClass.addAttribute(SculptNodeClass.m_outRaster)
+
+	# Vertex buffers shared with the other nodes in a chain
+	NodeBuffers.addBufferAttributes(SculptNodeClass)
+
+	# The falloff of the soft selection inside the curve
+	NodeFalloff.addFalloffAttributes(SculptNodeClass, falloff.kSculpt)
+
+	# Read only compute statistics
+	NodeStats.addStatsAttributes(SculptNodeClass)
+	# Memory budget of the frame caches in megabytes
+	FrameCacheNode.addFrameCacheAttributes(SculptNodeClass)
+
 	# Connect input/output dependencies
 	SculptNodeClass.attributeAffects(SculptNodeClass.m_terrain, SculptNodeClass.m_outMesh)
 	SculptNodeClass.attributeAffects(SculptNodeClass.m_curveMask, SculptNodeClass.m_outMesh)
@@ -300,10 +1054,46 @@ def nodeInitializer():
 	SculptNodeClass.attributeAffects(SculptNodeClass.m_sculptStrength, SculptNodeClass.m_outMesh)
 	SculptNodeClass.attributeAffects(SculptNodeClass.m_curveOffset, SculptNodeClass.m_outMesh)
 	SculptNodeClass.attributeAffects(SculptNodeClass.m_maxProjectionDistance, SculptNodeClass.m_outMesh)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_asyncCompute, SculptNodeClass.m_outMesh)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_inRaster, SculptNodeClass.m_outRaster)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_curveMask, SculptNodeClass.m_outRaster)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_sculptedMesh, SculptNodeClass.m_outRaster)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_sculptStrength, SculptNodeClass.m_outRaster)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_curveOffset, SculptNodeClass.m_outRaster)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_maxProjectionDistance, SculptNodeClass.m_outRaster)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_asyncCompute, SculptNodeClass.m_outRaster)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_inBuffer, SculptNodeClass.m_outMesh)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_inBuffer, SculptNodeClass.m_outBuffer)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_terrain, SculptNodeClass.m_outBuffer)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_curveMask, SculptNodeClass.m_outBuffer)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_sculptedMesh, SculptNodeClass.m_outBuffer)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_sculptStrength, SculptNodeClass.m_outBuffer)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_curveOffset, SculptNodeClass.m_outBuffer)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_maxProjectionDistance, SculptNodeClass.m_outBuffer)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_falloff, SculptNodeClass.m_outMesh)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_falloff, SculptNodeClass.m_outRaster)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_falloff, SculptNodeClass.m_outBuffer)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_falloffRamp, SculptNodeClass.m_outMesh)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_falloffRamp, SculptNodeClass.m_outRaster)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_falloffRamp, SculptNodeClass.m_outBuffer)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_maskMode, SculptNodeClass.m_outMesh)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_maskMode, SculptNodeClass.m_outRaster)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_maskMode, SculptNodeClass.m_outBuffer)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_extraCurveMasks, SculptNodeClass.m_outMesh)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_extraCurveMasks, SculptNodeClass.m_outRaster)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_extraCurveMasks, SculptNodeClass.m_outBuffer)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_maskOperation, SculptNodeClass.m_outMesh)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_maskOperation, SculptNodeClass.m_outRaster)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_maskOperation, SculptNodeClass.m_outBuffer)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_maskResolution, SculptNodeClass.m_outMesh)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_maskResolution, SculptNodeClass.m_outRaster)
+	SculptNodeClass.attributeAffects(SculptNodeClass.m_maskResolution, SculptNodeClass.m_outBuffer)
 
 ## Initialise the plugin when Maya loads it
 def initializePlugin(mobject):
 	mplugin = om.MFnPlugin(mobject)
+	# The raster and buffer attributes need the terrain data types
+	TerrainRasterData.loadDataPlugin()
 	try:
 		mplugin.registerNode(kPluginNodeName, kPluginNodeID, nodeCreator, nodeInitializer)
 	except:
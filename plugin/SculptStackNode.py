@@ -0,0 +1,290 @@
+## SculptStackNode.py
+# This node evaluates a stack of sculpt layers on one terrain
+# Every layer projects the input terrain onto its sculpted mesh, and the displacements of all the layers are added into one vertex buffer, so the terrain is only copied once
+# Each layer is only evaluated again when its own inputs or the terrain change, and when only some terrain vertices move a layer only projects the vertices around them again
+
+import sys
+import maya.api.OpenMaya as om
+import TerrainRasterData
+from terrain_nodes import NodeFingerprints, NodeStats
+import SculptLayerNode
+from terrain_core import fingerprints, regions, sculpt, stats
+
+#----------------------------------------------------------
+# Plugin
+#----------------------------------------------------------
+
+# Node info
+kPluginNodeName = "SculptStackNode"
+kPluginNodeID = om.MTypeId(0x100A)
+
+## This class is used to compute the sculpt layer stack
+class SculptStackNodeClass(om.MPxNode):
+	# Define the attributes
+	# Input objects
+	m_terrain = om.MObject()
+	# The layers, each with a curve mask, sculpted mesh and sculpt parameters
+	m_layers = om.MObject()
+	m_curveMask = om.MObject()
+	m_sculptedMesh = om.MObject()
+	m_sculptStrength = om.MObject()
+	m_curveOffset = om.MObject()
+	m_maxProjectionDistance = om.MObject()
+	# Output
+	m_outMesh = om.MObject()
+
+	## Constructor
+	def __init__(self):
+		om.MPxNode.__init__(self)
+		self.m_fingerprints = fingerprints.InputFingerprints()
+		# The SculptLayerState of each layer by logical index
+		self.m_layerStates = {}
+		# The terrain positions of the last compute, compared with the next terrain to find the moved vertices
+		self.m_terrainKey = None
+		self.m_terrainPoints = None
+		self.m_stats = stats.ComputeStats(kPluginNodeName)
+
+	## The function that is called when the node is dirty
+	# The compute is only wrapped in a profiler when a capture has been requested for this node or every node
+	# @param _plug A plug for one of the i/o attributes
+	# @param _dataBlock The data used for the computations
+	def compute(self, _plug, _dataBlock):
+		NodeStats.compute(self, _plug, _dataBlock)
+
+	## Record which input has been dirtied, the inputs of a layer are tracked by the layer so the other layers are not fingerprinted again
+	# @param _plug The plug being dirtied
+	# @param _plugArray The plugs affected by it
+	def setDependentsDirty(self, _plug, _plugArray):
+		if _plug.isChild and _plug.parent().isElement:
+			self.layerState(_plug.parent().logicalIndex()).m_fingerprints.setDirty(om.MFnAttribute(_plug.attribute()).name)
+		elif _plug.isElement and _plug.attribute() == SculptStackNodeClass.m_layers:
+			self.layerState(_plug.logicalIndex()).m_fingerprints.clear()
+		elif _plug.attribute() == SculptStackNodeClass.m_layers:
+			for state in self.m_layerStates.values():
+				state.m_fingerprints.clear()
+		else:
+			NodeFingerprints.setDependentsDirty(self, _plug)
+
+	## Record the dirtied inputs before the evaluation manager computes the node
+	# The evaluation manager does not say which layer is dirty, so every layer is fingerprinted again, but only the changed layers are evaluated
+	# @param _context The context of the evaluation
+	# @param _evaluationNode The evaluation node, which knows the dirty plugs
+	def preEvaluation(self, _context, _evaluationNode):
+		NodeFingerprints.preEvaluation(self, _evaluationNode, [SculptStackNodeClass.m_terrain])
+		layerAttributes = [SculptStackNodeClass.m_layers, SculptStackNodeClass.m_curveMask, SculptStackNodeClass.m_sculptedMesh]
+		if any(_evaluationNode.dirtyPlugExists(attribute) for attribute in layerAttributes):
+			for state in self.m_layerStates.values():
+				state.m_fingerprints.clear()
+
+	## Get the state of a layer, creating it for a new layer
+	# @param _logicalIndex The logical index of the layer
+	# @return The SculptLayerState
+	def layerState(self, _logicalIndex):
+		if _logicalIndex not in self.m_layerStates:
+			self.m_layerStates[_logicalIndex] = SculptLayerNode.SculptLayerState()
+		return self.m_layerStates[_logicalIndex]
+
+	## Compute one of the outputs
+	# @param _plug A plug for one of the i/o attributes
+	# @param _dataBlock The data used for the computations
+	def computePlug(self, _plug, _dataBlock):
+		# Check if the plug is the output
+		if (_plug == SculptStackNodeClass.m_outMesh):
+			self.m_stats.begin()
+
+			# Get data handles and typecast
+			terrainDataHandle = _dataBlock.inputValue(SculptStackNodeClass.m_terrain)
+			terrainValue = terrainDataHandle.asMesh()
+
+			layersDataHandle = _dataBlock.inputArrayValue(SculptStackNodeClass.m_layers)
+
+			outMeshDataHandle = _dataBlock.outputValue(SculptStackNodeClass.m_outMesh)
+
+			# Computation
+			inTerrainFn = om.MFnMesh(terrainValue)
+			vertexPositions = inTerrainFn.getPoints()
+
+			# Only the inputs dirtied since the last compute are fingerprinted again
+			inputs = NodeFingerprints.computeFingerprints(self, _dataBlock)
+			terrainKey = NodeFingerprints.inputFingerprint(inputs, SculptStackNodeClass.m_terrain, NodeFingerprints.meshFingerprint, inTerrainFn)
+
+			# Evaluate the layers whose inputs have changed, the others keep their displacements
+			terrain = SculptLayerNode.TerrainQueries(inTerrainFn)
+			# If the terrain has moved without changing its topology, the layers only update around the moved vertices
+			dirtyRegion = None
+			if self.m_terrainKey != terrainKey:
+				if self.m_terrainKey is not None and self.m_terrainKey[1] == terrainKey[1]:
+					dirtyRegion = regions.fromPoints(self.m_terrainKey, self.m_terrainPoints, terrain.points())
+				self.m_terrainKey = terrainKey
+				self.m_terrainPoints = terrain.points()
+			sculptedMeshes = {}
+			layerDisplacements = []
+			layerIndices = set()
+			if len(layersDataHandle) > 0:
+				layersDataHandle.jumpToPhysicalElement(0)
+				while not layersDataHandle.isDone():
+					logicalIndex = layersDataHandle.elementLogicalIndex()
+					layerIndices.add(logicalIndex)
+					state = self.layerState(logicalIndex)
+					# Dirtied inputs are only reported for the normal context, so other times fingerprint every input of the layer
+					layerInputs = state.m_fingerprints if _dataBlock.context().isNormal() else fingerprints.InputFingerprints()
+					if self.evaluateLayer(state, layerInputs, layersDataHandle.inputValue(), terrain, terrainKey, dirtyRegion, sculptedMeshes, logicalIndex):
+						layerDisplacements.append((state.m_indices, state.m_offsets))
+					layersDataHandle.next()
+
+			# Free the accelerators from memory as they are not automatically managed
+			for sculptedMeshFn, accelerationParams in sculptedMeshes.values():
+				sculptedMeshFn.freeCachedIntersectionAccelerator()
+
+			# Forget the layers that have been removed
+			for logicalIndex in list(self.m_layerStates.keys()):
+				if logicalIndex not in layerIndices:
+					del self.m_layerStates[logicalIndex]
+
+			# Add the displacements of every layer and move the terrain once
+			displacement, movedVertices = sculpt.accumulateDisplacements(len(vertexPositions), layerDisplacements)
+			for index in movedVertices:
+				vertexPositions[index] += om.MVector(displacement[index][0], displacement[index][1], displacement[index][2])
+
+			# Create a copy of the terrain
+			meshDataFn = om.MFnMeshData()
+			outTerrain = meshDataFn.create()
+			outTerrainFn = om.MFnMesh()
+			outTerrainFn.copy(terrainValue, outTerrain)
+
+			# Set the new vertices of the mesh
+			outTerrainFn.setPoints(vertexPositions)
+			# Normals may be locked upstream (e.g. analytic height field normals), unlock them around the moved vertices
+			TerrainRasterData.unlockMovedNormals(outTerrainFn, movedVertices)
+
+			# Set the output value
+			outMeshDataHandle.setMObject(outTerrain)
+
+			# Mark the plug as clean
+			outMeshDataHandle.setClean()
+			NodeStats.endCompute(self, _plug, _dataBlock)
+
+	## Evaluate one layer of the stack if its inputs have changed
+	# @param _state The SculptLayerState of the layer
+	# @param _inputs The InputFingerprints of the layer for this compute
+	# @param _layerDataHandle The data handle of the layer element
+	# @param _terrain The TerrainQueries shared by the layers
+	# @param _terrainKey The fingerprint of the terrain
+	# @param _dirtyRegion The terrain_core.regions.DirtyRegion of the vertices moved since the last compute, or None
+	# @param _sculptedMeshes The sculpted mesh function sets and acceleration parameters by fingerprint, shared by the layers
+	# @param _logicalIndex The logical index of the layer
+	# @return Whether the layer has displacements, False if an input is not connected or the selection was cancelled
+	def evaluateLayer(self, _state, _inputs, _layerDataHandle, _terrain, _terrainKey, _dirtyRegion, _sculptedMeshes, _logicalIndex):
+		curveMaskValue = _layerDataHandle.child(SculptStackNodeClass.m_curveMask).asNurbsCurve()
+		sculptedMeshValue = _layerDataHandle.child(SculptStackNodeClass.m_sculptedMesh).asMesh()
+		if curveMaskValue.isNull() or sculptedMeshValue.isNull():
+			return False
+		sculptStrengthValue = _layerDataHandle.child(SculptStackNodeClass.m_sculptStrength).asFloat()
+		curveOffsetValue = _layerDataHandle.child(SculptStackNodeClass.m_curveOffset).asFloat()
+		maxProjectionDistanceValue = _layerDataHandle.child(SculptStackNodeClass.m_maxProjectionDistance).asFloat()
+
+		curveFn = om.MFnNurbsCurve(curveMaskValue)
+		curveKey = NodeFingerprints.inputFingerprint(_inputs, SculptStackNodeClass.m_curveMask, NodeFingerprints.curveFingerprint, curveFn)
+		sculptedMeshKey = NodeFingerprints.inputFingerprint(_inputs, SculptStackNodeClass.m_sculptedMesh, NodeFingerprints.meshFingerprint, om.MFnMesh(sculptedMeshValue))
+		return SculptLayerNode.evaluateSculptLayer(_state, _terrain, _terrainKey, curveFn, curveKey, sculptedMeshValue, sculptedMeshKey, sculptStrengthValue, curveOffsetValue, maxProjectionDistanceValue, _sculptedMeshes, self.m_stats, "layer " + str(_logicalIndex), _dirtyRegion)
+
+#----------------------------------------------------------
+# Plugin Initialisation
+#----------------------------------------------------------
+
+## This function tells Maya to use the Python API 2.0
+def maya_useNewAPI():
+	pass
+
+## Create an instance of the node
+def nodeCreator():
+	return SculptStackNodeClass()
+
+## Initialise the node attributes
+def nodeInitializer():
+	# Create a numeric, typed and compound attribute function set
+	numericAttr = om.MFnNumericAttribute()
+	typedAttr = om.MFnTypedAttribute()
+	compoundAttr = om.MFnCompoundAttribute()
+
+	# Input node attributes
+	SculptStackNodeClass.m_terrain = typedAttr.create("terrain", "t", om.MFnData.kMesh)
+	typedAttr.readable = False
+	typedAttr.writable = True
+	typedAttr.storable = True
+	SculptStackNodeClass.addAttribute(SculptStackNodeClass.m_terrain)
+
+	# The children of each layer
+	SculptStackNodeClass.m_curveMask = typedAttr.create("curveMask", "cm", om.MFnData.kNurbsCurve)
+	typedAttr.readable = False
+	typedAttr.writable = True
+	typedAttr.storable = True
+
+	SculptStackNodeClass.m_sculptedMesh = typedAttr.create("sculptedMesh", "sm", om.MFnData.kMesh)
+	typedAttr.readable = False
+	typedAttr.writable = True
+	typedAttr.storable = True
+
+	SculptStackNodeClass.m_sculptStrength = numericAttr.create("sculptStrength", "ss", om.MFnNumericData.kFloat, 1.0)
+	numericAttr.readable = False
+	numericAttr.writable = True
+	numericAttr.storable = True
+
+	SculptStackNodeClass.m_curveOffset = numericAttr.create("curveOffset", "co", om.MFnNumericData.kFloat, 1.1)
+	numericAttr.readable = False
+	numericAttr.writable = True
+	numericAttr.storable = True
+
+	SculptStackNodeClass.m_maxProjectionDistance = numericAttr.create("maxProjectionDistance", "mpd", om.MFnNumericData.kFloat, 1000)
+	numericAttr.readable = False
+	numericAttr.writable = True
+	numericAttr.storable = True
+
+	SculptStackNodeClass.m_layers = compoundAttr.create("layers", "ly")
+	compoundAttr.addChild(SculptStackNodeClass.m_curveMask)
+	compoundAttr.addChild(SculptStackNodeClass.m_sculptedMesh)
+	compoundAttr.addChild(SculptStackNodeClass.m_sculptStrength)
+	compoundAttr.addChild(SculptStackNodeClass.m_curveOffset)
+	compoundAttr.addChild(SculptStackNodeClass.m_maxProjectionDistance)
+	compoundAttr.array = True
+	compoundAttr.readable = False
+	compoundAttr.writable = True
+	compoundAttr.storable = True
+	SculptStackNodeClass.addAttribute(SculptStackNodeClass.m_layers)
+
+	# Output node attribute
+	SculptStackNodeClass.m_outMesh = typedAttr.create("outMesh", "m", om.MFnData.kMesh)
+	typedAttr.readable = True
+	typedAttr.writable = False
+	typedAttr.storable = False
+	SculptStackNodeClass.addAttribute(SculptStackNodeClass.m_outMesh)
+
+	# Read only compute statistics
+	NodeStats.addStatsAttributes(SculptStackNodeClass)
+
+	# Connect input/output dependencies
+	SculptStackNodeClass.attributeAffects(SculptStackNodeClass.m_terrain, SculptStackNodeClass.m_outMesh)
+	SculptStackNodeClass.attributeAffects(SculptStackNodeClass.m_layers, SculptStackNodeClass.m_outMesh)
+	SculptStackNodeClass.attributeAffects(SculptStackNodeClass.m_curveMask, SculptStackNodeClass.m_outMesh)
+	SculptStackNodeClass.attributeAffects(SculptStackNodeClass.m_sculptedMesh, SculptStackNodeClass.m_outMesh)
+	SculptStackNodeClass.attributeAffects(SculptStackNodeClass.m_sculptStrength, SculptStackNodeClass.m_outMesh)
+	SculptStackNodeClass.attributeAffects(SculptStackNodeClass.m_curveOffset, SculptStackNodeClass.m_outMesh)
+	SculptStackNodeClass.attributeAffects(SculptStackNodeClass.m_maxProjectionDistance, SculptStackNodeClass.m_outMesh)
+
+## Initialise the plugin when Maya loads it
+def initializePlugin(mobject):
+	mplugin = om.MFnPlugin(mobject)
+	try:
+		mplugin.registerNode(kPluginNodeName, kPluginNodeID, nodeCreator, nodeInitializer)
+	except:
+		sys.stderr.write("Failed to register node: " + kPluginNodeName)
+		raise
+
+## Uninitialise the plugin when Maya unloads it
+def uninitializePlugin(mobject):
+	mplugin = om.MFnPlugin(mobject)
+	try:
+		mplugin.deregisterNode(kPluginNodeID)
+	except:
+		sys.stderr.write("Failed to unregister node: " + kPluginNodeName)
+		raise
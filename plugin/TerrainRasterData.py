@@ -0,0 +1,342 @@
+## TerrainRasterData.py
+# This plugin registers the terrain raster and vertex buffer data types, and the nodes that convert between meshes and rasters
+
+import sys
+import numpy
+import maya.api.OpenMaya as om
+import maya.cmds as mc
+from terrain_core import TerrainRaster, buffers, topology
+
+#----------------------------------------------------------
+# Plugin
+#----------------------------------------------------------
+
+# Data info
+kPluginFileName = "TerrainRasterData.py"
+kPluginDataName = "TerrainRasterData"
+kPluginDataID = om.MTypeId(0x1007)
+kBufferDataName = "TerrainBufferData"
+kBufferDataID = om.MTypeId(0x100C)
+
+# Node info
+kMeshToRasterNodeName = "MeshToRasterNode"
+kMeshToRasterNodeID = om.MTypeId(0x1008)
+kRasterToMeshNodeName = "RasterToMeshNode"
+kRasterToMeshNodeID = om.MTypeId(0x1009)
+
+## This class holds a terrain raster so it can flow between nodes
+class TerrainRasterDataClass(om.MPxData):
+
+	## Constructor
+	def __init__(self):
+		om.MPxData.__init__(self)
+		self.m_raster = None
+
+	## Copy the raster from another data object
+	# @param _other The data to copy from
+	def copy(self, _other):
+		if _other.m_raster is None:
+			self.m_raster = None
+		else:
+			self.m_raster = _other.m_raster.copy()
+
+	## Get the type id of the data
+	def typeId(self):
+		return kPluginDataID
+
+	## Get the name of the data type
+	def name(self):
+		return kPluginDataName
+
+## This class holds the handle of a shared vertex buffer so it can flow between nodes
+class TerrainBufferDataClass(om.MPxData):
+
+	## Constructor
+	def __init__(self):
+		om.MPxData.__init__(self)
+		self.m_handle = None
+
+	## Copy the handle from another data object, the buffers are immutable so they are shared rather than copied
+	# @param _other The data to copy from
+	def copy(self, _other):
+		self.m_handle = _other.m_handle
+
+	## Get the type id of the data
+	def typeId(self):
+		return kBufferDataID
+
+	## Get the name of the data type
+	def name(self):
+		return kBufferDataName
+
+## Get the raster stored in a data handle
+# @param _dataHandle The data handle for a terrain raster attribute
+# @return The TerrainRaster, or None if nothing is connected
+def rasterFromDataHandle(_dataHandle):
+	data = _dataHandle.asPluginData()
+	if data is None:
+		return None
+	return data.m_raster
+
+## Store a raster in an output data handle
+# @param _dataHandle The output data handle for a terrain raster attribute
+# @param _raster The TerrainRaster to store
+def setRasterDataHandle(_dataHandle, _raster):
+	pluginDataFn = om.MFnPluginData()
+	dataObj = pluginDataFn.create(kPluginDataID)
+	pluginDataFn.data().m_raster = _raster
+	_dataHandle.setMObject(dataObj)
+
+## Get the vertex buffer a data handle refers to
+# @param _dataHandle The data handle for a vertex buffer attribute
+# @return The terrain_core.buffers.VertexBuffer, or None if nothing is connected
+def bufferFromDataHandle(_dataHandle):
+	data = _dataHandle.asPluginData()
+	if data is None or data.m_handle is None:
+		return None
+	return buffers.lookup(data.m_handle)
+
+## Store the handle of a vertex buffer in an output data handle
+# The registry does not keep the buffer alive, so the node outputting it has to hold it
+# @param _dataHandle The output data handle for a vertex buffer attribute
+# @param _buffer The VertexBuffer to store
+def setBufferDataHandle(_dataHandle, _buffer):
+	pluginDataFn = om.MFnPluginData()
+	dataObj = pluginDataFn.create(kBufferDataID)
+	pluginDataFn.data().m_handle = buffers.register(_buffer)
+	_dataHandle.setMObject(dataObj)
+
+## Get the positions of a mesh as a NumPy array
+# @param _meshFn The mesh function set
+# @return An (N, 3) array of positions
+def pointsAsArray(_meshFn):
+	return numpy.array(_meshFn.getPoints(), dtype=numpy.float64)[:, :3]
+
+## Set every vertex of a mesh from a NumPy array in one call
+# @param _meshFn The mesh function set
+# @param _points An (N, 3) array of positions in object space
+def setPointsFromArray(_meshFn, _points):
+	_meshFn.setPoints(om.MPointArray([om.MPoint(point) for point in numpy.asarray(_points, dtype=numpy.float64)[:, :3].tolist()]))
+
+## Get the triangles of a mesh as a NumPy array
+# @param _meshFn The mesh function set
+# @return An (M, 3) array of vertex indices
+def trianglesAsArray(_meshFn):
+	return numpy.array(_meshFn.getTriangles()[1], dtype=numpy.int64).reshape(-1, 3)
+
+## Get the faces of a mesh as NumPy arrays
+# @param _meshFn The mesh function set
+# @return An array of vertex counts per face and an array of face vertex indices
+def facesAsArrays(_meshFn):
+	faceCounts, faceConnects = _meshFn.getVertices()
+	return numpy.array(faceCounts, dtype=numpy.int64), numpy.array(faceConnects, dtype=numpy.int64)
+
+## Get the adjacency of a mesh from the shared topology cache
+# Meshes with the same face connectivity share one topology, so it is only built again when the topology changes
+# @param _meshFn The mesh function set
+# @return The terrain_core.topology.MeshTopology, it must not be modified
+def meshTopology(_meshFn):
+	faceCounts, faceConnects = facesAsArrays(_meshFn)
+	return topology.meshTopology(faceCounts, faceConnects, _meshFn.numVertices)
+
+## Unlock the normals around moved vertices, so Maya calculates them from the moved geometry
+# Normals may be locked upstream (e.g. analytic height field normals). A vertex sharing a face with a moved vertex is unlocked as well, as that face has moved
+# @param _meshFn The output mesh function set
+# @param _movedVertices An array or list of the indices of the moved vertices
+def unlockMovedNormals(_meshFn, _movedVertices):
+	movedVertices = numpy.asarray(_movedVertices, dtype=numpy.int64)
+	if len(movedVertices) == 0:
+		return
+	adjacency = meshTopology(_meshFn)
+	_meshFn.unlockVertexNormals(adjacency.facesVertices(adjacency.verticesFaces(movedVertices)).tolist())
+
+## Find the terrain output of a node, which can be a mesh shape, a terrain node or a boolean node
+# @param _nodeName The name of the node
+# @return A mesh data MObject or a TerrainRaster, or None if the node has no terrain output
+def terrainOutput(_nodeName):
+	selectionList = om.MSelectionList()
+	selectionList.add(_nodeName)
+	nodeFn = om.MFnDependencyNode(selectionList.getDependNode(0))
+	# Nodes with both outputs use the raster when their raster input is connected
+	if nodeFn.hasAttribute("outRaster"):
+		if not nodeFn.hasAttribute("inRaster") or nodeFn.findPlug("inRaster", False).isConnected:
+			data = om.MFnPluginData(nodeFn.findPlug("outRaster", False).asMObject()).data()
+			return data.m_raster
+	for attributeName in ("outMesh", "output"):
+		if nodeFn.hasAttribute(attributeName):
+			return nodeFn.findPlug(attributeName, False).asMObject()
+	return None
+
+## Create a mesh from a raster
+# @param _raster The TerrainRaster to convert
+# @param _parent The transform to create the mesh shape under, a new mesh data object is created if not given
+# @return The mesh data MObject, or the new transform if a null parent was given
+def meshFromRaster(_raster, _parent=None):
+	faceCounts, faceConnects = _raster.gridFaces()
+	# Build the vertex and face arrays in bulk, then create the mesh in one call
+	vertices = om.MPointArray([om.MPoint(p) for p in _raster.positions().tolist()])
+	parent = _parent
+	if parent is None:
+		meshDataFn = om.MFnMeshData()
+		parent = meshDataFn.create()
+	meshFn = om.MFnMesh()
+	meshObj = meshFn.create(vertices, faceCounts.tolist(), faceConnects.tolist(), parent=parent)
+	if _parent is None:
+		return parent
+	return meshObj
+
+## This class converts a grid mesh into a terrain raster
+class MeshToRasterNodeClass(om.MPxNode):
+	# Define the attributes
+	m_terrain = om.MObject()
+	m_outRaster = om.MObject()
+
+	## Constructor
+	def __init__(self):
+		om.MPxNode.__init__(self)
+
+	## The function that is called when the node is dirty
+	# @param _plug A plug for one of the i/o attributes
+	# @param _dataBlock The data used for the computations
+	def compute(self, _plug, _dataBlock):
+		# Check if the plug is the output
+		if (_plug == MeshToRasterNodeClass.m_outRaster):
+			terrainDataHandle = _dataBlock.inputValue(MeshToRasterNodeClass.m_terrain)
+			terrainValue = terrainDataHandle.asMesh()
+			outRasterDataHandle = _dataBlock.outputValue(MeshToRasterNodeClass.m_outRaster)
+
+			# Convert the mesh vertices to a raster
+			raster, sampleIndices = TerrainRaster.fromPoints(pointsAsArray(om.MFnMesh(terrainValue)))
+			if raster is None:
+				sys.stderr.write(kMeshToRasterNodeName + ": the terrain vertices do not lie on a regular XZ grid\n")
+
+			setRasterDataHandle(outRasterDataHandle, raster)
+			outRasterDataHandle.setClean()
+
+## This class converts a terrain raster into a grid mesh at the end of a chain
+class RasterToMeshNodeClass(om.MPxNode):
+	# Define the attributes
+	m_inRaster = om.MObject()
+	m_outMesh = om.MObject()
+
+	## Constructor
+	def __init__(self):
+		om.MPxNode.__init__(self)
+
+	## The function that is called when the node is dirty
+	# @param _plug A plug for one of the i/o attributes
+	# @param _dataBlock The data used for the computations
+	def compute(self, _plug, _dataBlock):
+		# Check if the plug is the output
+		if (_plug == RasterToMeshNodeClass.m_outMesh):
+			inRasterDataHandle = _dataBlock.inputValue(RasterToMeshNodeClass.m_inRaster)
+			raster = rasterFromDataHandle(inRasterDataHandle)
+			outMeshDataHandle = _dataBlock.outputValue(RasterToMeshNodeClass.m_outMesh)
+
+			if raster is not None:
+				outMeshDataHandle.setMObject(meshFromRaster(raster))
+			outMeshDataHandle.setClean()
+
+#----------------------------------------------------------
+# Plugin Initialisation
+#----------------------------------------------------------
+
+## This function tells Maya to use the Python API 2.0
+def maya_useNewAPI():
+	pass
+
+## Load this plugin if it is not loaded yet
+# The data types only exist once it is loaded, so the plugins with raster or buffer attributes, or that read them, call this before registering
+def loadDataPlugin():
+	if not mc.pluginInfo(kPluginFileName, query=True, loaded=True):
+		mc.loadPlugin(kPluginFileName)
+
+## Create an instance of the data
+def dataCreator():
+	return TerrainRasterDataClass()
+
+## Create an instance of the vertex buffer data
+def bufferDataCreator():
+	return TerrainBufferDataClass()
+
+## Create an instance of the mesh to raster node
+def meshToRasterCreator():
+	return MeshToRasterNodeClass()
+
+## Create an instance of the raster to mesh node
+def rasterToMeshCreator():
+	return RasterToMeshNodeClass()
+
+## Initialise the mesh to raster node attributes
+def meshToRasterInitializer():
+	typedAttr = om.MFnTypedAttribute()
+
+	# Input node attributes
+	MeshToRasterNodeClass.m_terrain = typedAttr.create("terrain", "t", om.MFnData.kMesh)
+	typedAttr.readable = False
+	typedAttr.writable = True
+	typedAttr.storable = True
+	MeshToRasterNodeClass.addAttribute(MeshToRasterNodeClass.m_terrain)
+
+	# Output node attribute
+	MeshToRasterNodeClass.m_outRaster = typedAttr.create("outRaster", "or", kPluginDataID)
+	typedAttr.readable = True
+	typedAttr.writable = False
+	typedAttr.storable = False
+	MeshToRasterNodeClass.addAttribute(MeshToRasterNodeClass.m_outRaster)
+
+	# Connect input/output dependencies
+	MeshToRasterNodeClass.attributeAffects(MeshToRasterNodeClass.m_terrain, MeshToRasterNodeClass.m_outRaster)
+
+## Initialise the raster to mesh node attributes
+def rasterToMeshInitializer():
+	typedAttr = om.MFnTypedAttribute()
+
+	# Input node attributes
+	RasterToMeshNodeClass.m_inRaster = typedAttr.create("inRaster", "ir", kPluginDataID)
+	typedAttr.readable = False
+	typedAttr.writable = True
+	typedAttr.storable = False
+	RasterToMeshNodeClass.addAttribute(RasterToMeshNodeClass.m_inRaster)
+
+	# Output node attribute
+	RasterToMeshNodeClass.m_outMesh = typedAttr.create("outMesh", "om", om.MFnData.kMesh)
+	typedAttr.readable = True
+	typedAttr.writable = False
+	typedAttr.storable = False
+	RasterToMeshNodeClass.addAttribute(RasterToMeshNodeClass.m_outMesh)
+
+	# Connect input/output dependencies
+	RasterToMeshNodeClass.attributeAffects(RasterToMeshNodeClass.m_inRaster, RasterToMeshNodeClass.m_outMesh)
+
+## Initialise the plugin when Maya loads it
+def initializePlugin(mobject):
+	mplugin = om.MFnPlugin(mobject)
+	try:
+		mplugin.registerData(kPluginDataName, kPluginDataID, dataCreator)
+		mplugin.registerData(kBufferDataName, kBufferDataID, bufferDataCreator)
+	except:
+		sys.stderr.write("Failed to register data: " + kPluginDataName)
+		raise
+	try:
+		mplugin.registerNode(kMeshToRasterNodeName, kMeshToRasterNodeID, meshToRasterCreator, meshToRasterInitializer)
+		mplugin.registerNode(kRasterToMeshNodeName, kRasterToMeshNodeID, rasterToMeshCreator, rasterToMeshInitializer)
+	except:
+		sys.stderr.write("Failed to register nodes for: " + kPluginDataName)
+		raise
+
+## Uninitialise the plugin when Maya unloads it
+def uninitializePlugin(mobject):
+	mplugin = om.MFnPlugin(mobject)
+	try:
+		mplugin.deregisterNode(kRasterToMeshNodeID)
+		mplugin.deregisterNode(kMeshToRasterNodeID)
+	except:
+		sys.stderr.write("Failed to unregister nodes for: " + kPluginDataName)
+		raise
+	try:
+		mplugin.deregisterData(kBufferDataID)
+		mplugin.deregisterData(kPluginDataID)
+	except:
+		sys.stderr.write("Failed to unregister data: " + kPluginDataName)
+		raise
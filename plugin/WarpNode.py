@@ -2,7 +2,11 @@
 # This node enables puppet warp on a region of the mesh
 
 import sys
+import numpy
 import maya.api.OpenMaya as om
+import TerrainRasterData
+from terrain_nodes import BackgroundNode, FrameCacheNode, NodeBuffers, NodeDiskCache, NodeFalloff, NodeFingerprints, NodeStats, ProgressWindow
+from terrain_core import TerrainRaster, background, falloff, fingerprints, framecache, stats, warp
 
 #----------------------------------------------------------
 # Plugin
@@ -12,6 +16,40 @@ import maya.api.OpenMaya as om
 kPluginNodeName = "WarpNode"
 kPluginNodeID = om.MTypeId(0x1006)
 
+# The OperatorChainNode uses these for each of its warp operators
+
+## Read the positions from an array of control points
+# @param _arrayDataHandle The array data handle for the control points
+# @return An (N, 3) array of positions
+def readControlPoints(_arrayDataHandle):
+	controlPoints = []
+	if (len(_arrayDataHandle) > 0):
+		_arrayDataHandle.jumpToPhysicalElement(0)
+		while not _arrayDataHandle.isDone():
+			inputDataHandle = _arrayDataHandle.inputValue()
+			point = inputDataHandle.asDouble3()
+			controlPoints.append(point)
+			_arrayDataHandle.next()
+	return numpy.array(controlPoints, dtype=numpy.float64).reshape(-1, 3)
+
+## Save control point weights with the scene
+# @param _kind The kind of weights
+# @param _key The digest of the inputs of the weights
+# @param _weights The control point weights
+def saveWeights(_kind, _key, _weights):
+	offsets, indices, weights = warp.weightsToCSR(_weights)
+	NodeDiskCache.save(_kind, _key, {"offsets": offsets, "indices": indices, "weights": weights})
+
+## Load control point weights saved with the scene
+# @param _kind The kind of weights
+# @param _key The digest of the inputs of the weights
+# @return The control point weights, or None if they have not been saved
+def loadWeights(_kind, _key):
+	savedWeights = NodeDiskCache.load(_kind, _key)
+	if savedWeights is None:
+		return None
+	return warp.weightsFromCSR(savedWeights["offsets"], savedWeights["indices"], savedWeights["weights"])
+
 ## This class is used to create the warp node
 class WarpNodeClass(om.MPxNode):
 	# Define the attributes
@@ -19,110 +57,141 @@ class WarpNodeClass(om.MPxNode):
 	m_controlPoints = om.MObject()
 	m_controlPointsOriginal = om.MObject()
 	m_maxRadius = om.MObject()
+	m_asyncCompute = om.MObject()
+	m_inRaster = om.MObject()
 	m_outMesh = om.MObject()
+	m_outRaster = om.MObject()
+	# The vertex buffer attributes are added by NodeBuffers
+	m_inBuffer = om.MObject()
+	m_outBuffer = om.MObject()
+	# The falloff attributes are added by NodeFalloff
+	m_falloff = om.MObject()
+	m_falloffRamp = om.MObject()
 
 	## Constructor
 	def __init__(self):
 		om.MPxNode.__init__(self)
-		self.m_firstCompute = True
+		self.m_fingerprints = fingerprints.InputFingerprints()
+		self.m_weightsKey = None
 		self.m_controlPointsOriginal = []
 		self.m_controlPointsVertices = []
+		self.m_affectedVertices = []
+		self.m_rasterKey = None
+		self.m_rasterWeights = []
+		self.m_stats = stats.ComputeStats(kPluginNodeName)
+		# The background workers are created on the first asynchronous compute, their state is only used by the worker threads
+		self.m_meshBackground = None
+		self.m_rasterBackground = None
+		self.m_backgroundWeightsKey = None
+		self.m_backgroundWeights = []
+		self.m_backgroundAffected = []
+		self.m_backgroundRasterKey = None
+		self.m_backgroundRasterWeights = []
+		# The frames computed synchronously, replayed when the timeline is scrubbed
+		self.m_meshFrames = framecache.FrameCache()
+		self.m_rasterFrames = framecache.FrameCache()
+		# The buffer of the terrain at the start of a chain, and the warped buffer for the inputs in m_outBufferKey
+		self.m_terrainBufferKey = None
+		self.m_terrainBuffer = None
+		self.m_outBufferKey = None
+		self.m_outBuffer = None
+		# The input buffer the weights were last calculated or updated for, compared with the next input buffer to find the moved vertices
+		self.m_weightsBuffer = None
 
 	## The function that is called when the node is dirty
+	# The compute is only wrapped in a profiler when a capture has been requested for this node or every node
 	# @param _plug A plug for one of the i/o attributes
 	# @param _dataBlock The data used for the computations
 	def compute(self, _plug, _dataBlock):
+		NodeStats.compute(self, _plug, _dataBlock)
+
+	## Record which input has been dirtied, so the next compute only fingerprints that input
+	# @param _plug The plug being dirtied
+	# @param _plugArray The plugs affected by it
+	def setDependentsDirty(self, _plug, _plugArray):
+		NodeFingerprints.setDependentsDirty(self, _plug)
+
+	## Record the dirtied inputs before the evaluation manager computes the node
+	# @param _context The context of the evaluation
+	# @param _evaluationNode The evaluation node, which knows the dirty plugs
+	def preEvaluation(self, _context, _evaluationNode):
+		NodeFingerprints.preEvaluation(self, _evaluationNode, [WarpNodeClass.m_terrain, WarpNodeClass.m_controlPoints, WarpNodeClass.m_controlPointsOriginal, WarpNodeClass.m_inRaster])
+
+	## Compute one of the outputs
+	# @param _plug A plug for one of the i/o attributes
+	# @param _dataBlock The data used for the computations
+	def computePlug(self, _plug, _dataBlock):
+		# Check if the plug is the output buffer, or the output mesh of a node in a chain of buffers
+		if (_plug == WarpNodeClass.m_outBuffer or (_plug == WarpNodeClass.m_outMesh and NodeBuffers.hasInputBuffer(self, _dataBlock))):
+			self.m_stats.begin()
+			outBuffer = self.warpBuffer(_dataBlock)
+			if (_plug == WarpNodeClass.m_outBuffer):
+				outBufferDataHandle = _dataBlock.outputValue(WarpNodeClass.m_outBuffer)
+				TerrainRasterData.setBufferDataHandle(outBufferDataHandle, outBuffer)
+				outBufferDataHandle.setClean()
+			else:
+				# Only the end of a chain needs a mesh, it is made from the terrain at the start of the chain
+				outMeshDataHandle = _dataBlock.outputValue(WarpNodeClass.m_outMesh)
+				outMeshDataHandle.setMObject(NodeBuffers.meshFromBuffer(kPluginNodeName, _dataBlock.inputValue(WarpNodeClass.m_terrain).asMesh(), outBuffer))
+				outMeshDataHandle.setClean()
+			NodeStats.endCompute(self, _plug, _dataBlock)
+
 		# Check if the plug is the output mesh
-		if (_plug == WarpNodeClass.m_outMesh):
+		elif (_plug == WarpNodeClass.m_outMesh):
+			self.m_stats.begin()
 			# Get handles for the attributes
 			terrainDataHandle = _dataBlock.inputValue(WarpNodeClass.m_terrain)
 			terrainValue = terrainDataHandle.asMesh()
 			maxRadiusDataHandle = _dataBlock.inputValue(WarpNodeClass.m_maxRadius)
 			maxRadiusValue = maxRadiusDataHandle.asFloat()
 			controlPointsDataHandle = _dataBlock.inputArrayValue(WarpNodeClass.m_controlPoints)
+			asyncDataHandle = _dataBlock.inputValue(WarpNodeClass.m_asyncCompute)
 			outMeshDataHandle = _dataBlock.outputValue(WarpNodeClass.m_outMesh)
 
 			# Get all the vertices from the terrain
 			inTerrainFn = om.MFnMesh(terrainValue)
-			vertexPositions = inTerrainFn.getPoints()
-
-			if self.m_firstCompute == True:
-				# Get a list of the original control points positions
-				controlPointsOriginalDataHandle = _dataBlock.inputArrayValue(WarpNodeClass.m_controlPointsOriginal)
-				self.m_controlPointsOriginal = []
-				if (len(controlPointsOriginalDataHandle) > 0):
-					controlPointsOriginalDataHandle.jumpToPhysicalElement(0)
-					while not controlPointsOriginalDataHandle.isDone():
-						inputDataHandle = controlPointsOriginalDataHandle.inputValue()
-						point = inputDataHandle.asDouble3()
-						self.m_controlPointsOriginal.append(point)
-						controlPointsOriginalDataHandle.next()
-
-				numControlPoints = len(self.m_controlPointsOriginal)
-
-				# Calculate the max radius for each control point
-				maxRadiusSquared = maxRadiusValue * maxRadiusValue
-				controlPointsRadii = numControlPoints * [maxRadiusSquared]
-				for i in range(numControlPoints):
-					distances = []
-					for j in range(numControlPoints):
-						dX = self.m_controlPointsOriginal[i][0] - self.m_controlPointsOriginal[j][0]
-						dZ = self.m_controlPointsOriginal[i][2] - self.m_controlPointsOriginal[j][2]
-						distances.append(dX*dX + dZ*dZ)
-					distances.sort()
-					if distances[3] < maxRadiusSquared:
-						controlPointsRadii[i] = distances[3]
-
-				# Calculate which vertices are affected
-				for i in range(numControlPoints):
-					tempArray = []
-					# Calculate the min and max X and Z coordinates
-					minX = self.m_controlPointsOriginal[i][0] - controlPointsRadii[i]
-					maxX = self.m_controlPointsOriginal[i][0] + controlPointsRadii[i]
-					minZ = self.m_controlPointsOriginal[i][2] - controlPointsRadii[i]
-					maxZ = self.m_controlPointsOriginal[i][2] + controlPointsRadii[i]
-					vertexIterator = om.MItMeshVertex(terrainValue)
-					position = om.MPoint()
-					while not vertexIterator.isDone():
-						position = vertexIterator.position(om.MSpace.kWorld)
-						if minX < position.x < maxX:
-							if minZ < position.z < maxZ:
-								index = vertexIterator.index()
-								dX = self.m_controlPointsOriginal[i][0] - position.x
-								dZ = self.m_controlPointsOriginal[i][2] - position.z
-								distanceSquared = dX * dX + dZ * dZ
-								if distanceSquared < controlPointsRadii[i]:
-									ratio = distanceSquared / controlPointsRadii[i]
-									softSelectValue = 1.0 - ratio
-									tempArray.append((index, softSelectValue))
-						vertexIterator.next()
-					self.m_controlPointsVertices.append(tempArray)
-				# Set this variable as false so this block of code is never recomputed
-				self.m_firstCompute = False
-
-			# Get a list of the control points positions
-			controlPoints = []
-			if (len(controlPointsDataHandle) > 0):
-				controlPointsDataHandle.jumpToPhysicalElement(0)
-			while not controlPointsDataHandle.isDone():
-				inputDataHandle = controlPointsDataHandle.inputValue()
-				point = inputDataHandle.asDouble3()
-				controlPoints.append(point)
-				controlPointsDataHandle.next()
-
-			# Compute the difference in positions
-			controlPointsDifference = []
-			for cp, cpOriginal in zip(controlPoints,self.m_controlPointsOriginal):
-				dX = cp[0] - cpOriginal[0]
-				dY = cp[1] - cpOriginal[1]
-				dZ = cp[2] - cpOriginal[2]
-				controlPointsDifference.append(om.MVector(dX,dY,dZ))
-
-			# Move the affected vertices
-			numControlPoints = len(self.m_controlPointsOriginal)
-			for i in range(numControlPoints):
-				for point in self.m_controlPointsVertices[i]:
-					vertexPositions[point[0]] += controlPointsDifference[i] * point[1]
+			points = TerrainRasterData.pointsAsArray(inTerrainFn)
+			falloffTable = NodeFalloff.falloffTable(self, _dataBlock)
+
+			frame = None
+			if not asyncDataHandle.asBool():
+				# Only the inputs dirtied since the last compute are fingerprinted again
+				inputs = NodeFingerprints.computeFingerprints(self, _dataBlock)
+				terrainKey = NodeFingerprints.inputFingerprint(inputs, WarpNodeClass.m_terrain, NodeFingerprints.meshFingerprint, inTerrainFn)
+				controlPointsOriginalKey = NodeFingerprints.inputFingerprint(inputs, WarpNodeClass.m_controlPointsOriginal, self.controlPointsFingerprint, _dataBlock, WarpNodeClass.m_controlPointsOriginal)
+				controlPointsKey = NodeFingerprints.inputFingerprint(inputs, WarpNodeClass.m_controlPoints, self.controlPointsFingerprint, _dataBlock, WarpNodeClass.m_controlPoints)
+				# The weights depend on the terrain, the original control points, the radius and the falloff
+				weightsKey = (terrainKey, controlPointsOriginalKey, maxRadiusValue, falloffTable.key())
+
+				# Replay the frame if it has been computed with the same inputs
+				FrameCacheNode.updateBudget(self, self.m_meshFrames, _dataBlock)
+				frameTime = FrameCacheNode.evaluationTime(_dataBlock)
+				frameKey = (weightsKey, controlPointsKey)
+				frame = self.m_meshFrames.get(frameTime, frameKey)
+
+			# Every path gives the indices of the moved vertices and their displacements
+			if asyncDataHandle.asBool():
+				# Hand the NumPy work to the background worker, and move the vertices by the last finished result
+				affectedVertices, affectedDisplacement = self.warpMeshInBackground(points, _dataBlock, maxRadiusValue, falloffTable)
+				delta = (numpy.array(affectedVertices, dtype=numpy.int64), numpy.array(affectedDisplacement, dtype=numpy.float64).reshape(-1, 3))
+			elif frame is not None:
+				self.m_stats.addCacheHit()
+				delta = frame
+			else:
+				# Calculate the weights again only when the terrain, original control points or radius change, moving the control points reuses them
+				self.updateWeights(_dataBlock, weightsKey, maxRadiusValue, falloffTable, lambda: points)
+
+				# Sum the control point movements at the affected vertices
+				controlPointsDifference = self.calculateControlPointsDifference(controlPointsDataHandle)
+				displacement = warp.displacements(len(points), self.m_controlPointsVertices, controlPointsDifference)
+				affectedVertices = numpy.array(self.m_affectedVertices, dtype=numpy.int64)
+				delta = (affectedVertices, displacement[affectedVertices])
+
+				# Store the frame unless the weights were cancelled
+				if self.m_weightsKey == weightsKey:
+					self.m_meshFrames.put(frameTime, frameKey, delta)
+
+			self.m_stats.addVertices(len(delta[0]))
 
 			# Create a copy of the mesh to output
 			meshDataFn = om.MFnMeshData()
@@ -130,14 +199,271 @@ class WarpNodeClass(om.MPxNode):
 			outTerrainFn = om.MFnMesh()
 			outTerrainFn.copy(terrainValue, outTerrain)
 
-			# Set the output vertices
-			outTerrainFn.setPoints(vertexPositions)
+			# Set the output vertices in one call
+			TerrainRasterData.setPointsFromArray(outTerrainFn, framecache.applyDelta(points, delta))
+			# Normals may be locked upstream (e.g. analytic height field normals), unlock them around the moved vertices
+			TerrainRasterData.unlockMovedNormals(outTerrainFn, delta[0])
 
 			# Set the output value
 			outMeshDataHandle.setMObject(outTerrain)
 
 			# Mark the output data handle as clean
 			outMeshDataHandle.setClean()
+			NodeStats.endCompute(self, _plug, _dataBlock)
+
+		# Check if the plug is the output raster
+		elif (_plug == WarpNodeClass.m_outRaster):
+			self.m_stats.begin()
+			inRasterDataHandle = _dataBlock.inputValue(WarpNodeClass.m_inRaster)
+			raster = TerrainRasterData.rasterFromDataHandle(inRasterDataHandle)
+			maxRadiusDataHandle = _dataBlock.inputValue(WarpNodeClass.m_maxRadius)
+			maxRadiusValue = maxRadiusDataHandle.asFloat()
+			controlPointsDataHandle = _dataBlock.inputArrayValue(WarpNodeClass.m_controlPoints)
+			asyncDataHandle = _dataBlock.inputValue(WarpNodeClass.m_asyncCompute)
+			outRasterDataHandle = _dataBlock.outputValue(WarpNodeClass.m_outRaster)
+			falloffTable = NodeFalloff.falloffTable(self, _dataBlock)
+
+			if raster is not None and asyncDataHandle.asBool():
+				# Hand the NumPy work to the background worker and output the last finished result
+				raster = self.warpRasterInBackground(raster, _dataBlock, maxRadiusValue, falloffTable)
+			elif raster is not None:
+				# Only the inputs dirtied since the last compute are fingerprinted again
+				inputs = NodeFingerprints.computeFingerprints(self, _dataBlock)
+				rasterInputKey = NodeFingerprints.inputFingerprint(inputs, WarpNodeClass.m_inRaster, fingerprints.rasterFingerprint, raster)
+				controlPointsOriginalKey = NodeFingerprints.inputFingerprint(inputs, WarpNodeClass.m_controlPointsOriginal, self.controlPointsFingerprint, _dataBlock, WarpNodeClass.m_controlPointsOriginal)
+				controlPointsKey = NodeFingerprints.inputFingerprint(inputs, WarpNodeClass.m_controlPoints, self.controlPointsFingerprint, _dataBlock, WarpNodeClass.m_controlPoints)
+
+				# Replay the frame if it has been computed with the same inputs
+				FrameCacheNode.updateBudget(self, self.m_rasterFrames, _dataBlock)
+				frameTime = FrameCacheNode.evaluationTime(_dataBlock)
+				frameKey = (rasterInputKey, controlPointsOriginalKey, controlPointsKey, maxRadiusValue, falloffTable.key())
+				frame = self.m_rasterFrames.get(frameTime, frameKey)
+				if frame is not None:
+					self.m_stats.addCacheHit()
+					raster = TerrainRaster(framecache.applyDelta(raster.m_heights.ravel(), frame).reshape(raster.resolution()), raster.m_origin, raster.m_spacing)
+				else:
+					# Calculate the control point weights once per raster grid, original control points, radius and falloff
+					rasterKey = (raster.resolution(), raster.m_origin, raster.m_spacing, controlPointsOriginalKey, maxRadiusValue, falloffTable.key())
+					if self.m_rasterKey != rasterKey:
+						controlPointsOriginalDataHandle = _dataBlock.inputArrayValue(WarpNodeClass.m_controlPointsOriginal)
+						self.m_controlPointsOriginal = readControlPoints(controlPointsOriginalDataHandle)
+						# The saved weights are found by a digest of the inputs rather than their fingerprints
+						diskKey = fingerprints.digest(raster.resolution(), raster.m_origin, raster.m_spacing, self.m_controlPointsOriginal, maxRadiusValue, falloffTable.m_values)
+						savedWeights = loadWeights("warpRasterWeights", diskKey)
+						if savedWeights is not None:
+							self.m_stats.addCacheHit()
+							self.m_rasterWeights = savedWeights
+							self.m_rasterKey = rasterKey
+						else:
+							controlPointsRadii = warp.controlPointRadii(self.m_controlPointsOriginal, maxRadiusValue)
+							# The weights of the previous grid cannot be used if the artist cancels
+							self.m_rasterKey = None
+							self.m_rasterWeights = []
+							with ProgressWindow.ProgressWindow("Calculating the warp weights") as window:
+								self.m_rasterWeights = warp.rasterControlPointWeights(raster, self.m_controlPointsOriginal, controlPointsRadii, window.token(), falloffTable)
+								self.m_rasterKey = rasterKey
+							if self.m_rasterKey == rasterKey:
+								saveWeights("warpRasterWeights", diskKey, self.m_rasterWeights)
+					else:
+						self.m_stats.addCacheHit()
+					self.m_stats.addVertices(raster.numSamples())
+
+					controlPointsDifference = self.calculateControlPointsDifference(controlPointsDataHandle)
+					inRaster = raster
+					raster = warp.warpRaster(raster, self.m_rasterWeights, controlPointsDifference)
+
+					# Store the frame unless the weights were cancelled
+					if self.m_rasterKey == rasterKey:
+						self.m_rasterFrames.put(frameTime, frameKey, framecache.sparseDelta(inRaster.m_heights.ravel(), raster.m_heights.ravel()))
+
+			TerrainRasterData.setRasterDataHandle(outRasterDataHandle, raster)
+			outRasterDataHandle.setClean()
+			NodeStats.endCompute(self, _plug, _dataBlock)
+
+	## Calculate the control point weights if the terrain, original control points, radius or falloff have changed
+	# The weights saved with the scene are loaded if they were calculated from the same inputs
+	# @param _dataBlock The data used for the computations
+	# @param _weightsKey The fingerprint of the inputs of the weights
+	# @param _maxRadius The maximum radius of a control point
+	# @param _falloff The terrain_core.falloff.FalloffTable of the weights
+	# @param _points A function returning an (N, 3) array of the terrain vertices, only called if the weights are loaded or calculated
+	# @param _dirtyRegion The terrain_core.regions.DirtyRegion of the vertices moved since the weights were calculated, or None if it is not known
+	# @param _positions A function returning the positions of an array of vertices, used to update the weights for the dirty region
+	def updateWeights(self, _dataBlock, _weightsKey, _maxRadius, _falloff, _points, _dirtyRegion=None, _positions=None):
+		if self.m_weightsKey == _weightsKey:
+			self.m_stats.addCacheHit()
+			return
+		# If only the terrain has moved, update the weights of the moved vertices, skipping them all if none were or are near a control point
+		if _dirtyRegion is not None and self.m_weightsKey is not None and self.m_weightsKey == (_dirtyRegion.m_previousKey,) + tuple(_weightsKey[1:]):
+			controlPointsRadii = warp.controlPointRadii(self.m_controlPointsOriginal, _maxRadius)
+			if _dirtyRegion.intersects(warp.influenceBounds(self.m_controlPointsOriginal, controlPointsRadii)):
+				self.m_stats.addVertices(len(_dirtyRegion.m_indices))
+				self.m_controlPointsVertices = warp.updateControlPointWeights(self.m_controlPointsVertices, _dirtyRegion.m_indices, _positions(_dirtyRegion.m_indices), self.m_controlPointsOriginal, controlPointsRadii, _falloff)
+				self.m_affectedVertices = warp.affectedIndices(self.m_controlPointsVertices).tolist()
+			self.m_weightsKey = _weightsKey
+			return
+		# Get a list of the original control points positions
+		controlPointsOriginalDataHandle = _dataBlock.inputArrayValue(WarpNodeClass.m_controlPointsOriginal)
+		self.m_controlPointsOriginal = readControlPoints(controlPointsOriginalDataHandle)
+
+		# The saved weights are found by a digest of the inputs rather than their fingerprints
+		points = _points()
+		diskKey = fingerprints.digest(numpy.asarray(points, dtype=numpy.float64)[:, :3], self.m_controlPointsOriginal, _maxRadius, _falloff.m_values)
+		savedWeights = loadWeights("warpWeights", diskKey)
+		if savedWeights is not None:
+			self.m_stats.addCacheHit()
+			self.m_controlPointsVertices = savedWeights
+			self.m_affectedVertices = warp.affectedIndices(self.m_controlPointsVertices).tolist()
+			self.m_weightsKey = _weightsKey
+			return
+
+		# Calculate which vertices are affected by each control point
+		controlPointsRadii = warp.controlPointRadii(self.m_controlPointsOriginal, _maxRadius)
+		# If the artist cancels, nothing moves and the weights are calculated again on the next compute
+		self.m_weightsKey = None
+		self.m_controlPointsVertices = []
+		self.m_affectedVertices = []
+		with ProgressWindow.ProgressWindow("Calculating the warp weights") as window:
+			self.m_controlPointsVertices = warp.controlPointWeights(points, self.m_controlPointsOriginal, controlPointsRadii, window.token(), _falloff)
+			# Store the indices of all the vertices that can move
+			self.m_affectedVertices = warp.affectedIndices(self.m_controlPointsVertices).tolist()
+			self.m_weightsKey = _weightsKey
+		if self.m_weightsKey == _weightsKey:
+			saveWeights("warpWeights", diskKey, self.m_controlPointsVertices)
+
+	## Warp the vertex buffer, only the pages with moved vertices are copied and the rest are shared with the input buffer
+	# When the input buffer has moved since the last compute, only the weights of the vertices it moved are calculated again
+	# This is always synchronous and does not cache frames
+	# @param _dataBlock The data used for the computations
+	# @return The warped VertexBuffer
+	def warpBuffer(self, _dataBlock):
+		maxRadiusValue = _dataBlock.inputValue(WarpNodeClass.m_maxRadius).asFloat()
+		controlPointsDataHandle = _dataBlock.inputArrayValue(WarpNodeClass.m_controlPoints)
+
+		# Only the inputs dirtied since the last compute are fingerprinted again, the buffers know their own fingerprints
+		inputs = NodeFingerprints.computeFingerprints(self, _dataBlock)
+		inBuffer = NodeBuffers.inputBuffer(self, _dataBlock, inputs)
+		controlPointsOriginalKey = NodeFingerprints.inputFingerprint(inputs, WarpNodeClass.m_controlPointsOriginal, self.controlPointsFingerprint, _dataBlock, WarpNodeClass.m_controlPointsOriginal)
+		controlPointsKey = NodeFingerprints.inputFingerprint(inputs, WarpNodeClass.m_controlPoints, self.controlPointsFingerprint, _dataBlock, WarpNodeClass.m_controlPoints)
+		falloffTable = NodeFalloff.falloffTable(self, _dataBlock)
+		weightsKey = (inBuffer.key(), controlPointsOriginalKey, maxRadiusValue, falloffTable.key())
+		outBufferKey = (weightsKey, controlPointsKey)
+		if self.m_outBufferKey == outBufferKey:
+			self.m_stats.addCacheHit()
+			return self.m_outBuffer
+
+		# The pages of the input buffer that changed give the vertices moved upstream
+		dirtyRegion = inBuffer.dirtyRegion(self.m_weightsBuffer) if self.m_weightsKey is not None else None
+		self.updateWeights(_dataBlock, weightsKey, maxRadiusValue, falloffTable, inBuffer.points, dirtyRegion, inBuffer.take)
+		self.m_weightsBuffer = inBuffer if self.m_weightsKey == weightsKey else None
+		affectedVertices, displacement = warp.affectedDisplacements(self.m_controlPointsVertices, self.calculateControlPointsDifference(controlPointsDataHandle))
+		self.m_stats.addVertices(len(affectedVertices))
+
+		# The node holds the buffer it outputs, the registry does not keep it alive
+		self.m_outBuffer = inBuffer.moved(affectedVertices, displacement)
+		# A cancelled warp is not kept, so it is calculated again on the next compute
+		self.m_outBufferKey = outBufferKey if self.m_weightsKey == weightsKey else None
+		return self.m_outBuffer
+
+	## Warp the mesh on the background worker
+	# @param _points An (N, 3) array of the terrain vertices
+	# @param _dataBlock The data used for the computations
+	# @param _maxRadius The maximum radius of a control point
+	# @param _falloff The terrain_core.falloff.FalloffTable of the weights
+	# @return The indices of the moved vertices and their displacements from the last finished job
+	def warpMeshInBackground(self, _points, _dataBlock, _maxRadius, _falloff):
+		if self.m_meshBackground is None:
+			self.m_meshBackground = background.BackgroundCompute(BackgroundNode.dirtyOnFinish(self, WarpNodeClass.m_outMesh))
+		controlPointsOriginal = readControlPoints(_dataBlock.inputArrayValue(WarpNodeClass.m_controlPointsOriginal))
+		controlPoints = readControlPoints(_dataBlock.inputArrayValue(WarpNodeClass.m_controlPoints))
+		key = fingerprints.fingerprint(_points, controlPointsOriginal, controlPoints, _maxRadius, _falloff.key())
+		self.m_meshBackground.submit(key, self.warpMeshJob, _points, controlPointsOriginal, controlPoints, _maxRadius, _falloff)
+		BackgroundNode.reportError(self, self.m_meshBackground, key)
+		resultKey, result = self.m_meshBackground.result()
+		if resultKey == key:
+			self.m_stats.addCacheHit()
+		# The last result cannot be shown if the number of vertices has changed
+		if result is None or result[0] != len(_points):
+			return [], []
+		return result[1], result[2]
+
+	## Calculate the warp of the mesh, this runs on the background worker so it does not use Maya
+	# The control point weights are kept while the terrain, original control points, radius and falloff are unchanged
+	# @param _points An (N, 3) array of the terrain vertices
+	# @param _controlPointsOriginal An (M, 3) array of the original control point positions
+	# @param _controlPoints An (M, 3) array of the control point positions
+	# @param _maxRadius The maximum radius of a control point
+	# @param _falloff The terrain_core.falloff.FalloffTable of the weights
+	# @param _progress The ProgressToken of the job, cancelled when newer inputs are submitted
+	# @return The number of vertices, the indices of the moved vertices and their displacements
+	def warpMeshJob(self, _points, _controlPointsOriginal, _controlPoints, _maxRadius, _falloff, _progress):
+		weightsKey = fingerprints.fingerprint(_points, _controlPointsOriginal, _maxRadius, _falloff.key())
+		if self.m_backgroundWeightsKey != weightsKey:
+			controlPointsRadii = warp.controlPointRadii(_controlPointsOriginal, _maxRadius)
+			self.m_backgroundWeightsKey = None
+			self.m_backgroundWeights = warp.controlPointWeights(_points, _controlPointsOriginal, controlPointsRadii, _progress, _falloff)
+			self.m_backgroundAffected = warp.affectedIndices(self.m_backgroundWeights)
+			self.m_backgroundWeightsKey = weightsKey
+		numControlPoints = min(len(_controlPoints), len(_controlPointsOriginal))
+		displacement = warp.displacements(len(_points), self.m_backgroundWeights, _controlPoints[:numControlPoints] - _controlPointsOriginal[:numControlPoints])
+		return len(_points), self.m_backgroundAffected.tolist(), displacement[self.m_backgroundAffected].tolist()
+
+	## Warp a raster on the background worker
+	# @param _raster The TerrainRaster to warp
+	# @param _dataBlock The data used for the computations
+	# @param _maxRadius The maximum radius of a control point
+	# @param _falloff The terrain_core.falloff.FalloffTable of the weights
+	# @return The warped TerrainRaster from the last finished job, or the input raster if there is none for this grid
+	def warpRasterInBackground(self, _raster, _dataBlock, _maxRadius, _falloff):
+		if self.m_rasterBackground is None:
+			self.m_rasterBackground = background.BackgroundCompute(BackgroundNode.dirtyOnFinish(self, WarpNodeClass.m_outRaster))
+		controlPointsOriginal = readControlPoints(_dataBlock.inputArrayValue(WarpNodeClass.m_controlPointsOriginal))
+		controlPoints = readControlPoints(_dataBlock.inputArrayValue(WarpNodeClass.m_controlPoints))
+		key = fingerprints.fingerprint(_raster.m_heights, _raster.m_origin, _raster.m_spacing, controlPointsOriginal, controlPoints, _maxRadius, _falloff.key())
+		# The worker gets its own copy in case the upstream raster is changed while it runs
+		self.m_rasterBackground.submit(key, self.warpRasterJob, _raster.copy(), controlPointsOriginal, controlPoints, _maxRadius, _falloff)
+		BackgroundNode.reportError(self, self.m_rasterBackground, key)
+		resultKey, result = self.m_rasterBackground.result()
+		if resultKey == key:
+			self.m_stats.addCacheHit()
+		self.m_stats.addVertices(_raster.numSamples())
+		if result is None or result.resolution() != _raster.resolution():
+			return _raster
+		return result
+
+	## Calculate the warp of a raster, this runs on the background worker so it does not use Maya
+	# @param _raster The TerrainRaster to warp
+	# @param _controlPointsOriginal An (M, 3) array of the original control point positions
+	# @param _controlPoints An (M, 3) array of the control point positions
+	# @param _maxRadius The maximum radius of a control point
+	# @param _falloff The terrain_core.falloff.FalloffTable of the weights
+	# @param _progress The ProgressToken of the job, cancelled when newer inputs are submitted
+	# @return The warped TerrainRaster
+	def warpRasterJob(self, _raster, _controlPointsOriginal, _controlPoints, _maxRadius, _falloff, _progress):
+		weightsKey = (_raster.resolution(), _raster.m_origin, _raster.m_spacing, fingerprints.fingerprint(_controlPointsOriginal, _maxRadius, _falloff.key()))
+		if self.m_backgroundRasterKey != weightsKey:
+			controlPointsRadii = warp.controlPointRadii(_controlPointsOriginal, _maxRadius)
+			self.m_backgroundRasterKey = None
+			self.m_backgroundRasterWeights = warp.rasterControlPointWeights(_raster, _controlPointsOriginal, controlPointsRadii, _progress, _falloff)
+			self.m_backgroundRasterKey = weightsKey
+		numControlPoints = min(len(_controlPoints), len(_controlPointsOriginal))
+		return warp.warpRaster(_raster, self.m_backgroundRasterWeights, _controlPoints[:numControlPoints] - _controlPointsOriginal[:numControlPoints])
+
+	## Calculate the fingerprint of an array of control points
+	# @param _dataBlock The data used for the computations
+	# @param _attribute The control points attribute
+	# @return The fingerprint
+	def controlPointsFingerprint(self, _dataBlock, _attribute):
+		return fingerprints.fingerprint(readControlPoints(_dataBlock.inputArrayValue(_attribute)))
+
+
+	## Calculate how far each control point has moved from its original position
+	# @param _controlPointsDataHandle The array data handle for the control points
+	# @return An (N, 3) array of movements
+	def calculateControlPointsDifference(self, _controlPointsDataHandle):
+		controlPoints = readControlPoints(_controlPointsDataHandle)
+		numControlPoints = min(len(controlPoints), len(self.m_controlPointsOriginal))
+		return controlPoints[:numControlPoints] - self.m_controlPointsOriginal[:numControlPoints]
 
 #----------------------------------------------------------
 # Plugin Initialisation
@@ -185,6 +511,18 @@ def nodeInitializer():
 	mFnNumericAttribute.storable = True
 	WarpNodeClass.addAttribute(WarpNodeClass.m_maxRadius)
 
+	WarpNodeClass.m_asyncCompute = mFnNumericAttribute.create("asyncCompute", "ac", om.MFnNumericData.kBoolean, False)
+	mFnNumericAttribute.readable = False
+	mFnNumericAttribute.writable = True
+	mFnNumericAttribute.storable = True
+	WarpNodeClass.addAttribute(WarpNodeClass.m_asyncCompute)
+
+	WarpNodeClass.m_inRaster = mFnTypedAttribute.create("inRaster", "ir", TerrainRasterData.kPluginDataID)
+	mFnTypedAttribute.readable = False
+	mFnTypedAttribute.writable = True
+	mFnTypedAttribute.storable = False
+	WarpNodeClass.addAttribute(WarpNodeClass.m_inRaster)
+
 	# Output node attributes
 	WarpNodeClass.m_outMesh = mFnTypedAttribute.create("outMesh", "om", om.MFnData.kMesh)
 	mFnTypedAttribute.readable = True
@@ -192,15 +530,52 @@ def nodeInitializer():
 	mFnTypedAttribute.storable = False
 	WarpNodeClass.addAttribute(WarpNodeClass.m_outMesh)
 
+	WarpNodeClass.m_outRaster = mFnTypedAttribute.create("outRaster", "or", TerrainRasterData.kPluginDataID)
+	mFnTypedAttribute.readable = True
+	mFnTypedAttribute.writable = False
+	mFnTypedAttribute.storable = False
+	WarpNodeClass.addAttribute(WarpNodeClass.m_outRaster)
+
+	# Vertex buffers shared with the other nodes in a chain
+	NodeBuffers.addBufferAttributes(WarpNodeClass)
+
+	# The falloff of the control point weights, quadratic as it has always been
+	NodeFalloff.addFalloffAttributes(WarpNodeClass, falloff.kQuadratic)
+
+	# Read only compute statistics
+	NodeStats.addStatsAttributes(WarpNodeClass)
+	# Memory budget of the frame caches in megabytes
+	FrameCacheNode.addFrameCacheAttributes(WarpNodeClass)
+
 	# Connect input/output dependencies
 	WarpNodeClass.attributeAffects(WarpNodeClass.m_terrain, WarpNodeClass.m_outMesh)
 	WarpNodeClass.attributeAffects(WarpNodeClass.m_controlPoints, WarpNodeClass.m_outMesh)
 	WarpNodeClass.attributeAffects(WarpNodeClass.m_controlPointsOriginal, WarpNodeClass.m_outMesh)
 	WarpNodeClass.attributeAffects(WarpNodeClass.m_maxRadius, WarpNodeClass.m_outMesh)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_asyncCompute, WarpNodeClass.m_outMesh)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_inRaster, WarpNodeClass.m_outRaster)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_controlPoints, WarpNodeClass.m_outRaster)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_controlPointsOriginal, WarpNodeClass.m_outRaster)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_maxRadius, WarpNodeClass.m_outRaster)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_asyncCompute, WarpNodeClass.m_outRaster)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_inBuffer, WarpNodeClass.m_outMesh)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_inBuffer, WarpNodeClass.m_outBuffer)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_terrain, WarpNodeClass.m_outBuffer)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_controlPoints, WarpNodeClass.m_outBuffer)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_controlPointsOriginal, WarpNodeClass.m_outBuffer)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_maxRadius, WarpNodeClass.m_outBuffer)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_falloff, WarpNodeClass.m_outMesh)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_falloff, WarpNodeClass.m_outRaster)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_falloff, WarpNodeClass.m_outBuffer)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_falloffRamp, WarpNodeClass.m_outMesh)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_falloffRamp, WarpNodeClass.m_outRaster)
+	WarpNodeClass.attributeAffects(WarpNodeClass.m_falloffRamp, WarpNodeClass.m_outBuffer)
 
 ## Initialise the plugin when Maya loads it
 def initializePlugin(mobject):
 	mplugin = om.MFnPlugin(mobject)
+	# The raster and buffer attributes need the terrain data types
+	TerrainRasterData.loadDataPlugin()
 	try:
 		mplugin.registerNode(kPluginNodeName, kPluginNodeID, nodeCreator, nodeInitializer)
 	except:
@@ -0,0 +1,7 @@
+## terrain_core
+# Maya independent terrain data structures and algorithms, operating on NumPy arrays
+# The plugins are adapters that convert Maya data to arrays and call into this package, so it can also run outside Maya
+
+from terrain_core.raster import TerrainRaster
+from terrain_core.tiles import TiledTerrainStore
+from terrain_core import background, buffers, cave, diskcache, falloff, fingerprints, framecache, heightmap, masks, meshio, profiling, progress, regions, river, sculpt, stats, topology, warp
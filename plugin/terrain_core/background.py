@@ -0,0 +1,108 @@
+## background.py
+# Run compute work on a background thread, keeping the result of the last finished job
+# Only one job runs at a time, a job that has not started is replaced by newer requests and a running job is cancelled by them
+
+import threading
+from terrain_core import progress
+
+## A worker thread that computes the latest requested job
+class BackgroundCompute(object):
+
+	## Constructor
+	# @param _onFinished A function called with the key of every finished job, it is called from the worker thread
+	def __init__(self, _onFinished=None):
+		self.m_onFinished = _onFinished
+		self.m_lock = threading.Lock()
+		self.m_thread = None
+		self.m_pending = None
+		self.m_runningKey = None
+		self.m_runningToken = None
+		self.m_resultKey = None
+		self.m_result = None
+		self.m_errorKey = None
+		self.m_error = None
+
+	## Request a job, replacing any job that has not started yet
+	# Nothing is done if the job is running, has the current result or failed
+	# @param _key The fingerprint of the job inputs, see terrain_core.fingerprints
+	# @param _function The function to run, it must not use Maya, and is given a ProgressToken after the arguments
+	# @param _args The arguments of the function, they must not be changed after submitting
+	def submit(self, _key, _function, *_args):
+		with self.m_lock:
+			if _key == self.m_runningKey:
+				# The inputs have gone back to the running job, so a newer pending job is stale
+				self.m_pending = None
+				return
+			if self.m_runningToken is not None:
+				# The running job is out of date, stop it at the end of its current chunk
+				self.m_runningToken.cancel()
+			if _key == self.m_resultKey or _key == self.m_errorKey:
+				self.m_pending = None
+				return
+			self.m_pending = (_key, _function, _args)
+			if self.m_thread is None:
+				self.m_thread = threading.Thread(target=self.run)
+				self.m_thread.daemon = True
+				self.m_thread.start()
+
+	## The worker thread, runs pending jobs until there are none left
+	def run(self):
+		while True:
+			with self.m_lock:
+				if self.m_pending is None:
+					self.m_thread = None
+					return
+				key, function, args = self.m_pending
+				self.m_pending = None
+				self.m_runningKey = key
+				self.m_runningToken = progress.ProgressToken()
+				token = self.m_runningToken
+			cancelled = False
+			try:
+				result = function(*(args + (token,)))
+				error = None
+			except progress.Cancelled:
+				cancelled = True
+			except Exception as exception:
+				result = None
+				error = exception
+			with self.m_lock:
+				self.m_runningKey = None
+				self.m_runningToken = None
+				if cancelled:
+					continue
+				if error is None:
+					self.m_resultKey = key
+					self.m_result = result
+					# Inputs that failed before are run again once they are submitted again
+					self.m_errorKey = None
+					self.m_error = None
+				else:
+					self.m_errorKey = key
+					self.m_error = error
+			if self.m_onFinished is not None:
+				self.m_onFinished(key)
+
+	## Cancel the pending and running jobs
+	def cancel(self):
+		with self.m_lock:
+			self.m_pending = None
+			if self.m_runningToken is not None:
+				self.m_runningToken.cancel()
+
+	## Get the result of the last finished job
+	# @return The key and the result, both None if no job has finished
+	def result(self):
+		with self.m_lock:
+			return self.m_resultKey, self.m_result
+
+	## Get the error of the last failed job, each error is only returned once so it is only reported once
+	# The failed inputs are not run again until another job has finished
+	# @return The key and the exception, both None if no job has failed since the last call
+	def takeError(self):
+		with self.m_lock:
+			if self.m_error is None:
+				return None, None
+			error = self.m_error
+			self.m_error = None
+			return self.m_errorKey, error
@@ -0,0 +1,160 @@
+## buffers.py
+# Vertex buffers shared between terrain nodes and copied on write a page at a time
+# A VertexBuffer is immutable and holds its positions in pages of kPageSize vertices. Moving some vertices makes a new buffer that only copies the pages they are in, and shares every other page with the buffer it was made from
+# Buffers are registered in a registry for the whole process, so nodes pass each other small integer handles instead of meshes
+
+import itertools
+import threading
+import weakref
+import numpy
+from terrain_core import fingerprints, regions
+
+# The number of vertices in a page
+kPageSize = 4096
+
+## An immutable array of vertex positions stored in read only pages
+class VertexBuffer(object):
+
+	## Constructor, use fromPoints or moved to create a buffer
+	# @param _pages A list of read only (kPageSize, 3) float64 arrays, the last page can be shorter
+	# @param _pageKeys An array of the fingerprints of the pages
+	def __init__(self, _pages, _pageKeys):
+		self.m_pages = _pages
+		self.m_pageKeys = _pageKeys
+		self.m_numVertices = sum(len(page) for page in _pages)
+		# The key is combined from the page fingerprints, so it is not calculated from every vertex again
+		self.m_key = (self.m_numVertices, fingerprints.fingerprint(_pageKeys))
+		# The handle is given by the registry
+		self.m_handle = None
+
+	## Get the number of vertices
+	# @return The number of vertices
+	def numVertices(self):
+		return self.m_numVertices
+
+	## Get the number of pages
+	# @return The number of pages
+	def numPages(self):
+		return len(self.m_pages)
+
+	## Get the fingerprint of the positions
+	# @return The fingerprint, equal for buffers with the same positions
+	def key(self):
+		return self.m_key
+
+	## Get the positions as one array
+	# @return A new (N, 3) array of positions, it can be modified
+	def points(self):
+		if len(self.m_pages) == 0:
+			return numpy.zeros((0, 3), dtype=numpy.float64)
+		return numpy.concatenate(self.m_pages)
+
+	## Get the positions of some vertices
+	# @param _indices An array of vertex indices
+	# @return An (M, 3) array of positions
+	def take(self, _indices):
+		indices = numpy.asarray(_indices, dtype=numpy.int64)
+		positions = numpy.empty((len(indices), 3), dtype=numpy.float64)
+		pageIndices = indices // kPageSize
+		for page in numpy.unique(pageIndices):
+			slots = numpy.flatnonzero(pageIndices == page)
+			positions[slots] = self.m_pages[page][indices[slots] - page * kPageSize]
+		return positions
+
+	## Make a buffer with some vertices moved, sharing the pages without moved vertices
+	# @param _indices An array of vertex indices, a vertex listed more than once is moved by the sum of its offsets
+	# @param _offsets An (M, 3) array of the offsets of the vertices
+	# @return The new VertexBuffer, or this buffer if nothing moved
+	def moved(self, _indices, _offsets):
+		indices = numpy.asarray(_indices, dtype=numpy.int64)
+		offsets = numpy.asarray(_offsets, dtype=numpy.float64).reshape(-1, 3)
+		if len(indices) == 0:
+			return self
+		pages = list(self.m_pages)
+		pageKeys = self.m_pageKeys.copy()
+		# Group the vertices by page, so each touched page is copied once
+		pageIndices = indices // kPageSize
+		order = numpy.argsort(pageIndices, kind="mergesort")
+		sortedPages = pageIndices[order]
+		starts = numpy.flatnonzero(numpy.concatenate(([True], sortedPages[1:] != sortedPages[:-1])))
+		ends = numpy.concatenate((starts[1:], [len(order)]))
+		for start, end in zip(starts, ends):
+			page = int(sortedPages[start])
+			slots = order[start:end]
+			pageCopy = pages[page].copy()
+			numpy.add.at(pageCopy, indices[slots] - page * kPageSize, offsets[slots])
+			pageCopy.flags.writeable = False
+			pages[page] = pageCopy
+			pageKeys[page] = fingerprints.fingerprint(pageCopy)
+		return VertexBuffer(pages, pageKeys)
+
+	## Find the vertices that differ from an earlier version of the buffer
+	# Only the pages with different fingerprints are compared, so the cost is in proportion to the pages that changed
+	# @param _previous The earlier VertexBuffer
+	# @return The terrain_core.regions.DirtyRegion, or None if there is no earlier buffer or it has a different number of vertices
+	def dirtyRegion(self, _previous):
+		if _previous is None or _previous.numVertices() != self.numVertices():
+			return None
+		indices = []
+		previousPoints = []
+		points = []
+		for page in numpy.flatnonzero(self.m_pageKeys != _previous.m_pageKeys):
+			changed = numpy.flatnonzero((self.m_pages[page] != _previous.m_pages[page]).any(axis=1))
+			indices.append(changed + page * kPageSize)
+			previousPoints.append(_previous.m_pages[page][changed])
+			points.append(self.m_pages[page][changed])
+		if len(indices) == 0:
+			return regions.DirtyRegion(_previous.key(), numpy.zeros(0, dtype=numpy.int64))
+		return regions.DirtyRegion(_previous.key(), numpy.concatenate(indices), regions.xzBounds(*(previousPoints + points)))
+
+	## Get the memory used by the pages, including pages shared with other buffers
+	# @return The size of the pages in bytes
+	def nbytes(self):
+		return sum(page.nbytes for page in self.m_pages)
+
+## Create a buffer from an array of positions
+# @param _points An (N, 3) array of positions, it is copied
+# @return The VertexBuffer
+def fromPoints(_points):
+	points = numpy.asarray(_points, dtype=numpy.float64)[:, :3]
+	pages = []
+	for start in range(0, len(points), kPageSize):
+		page = numpy.array(points[start:start + kPageSize])
+		page.flags.writeable = False
+		pages.append(page)
+	pageKeys = numpy.array([fingerprints.fingerprint(page) for page in pages], dtype=numpy.int64)
+	return VertexBuffer(pages, pageKeys)
+
+# The registered buffers by handle, a buffer is dropped once nothing else holds it
+registeredBuffers = weakref.WeakValueDictionary()
+registeredBuffersLock = threading.Lock()
+handleCounter = itertools.count(1)
+
+## Register a buffer so other nodes can find it by its handle
+# The registry does not keep the buffer alive, the node that made it has to hold it
+# @param _buffer The VertexBuffer
+# @return The handle of the buffer, a buffer registered again keeps its handle
+def register(_buffer):
+	with registeredBuffersLock:
+		if _buffer.m_handle is None:
+			_buffer.m_handle = next(handleCounter)
+			registeredBuffers[_buffer.m_handle] = _buffer
+		return _buffer.m_handle
+
+## Find a registered buffer
+# @param _handle The handle of the buffer
+# @return The VertexBuffer, or None if it has been dropped
+def lookup(_handle):
+	with registeredBuffersLock:
+		return registeredBuffers.get(_handle)
+
+## Get the memory used by every registered buffer, counting shared pages once
+# @return The size of the pages in bytes
+def registeredBytes():
+	with registeredBuffersLock:
+		buffers = list(registeredBuffers.values())
+	pages = {}
+	for buffer in buffers:
+		for page in buffer.m_pages:
+			pages[id(page)] = page.nbytes
+	return sum(pages.values())
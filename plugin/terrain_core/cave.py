@@ -0,0 +1,18 @@
+## cave.py
+# Offset a cave entrance curve into the terrain
+
+import numpy
+
+## Offset curve points into the terrain along the normal at the curve centre
+# Each point moves by the depth plus its own height above the centre along the normal, so the new curve lies in the plane below the centre
+# @param _curvePoints An (N, 3) array of curve CV positions
+# @param _centre The centre of the curve
+# @param _normal The terrain normal closest to the centre
+# @param _depth How far into the terrain to move the curve
+# @return An (N, 3) array of moved points
+def caveOffsetPoints(_curvePoints, _centre, _normal, _depth):
+	curvePoints = numpy.asarray(_curvePoints, dtype=numpy.float64)[:, :3]
+	normal = numpy.asarray(_normal, dtype=numpy.float64)[:3]
+	normal = normal / numpy.sqrt((normal * normal).sum())
+	offsets = (curvePoints - numpy.asarray(_centre, dtype=numpy.float64)[:3]).dot(normal)
+	return curvePoints - (offsets + _depth)[:, numpy.newaxis] * normal
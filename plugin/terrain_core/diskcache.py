@@ -0,0 +1,144 @@
+## diskcache.py
+# A content addressed cache of derived node state in compressed .npz files, so reopening a scene does not compute it again
+# Each file is named after the kind of state and the sha1 digest of its key, the digest of the input data
+# The least recently used files are removed once the folder is over its size limit
+
+import hashlib
+import os
+import tempfile
+import time
+import zipfile
+import numpy
+
+# The default size limit of a cache folder in megabytes
+kDefaultMaxSize = 2048.0
+# The extension of the cache files
+kExtension = ".npz"
+# The extension of the files being written
+kTemporaryExtension = ".tmp"
+# Temporary files older than this many seconds were left by a save that never finished
+kStaleTemporaryAge = 3600.0
+
+## A folder of cached arrays with a size limit
+class DiskCache(object):
+
+	## Constructor
+	# @param _directory The folder to store the files in, it is created when the first file is saved
+	# @param _maxSize The size limit of the folder in megabytes
+	def __init__(self, _directory, _maxSize=kDefaultMaxSize):
+		self.m_directory = _directory
+		self.m_maxSize = int(_maxSize * 1024 * 1024)
+
+	## Get the file of an entry
+	# @param _kind The kind of state, e.g. "warpWeights"
+	# @param _key The digest of the inputs, any value with a stable repr, see terrain_core.fingerprints.digest
+	# @return The path of the file
+	def path(self, _kind, _key):
+		digest = hashlib.sha1(repr(_key).encode("utf-8")).hexdigest()[:24]
+		return os.path.join(self.m_directory, _kind + "_" + digest + kExtension)
+
+	## Load an entry, marking it as recently used
+	# @param _kind The kind of state
+	# @param _key The digest of the inputs
+	# @return A dictionary of arrays, or None if there is no valid entry
+	def load(self, _kind, _key):
+		path = self.path(_kind, _key)
+		if not os.path.isfile(path):
+			return None
+		try:
+			with numpy.load(path) as data:
+				# The full key is stored in the file, so a hash collision is a miss
+				if str(data["key"]) != repr(_key):
+					return None
+				arrays = dict((name, data[name]) for name in data.files if name != "key")
+			os.utime(path, None)
+		except (IOError, OSError, KeyError, ValueError, zipfile.BadZipfile):
+			# A partly written or corrupt file is recomputed
+			return None
+		return arrays
+
+	## Save an entry, then remove the least recently used files if the folder is over its limit
+	# The file is written under a temporary name and renamed, so a crash never leaves a partial entry
+	# @param _kind The kind of state
+	# @param _key The digest of the inputs
+	# @param _arrays A dictionary of arrays
+	# @return Whether the entry was saved
+	def save(self, _kind, _key, _arrays):
+		path = self.path(_kind, _key)
+		temporaryPath = None
+		try:
+			if not os.path.isdir(self.m_directory):
+				os.makedirs(self.m_directory)
+			handle, temporaryPath = tempfile.mkstemp(suffix=kTemporaryExtension, dir=self.m_directory)
+			with os.fdopen(handle, "wb") as temporaryFile:
+				numpy.savez_compressed(temporaryFile, key=numpy.array(repr(_key)), **_arrays)
+			if os.path.exists(path):
+				os.remove(path)
+			os.rename(temporaryPath, path)
+			temporaryPath = None
+		except (IOError, OSError):
+			# The cache is optional, a read only or full disk only means the state is computed again
+			return False
+		finally:
+			# A failed write does not leave its temporary file behind
+			if temporaryPath is not None:
+				try:
+					os.remove(temporaryPath)
+				except OSError:
+					pass
+		self.evict()
+		return True
+
+	## Get the cache files from least to most recently used
+	# @param _extension The extension of the files
+	# @return A list of (modified time, size, path)
+	def files(self, _extension=kExtension):
+		if not os.path.isdir(self.m_directory):
+			return []
+		entries = []
+		for name in os.listdir(self.m_directory):
+			if name.endswith(_extension):
+				path = os.path.join(self.m_directory, name)
+				try:
+					entries.append((os.path.getmtime(path), os.path.getsize(path), path))
+				except OSError:
+					pass
+		return sorted(entries)
+
+	## Get the temporary files left behind by saves that never finished, such as when Maya crashed while writing
+	# Younger temporary files may still be being written by another Maya session
+	# @return A list of (modified time, size, path)
+	def staleFiles(self):
+		oldest = time.time() - kStaleTemporaryAge
+		return [entry for entry in self.files(kTemporaryExtension) if entry[0] < oldest]
+
+	## Remove the stale temporary files, then the least recently used files until the folder is within its limit
+	def evict(self):
+		for mtime, size, path in self.staleFiles():
+			try:
+				os.remove(path)
+			except OSError:
+				pass
+		entries = self.files()
+		total = sum(size for mtime, size, path in entries)
+		for mtime, size, path in entries:
+			if total <= self.m_maxSize:
+				break
+			try:
+				os.remove(path)
+				total -= size
+			except OSError:
+				pass
+
+	## Get the size of the cache files
+	# @return The size in bytes
+	def size(self):
+		return sum(size for mtime, size, path in self.files())
+
+	## Remove every cache file and the stale temporary files
+	def clear(self):
+		for mtime, size, path in self.files() + self.staleFiles():
+			try:
+				os.remove(path)
+			except OSError:
+				pass
@@ -0,0 +1,93 @@
+## falloff.py
+# Soft selection falloff kernels, evaluated over whole arrays through lookup tables
+# A kernel maps the distance from the centre of a soft selection, as a fraction of its radius, to a weight from 1 at the centre to 0 at the edge
+# The tables are indexed by the squared fraction, which the sculpt and warp selections already calculate, so no square roots are taken
+
+import numpy
+from terrain_core import fingerprints
+
+# The kernels, the values of the falloff attribute of the nodes
+kSculpt = 0
+kQuadratic = 1
+kSmoothstep = 2
+kGaussian = 3
+kWendland = 4
+kRamp = 5
+kKernelNames = ["Sculpt", "Quadratic", "Smoothstep", "Gaussian", "Wendland", "Ramp"]
+
+# The number of entries in a table
+kTableSize = 1024
+# The Gaussian is exp(-kGaussianSharpness * fraction^2), shifted and scaled to reach 0 at the edge
+kGaussianSharpness = 4.0
+
+## A falloff kernel sampled at evenly spaced squared distance fractions
+class FalloffTable(object):
+
+	## Constructor
+	# @param _values The weights at kTableSize squared distance fractions from 0 to 1
+	def __init__(self, _values):
+		self.m_values = numpy.array(_values, dtype=numpy.float64)
+		self.m_values.flags.writeable = False
+		self.m_key = fingerprints.fingerprint(self.m_values)
+
+	## Get the fingerprint of the table, so the weights made with it are calculated again when the kernel changes
+	# @return The fingerprint
+	def key(self):
+		return self.m_key
+
+	## Evaluate the kernel, interpolating linearly between the entries
+	# @param _distanceSquaredRatios An array of squared distances divided by the squared radius, values above 1 are outside and weigh 0
+	# @return An array of weights
+	def evaluate(self, _distanceSquaredRatios):
+		position = numpy.clip(numpy.asarray(_distanceSquaredRatios, dtype=numpy.float64), 0.0, 1.0) * (kTableSize - 1)
+		lower = numpy.minimum(position.astype(numpy.int64), kTableSize - 2)
+		fraction = position - lower
+		return self.m_values[lower] + (self.m_values[lower + 1] - self.m_values[lower]) * fraction
+
+## Evaluate a kernel exactly
+# @param _kernel One of the kernel constants, other than kRamp
+# @param _fractions An array of distances as fractions of the radius, from 0 to 1
+# @return An array of weights
+def kernelValues(_kernel, _fractions):
+	fractions = numpy.asarray(_fractions, dtype=numpy.float64)
+	squared = fractions * fractions
+	if _kernel == kSculpt:
+		# The original sculpt layer falloff, 2 + 2 / (ratio - 2) of the squared fraction
+		return 2.0 * (1.0 - squared) / (2.0 - squared)
+	if _kernel == kQuadratic:
+		# The original warp falloff
+		return 1.0 - squared
+	if _kernel == kSmoothstep:
+		return 1.0 - squared * (3.0 - 2.0 * fractions)
+	if _kernel == kGaussian:
+		edge = numpy.exp(-kGaussianSharpness)
+		return (numpy.exp(-kGaussianSharpness * squared) - edge) / (1.0 - edge)
+	if _kernel == kWendland:
+		# Wendland's C2 kernel
+		return (1.0 - fractions) ** 4 * (4.0 * fractions + 1.0)
+	raise ValueError("Unknown falloff kernel " + str(_kernel))
+
+# The tables of the kernels, built the first time each is used
+kernelTables = {}
+
+## Get the table of a kernel
+# @param _kernel One of the kernel constants, other than kRamp
+# @return The FalloffTable
+def kernelTable(_kernel):
+	table = kernelTables.get(_kernel)
+	if table is None:
+		fractions = numpy.sqrt(numpy.linspace(0.0, 1.0, kTableSize))
+		table = FalloffTable(kernelValues(_kernel, fractions))
+		kernelTables[_kernel] = table
+	return table
+
+## Build the table of a ramp drawn by the artist
+# @param _positions An array of distance fractions from 0 to 1
+# @param _values An array of the weights at the positions
+# @return The FalloffTable, the ramp is linear between the positions and constant beyond the first and last
+def rampTable(_positions, _values):
+	positions = numpy.asarray(_positions, dtype=numpy.float64)
+	values = numpy.asarray(_values, dtype=numpy.float64)
+	order = numpy.argsort(positions, kind="mergesort")
+	fractions = numpy.sqrt(numpy.linspace(0.0, 1.0, kTableSize))
+	return FalloffTable(numpy.interp(fractions, positions[order], values[order]))
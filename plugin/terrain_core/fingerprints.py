@@ -0,0 +1,104 @@
+## fingerprints.py
+# Cheap fingerprints of node inputs, so the nodes compare a checksum rather than every value
+# InputFingerprints keeps the fingerprint of each input of a node and only calculates it again once the input has been dirtied
+# The fingerprints are 32-bit checksums, so state kept across sessions is keyed by a digest instead
+
+import hashlib
+import itertools
+import zlib
+import numpy
+
+## Calculate a fingerprint of some values
+# @param _values Arrays, numbers or tuples of numbers
+# @return An integer that changes when any of the values change
+def fingerprint(*_values):
+	checksum = 0
+	for value in _values:
+		array = numpy.ascontiguousarray(value)
+		checksum = zlib.crc32((str(array.dtype) + str(array.shape)).encode("ascii"), checksum)
+		checksum = zlib.crc32(array.tobytes(), checksum)
+	return checksum & 0xffffffff
+
+## Calculate a strong digest of some values, for keys that outlive the session such as the disk cache
+# @param _values Arrays, numbers or tuples of numbers, as for fingerprint
+# @return A hexadecimal string that changes when any of the values change
+def digest(*_values):
+	hasher = hashlib.sha1()
+	for value in _values:
+		array = numpy.ascontiguousarray(value)
+		hasher.update((str(array.dtype) + str(array.shape)).encode("ascii"))
+		hasher.update(array.tobytes())
+	return hasher.hexdigest()
+
+## Calculate the fingerprint of the positions of a mesh
+# @param _points An (N, 3) array of vertex positions
+# @return The fingerprint
+def pointsFingerprint(_points):
+	return fingerprint(numpy.asarray(_points, dtype=numpy.float64)[:, :3])
+
+## Calculate the fingerprint of the face connectivity of a mesh
+# @param _faceCounts An array of the number of vertices of each face
+# @param _faceVertices An array of the vertex indices of every face
+# @return The fingerprint
+def topologyFingerprint(_faceCounts, _faceVertices):
+	return fingerprint(numpy.asarray(_faceCounts, dtype=numpy.int64), numpy.asarray(_faceVertices, dtype=numpy.int64))
+
+## Calculate the fingerprint of a NURBS curve
+# @param _cvs An (N, 3) array of the CV positions
+# @param _knots An array of the knots
+# @param _degree The degree of the curve
+# @return The fingerprint
+def curveFingerprint(_cvs, _knots, _degree):
+	return fingerprint(numpy.asarray(_cvs, dtype=numpy.float64)[:, :3], numpy.asarray(_knots, dtype=numpy.float64), _degree)
+
+## Calculate the fingerprint of a raster
+# @param _raster A TerrainRaster
+# @return The fingerprint
+def rasterFingerprint(_raster):
+	return fingerprint(_raster.m_heights, _raster.m_origin, _raster.m_spacing)
+
+# Input versions are unique across every InputFingerprints, so the versions of a new instance never match older keys
+versionCounter = itertools.count(1)
+
+## The fingerprints of the inputs of a node
+# The node marks an input dirty when it changes, and its fingerprint is calculated again the next time it is asked for
+class InputFingerprints(object):
+
+	## Constructor
+	def __init__(self):
+		self.m_fingerprints = {}
+		self.m_dirty = set()
+
+	## Mark an input as changed
+	# @param _name The name of the input
+	def setDirty(self, _name):
+		self.m_dirty.add(_name)
+
+	## Check if an input has changed since its fingerprint was calculated
+	# @param _name The name of the input
+	# @return Whether the fingerprint has to be calculated again
+	def isDirty(self, _name):
+		return _name in self.m_dirty or _name not in self.m_fingerprints
+
+	## Get the fingerprint of an input, calculating it only if the input is dirty
+	# @param _name The name of the input
+	# @param _function The function calculating the fingerprint
+	# @param _args The arguments of the function
+	# @return The fingerprint
+	def fingerprint(self, _name, _function, *_args):
+		if self.isDirty(_name):
+			self.m_fingerprints[_name] = _function(*_args)
+			self.m_dirty.discard(_name)
+		return self.m_fingerprints[_name]
+
+	## Get the version of an input, a number that changes every time the input is dirtied
+	# This is cheaper than a fingerprint for large inputs, but setting the same value again counts as a change
+	# @param _name The name of the input
+	# @return The version
+	def version(self, _name):
+		return self.fingerprint(_name, next, versionCounter)
+
+	## Forget every fingerprint, so they are all calculated again
+	def clear(self):
+		self.m_fingerprints.clear()
+		self.m_dirty.clear()
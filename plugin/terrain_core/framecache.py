@@ -0,0 +1,104 @@
+## framecache.py
+# A memory bounded cache of the frames a node has computed, so scrubbing the timeline and playblasts replay them
+# A frame is stored as a sparse delta, the indices of the values the node moved and their offsets, keyed by the time and a fingerprint of the inputs
+# The least recently used frames are evicted once the cache is over its memory budget
+
+import collections
+import numpy
+
+# The default memory budget of a cache in megabytes
+kDefaultBudget = 256.0
+
+## Calculate the sparse delta between the input and output of a node
+# @param _input An array of values
+# @param _output An array of the same shape
+# @return The flat indices of the values that changed and their offsets
+def sparseDelta(_input, _output):
+	before = numpy.asarray(_input).reshape(len(_input), -1)
+	after = numpy.asarray(_output).reshape(len(_output), -1)
+	indices = numpy.nonzero((before != after).any(axis=1))[0]
+	# The offsets are calculated in double precision so applying them gives back the exact output
+	return indices.astype(numpy.int64), after[indices].astype(numpy.float64) - before[indices]
+
+## Apply a sparse delta to the input of a node
+# @param _input An array of values, it is not modified
+# @param _delta The indices and offsets of a frame
+# @return A copy of the input with the offsets added
+def applyDelta(_input, _delta):
+	indices, offsets = _delta
+	output = numpy.array(_input)
+	flat = output.reshape(len(output), -1)
+	flat[indices] = flat[indices] + offsets.reshape(len(indices), -1)
+	return output
+
+## The size of a frame
+# @param _frame A tuple of arrays
+# @return The number of bytes used by the arrays
+def frameSize(_frame):
+	return sum(numpy.asarray(array).nbytes for array in _frame)
+
+## A least recently used cache of frames with a memory budget
+class FrameCache(object):
+
+	## Constructor
+	# @param _budget The memory budget in megabytes, 0 disables the cache
+	def __init__(self, _budget=kDefaultBudget):
+		self.m_frames = collections.OrderedDict()
+		self.m_budget = 0
+		self.m_memory = 0
+		self.m_hits = 0
+		self.m_misses = 0
+		self.setBudget(_budget)
+
+	## Change the memory budget, evicting frames if the cache is over it
+	# @param _budget The memory budget in megabytes, 0 disables the cache
+	def setBudget(self, _budget):
+		self.m_budget = int(max(_budget, 0.0) * 1024 * 1024)
+		self.evict()
+
+	## Get a frame, marking it as the most recently used
+	# @param _time The time of the frame
+	# @param _key The fingerprint of the inputs
+	# @return The frame, or None if it is not cached
+	def get(self, _time, _key):
+		frame = self.m_frames.pop((_time, _key), None)
+		if frame is None:
+			self.m_misses += 1
+			return None
+		self.m_frames[(_time, _key)] = frame
+		self.m_hits += 1
+		return frame
+
+	## Store a frame, frames larger than the whole budget are not stored
+	# @param _time The time of the frame
+	# @param _key The fingerprint of the inputs
+	# @param _frame A tuple of arrays, they must not be changed after storing
+	def put(self, _time, _key, _frame):
+		size = frameSize(_frame)
+		if size > self.m_budget:
+			return
+		previous = self.m_frames.pop((_time, _key), None)
+		if previous is not None:
+			self.m_memory -= frameSize(previous)
+		self.m_frames[(_time, _key)] = _frame
+		self.m_memory += size
+		self.evict()
+
+	## Remove the least recently used frames until the cache is within its budget
+	def evict(self):
+		while self.m_memory > self.m_budget and len(self.m_frames) > 0:
+			key, frame = self.m_frames.popitem(last=False)
+			self.m_memory -= frameSize(frame)
+
+	## Remove every frame
+	def clear(self):
+		self.m_frames.clear()
+		self.m_memory = 0
+
+	## Get the memory used by the frames
+	# @return The size of the cached frames in bytes
+	def memory(self):
+		return self.m_memory
+
+	def __len__(self):
+		return len(self.m_frames)
@@ -0,0 +1,285 @@
+## heightmap.py
+# 16-bit heightmap files, exported in strips of rows and imported through memory maps
+
+import math
+import os
+import struct
+import zlib
+import numpy
+
+# Supported file formats
+kFormats = ("raw", "pgm", "png")
+kPngSignature = b"\x89PNG\r\n\x1a\n"
+
+## Work out the heightmap format from a file name
+# @param _path The file path
+# @return The format name, or None if the extension is not supported
+def formatFromPath(_path):
+	extension = _path.rsplit(".", 1)[-1].lower()
+	if extension in ("r16", "raw"):
+		return "raw"
+	if extension in kFormats:
+		return extension
+	return None
+
+## Memory map a RAW or PGM heightmap without reading it
+# RAW files are 16-bit little endian, if the size is not given they are assumed to be square
+# @param _path The heightmap file
+# @param _numRows The number of rows in a RAW file
+# @param _numColumns The number of columns in a RAW file
+# @return A read only 2D memory mapped array and the value that represents the maximum height
+def mapHeightmap(_path, _numRows=None, _numColumns=None):
+	heightmapFormat = formatFromPath(_path)
+	if heightmapFormat == "raw":
+		numValues = os.path.getsize(_path) // 2
+		if _numRows is None and _numColumns is None:
+			_numRows = _numColumns = int(round(math.sqrt(numValues)))
+		elif _numRows is None:
+			_numRows = numValues // _numColumns
+		elif _numColumns is None:
+			_numColumns = numValues // _numRows
+		if _numRows * _numColumns != numValues:
+			raise ValueError("RAW heightmap size does not match %d x %d: %s" % (_numRows, _numColumns, _path))
+		return numpy.memmap(_path, dtype="<u2", mode="r", shape=(_numRows, _numColumns)), 65535
+	elif heightmapFormat == "pgm":
+		with open(_path, "rb") as pgmFile:
+			header = pgmFile.read(512)
+		# The header is the magic number, width, height and max value separated by whitespace and comments
+		tokens = []
+		position = 0
+		while len(tokens) < 4:
+			while position < len(header) and header[position:position + 1].isspace():
+				position += 1
+			if header[position:position + 1] == b"#":
+				position = header.index(b"\n", position)
+				continue
+			start = position
+			while position < len(header) and not header[position:position + 1].isspace():
+				position += 1
+			tokens.append(header[start:position])
+		if tokens[0] != b"P5":
+			raise ValueError("Only binary PGM heightmaps are supported: " + _path)
+		numColumns, numRows, maxValue = int(tokens[1]), int(tokens[2]), int(tokens[3])
+		dtype = ">u2" if maxValue > 255 else "u1"
+		return numpy.memmap(_path, dtype=dtype, mode="r", offset=position + 1, shape=(numRows, numColumns)), maxValue
+	raise ValueError("Only RAW and PGM heightmaps can be memory mapped: " + _path)
+
+## Convert heights to 16-bit values
+# @param _heights An array of heights
+# @param _low The height stored as 0
+# @param _high The height stored as 65535
+# @return An array of uint16
+def quantize(_heights, _low, _high):
+	scale = 65535.0 / (_high - _low) if _high > _low else 0.0
+	values = (numpy.asarray(_heights, dtype=numpy.float64) - _low) * scale
+	return numpy.clip(numpy.rint(values), 0, 65535).astype(numpy.uint16)
+
+## This class writes a 16-bit greyscale heightmap one strip of rows at a time
+class HeightmapWriter(object):
+
+	## Constructor
+	# @param _path The file to write
+	# @param _format The file format, one of raw, pgm or png
+	# @param _numRows The number of rows in the heightmap
+	# @param _numColumns The number of columns in the heightmap
+	# @param _low The height stored as 0
+	# @param _high The height stored as 65535
+	def __init__(self, _path, _format, _numRows, _numColumns, _low, _high):
+		if _format not in kFormats:
+			raise ValueError("Unsupported heightmap format: " + str(_format))
+		self.m_format = _format
+		self.m_numRows = _numRows
+		self.m_numColumns = _numColumns
+		self.m_low = _low
+		self.m_high = _high
+		self.m_rowsWritten = 0
+		self.m_file = open(_path, "wb")
+		if self.m_format == "pgm":
+			self.m_file.write(("P5\n%d %d\n65535\n" % (_numColumns, _numRows)).encode("ascii"))
+		elif self.m_format == "png":
+			self.m_compressor = zlib.compressobj(6)
+			self.m_file.write(kPngSignature)
+			# 16-bit greyscale, no interlacing
+			self.writePngChunk(b"IHDR", struct.pack(">IIBBBBB", _numColumns, _numRows, 16, 0, 0, 0, 0))
+
+	## Write the next strip of rows
+	# @param _heights A 2D array of heights with the same number of columns as the heightmap
+	def writeStrip(self, _heights):
+		values = quantize(_heights, self.m_low, self.m_high)
+		if values.ndim != 2 or values.shape[1] != self.m_numColumns or self.m_rowsWritten + values.shape[0] > self.m_numRows:
+			raise ValueError("Heightmap strip does not fit the heightmap")
+		if self.m_format == "raw":
+			self.m_file.write(values.astype("<u2").tobytes())
+		elif self.m_format == "pgm":
+			self.m_file.write(values.astype(">u2").tobytes())
+		else:
+			# Every PNG row starts with a filter type byte, 0 means no filtering
+			rows = numpy.zeros((values.shape[0], self.m_numColumns * 2 + 1), dtype=numpy.uint8)
+			rows[:, 1:] = values.astype(">u2").view(numpy.uint8).reshape(values.shape[0], -1)
+			compressed = self.m_compressor.compress(rows.tobytes())
+			if len(compressed) > 0:
+				self.writePngChunk(b"IDAT", compressed)
+		self.m_rowsWritten += values.shape[0]
+
+	## Finish the file
+	def close(self):
+		if self.m_file is None:
+			return
+		if self.m_rowsWritten != self.m_numRows:
+			self.m_file.close()
+			self.m_file = None
+			raise ValueError("Heightmap was closed after %d of %d rows" % (self.m_rowsWritten, self.m_numRows))
+		if self.m_format == "png":
+			self.writePngChunk(b"IDAT", self.m_compressor.flush())
+			self.writePngChunk(b"IEND", b"")
+		self.m_file.close()
+		self.m_file = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, _type, _value, _traceback):
+		if _type is None:
+			self.close()
+		elif self.m_file is not None:
+			self.m_file.close()
+			self.m_file = None
+
+	## Write a PNG chunk with its length and CRC
+	# @param _type The four byte chunk type
+	# @param _data The chunk data
+	def writePngChunk(self, _type, _data):
+		self.m_file.write(struct.pack(">I", len(_data)))
+		self.m_file.write(_type)
+		self.m_file.write(_data)
+		self.m_file.write(struct.pack(">I", zlib.crc32(_type + _data) & 0xffffffff))
+
+## Rasterise the top surface of a triangle mesh onto a strip of a regular XZ grid
+# @param _points An (N, 3) array of vertex positions
+# @param _triangles An (M, 3) array of vertex indices
+# @param _origin The XZ position of the first sample
+# @param _spacing The XZ distance between neighbouring samples
+# @param _firstRow The first row of the strip
+# @param _numRows The number of rows in the strip
+# @param _numColumns The number of columns in the grid
+# @return A (numRows, numColumns) array of heights, NaN where no triangle covers a sample
+def rasterizeTriangles(_points, _triangles, _origin, _spacing, _firstRow, _numRows, _numColumns):
+	strip = numpy.full(_numRows * _numColumns, -numpy.inf)
+	if len(_triangles) > 0:
+		corners = _points[_triangles]
+		# Triangle bounds in grid coordinates
+		columnCoords = (corners[:, :, 0] - _origin[0]) / _spacing[0]
+		rowCoords = (corners[:, :, 2] - _origin[1]) / _spacing[1] - _firstRow
+		firstColumns = numpy.maximum(numpy.ceil(columnCoords.min(axis=1) - 1e-6), 0).astype(numpy.int64)
+		lastColumns = numpy.minimum(numpy.floor(columnCoords.max(axis=1) + 1e-6), _numColumns - 1).astype(numpy.int64)
+		firstRows = numpy.maximum(numpy.ceil(rowCoords.min(axis=1) - 1e-6), 0).astype(numpy.int64)
+		lastRows = numpy.minimum(numpy.floor(rowCoords.max(axis=1) + 1e-6), _numRows - 1).astype(numpy.int64)
+		keep = (lastColumns >= firstColumns) & (lastRows >= firstRows)
+		corners = corners[keep]
+		firstColumns, lastColumns, firstRows, lastRows = firstColumns[keep], lastColumns[keep], firstRows[keep], lastRows[keep]
+
+		# Expand every triangle into the samples inside its bounding box
+		widths = lastColumns - firstColumns + 1
+		counts = widths * (lastRows - firstRows + 1)
+		triangle = numpy.repeat(numpy.arange(len(counts)), counts)
+		local = numpy.arange(counts.sum()) - numpy.repeat(numpy.cumsum(counts) - counts, counts)
+		columns = firstColumns[triangle] + local % widths[triangle]
+		rows = firstRows[triangle] + local // widths[triangle]
+		x = _origin[0] + columns * _spacing[0]
+		z = _origin[1] + (rows + _firstRow) * _spacing[1]
+
+		# Barycentric coordinates in the XZ plane
+		a, b, c = corners[triangle, 0], corners[triangle, 1], corners[triangle, 2]
+		denominator = (b[:, 2] - c[:, 2]) * (a[:, 0] - c[:, 0]) + (c[:, 0] - b[:, 0]) * (a[:, 2] - c[:, 2])
+		valid = numpy.abs(denominator) > 1e-12
+		denominator = numpy.where(valid, denominator, 1.0)
+		w0 = ((b[:, 2] - c[:, 2]) * (x - c[:, 0]) + (c[:, 0] - b[:, 0]) * (z - c[:, 2])) / denominator
+		w1 = ((c[:, 2] - a[:, 2]) * (x - c[:, 0]) + (a[:, 0] - c[:, 0]) * (z - c[:, 2])) / denominator
+		w2 = 1.0 - w0 - w1
+		inside = valid & (w0 >= -1e-6) & (w1 >= -1e-6) & (w2 >= -1e-6)
+		heights = w0 * a[:, 1] + w1 * b[:, 1] + w2 * c[:, 1]
+		# Keep the highest surface where the mesh overlaps itself
+		numpy.maximum.at(strip, (rows * _numColumns + columns)[inside], heights[inside])
+	strip[numpy.isinf(strip)] = numpy.nan
+	return strip.reshape(_numRows, _numColumns)
+
+## Generate strips of heights from a triangle mesh
+# @param _points An (N, 3) array of vertex positions
+# @param _triangles An (M, 3) array of vertex indices
+# @param _numRows The number of rows in the heightmap
+# @param _numColumns The number of columns in the heightmap
+# @param _stripRows The number of rows in each strip
+# @return A generator of 2D height arrays, samples outside the mesh are set to its lowest height
+def meshStrips(_points, _triangles, _numRows, _numColumns, _stripRows=64):
+	_points = numpy.asarray(_points, dtype=numpy.float64)
+	_triangles = numpy.asarray(_triangles, dtype=numpy.int64).reshape(-1, 3)
+	minimum = _points.min(axis=0)
+	maximum = _points.max(axis=0)
+	origin = (minimum[0], minimum[2])
+	spacing = ((maximum[0] - minimum[0]) / max(_numColumns - 1, 1), (maximum[2] - minimum[2]) / max(_numRows - 1, 1))
+	spacing = (spacing[0] if spacing[0] > 0 else 1.0, spacing[1] if spacing[1] > 0 else 1.0)
+	# Sort the triangles by their first row so each strip only looks at a prefix of them
+	triangleRows = (_points[_triangles][:, :, 2] - origin[1]) / spacing[1]
+	order = numpy.argsort(triangleRows.min(axis=1), kind="mergesort")
+	_triangles = _triangles[order]
+	minRows = triangleRows.min(axis=1)[order]
+	maxRows = triangleRows.max(axis=1)[order]
+	for firstRow in range(0, _numRows, _stripRows):
+		numRows = min(_stripRows, _numRows - firstRow)
+		end = numpy.searchsorted(minRows, firstRow + numRows, side="right")
+		overlapping = numpy.nonzero(maxRows[:end] >= firstRow - 1)[0]
+		strip = rasterizeTriangles(_points, _triangles[overlapping], origin, spacing, firstRow, numRows, _numColumns)
+		strip[numpy.isnan(strip)] = minimum[1]
+		yield strip
+
+## Generate strips of heights by resampling a raster
+# @param _raster The TerrainRaster to resample
+# @param _numRows The number of rows in the heightmap
+# @param _numColumns The number of columns in the heightmap
+# @param _stripRows The number of rows in each strip
+# @return A generator of 2D height arrays
+def rasterStrips(_raster, _numRows, _numColumns, _stripRows=64):
+	minX, maxX, minZ, maxZ = _raster.bounds()
+	x = numpy.linspace(minX, maxX, _numColumns)
+	z = numpy.linspace(minZ, maxZ, _numRows)
+	for firstRow in range(0, _numRows, _stripRows):
+		stripZ = z[firstRow:firstRow + _stripRows]
+		sampleX = numpy.tile(x, len(stripZ))
+		sampleZ = numpy.repeat(stripZ, _numColumns)
+		yield _raster.sample(sampleX, sampleZ).reshape(len(stripZ), _numColumns)
+
+## Generate strips of heights from a tiled terrain store at its own resolution
+# @param _store The TiledTerrainStore to read
+# @param _stripRows The number of rows in each strip
+# @return A generator of 2D height arrays
+def storeStrips(_store, _stripRows=64):
+	numRows, numColumns = _store.resolution()
+	for firstRow in range(0, numRows, _stripRows):
+		yield _store.readWindow(firstRow, 0, min(_stripRows, numRows - firstRow), numColumns)
+
+## Find the height range of a tiled terrain store, one strip at a time
+# @param _store The TiledTerrainStore to read
+# @param _stripRows The number of rows in each strip
+# @return The minimum and maximum heights
+def storeHeightRange(_store, _stripRows=64):
+	low = numpy.inf
+	high = -numpy.inf
+	for strip in storeStrips(_store, _stripRows):
+		low = min(low, float(strip.min()))
+		high = max(high, float(strip.max()))
+	return low, high
+
+## Write strips of heights to a heightmap file
+# @param _path The file to write
+# @param _strips An iterable of 2D height arrays
+# @param _numRows The number of rows in the heightmap
+# @param _numColumns The number of columns in the heightmap
+# @param _low The height stored as 0
+# @param _high The height stored as 65535
+# @param _format The file format, taken from the file extension if not given
+def exportHeightmap(_path, _strips, _numRows, _numColumns, _low, _high, _format=None):
+	if _format is None:
+		_format = formatFromPath(_path)
+	with HeightmapWriter(_path, _format, _numRows, _numColumns, _low, _high) as writer:
+		for strip in _strips:
+			writer.writeStrip(strip)
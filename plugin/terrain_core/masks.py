@@ -0,0 +1,258 @@
+## masks.py
+# Curve masks rasterized into weight textures over the XZ bounds of a terrain
+# The signed distance to each curve is calculated once with a distance transform and kept while the curve and grid do not change
+# The weights are made from the distances with a falloff, vertices sample them by bilinear lookup instead of testing the curve, and masks on the same grid combine with a union or intersection of their weights
+
+import numpy
+from terrain_core import fingerprints
+from terrain_core.raster import TerrainRaster
+
+# The ways masks are combined, the values of the maskOperation attribute of the SculptLayerNode
+kUnion = 0
+kIntersection = 1
+kOperationNames = ["Union", "Intersection"]
+
+# The smallest curve offset, smaller offsets would select an unbounded area
+kMinimumOffset = 1e-3
+
+## Get the grid of the mask textures over some XZ bounds
+# The texels are square, with the resolution along the longer side of the bounds
+# @param _bounds The bounds (minX, minZ, maxX, maxZ), or None for empty bounds
+# @param _resolution The number of texels along the longer side, at least 2
+# @return The XZ position of the first texel, the distance between texels and the number of rows (Z) and columns (X)
+def textureGrid(_bounds, _resolution):
+	if _resolution < 2:
+		raise ValueError("Mask textures need a resolution of at least 2")
+	minX, minZ, maxX, maxZ = (0.0, 0.0, 0.0, 0.0) if _bounds is None else [float(value) for value in _bounds]
+	extent = max(maxX - minX, maxZ - minZ)
+	spacing = extent / (_resolution - 1) if extent > 0.0 else 1.0
+	numRows = int(numpy.ceil((maxZ - minZ) / spacing - 1e-9)) + 1
+	numColumns = int(numpy.ceil((maxX - minX) / spacing - 1e-9)) + 1
+	return (minX, minZ), spacing, (numRows, numColumns)
+
+## Find the texels inside a closed polyline with the even-odd rule
+# Each edge toggles the texels to the right of where it crosses each row, so the cost is in proportion to the edges and the rows rather than the texels
+# @param _polyline An (M, 3) array of points along the curve, the last point joins the first
+# @param _origin The XZ position of the first texel
+# @param _spacing The distance between texels
+# @param _shape The number of rows and columns
+# @return A 2D boolean array indexed by [row, column]
+def insideTexels(_polyline, _origin, _spacing, _shape):
+	numRows, numColumns = _shape
+	polyline = numpy.asarray(_polyline, dtype=numpy.float64).reshape(-1, 3)[:, (0, 2)]
+	start = polyline
+	end = numpy.roll(polyline, -1, axis=0)
+	rowZ = _origin[1] + numpy.arange(numRows) * _spacing
+	# An edge crosses a row if one end is above it, so an end exactly on a row is counted once
+	crosses = (start[:, 1, numpy.newaxis] <= rowZ) != (end[:, 1, numpy.newaxis] <= rowZ)
+	edge, row = numpy.nonzero(crosses)
+	t = (rowZ[row] - start[edge, 1]) / (end[edge, 1] - start[edge, 1])
+	crossingX = start[edge, 0] + t * (end[edge, 0] - start[edge, 0])
+	column = numpy.clip(numpy.ceil((crossingX - _origin[0]) / _spacing), 0, numColumns).astype(numpy.intp)
+	toggles = numpy.zeros((numRows, numColumns + 1), dtype=numpy.int32)
+	numpy.add.at(toggles, (row, column), 1)
+	return (numpy.cumsum(toggles, axis=1)[:, :numColumns] % 2) == 1
+
+## Calculate the squared distance to the nearest feature along the first axis of an array
+# The nearest features before and after each texel are found with running maximums and minimums of their indices
+# @param _features A boolean array of the feature texels
+# @param _far The squared distance of texels with no feature along their axis
+# @return An array of squared distances, in texels
+def axisDistanceTransform(_features, _far):
+	features = numpy.asarray(_features, dtype=bool)
+	indices = numpy.arange(features.shape[0], dtype=numpy.float64).reshape((-1,) + (1,) * (features.ndim - 1))
+	before = numpy.maximum.accumulate(numpy.where(features, indices, -numpy.inf), axis=0)
+	after = numpy.minimum.accumulate(numpy.where(features, indices, numpy.inf)[::-1], axis=0)[::-1]
+	distances = numpy.minimum(indices - before, after - indices)
+	return numpy.minimum(distances * distances, _far)
+
+## Calculate the squared distance transform along each row of an array
+# This is the lower envelope of parabolas of Felzenszwalb and Huttenlocher, stepping along the columns of every row at once
+# @param _squaredDistances A 2D array of the squared distance at each texel, 0 at the features and a value larger than any distance elsewhere
+# @return A 2D array of the squared distance to the nearest feature, in texels
+def rowDistanceTransform(_squaredDistances):
+	f = numpy.asarray(_squaredDistances, dtype=numpy.float64)
+	numLines, n = f.shape
+	lines = numpy.arange(numLines)
+	# The texel of each parabola in the envelope, and where each parabola starts to be the lowest
+	vertices = numpy.zeros((numLines, n), dtype=numpy.intp)
+	boundaries = numpy.empty((numLines, n + 1), dtype=numpy.float64)
+	boundaries[:, 0] = -numpy.inf
+	boundaries[:, 1] = numpy.inf
+	k = numpy.zeros(numLines, dtype=numpy.intp)
+	for q in range(1, n):
+		parabola = f[:, q] + q * q
+		# Drop the parabolas the new one is lower than, a line at a time until none are dropped
+		while True:
+			v = vertices[lines, k]
+			s = (parabola - (f[lines, v] + v * v)) / (2.0 * (q - v))
+			dropped = s <= boundaries[lines, k]
+			if not dropped.any():
+				break
+			k -= dropped
+		k += 1
+		vertices[lines, k] = q
+		boundaries[lines, k] = s
+		boundaries[lines, k + 1] = numpy.inf
+	distances = numpy.empty_like(f)
+	k[:] = 0
+	for q in range(n):
+		while True:
+			advance = boundaries[lines, k + 1] < q
+			if not advance.any():
+				break
+			k += advance
+		v = vertices[lines, k]
+		distances[:, q] = (q - v) ** 2 + f[lines, v]
+	return distances
+
+## Calculate the signed distance from the edge of a region at each texel
+# The distance transform runs along the columns then the rows, with the inside and outside transformed together
+# The columns only have features or none, so they are a running search, and the rows find the lower envelope of the column distances
+# @param _inside A 2D boolean array of the texels inside the region
+# @param _spacing The distance between texels
+# @return A 2D array of distances, positive inside and negative outside
+def signedDistance(_inside, _spacing):
+	inside = numpy.asarray(_inside, dtype=bool)
+	numRows, numColumns = inside.shape
+	far = float(numRows * numRows + numColumns * numColumns)
+	# The distance of the inside texels to the nearest outside texel, and of the outside texels to the nearest inside texel
+	squared = axisDistanceTransform(numpy.stack((~inside, inside), axis=1), far)
+	squared = rowDistanceTransform(squared.transpose(1, 0, 2).reshape(2 * numRows, numColumns)).reshape(2, numRows, numColumns)
+	# Texel centres next to the edge are half a texel from it
+	distances = (numpy.sqrt(numpy.minimum(squared, far)) - 0.5) * _spacing
+	return numpy.where(inside, distances[0], -distances[1])
+
+## The signed distance to a curve over a grid, and the weights made from it
+class CurveMask(object):
+
+	## Constructor
+	# @param _distances A 2D array of signed distances indexed by [row, column], positive inside the curve
+	# @param _origin The XZ position of the first texel
+	# @param _spacing The distance between texels
+	# @param _key The fingerprint of the curve and the grid
+	def __init__(self, _distances, _origin, _spacing, _key):
+		self.m_distances = numpy.asarray(_distances, dtype=numpy.float32)
+		self.m_origin = (float(_origin[0]), float(_origin[1]))
+		self.m_spacing = float(_spacing)
+		self.m_key = _key
+		# The deepest texel is the centre of the falloff
+		self.m_depth = max(float(self.m_distances.max()), 0.0) if self.m_distances.size > 0 else 0.0
+		# The weights for the offset and falloff in m_weightsKey
+		self.m_weightsKey = None
+		self.m_weights = None
+
+	## Get the fingerprint of the curve and the grid
+	# @return The fingerprint
+	def key(self):
+		return self.m_key
+
+	## Get the memory used by the distances and weights
+	# @return The size of the arrays in bytes
+	def nbytes(self):
+		return self.m_distances.nbytes + (0 if self.m_weights is None else self.m_weights.nbytes)
+
+	## Get the soft selection weights of the texels
+	# The edge is moved towards the deepest texel by the offset, and the falloff runs from the deepest texel (0) to the moved edge (1)
+	# @param _curveOffset Offset the curve so it is still visible, 1 is the curve itself and larger offsets shrink the mask
+	# @param _falloff The terrain_core.falloff.FalloffTable of the weights
+	# @return A 2D float32 array of weights, 0 outside the mask
+	def weights(self, _curveOffset, _falloff):
+		weightsKey = (_curveOffset, _falloff.key())
+		if self.m_weightsKey != weightsKey:
+			weights = numpy.zeros(self.m_distances.shape, dtype=numpy.float32)
+			if self.m_depth > 0.0:
+				offset = max(float(_curveOffset), kMinimumOffset)
+				edge = self.m_depth - self.m_depth / offset
+				inside = self.m_distances > edge
+				fractions = (self.m_depth - self.m_distances[inside]) * (offset / self.m_depth)
+				weights[inside] = _falloff.evaluate(fractions * fractions)
+			self.m_weights = weights
+			self.m_weightsKey = weightsKey
+		return self.m_weights
+
+## Get the fingerprint of the mask of a curve
+# @param _polyline An (M, 3) array of points along the curve
+# @param _bounds The XZ bounds (minX, minZ, maxX, maxZ) of the terrain
+# @param _resolution The number of texels along the longer side of the bounds
+# @return The fingerprint of the curve and the grid
+def maskKey(_polyline, _bounds, _resolution):
+	return (fingerprints.fingerprint(numpy.asarray(_polyline, dtype=numpy.float64)),) + textureGrid(_bounds, _resolution)
+
+## Rasterize a curve into a mask
+# @param _polyline An (M, 3) array of points along the curve
+# @param _bounds The XZ bounds (minX, minZ, maxX, maxZ) of the terrain
+# @param _resolution The number of texels along the longer side of the bounds
+# @return The CurveMask
+def rasterizeCurve(_polyline, _bounds, _resolution):
+	origin, spacing, shape = textureGrid(_bounds, _resolution)
+	inside = insideTexels(_polyline, origin, spacing, shape)
+	return CurveMask(signedDistance(inside, spacing), origin, spacing, maskKey(_polyline, _bounds, _resolution))
+
+## Combine the weights of masks on the same grid
+# @param _weights A list of 2D arrays of weights, at least one
+# @param _operation kUnion for the largest weight of any mask, or kIntersection for the smallest
+# @return A 2D array of weights, the only array if there is one
+def combineWeights(_weights, _operation):
+	if len(_weights) == 0:
+		raise ValueError("At least one mask is needed")
+	if _operation == kUnion:
+		combine = numpy.maximum
+	elif _operation == kIntersection:
+		combine = numpy.minimum
+	else:
+		raise ValueError("Unknown mask operation " + str(_operation))
+	combined = _weights[0]
+	for weights in _weights[1:]:
+		combined = combine(combined, weights)
+	return combined
+
+## Make a weight texture that can be sampled at any position
+# @param _weights A 2D array of weights
+# @param _mask The CurveMask the weights were made on, for the grid
+# @return A TerrainRaster of the weights
+def weightTexture(_weights, _mask):
+	return TerrainRaster(_weights, _mask.m_origin, (_mask.m_spacing, _mask.m_spacing))
+
+## Select the points a weight texture covers
+# @param _texture The TerrainRaster of the weights
+# @param _points An (N, 3) array of positions
+# @return A sorted array of the indices of the points with a weight above 0, and an array of their weights
+def selectPoints(_texture, _points):
+	points = numpy.asarray(_points, dtype=numpy.float64).reshape(-1, 3)
+	weights = _texture.sample(points[:, 0], points[:, 2])
+	indices = numpy.flatnonzero(weights > 0.0)
+	return indices, weights[indices].astype(numpy.float64)
+
+## The masks of a node, rasterized again only when a curve or the grid changes
+class MaskCache(object):
+
+	## Constructor
+	def __init__(self):
+		self.m_masks = {}
+
+	## Get the masks of some curves over a grid
+	# Masks of curves that are no longer asked for are dropped
+	# @param _polylines A list of (M, 3) arrays of points along each curve
+	# @param _bounds The XZ bounds (minX, minZ, maxX, maxZ) of the terrain
+	# @param _resolution The number of texels along the longer side of the bounds
+	# @return A list of the CurveMask of each curve and the number of masks that were rasterized
+	def curveMasks(self, _polylines, _bounds, _resolution):
+		curveMasks = []
+		masks = {}
+		numRasterized = 0
+		for polyline in _polylines:
+			key = maskKey(polyline, _bounds, _resolution)
+			mask = masks.get(key, self.m_masks.get(key))
+			if mask is None:
+				mask = rasterizeCurve(polyline, _bounds, _resolution)
+				numRasterized += 1
+			masks[key] = mask
+			curveMasks.append(mask)
+		self.m_masks = masks
+		return curveMasks, numRasterized
+
+	## Get the memory used by the masks
+	# @return The size of the arrays in bytes
+	def nbytes(self):
+		return sum(mask.nbytes() for mask in self.m_masks.values())
@@ -0,0 +1,118 @@
+## meshio.py
+# Streaming mesh writers, the vertex and face arrays are written in fixed size chunks
+
+import numpy
+
+# Supported file formats
+kFormats = ("ply", "obj")
+
+## Work out the mesh format from a file name
+# @param _path The file path
+# @return The format name, or None if the extension is not supported
+def formatFromPath(_path):
+	extension = _path.rsplit(".", 1)[-1].lower()
+	if extension in kFormats:
+		return extension
+	return None
+
+## Calculate where each face starts in the face connects array
+# @param _faceCounts The number of vertices in each face
+# @return An array of offsets with one extra entry for the end
+def faceOffsets(_faceCounts):
+	offsets = numpy.zeros(len(_faceCounts) + 1, dtype=numpy.int64)
+	numpy.cumsum(_faceCounts, out=offsets[1:])
+	return offsets
+
+## Write a mesh as binary little endian PLY
+# @param _path The file to write
+# @param _points An (N, 3) array of vertex positions
+# @param _faceCounts The number of vertices in each face
+# @param _faceConnects The vertex indices of every face, one face after another
+# @param _chunkSize The number of vertices or faces written at once
+def writePly(_path, _points, _faceCounts, _faceConnects, _chunkSize=65536):
+	points = numpy.asarray(_points)
+	faceCounts = numpy.asarray(_faceCounts, dtype=numpy.int64)
+	faceConnects = numpy.asarray(_faceConnects, dtype=numpy.int64)
+	numFaces = len(faceCounts)
+	header = "ply\nformat binary_little_endian 1.0\nelement vertex %d\nproperty float x\nproperty float y\nproperty float z\nelement face %d\nproperty list uchar int vertex_indices\nend_header\n" % (len(points), numFaces)
+	with open(_path, "wb") as plyFile:
+		plyFile.write(header.encode("ascii"))
+		for start in range(0, len(points), _chunkSize):
+			plyFile.write(numpy.ascontiguousarray(points[start:start + _chunkSize, :3], dtype="<f4").tobytes())
+		if numFaces == 0:
+			return
+		if numpy.all(faceCounts == faceCounts[0]):
+			# All the faces have the same number of vertices, so each face is a fixed size record
+			size = int(faceCounts[0])
+			record = numpy.dtype([("count", "u1"), ("indices", "<i4", (size,))])
+			indices = faceConnects.reshape(numFaces, size)
+			for start in range(0, numFaces, _chunkSize):
+				chunk = numpy.empty(min(_chunkSize, numFaces - start), dtype=record)
+				chunk["count"] = size
+				chunk["indices"] = indices[start:start + len(chunk)]
+				plyFile.write(chunk.tobytes())
+		else:
+			offsets = faceOffsets(faceCounts)
+			for start in range(0, numFaces, _chunkSize):
+				end = min(start + _chunkSize, numFaces)
+				counts = faceCounts[start:end]
+				connects = faceConnects[offsets[start]:offsets[end]].astype("<i4")
+				# Each face is a count byte followed by its indices, scatter both into one byte buffer
+				faceBytes = 1 + 4 * counts
+				faceStarts = numpy.cumsum(faceBytes) - faceBytes
+				buffer = numpy.empty(int(faceBytes.sum()), dtype=numpy.uint8)
+				buffer[faceStarts] = counts
+				corner = numpy.arange(len(connects)) - numpy.repeat(offsets[start:end] - offsets[start], counts)
+				indexStarts = numpy.repeat(faceStarts + 1, counts) + 4 * corner
+				byteIndices = (indexStarts[:, numpy.newaxis] + numpy.arange(4)).ravel()
+				buffer[byteIndices] = connects.view(numpy.uint8)
+				plyFile.write(buffer.tobytes())
+
+## Write a mesh as ASCII OBJ, formatting a chunk of lines at a time
+# @param _path The file to write
+# @param _points An (N, 3) array of vertex positions
+# @param _faceCounts The number of vertices in each face
+# @param _faceConnects The vertex indices of every face, one face after another
+# @param _chunkSize The number of vertices or faces written at once
+def writeObj(_path, _points, _faceCounts, _faceConnects, _chunkSize=65536):
+	points = numpy.asarray(_points, dtype=numpy.float64)
+	faceCounts = numpy.asarray(_faceCounts, dtype=numpy.int64)
+	# OBJ indices start at one
+	faceConnects = numpy.asarray(_faceConnects, dtype=numpy.int64) + 1
+	numFaces = len(faceCounts)
+	with open(_path, "wb", 1 << 20) as objFile:
+		for start in range(0, len(points), _chunkSize):
+			chunk = points[start:start + _chunkSize, :3]
+			objFile.write((("v %.6g %.6g %.6g\n" * len(chunk)) % tuple(chunk.ravel().tolist())).encode("ascii"))
+		if numFaces == 0:
+			return
+		if numpy.all(faceCounts == faceCounts[0]):
+			size = int(faceCounts[0])
+			line = "f" + " %d" * size + "\n"
+			indices = faceConnects.reshape(numFaces, size)
+			for start in range(0, numFaces, _chunkSize):
+				chunk = indices[start:start + _chunkSize]
+				objFile.write(((line * len(chunk)) % tuple(chunk.ravel().tolist())).encode("ascii"))
+		else:
+			offsets = faceOffsets(faceCounts)
+			for start in range(0, numFaces, _chunkSize):
+				end = min(start + _chunkSize, numFaces)
+				lines = "".join(["f" + " %d" * count + "\n" for count in faceCounts[start:end].tolist()])
+				objFile.write((lines % tuple(faceConnects[offsets[start]:offsets[end]].tolist())).encode("ascii"))
+
+## Write a mesh in the format given by the file name
+# @param _path The file to write
+# @param _points An (N, 3) array of vertex positions
+# @param _faceCounts The number of vertices in each face
+# @param _faceConnects The vertex indices of every face, one face after another
+# @param _format The file format, taken from the file extension if not given
+# @param _chunkSize The number of vertices or faces written at once
+def writeMesh(_path, _points, _faceCounts, _faceConnects, _format=None, _chunkSize=65536):
+	if _format is None:
+		_format = formatFromPath(_path)
+	if _format == "ply":
+		writePly(_path, _points, _faceCounts, _faceConnects, _chunkSize)
+	elif _format == "obj":
+		writeObj(_path, _points, _faceCounts, _faceConnects, _chunkSize)
+	else:
+		raise ValueError("Unsupported mesh format: " + str(_format))
@@ -0,0 +1,111 @@
+## profiling.py
+# On demand cProfile captures of node computes
+# Nothing is profiled until a capture is requested, the nodes only check isActive before each compute
+# A compute pulled by a profiled compute is recorded in the capture that pulled it, only one profiler runs at a time
+
+import cProfile
+import os
+import pstats
+import re
+import sys
+import tempfile
+import time
+
+try:
+	from StringIO import StringIO
+except ImportError:
+	from io import StringIO
+
+# The number of functions listed in each summary
+kSummaryFunctions = 30
+
+# The number of computes left to profile on every node, and for each node by name
+globalRequest = 0
+nodeRequests = {}
+# The folder the captures are written to
+outputDirectory = os.path.join(tempfile.gettempdir(), "terrainProfiles")
+# The files written by the captures, most recent last
+captures = []
+# Whether a capture is running
+capturing = False
+
+## Check if any capture has been requested, this is cheap enough to call before every compute
+# @return Whether the nodes should check isRequested
+def isActive():
+	return not capturing and (globalRequest > 0 or len(nodeRequests) > 0)
+
+## Check if the next compute of a node is to be profiled
+# @param _nodeName The name of the node
+# @return Whether the node should call capture
+def isRequested(_nodeName):
+	return not capturing and (globalRequest > 0 or _nodeName in nodeRequests)
+
+## Request the next computes to be profiled
+# @param _numComputes The number of computes to profile
+# @param _nodeName Only profile this node, or every node if None
+# @param _directory The folder to write the captures to, or None to keep the current folder
+def requestCapture(_numComputes, _nodeName=None, _directory=None):
+	global globalRequest, outputDirectory
+	if _directory is not None:
+		outputDirectory = _directory
+	if _nodeName is None:
+		globalRequest = max(int(_numComputes), 0)
+	elif _numComputes > 0:
+		nodeRequests[_nodeName] = int(_numComputes)
+
+## Cancel the requested captures
+# @param _nodeName Only cancel the captures of this node, or every capture if None
+def cancelCapture(_nodeName=None):
+	global globalRequest
+	if _nodeName is None:
+		globalRequest = 0
+		nodeRequests.clear()
+	else:
+		nodeRequests.pop(_nodeName, None)
+
+## Run a compute, profiling it if a capture has been requested for the node
+# Inside a running capture the compute is not profiled again, its calls are already recorded by the running capture
+# @param _nodeName The name of the node
+# @param _function The compute function
+# @param _args The arguments of the compute function
+# @return The return value of the compute function
+def capture(_nodeName, _function, *_args):
+	global globalRequest, capturing
+	if capturing:
+		return _function(*_args)
+	if _nodeName in nodeRequests:
+		nodeRequests[_nodeName] -= 1
+		if nodeRequests[_nodeName] <= 0:
+			del nodeRequests[_nodeName]
+	elif globalRequest > 0:
+		globalRequest -= 1
+	else:
+		return _function(*_args)
+	profile = cProfile.Profile()
+	capturing = True
+	try:
+		return profile.runcall(_function, *_args)
+	finally:
+		capturing = False
+		writeCapture(_nodeName, profile)
+
+## Write a profile as a .pstats file and a summary of the slowest functions
+# @param _nodeName The name of the node, used for the file names
+# @param _profile The finished cProfile.Profile
+# @return The path of the .pstats file
+def writeCapture(_nodeName, _profile):
+	if not os.path.isdir(outputDirectory):
+		os.makedirs(outputDirectory)
+	# Node names can contain namespace and path separators
+	baseName = re.sub(r"[^A-Za-z0-9_]", "_", _nodeName) + "_" + time.strftime("%Y%m%d_%H%M%S") + "_%d" % len(captures)
+	path = os.path.join(outputDirectory, baseName + ".pstats")
+	_profile.dump_stats(path)
+	summary = StringIO()
+	stats = pstats.Stats(_profile, stream=summary)
+	stats.sort_stats("cumulative").print_stats(kSummaryFunctions)
+	with open(os.path.join(outputDirectory, baseName + ".txt"), "w") as summaryFile:
+		summaryFile.write("Profile of " + _nodeName + "\n")
+		summaryFile.write(summary.getvalue())
+	captures.append(path)
+	sys.stdout.write("Profile of " + _nodeName + " written to " + path + "\n")
+	return path
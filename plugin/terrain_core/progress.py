@@ -0,0 +1,46 @@
+## progress.py
+# Progress reporting and cancellation for long running loops
+# The loops check a token between chunks of work, which raises Cancelled once the token has been cancelled
+
+## Raised by a loop when its token has been cancelled
+class Cancelled(Exception):
+	pass
+
+## A token passed to long running loops to report their progress and ask them to stop
+class ProgressToken(object):
+
+	## Constructor
+	# @param _report A function called with the fraction of the work done, or None
+	# @param _poll A function returning True when the user has asked to cancel, or None
+	def __init__(self, _report=None, _poll=None):
+		self.m_report = _report
+		self.m_poll = _poll
+		self.m_cancelled = False
+
+	## Ask the loop using this token to stop at the end of its current chunk, this can be called from any thread
+	def cancel(self):
+		self.m_cancelled = True
+
+	## Check if the token has been cancelled
+	# @return Whether the loop should stop
+	def isCancelled(self):
+		return self.m_cancelled
+
+	## Report the progress of a loop and stop it if the token has been cancelled
+	# @param _done The amount of work done
+	# @param _total The total amount of work, or None if it is not known
+	def check(self, _done, _total=None):
+		if self.m_report is not None and _total:
+			self.m_report(min(float(_done) / _total, 1.0))
+		if self.m_poll is not None and self.m_poll():
+			self.m_cancelled = True
+		if self.m_cancelled:
+			raise Cancelled()
+
+## Check a token that may be None, called by loops between chunks of work
+# @param _progress A ProgressToken or None
+# @param _done The amount of work done
+# @param _total The total amount of work, or None if it is not known
+def check(_progress, _done, _total=None):
+	if _progress is not None:
+		_progress.check(_done, _total)
@@ -0,0 +1,154 @@
+## raster.py
+# A compact height field representation for terrains built on a regular grid
+
+import numpy
+
+## A float32 height field sampled on a regular grid in the XZ plane
+# The sample at [row, column] lies at (originX + column * spacingX, originZ + row * spacingZ)
+class TerrainRaster(object):
+
+	## Constructor
+	# @param _heights A 2D array of heights indexed by [row, column]
+	# @param _origin The XZ position of the first sample
+	# @param _spacing The XZ distance between neighbouring samples
+	def __init__(self, _heights, _origin=(0.0, 0.0), _spacing=(1.0, 1.0)):
+		self.m_heights = numpy.ascontiguousarray(_heights, dtype=numpy.float32)
+		if self.m_heights.ndim != 2:
+			raise ValueError("TerrainRaster heights must be a 2D array")
+		self.m_origin = (float(_origin[0]), float(_origin[1]))
+		self.m_spacing = (float(_spacing[0]), float(_spacing[1]))
+
+	## Create a copy of the raster
+	# @return A new TerrainRaster with its own height array
+	def copy(self):
+		return TerrainRaster(self.m_heights.copy(), self.m_origin, self.m_spacing)
+
+	## Get the grid resolution
+	# @return The number of rows (Z) and columns (X)
+	def resolution(self):
+		return self.m_heights.shape
+
+	## Get the number of samples
+	# @return The number of heights in the raster
+	def numSamples(self):
+		return self.m_heights.size
+
+	## Get the memory used by the heights
+	# @return The size of the height array in bytes
+	def nbytes(self):
+		return self.m_heights.nbytes
+
+	## Get the X coordinate of each column
+	# @return A 1D array of X positions
+	def xCoordinates(self):
+		return self.m_origin[0] + numpy.arange(self.m_heights.shape[1]) * self.m_spacing[0]
+
+	## Get the Z coordinate of each row
+	# @return A 1D array of Z positions
+	def zCoordinates(self):
+		return self.m_origin[1] + numpy.arange(self.m_heights.shape[0]) * self.m_spacing[1]
+
+	## Get the XZ bounds of the raster
+	# @return The minimum and maximum X and Z coordinates
+	def bounds(self):
+		numRows, numColumns = self.m_heights.shape
+		maxX = self.m_origin[0] + (numColumns - 1) * self.m_spacing[0]
+		maxZ = self.m_origin[1] + (numRows - 1) * self.m_spacing[1]
+		return self.m_origin[0], maxX, self.m_origin[1], maxZ
+
+	## Get the 3D position of every sample
+	# @return An (N, 3) array of positions in row major order
+	def positions(self):
+		numRows, numColumns = self.m_heights.shape
+		positions = numpy.empty((numRows * numColumns, 3), dtype=numpy.float64)
+		positions[:, 0] = numpy.tile(self.xCoordinates(), numRows)
+		positions[:, 1] = self.m_heights.ravel()
+		positions[:, 2] = numpy.repeat(self.zCoordinates(), numColumns)
+		return positions
+
+	## Get the quad faces of the grid, wound so the normals face up (+Y)
+	# @return An array of vertex counts per face and an array of face vertex indices
+	def gridFaces(self):
+		numRows, numColumns = self.m_heights.shape
+		rowStart = numpy.arange(numRows - 1) * numColumns
+		corner = (rowStart[:, numpy.newaxis] + numpy.arange(numColumns - 1)).ravel()
+		faceConnects = numpy.empty((corner.size, 4), dtype=numpy.int32)
+		faceConnects[:, 0] = corner
+		faceConnects[:, 1] = corner + numColumns
+		faceConnects[:, 2] = corner + numColumns + 1
+		faceConnects[:, 3] = corner + 1
+		faceCounts = numpy.full(corner.size, 4, dtype=numpy.int32)
+		return faceCounts, faceConnects.ravel()
+
+	## Bilinearly sample the heights at arbitrary XZ positions, clamping to the edges
+	# @param _x An array of X positions
+	# @param _z An array of Z positions
+	# @return An array of heights
+	def sample(self, _x, _z):
+		numRows, numColumns = self.m_heights.shape
+		u = numpy.clip((numpy.asarray(_x, dtype=numpy.float64) - self.m_origin[0]) / self.m_spacing[0], 0.0, numColumns - 1)
+		v = numpy.clip((numpy.asarray(_z, dtype=numpy.float64) - self.m_origin[1]) / self.m_spacing[1], 0.0, numRows - 1)
+		column = numpy.minimum(u.astype(numpy.intp), max(numColumns - 2, 0))
+		row = numpy.minimum(v.astype(numpy.intp), max(numRows - 2, 0))
+		fu = u - column
+		fv = v - row
+		nextColumn = numpy.minimum(column + 1, numColumns - 1)
+		nextRow = numpy.minimum(row + 1, numRows - 1)
+		h = self.m_heights
+		h0 = h[row, column] + (h[row, nextColumn] - h[row, column]) * fu
+		h1 = h[nextRow, column] + (h[nextRow, nextColumn] - h[nextRow, column]) * fu
+		return h0 + (h1 - h0) * fv
+
+	## Get the normal of every sample from the height gradient
+	# @return An (N, 3) array of unit normals in row major order
+	def normals(self):
+		numRows, numColumns = self.m_heights.shape
+		normals = numpy.empty((numRows * numColumns, 3), dtype=numpy.float64)
+		if numRows < 2 or numColumns < 2:
+			normals[:] = (0.0, 1.0, 0.0)
+			return normals
+		dhdz, dhdx = numpy.gradient(self.m_heights.astype(numpy.float64), self.m_spacing[1], self.m_spacing[0])
+		normals[:, 0] = -dhdx.ravel()
+		normals[:, 1] = 1.0
+		normals[:, 2] = -dhdz.ravel()
+		normals /= numpy.sqrt(numpy.einsum("ij,ij->i", normals, normals))[:, numpy.newaxis]
+		return normals
+
+	## Create a raster from points that lie on a regular XZ grid
+	# @param _points An (N, 3) array of positions
+	# @param _tolerance The relative tolerance, as a fraction of the grid spacing
+	# @return The raster and the row major sample index of every point, or (None, None) if the points are not a regular grid
+	@staticmethod
+	def fromPoints(_points, _tolerance=1e-3):
+		points = numpy.asarray(_points, dtype=numpy.float64)
+		if points.ndim != 2 or points.shape[0] < 4:
+			return None, None
+		spacing = []
+		origin = []
+		indices = []
+		for axis in (0, 2):
+			coordinates = points[:, axis]
+			minimum = coordinates.min()
+			unique = numpy.unique(coordinates)
+			if unique.size < 2:
+				return None, None
+			step = numpy.diff(unique)
+			step = step[step > (unique[-1] - unique[0]) * 1e-9].min()
+			index = numpy.rint((coordinates - minimum) / step)
+			# Every point must lie on the grid
+			if numpy.abs((coordinates - minimum) / step - index).max() > _tolerance:
+				return None, None
+			origin.append(minimum)
+			spacing.append(step)
+			indices.append(index.astype(numpy.int64))
+		numColumns = int(indices[0].max()) + 1
+		numRows = int(indices[1].max()) + 1
+		# The grid must be complete with exactly one point per sample
+		if numRows * numColumns != points.shape[0]:
+			return None, None
+		sampleIndices = indices[1] * numColumns + indices[0]
+		if numpy.bincount(sampleIndices, minlength=numRows * numColumns).max() != 1:
+			return None, None
+		heights = numpy.empty(numRows * numColumns, dtype=numpy.float32)
+		heights[sampleIndices] = points[:, 1]
+		return TerrainRaster(heights.reshape(numRows, numColumns), origin, spacing), sampleIndices
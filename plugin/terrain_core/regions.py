@@ -0,0 +1,94 @@
+## regions.py
+# Dirty regions, the vertices of a terrain that changed since a node last evaluated it
+# A node only evaluates the part of a region inside its own area of influence again, so a small edit costs time in proportion to the edit rather than the terrain
+
+import numpy
+
+## The vertices that changed between two versions of a terrain
+class DirtyRegion(object):
+
+	## Constructor
+	# @param _previousKey The fingerprint of the terrain before the change, the region only applies to state calculated from it
+	# @param _indices A sorted array of the indices of the changed vertices
+	# @param _bounds The XZ bounds of the old and new positions of the changed vertices, or None if they are not known
+	def __init__(self, _previousKey, _indices, _bounds=None):
+		self.m_previousKey = _previousKey
+		self.m_indices = numpy.asarray(_indices, dtype=numpy.int64)
+		self.m_bounds = _bounds
+
+	## Check if no vertices changed
+	# @return Whether the region is empty
+	def isEmpty(self):
+		return len(self.m_indices) == 0
+
+	## Check if the region can overlap some XZ bounds
+	# @param _bounds The bounds (minX, minZ, maxX, maxZ), or None for empty bounds
+	# @return False only if none of the changed vertices were or are inside the bounds
+	def intersects(self, _bounds):
+		if self.isEmpty() or _bounds is None:
+			return False
+		if self.m_bounds is None:
+			return True
+		return boundsIntersect(self.m_bounds, _bounds)
+
+## Test which values are in a sorted array of indices
+# @param _sortedIndices A sorted array of indices
+# @param _values An array of indices to look for
+# @return A boolean array, True where the value is in the sorted array
+def contains(_sortedIndices, _values):
+	sortedIndices = numpy.asarray(_sortedIndices, dtype=numpy.int64)
+	values = numpy.asarray(_values, dtype=numpy.int64)
+	if len(sortedIndices) == 0:
+		return numpy.zeros(len(values), dtype=bool)
+	found = numpy.minimum(numpy.searchsorted(sortedIndices, values), len(sortedIndices) - 1)
+	return sortedIndices[found] == values
+
+## Calculate the XZ bounds of some arrays of positions
+# @param _points (N, 3) arrays of positions
+# @return The bounds (minX, minZ, maxX, maxZ), or None if there are no positions
+def xzBounds(*_points):
+	points = [numpy.asarray(points, dtype=numpy.float64).reshape(-1, 3) for points in _points]
+	points = [p for p in points if len(p) > 0]
+	if len(points) == 0:
+		return None
+	points = numpy.concatenate(points)
+	return (points[:, 0].min(), points[:, 2].min(), points[:, 0].max(), points[:, 2].max())
+
+## Check if two XZ bounds overlap
+# @param _a The first bounds (minX, minZ, maxX, maxZ)
+# @param _b The second bounds
+# @return Whether they overlap, touching bounds overlap
+def boundsIntersect(_a, _b):
+	return _a[0] <= _b[2] and _b[0] <= _a[2] and _a[1] <= _b[3] and _b[1] <= _a[3]
+
+## Find the dirty region between two arrays of positions
+# This compares every vertex, so it is used for meshes where the node does not know what changed
+# @param _previousKey The fingerprint of the previous positions
+# @param _previous An (N, 3) array of the previous positions
+# @param _points An (N, 3) array of the new positions
+# @return The DirtyRegion, or None if the number of vertices has changed
+def fromPoints(_previousKey, _previous, _points):
+	previous = numpy.asarray(_previous, dtype=numpy.float64)[:, :3]
+	points = numpy.asarray(_points, dtype=numpy.float64)[:, :3]
+	if len(previous) != len(points):
+		return None
+	indices = numpy.flatnonzero((previous != points).any(axis=1))
+	return DirtyRegion(_previousKey, indices, xzBounds(previous[indices], points[indices]))
+
+## Find the vertices whose displacement differs between two sets of displacements
+# An operator moved its input by the old displacements and now moves it by the new ones, so its output changes at these vertices as well as where its input changed
+# @param _previousIndices An array of the vertices of the old displacements
+# @param _previousOffsets An (M, 3) array of the old displacements
+# @param _indices An array of the vertices of the new displacements
+# @param _offsets An (K, 3) array of the new displacements
+# @return A sorted array of vertex indices
+def changedOffsets(_previousIndices, _previousOffsets, _indices, _offsets):
+	previousIndices = numpy.asarray(_previousIndices, dtype=numpy.int64)
+	indices = numpy.asarray(_indices, dtype=numpy.int64)
+	vertices = numpy.unique(numpy.concatenate((previousIndices, indices)))
+	# Sum both displacements onto the vertices of either, a vertex listed more than once moves by the sum of its offsets
+	previous = numpy.zeros((len(vertices), 3), dtype=numpy.float64)
+	numpy.add.at(previous, numpy.searchsorted(vertices, previousIndices), numpy.asarray(_previousOffsets, dtype=numpy.float64).reshape(-1, 3))
+	current = numpy.zeros((len(vertices), 3), dtype=numpy.float64)
+	numpy.add.at(current, numpy.searchsorted(vertices, indices), numpy.asarray(_offsets, dtype=numpy.float64).reshape(-1, 3))
+	return vertices[(previous != current).any(axis=1)]
@@ -0,0 +1,43 @@
+## river.py
+# River bank and bed curves from a centre line and the terrain normals
+
+import numpy
+
+## Normalise rows of vectors, leaving zero length vectors unchanged
+# @param _vectors An (N, 3) array of vectors
+# @return An (N, 3) array of unit vectors
+def normalize(_vectors):
+	lengths = numpy.sqrt((_vectors * _vectors).sum(axis=1))
+	return _vectors / numpy.where(lengths > 0.0, lengths, 1.0)[:, numpy.newaxis]
+
+## Calculate the direction of the curve at each point
+# @param _curvePoints An (N, 3) array of points along the curve
+# @return An (N, 3) array of unit directions, the last point uses the previous direction
+def curveDirections(_curvePoints):
+	curvePoints = numpy.asarray(_curvePoints, dtype=numpy.float64)[:, :3]
+	directions = numpy.empty_like(curvePoints)
+	directions[:-1] = normalize(curvePoints[1:] - curvePoints[:-1])
+	directions[-1] = directions[-2]
+	return directions
+
+## Calculate the frame of the river at each point
+# @param _curvePoints An (N, 3) array of points along the curve
+# @param _normals An (N, 3) array of terrain normals at the points
+# @return Arrays of unit directions, normals and tangents across the river
+def riverFrames(_curvePoints, _normals):
+	directions = curveDirections(_curvePoints)
+	normals = normalize(numpy.asarray(_normals, dtype=numpy.float64)[:, :3])
+	tangents = normalize(numpy.cross(normals, directions))
+	return directions, normals, tangents
+
+## Calculate the edit points of the river curves
+# @param _curvePoints An (N, 3) array of points along the curve
+# @param _normals An (N, 3) array of terrain normals at the points
+# @param _width The width of the river
+# @param _depth The depth of the river
+# @return The left bank, bed and right bank points as (N, 3) arrays
+def riverCurves(_curvePoints, _normals, _width, _depth):
+	curvePoints = numpy.asarray(_curvePoints, dtype=numpy.float64)[:, :3]
+	directions, normals, tangents = riverFrames(curvePoints, _normals)
+	halfWidth = _width / 2.0
+	return curvePoints + tangents * halfWidth, curvePoints - normals * _depth, curvePoints - tangents * halfWidth
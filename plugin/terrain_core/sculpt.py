@@ -0,0 +1,163 @@
+## sculpt.py
+# Sculpt layer region selection, soft selection and projection
+
+import numpy
+from terrain_core import falloff, progress
+
+## Find the centre of a curve from points sampled along it
+# @param _curveSamples An (N, 3) array of points sampled evenly along the curve
+# @return The centre as a length 3 array
+def curveCentre(_curveSamples):
+	return numpy.asarray(_curveSamples, dtype=numpy.float64)[:, :3].mean(axis=0)
+
+## Find the closest points on a polyline, used when the exact curve is not available
+# @param _points An (N, 3) array of points
+# @param _polyline An (M, 3) array of points along the curve
+# @param _closed Whether the last point connects back to the first
+# @param _chunkSize The number of points tested against every segment at once
+# @param _progress A ProgressToken checked after each chunk, or None
+# @return An (N, 3) array of the closest points on the polyline
+def closestPointsOnPolyline(_points, _polyline, _closed=True, _chunkSize=4096, _progress=None):
+	points = numpy.asarray(_points, dtype=numpy.float64)[:, :3]
+	polyline = numpy.asarray(_polyline, dtype=numpy.float64)[:, :3]
+	starts = polyline if _closed else polyline[:-1]
+	ends = numpy.roll(polyline, -1, axis=0) if _closed else polyline[1:]
+	segments = ends - starts
+	lengthsSquared = numpy.maximum((segments * segments).sum(axis=1), 1e-20)
+	closest = numpy.empty_like(points)
+	for start in range(0, len(points), _chunkSize):
+		progress.check(_progress, start, len(points))
+		chunk = points[start:start + _chunkSize]
+		# Project every point onto every segment and keep the nearest
+		t = numpy.einsum("nsk,sk->ns", chunk[:, numpy.newaxis, :] - starts[numpy.newaxis, :, :], segments) / lengthsSquared
+		t = numpy.clip(t, 0.0, 1.0)
+		projected = starts[numpy.newaxis, :, :] + t[:, :, numpy.newaxis] * segments[numpy.newaxis, :, :]
+		distances = ((projected - chunk[:, numpy.newaxis, :]) ** 2).sum(axis=2)
+		nearest = distances.argmin(axis=1)
+		closest[start:start + len(chunk)] = projected[numpy.arange(len(chunk)), nearest]
+	return closest
+
+## Test if points are inside a curve
+# A point is inside if its offset distance from the centre, projected towards the closest point on the curve, is shorter than the distance to the curve
+# @param _centre The centre of the curve
+# @param _points An (N, 3) array of points to test
+# @param _curvePoints An (N, 3) array of the closest points on the curve to each point
+# @param _offset Scale the points from the centre so the curve is still visible
+# @return A boolean array
+def insideCurve(_centre, _points, _curvePoints, _offset):
+	centre = numpy.asarray(_centre, dtype=numpy.float64)[:3]
+	centreToPoint = (numpy.asarray(_points, dtype=numpy.float64)[:, :3] - centre) * _offset
+	centreToCurve = numpy.asarray(_curvePoints, dtype=numpy.float64)[:, :3] - centre
+	curveDistance = numpy.sqrt((centreToCurve * centreToCurve).sum(axis=1))
+	projected = (centreToPoint * centreToCurve).sum(axis=1) / numpy.maximum(curveDistance, 1e-20)
+	return projected < curveDistance
+
+## Calculate the soft selection values of points inside a curve
+# The squared distance from the centre, as a fraction of the squared distance to the curve, is looked up in the falloff table
+# Points outside the curve, such as the outer vertices of the faces inside it, weigh 0
+# @param _centre The centre of the curve
+# @param _points An (N, 3) array of points
+# @param _curvePoints An (N, 3) array of the closest points on the curve to each point
+# @param _falloff The terrain_core.falloff.FalloffTable, or None for the sculpt kernel
+# @return An array of values
+def softSelectValues(_centre, _points, _curvePoints, _falloff=None):
+	centre = numpy.asarray(_centre, dtype=numpy.float64)[:3]
+	centreToPoint = numpy.asarray(_points, dtype=numpy.float64)[:, :3] - centre
+	centreToCurve = numpy.asarray(_curvePoints, dtype=numpy.float64)[:, :3] - centre
+	ratio = (centreToPoint * centreToPoint).sum(axis=1) / numpy.maximum((centreToCurve * centreToCurve).sum(axis=1), 1e-20)
+	table = falloff.kernelTable(falloff.kSculpt) if _falloff is None else _falloff
+	return table.evaluate(ratio)
+
+## Flood fill outwards from a starting element while the elements are inside a region
+# The fill works one ring at a time so the inside test can be evaluated in batches
+# @param _start The index of the starting element
+# @param _neighbours A function returning the indices of the elements connected to an element
+# @param _inside A function taking an array of indices and returning a boolean array
+# @param _progress A ProgressToken checked after each ring, or None
+# @param _numElements The total number of elements, used to estimate the progress
+# @return A list of the indices inside the region
+def floodFill(_start, _neighbours, _inside, _progress=None, _numElements=None):
+	visited = set([_start])
+	frontier = [_start]
+	insideElements = []
+	while len(frontier) > 0:
+		progress.check(_progress, len(visited), _numElements)
+		mask = _inside(numpy.array(frontier, dtype=numpy.int64))
+		nextFrontier = []
+		for element, isInside in zip(frontier, mask):
+			if isInside:
+				insideElements.append(element)
+				for neighbour in _neighbours(element):
+					if neighbour not in visited:
+						visited.add(neighbour)
+						nextFrontier.append(neighbour)
+		frontier = nextFrontier
+	return insideElements
+
+## Find the grid samples of a raster inside a curve
+# @param _raster The TerrainRaster to sculpt
+# @param _curveCVs An (N, 3) array of the curve CVs, the curve lies inside their bounding box
+# @param _centre The centre of the curve
+# @param _offset Scale the points from the centre so the curve is still visible
+# @param _closestPoints A function taking an (N, 3) array of points and returning the closest points on the curve
+# @param _falloff The terrain_core.falloff.FalloffTable, or None for the sculpt kernel
+# @return The row major indices of the samples inside the curve and their soft selection values
+def rasterSamplesInsideCurve(_raster, _curveCVs, _centre, _offset, _closestPoints, _falloff=None):
+	curveCVs = numpy.asarray(_curveCVs, dtype=numpy.float64)
+	xCoordinates = _raster.xCoordinates()
+	zCoordinates = _raster.zCoordinates()
+	columns = numpy.nonzero((xCoordinates >= curveCVs[:, 0].min()) & (xCoordinates <= curveCVs[:, 0].max()))[0]
+	rows = numpy.nonzero((zCoordinates >= curveCVs[:, 2].min()) & (zCoordinates <= curveCVs[:, 2].max()))[0]
+	indices = (rows[:, numpy.newaxis] * xCoordinates.size + columns[numpy.newaxis, :]).ravel()
+	if len(indices) == 0:
+		return indices, numpy.zeros(0)
+	points = _raster.positions()[indices]
+	curvePoints = _closestPoints(points)
+	inside = insideCurve(_centre, points, curvePoints, _offset)
+	return indices[inside], softSelectValues(_centre, points[inside], curvePoints[inside], _falloff)
+
+## Find the points inside a curve
+# This tests every point in the bounding box of the curve rather than flood filling the mesh, so it does not need the mesh topology
+# @param _points An (N, 3) array of points
+# @param _curveCVs An (N, 3) array of the curve CVs, the curve lies inside their bounding box
+# @param _centre The centre of the curve
+# @param _offset Scale the points from the centre so the curve is still visible
+# @param _closestPoints A function taking an (N, 3) array of points and returning the closest points on the curve
+# @param _falloff The terrain_core.falloff.FalloffTable, or None for the sculpt kernel
+# @return The indices of the points inside the curve and their soft selection values
+def pointsInsideCurve(_points, _curveCVs, _centre, _offset, _closestPoints, _falloff=None):
+	points = numpy.asarray(_points, dtype=numpy.float64)[:, :3]
+	curveCVs = numpy.asarray(_curveCVs, dtype=numpy.float64)
+	inBox = (points[:, 0] >= curveCVs[:, 0].min()) & (points[:, 0] <= curveCVs[:, 0].max()) & (points[:, 2] >= curveCVs[:, 2].min()) & (points[:, 2] <= curveCVs[:, 2].max())
+	indices = numpy.nonzero(inBox)[0]
+	if len(indices) == 0:
+		return indices, numpy.zeros(0)
+	curvePoints = _closestPoints(points[indices])
+	inside = insideCurve(_centre, points[indices], curvePoints, _offset)
+	return indices[inside], softSelectValues(_centre, points[indices][inside], curvePoints[inside], _falloff)
+
+## Move points towards their projections onto a sculpted surface
+# @param _points An (N, 3) array of points, modified in place
+# @param _indices The indices of the points to move
+# @param _hitPoints An array of the projected positions of those points
+# @param _hits A boolean array, False where a point had no projection
+# @param _strength The sculpt strength
+# @param _softSelect The soft selection value of each point
+def applySculpt(_points, _indices, _hitPoints, _hits, _strength, _softSelect):
+	indices = numpy.asarray(_indices, dtype=numpy.int64)[_hits]
+	difference = numpy.asarray(_hitPoints, dtype=numpy.float64)[_hits, :3] - _points[indices, :3]
+	_points[indices, :3] += difference * (_strength * numpy.asarray(_softSelect)[_hits])[:, numpy.newaxis]
+
+## Sum the displacements of several sculpt layers into one buffer
+# Layers overlapping the same points add their displacements together
+# @param _numPoints The number of points
+# @param _layers A list of (point indices, (N, 3) displacements) for each layer
+# @return An (N, 3) array of displacements and a sorted array of the indices of the moved points
+def accumulateDisplacements(_numPoints, _layers):
+	displacement = numpy.zeros((_numPoints, 3), dtype=numpy.float64)
+	layers = [(numpy.asarray(indices, dtype=numpy.int64), offsets) for indices, offsets in _layers if len(indices) > 0]
+	if len(layers) == 0:
+		return displacement, numpy.zeros(0, dtype=numpy.int64)
+	for indices, offsets in layers:
+		numpy.add.at(displacement, indices, numpy.asarray(offsets, dtype=numpy.float64)[:, :3])
+	return displacement, numpy.unique(numpy.concatenate([indices for indices, offsets in layers]))
@@ -0,0 +1,90 @@
+## stats.py
+# Compute statistics recorded by the nodes, with an optional log of every compute
+# Set the TERRAIN_COMPUTE_LOG environment variable to a file name to log every compute of the session
+
+import json
+import os
+import time
+import timeit
+
+# The environment variable that starts the log when the package is imported
+kLogVariable = "TERRAIN_COMPUTE_LOG"
+
+# The open log file, None when logging is off
+logFile = None
+
+## Start logging every compute to a file, one JSON object per line
+# @param _path The log file, it is appended to if it exists
+def startLog(_path):
+	global logFile
+	stopLog()
+	logFile = open(_path, "a")
+
+## Stop logging computes
+def stopLog():
+	global logFile
+	if logFile is not None:
+		logFile.close()
+		logFile = None
+
+## Check if computes are being logged
+# @return Whether the log is open
+def isLogging():
+	return logFile is not None
+
+## The timings and counters of one node
+# Vertices and rays are counted for the last compute, the times and cache hits accumulate over the session
+class ComputeStats(object):
+
+	## Constructor
+	# @param _nodeType The type of the node the statistics belong to
+	def __init__(self, _nodeType):
+		self.m_nodeType = _nodeType
+		self.m_lastTime = 0.0
+		self.m_totalTime = 0.0
+		self.m_computeCount = 0
+		self.m_vertices = 0
+		self.m_rays = 0
+		self.m_cacheHits = 0
+		self.m_startTime = None
+		self.m_cacheHit = False
+
+	## Start timing a compute and reset the counters of the last compute
+	def begin(self):
+		self.m_vertices = 0
+		self.m_rays = 0
+		self.m_cacheHit = False
+		self.m_startTime = timeit.default_timer()
+
+	## Count the vertices processed by the compute
+	# @param _count The number of vertices
+	def addVertices(self, _count):
+		self.m_vertices += int(_count)
+
+	## Count the rays cast, or closest point queries made, by the compute
+	# @param _count The number of rays
+	def addRays(self, _count):
+		self.m_rays += int(_count)
+
+	## Record that the compute reused a cached result instead of rebuilding it
+	def addCacheHit(self):
+		self.m_cacheHit = True
+		self.m_cacheHits += 1
+
+	## Stop timing a compute and log it
+	# @param _nodeName The name of the node
+	# @param _plugName The name of the output being computed
+	def end(self, _nodeName, _plugName):
+		if self.m_startTime is None:
+			return
+		self.m_lastTime = timeit.default_timer() - self.m_startTime
+		self.m_startTime = None
+		self.m_totalTime += self.m_lastTime
+		self.m_computeCount += 1
+		if logFile is not None:
+			record = {"wallTime": time.time(), "node": _nodeName, "type": self.m_nodeType, "plug": _plugName, "time": self.m_lastTime, "vertices": self.m_vertices, "rays": self.m_rays, "cacheHit": self.m_cacheHit}
+			logFile.write(json.dumps(record, sort_keys=True) + "\n")
+			logFile.flush()
+
+if os.environ.get(kLogVariable):
+	startLog(os.environ[kLogVariable])
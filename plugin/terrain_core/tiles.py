@@ -0,0 +1,234 @@
+## tiles.py
+# A tiled terrain store for terrains that are too large to hold in memory as one mesh
+
+import mmap
+import struct
+import numpy
+from terrain_core.raster import TerrainRaster
+
+# The file starts with a fixed header, followed by one flag byte per tile, then the tiles
+kMagic = b"TTS1"
+kVersion = 1
+kHeaderFormat = "<4sIIIIddddf"
+kHeaderSize = struct.calcsize(kHeaderFormat)
+
+## A store of fixed size float32 height tiles in a memory mapped file
+# Tiles are paged in by the operating system only when they are touched, and written tiles are flushed individually
+class TiledTerrainStore(object):
+
+	## Constructor, use create or open instead
+	# @param _path The path of the store file
+	# @param _file The open file object
+	# @param _header The values read from the header
+	# @param _readOnly Whether the store was opened read only
+	def __init__(self, _path, _file, _header, _readOnly):
+		self.m_path = _path
+		self.m_file = _file
+		self.m_readOnly = _readOnly
+		self.m_tileSize, self.m_numRows, self.m_numColumns = _header[2], _header[3], _header[4]
+		self.m_origin = (_header[5], _header[6])
+		self.m_spacing = (_header[7], _header[8])
+		self.m_fillValue = _header[9]
+		self.m_numTileRows = (self.m_numRows + self.m_tileSize - 1) // self.m_tileSize
+		self.m_numTileColumns = (self.m_numColumns + self.m_tileSize - 1) // self.m_tileSize
+		self.m_dataOffset = TiledTerrainStore.dataOffset(self.m_numTileRows * self.m_numTileColumns)
+		access = mmap.ACCESS_READ if _readOnly else mmap.ACCESS_WRITE
+		self.m_mmap = mmap.mmap(self.m_file.fileno(), 0, access=access)
+		self.m_tileFlags = numpy.frombuffer(self.m_mmap, dtype=numpy.uint8, count=self.m_numTileRows * self.m_numTileColumns, offset=kHeaderSize)
+		tileShape = (self.m_numTileRows * self.m_numTileColumns, self.m_tileSize, self.m_tileSize)
+		self.m_tiles = numpy.frombuffer(self.m_mmap, dtype="<f4", count=int(numpy.prod(tileShape)), offset=self.m_dataOffset).reshape(tileShape)
+		self.m_dirtyTiles = set()
+
+	## Create a new store file
+	# The file is sized up front, on most file systems the unwritten tiles do not use any disk space
+	# @param _path The path of the store file
+	# @param _numRows The number of height samples along Z
+	# @param _numColumns The number of height samples along X
+	# @param _tileSize The number of samples along each side of a tile
+	# @param _origin The XZ position of the first sample
+	# @param _spacing The XZ distance between neighbouring samples
+	# @param _fillValue The height of samples that have never been written
+	# @return A TiledTerrainStore open for writing
+	@staticmethod
+	def create(_path, _numRows, _numColumns, _tileSize=256, _origin=(0.0, 0.0), _spacing=(1.0, 1.0), _fillValue=0.0):
+		if _numRows < 1 or _numColumns < 1 or _tileSize < 1:
+			raise ValueError("TiledTerrainStore needs a positive size and tile size")
+		header = (kMagic, kVersion, _tileSize, _numRows, _numColumns, float(_origin[0]), float(_origin[1]), float(_spacing[0]), float(_spacing[1]), float(_fillValue))
+		numTiles = ((_numRows + _tileSize - 1) // _tileSize) * ((_numColumns + _tileSize - 1) // _tileSize)
+		with open(_path, "wb") as storeFile:
+			storeFile.write(struct.pack(kHeaderFormat, *header))
+			storeFile.truncate(TiledTerrainStore.dataOffset(numTiles) + numTiles * _tileSize * _tileSize * 4)
+		return TiledTerrainStore.open(_path)
+
+	## Open an existing store file
+	# @param _path The path of the store file
+	# @param _readOnly Open the store without write access
+	# @return A TiledTerrainStore
+	@staticmethod
+	def open(_path, _readOnly=False):
+		storeFile = open(_path, "rb" if _readOnly else "r+b")
+		header = struct.unpack(kHeaderFormat, storeFile.read(kHeaderSize))
+		if header[0] != kMagic or header[1] != kVersion:
+			storeFile.close()
+			raise IOError("Not a tiled terrain store: " + _path)
+		return TiledTerrainStore(_path, storeFile, header, _readOnly)
+
+	## Calculate where the tile data starts, aligned so each tile can be flushed on its own
+	# @param _numTiles The number of tiles in the store
+	# @return The byte offset of the first tile
+	@staticmethod
+	def dataOffset(_numTiles):
+		granularity = mmap.ALLOCATIONGRANULARITY
+		return ((kHeaderSize + _numTiles + granularity - 1) // granularity) * granularity
+
+	## Get the number of samples in the store
+	# @return The number of rows (Z) and columns (X)
+	def resolution(self):
+		return (self.m_numRows, self.m_numColumns)
+
+	## Get the number of tiles in the store
+	# @return The number of tile rows and tile columns
+	def tileGrid(self):
+		return (self.m_numTileRows, self.m_numTileColumns)
+
+	## Get the window of samples covered by a tile
+	# @param _tileRow The tile row
+	# @param _tileColumn The tile column
+	# @return The first row, first column, number of rows and number of columns
+	def tileWindow(self, _tileRow, _tileColumn):
+		row = _tileRow * self.m_tileSize
+		column = _tileColumn * self.m_tileSize
+		return row, column, min(self.m_tileSize, self.m_numRows - row), min(self.m_tileSize, self.m_numColumns - column)
+
+	## Read a window of heights, only the tiles it overlaps are paged in
+	# @param _row The first row of the window
+	# @param _column The first column of the window
+	# @param _numRows The number of rows in the window
+	# @param _numColumns The number of columns in the window
+	# @return A new float32 array of heights
+	def readWindow(self, _row, _column, _numRows, _numColumns):
+		self.checkWindow(_row, _column, _numRows, _numColumns)
+		window = numpy.empty((_numRows, _numColumns), dtype=numpy.float32)
+		for tileIndex, tileSlice, windowSlice in self.overlappingTiles(_row, _column, _numRows, _numColumns):
+			if self.m_tileFlags[tileIndex]:
+				window[windowSlice] = self.m_tiles[tileIndex][tileSlice]
+			else:
+				window[windowSlice] = self.m_fillValue
+		return window
+
+	## Write a window of heights, the tiles it overlaps are marked as dirty
+	# @param _row The first row of the window
+	# @param _column The first column of the window
+	# @param _heights A 2D array of heights
+	def writeWindow(self, _row, _column, _heights):
+		if self.m_readOnly:
+			raise IOError("Tiled terrain store is open read only: " + self.m_path)
+		heights = numpy.asarray(_heights, dtype=numpy.float32)
+		self.checkWindow(_row, _column, heights.shape[0], heights.shape[1])
+		for tileIndex, tileSlice, windowSlice in self.overlappingTiles(_row, _column, heights.shape[0], heights.shape[1]):
+			if not self.m_tileFlags[tileIndex]:
+				# Initialise the tile before a partial write
+				self.m_tiles[tileIndex][:] = self.m_fillValue
+				self.m_tileFlags[tileIndex] = 1
+			self.m_tiles[tileIndex][tileSlice] = heights[windowSlice]
+			self.m_dirtyTiles.add(tileIndex)
+
+	## Read a window of heights as a raster positioned in world space
+	# @param _row The first row of the window
+	# @param _column The first column of the window
+	# @param _numRows The number of rows in the window
+	# @param _numColumns The number of columns in the window
+	# @return A TerrainRaster
+	def readRaster(self, _row, _column, _numRows, _numColumns):
+		origin = (self.m_origin[0] + _column * self.m_spacing[0], self.m_origin[1] + _row * self.m_spacing[1])
+		return TerrainRaster(self.readWindow(_row, _column, _numRows, _numColumns), origin, self.m_spacing)
+
+	## Write a raster back into the store at its world position
+	# @param _raster A TerrainRaster on the same grid as the store
+	def writeRaster(self, _raster):
+		column = int(round((_raster.m_origin[0] - self.m_origin[0]) / self.m_spacing[0]))
+		row = int(round((_raster.m_origin[1] - self.m_origin[1]) / self.m_spacing[1]))
+		self.writeWindow(row, column, _raster.m_heights)
+
+	## Apply an operation to the store one tile at a time
+	# Each tile is read with a border of neighbouring samples so operations that look at neighbours see across tile edges
+	# Tiles are processed in row order, so the border above and to the left of a tile has already been processed
+	# @param _function A function taking a TerrainRaster and returning a TerrainRaster of the same size
+	# @param _border The number of extra samples read around each tile
+	# @param _flushEachTile Flush every tile after it is written to bound the number of dirty pages
+	def processTiles(self, _function, _border=0, _flushEachTile=True):
+		for tileRow in range(self.m_numTileRows):
+			for tileColumn in range(self.m_numTileColumns):
+				row, column, numRows, numColumns = self.tileWindow(tileRow, tileColumn)
+				firstRow = max(row - _border, 0)
+				firstColumn = max(column - _border, 0)
+				lastRow = min(row + numRows + _border, self.m_numRows)
+				lastColumn = min(column + numColumns + _border, self.m_numColumns)
+				result = _function(self.readRaster(firstRow, firstColumn, lastRow - firstRow, lastColumn - firstColumn))
+				# Only write back the samples that belong to this tile
+				inner = result.m_heights[row - firstRow:row - firstRow + numRows, column - firstColumn:column - firstColumn + numColumns]
+				self.writeWindow(row, column, inner)
+				if _flushEachTile:
+					self.flush()
+
+	## Write the dirty tiles back to the file
+	def flush(self):
+		if self.m_readOnly or len(self.m_dirtyTiles) == 0:
+			return
+		tileBytes = self.m_tileSize * self.m_tileSize * 4
+		granularity = mmap.ALLOCATIONGRANULARITY
+		for tileIndex in sorted(self.m_dirtyTiles):
+			# Flushes must start on a page boundary, small tiles share their pages with their neighbours
+			start = self.m_dataOffset + tileIndex * tileBytes
+			alignedStart = (start // granularity) * granularity
+			self.m_mmap.flush(alignedStart, start + tileBytes - alignedStart)
+		# The tile flags live in the header page
+		self.m_mmap.flush(0, self.m_dataOffset)
+		self.m_dirtyTiles = set()
+
+	## Flush any dirty tiles and close the file
+	def close(self):
+		if self.m_mmap is None:
+			return
+		self.flush()
+		# The array views must be released before the map can be closed
+		self.m_tiles = None
+		self.m_tileFlags = None
+		self.m_mmap.close()
+		self.m_mmap = None
+		self.m_file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, _type, _value, _traceback):
+		self.close()
+
+	## Check a window lies inside the store
+	# @param _row The first row of the window
+	# @param _column The first column of the window
+	# @param _numRows The number of rows in the window
+	# @param _numColumns The number of columns in the window
+	def checkWindow(self, _row, _column, _numRows, _numColumns):
+		if _row < 0 or _column < 0 or _row + _numRows > self.m_numRows or _column + _numColumns > self.m_numColumns:
+			raise IndexError("Window is outside the tiled terrain store")
+
+	## Find the tiles that overlap a window
+	# @param _row The first row of the window
+	# @param _column The first column of the window
+	# @param _numRows The number of rows in the window
+	# @param _numColumns The number of columns in the window
+	# @return A list of (tile index, slice into the tile, slice into the window)
+	def overlappingTiles(self, _row, _column, _numRows, _numColumns):
+		tiles = []
+		size = self.m_tileSize
+		for tileRow in range(_row // size, (_row + _numRows - 1) // size + 1):
+			rowStart = max(_row, tileRow * size)
+			rowEnd = min(_row + _numRows, (tileRow + 1) * size)
+			for tileColumn in range(_column // size, (_column + _numColumns - 1) // size + 1):
+				columnStart = max(_column, tileColumn * size)
+				columnEnd = min(_column + _numColumns, (tileColumn + 1) * size)
+				tileSlice = (slice(rowStart - tileRow * size, rowEnd - tileRow * size), slice(columnStart - tileColumn * size, columnEnd - tileColumn * size))
+				windowSlice = (slice(rowStart - _row, rowEnd - _row), slice(columnStart - _column, columnEnd - _column))
+				tiles.append((tileRow * self.m_numTileColumns + tileColumn, tileSlice, windowSlice))
+		return tiles
@@ -0,0 +1,226 @@
+## topology.py
+# Mesh connectivity stored as CSR adjacency arrays, shared by every node reading the same terrain
+# Each adjacency is an offsets array and an indices array, the neighbours of element i are indices[offsets[i]:offsets[i + 1]]
+# The topologies are cached for the whole process, keyed by a fingerprint of the face connectivity, so they are only rebuilt when the topology changes
+
+import collections
+import threading
+import numpy
+from terrain_core import fingerprints
+
+# The number of topologies kept in the cache
+kMaxTopologies = 8
+
+## The face to vertex, vertex to face and face to face adjacency of a mesh
+class MeshTopology(object):
+
+	## Constructor
+	# @param _faceCounts An array of the number of vertices of each face
+	# @param _faceVertices An array of the vertex indices of every face, in face order
+	# @param _numVertices The number of vertices, or None to use the highest vertex index
+	def __init__(self, _faceCounts, _faceVertices, _numVertices=None):
+		faceCounts = numpy.asarray(_faceCounts, dtype=numpy.int64)
+		faceVertices = numpy.asarray(_faceVertices, dtype=numpy.int64)
+		numFaces = len(faceCounts)
+		numVertices = int(_numVertices) if _numVertices is not None else (int(faceVertices.max()) + 1 if len(faceVertices) > 0 else 0)
+
+		# Face to vertex, this is the Maya face connectivity
+		self.m_faceOffsets = numpy.concatenate(([0], numpy.cumsum(faceCounts))).astype(numpy.int64)
+		self.m_faceVertices = faceVertices
+
+		# Vertex to face, sort the face corners by vertex
+		cornerFaces = numpy.repeat(numpy.arange(numFaces, dtype=numpy.int64), faceCounts)
+		order = numpy.argsort(faceVertices, kind="mergesort")
+		self.m_vertexOffsets = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(faceVertices, minlength=numVertices)))).astype(numpy.int64)
+		self.m_vertexFaces = cornerFaces[order]
+
+		# Face to face, faces are connected when they share an edge
+		nextCorner = numpy.arange(len(faceVertices), dtype=numpy.int64) + 1
+		if numFaces > 0:
+			# The last corner of each face wraps around to its first corner
+			nextCorner[self.m_faceOffsets[1:] - 1] = self.m_faceOffsets[:-1]
+		edgeStarts = faceVertices
+		edgeEnds = faceVertices[nextCorner] if len(faceVertices) > 0 else faceVertices
+		edgeKeys = numpy.minimum(edgeStarts, edgeEnds) * max(numVertices, 1) + numpy.maximum(edgeStarts, edgeEnds)
+		order = numpy.argsort(edgeKeys, kind="mergesort")
+		sortedKeys = edgeKeys[order]
+		sortedFaces = cornerFaces[order]
+		# Neighbouring corners in the sorted order with the same key lie on the same edge
+		shared = numpy.nonzero(sortedKeys[1:] == sortedKeys[:-1])[0]
+		first = numpy.concatenate((sortedFaces[shared], sortedFaces[shared + 1]))
+		second = numpy.concatenate((sortedFaces[shared + 1], sortedFaces[shared]))
+		# Faces sharing more than one edge are only connected once
+		pairs = numpy.sort(first * max(numFaces, 1) + second)
+		pairs = pairs[numpy.concatenate((numpy.ones(min(len(pairs), 1), dtype=bool), pairs[1:] != pairs[:-1]))]
+		first = pairs // max(numFaces, 1)
+		second = pairs % max(numFaces, 1)
+		keep = first != second
+		self.m_faceNeighbourOffsets = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(first[keep], minlength=numFaces)))).astype(numpy.int64)
+		self.m_faceNeighbours = second[keep]
+
+	## Get the number of faces
+	# @return The number of faces
+	def numFaces(self):
+		return len(self.m_faceOffsets) - 1
+
+	## Get the number of vertices
+	# @return The number of vertices
+	def numVertices(self):
+		return len(self.m_vertexOffsets) - 1
+
+	## Get the vertices of a face
+	# @param _face The face index
+	# @return An array of vertex indices in face order
+	def faceVertexIndices(self, _face):
+		return self.m_faceVertices[self.m_faceOffsets[_face]:self.m_faceOffsets[_face + 1]]
+
+	## Get the faces using a vertex
+	# @param _vertex The vertex index
+	# @return An array of face indices
+	def vertexFaceIndices(self, _vertex):
+		return self.m_vertexFaces[self.m_vertexOffsets[_vertex]:self.m_vertexOffsets[_vertex + 1]]
+
+	## Get the faces sharing an edge with a face
+	# @param _face The face index
+	# @return An array of face indices
+	def faceNeighbours(self, _face):
+		return self.m_faceNeighbours[self.m_faceNeighbourOffsets[_face]:self.m_faceNeighbourOffsets[_face + 1]]
+
+	## Get the corners of several faces, the positions of their vertices in the face connectivity
+	# @param _faces An array of face indices
+	# @return An array of the corners of every face in order, and the number of corners of each face
+	def faceCorners(self, _faces):
+		faces = numpy.asarray(_faces, dtype=numpy.int64)
+		starts = self.m_faceOffsets[faces]
+		counts = self.m_faceOffsets[faces + 1] - starts
+		# Offset a running count of the corners so each face continues from its own start
+		corners = numpy.repeat(starts - (numpy.cumsum(counts) - counts), counts) + numpy.arange(counts.sum(), dtype=numpy.int64)
+		return corners, counts
+
+	## Get the vertices used by several faces
+	# @param _faces An array of face indices
+	# @return A sorted array of the vertex indices, without duplicates
+	def facesVertices(self, _faces):
+		corners, counts = self.faceCorners(_faces)
+		return numpy.unique(self.m_faceVertices[corners])
+
+	## Get the faces using several vertices
+	# @param _vertices An array of vertex indices
+	# @return A sorted array of the face indices, without duplicates
+	def verticesFaces(self, _vertices):
+		vertices = numpy.asarray(_vertices, dtype=numpy.int64)
+		starts = self.m_vertexOffsets[vertices]
+		counts = self.m_vertexOffsets[vertices + 1] - starts
+		return numpy.unique(self.m_vertexFaces[numpy.repeat(starts - (numpy.cumsum(counts) - counts), counts) + numpy.arange(counts.sum(), dtype=numpy.int64)])
+
+	## Calculate the centres of faces as the average of their vertices
+	# @param _points An (N, 3) array of the vertex positions
+	# @param _faces An array of face indices, or None for every face
+	# @return An (M, 3) array of the face centres
+	def faceCentres(self, _points, _faces=None):
+		points = numpy.asarray(_points, dtype=numpy.float64)[:, :3]
+		corners, counts = self.faceCorners(numpy.arange(self.numFaces()) if _faces is None else _faces)
+		if len(counts) == 0:
+			return numpy.zeros((0, 3), dtype=numpy.float64)
+		sums = numpy.add.reduceat(points[self.m_faceVertices[corners]], numpy.cumsum(counts) - counts, axis=0)
+		return sums / counts[:, numpy.newaxis]
+
+	## Calculate the area weighted normal of every face with Newell's method, which also handles non planar faces
+	# @param _points An (N, 3) array of the vertex positions
+	# @return An (M, 3) array of normals, their lengths are twice the face areas
+	def faceNormals(self, _points):
+		points = numpy.asarray(_points, dtype=numpy.float64)[:, :3]
+		return newellNormals(points[self.m_faceVertices], numpy.diff(self.m_faceOffsets))
+
+	## Calculate the area weighted vertex normals
+	# @param _points An (N, 3) array of the vertex positions
+	# @return An (N, 3) array of unit normals, zero for vertices without faces
+	def vertexNormals(self, _points):
+		faceNormals = self.faceNormals(_points)
+		cornerFaces = numpy.repeat(numpy.arange(self.numFaces(), dtype=numpy.int64), numpy.diff(self.m_faceOffsets))
+		normals = numpy.empty((self.numVertices(), 3), dtype=numpy.float64)
+		for axis in range(3):
+			normals[:, axis] = numpy.bincount(self.m_faceVertices, weights=faceNormals[cornerFaces, axis], minlength=self.numVertices())
+		lengths = numpy.sqrt((normals * normals).sum(axis=1))
+		return normals / numpy.maximum(lengths, 1e-20)[:, numpy.newaxis]
+
+	## Calculate the area weighted normals of some vertices from the faces around them, without reading the other vertices
+	# Gives the same normals as vertexNormals, for small sets of vertices of a large mesh
+	# @param _positions A function taking an array of vertex indices and returning an (M, 3) array of their positions
+	# @param _vertices An array of vertex indices
+	# @return An (M, 3) array of unit normals, zero for vertices without faces
+	def vertexNormalsOf(self, _positions, _vertices):
+		vertices = numpy.asarray(_vertices, dtype=numpy.int64)
+		starts = self.m_vertexOffsets[vertices]
+		counts = self.m_vertexOffsets[vertices + 1] - starts
+		# The faces around each vertex, in the same order as the vertices
+		vertexFaces = self.m_vertexFaces[numpy.repeat(starts - (numpy.cumsum(counts) - counts), counts) + numpy.arange(counts.sum(), dtype=numpy.int64)]
+		faces, faceSlots = numpy.unique(vertexFaces, return_inverse=True)
+		corners, faceCounts = self.faceCorners(faces)
+		cornerVertices = self.m_faceVertices[corners]
+		# Read the position of each vertex of the faces once
+		usedVertices, cornerSlots = numpy.unique(cornerVertices, return_inverse=True)
+		faceNormals = newellNormals(numpy.asarray(_positions(usedVertices), dtype=numpy.float64)[:, :3][cornerSlots.ravel()], faceCounts)
+		vertexSlots = numpy.repeat(numpy.arange(len(vertices), dtype=numpy.int64), counts)
+		normals = numpy.empty((len(vertices), 3), dtype=numpy.float64)
+		for axis in range(3):
+			normals[:, axis] = numpy.bincount(vertexSlots, weights=faceNormals[faceSlots.ravel(), axis], minlength=len(vertices))
+		lengths = numpy.sqrt((normals * normals).sum(axis=1))
+		return normals / numpy.maximum(lengths, 1e-20)[:, numpy.newaxis]
+
+	## Get the memory used by the adjacency arrays
+	# @return The size of the arrays in bytes
+	def nbytes(self):
+		return sum(array.nbytes for array in (self.m_faceOffsets, self.m_faceVertices, self.m_vertexOffsets, self.m_vertexFaces, self.m_faceNeighbourOffsets, self.m_faceNeighbours))
+
+## Calculate the area weighted normals of faces with Newell's method, which also handles non planar faces
+# @param _cornerPositions An array of the positions of the corners of every face, in face order
+# @param _faceCounts An array of the number of corners of each face
+# @return An (M, 3) array of normals, their lengths are twice the face areas
+def newellNormals(_cornerPositions, _faceCounts):
+	faceCounts = numpy.asarray(_faceCounts, dtype=numpy.int64)
+	if len(faceCounts) == 0:
+		return numpy.zeros((0, 3), dtype=numpy.float64)
+	faceStarts = numpy.cumsum(faceCounts) - faceCounts
+	nextCorner = numpy.arange(len(_cornerPositions), dtype=numpy.int64) + 1
+	nextCorner[faceStarts + faceCounts - 1] = faceStarts
+	# Positions relative to the face centres keep the cross products accurate far from the origin
+	centres = numpy.add.reduceat(_cornerPositions, faceStarts, axis=0) / faceCounts[:, numpy.newaxis]
+	corners = _cornerPositions - numpy.repeat(centres, faceCounts, axis=0)
+	return numpy.add.reduceat(numpy.cross(corners, corners[nextCorner]), faceStarts, axis=0)
+
+# The cached topologies by fingerprint, most recently used last
+topologies = collections.OrderedDict()
+topologiesLock = threading.Lock()
+
+## Calculate the fingerprint of the face connectivity of a mesh
+# @param _faceCounts An array of the number of vertices of each face
+# @param _faceVertices An array of the vertex indices of every face
+# @param _numVertices The number of vertices, or None
+# @return The fingerprint
+def connectivityKey(_faceCounts, _faceVertices, _numVertices=None):
+	return (fingerprints.topologyFingerprint(_faceCounts, _faceVertices), _numVertices)
+
+## Get the topology of a mesh, building it if no mesh with the same connectivity has been seen
+# @param _faceCounts An array of the number of vertices of each face
+# @param _faceVertices An array of the vertex indices of every face
+# @param _numVertices The number of vertices, or None to use the highest vertex index
+# @return The shared MeshTopology, it must not be modified
+def meshTopology(_faceCounts, _faceVertices, _numVertices=None):
+	key = connectivityKey(_faceCounts, _faceVertices, _numVertices)
+	with topologiesLock:
+		topology = topologies.pop(key, None)
+		if topology is not None:
+			topologies[key] = topology
+			return topology
+	topology = MeshTopology(_faceCounts, _faceVertices, _numVertices)
+	with topologiesLock:
+		topologies[key] = topology
+		while len(topologies) > kMaxTopologies:
+			topologies.popitem(last=False)
+	return topology
+
+## Remove every cached topology
+def clearTopologies():
+	with topologiesLock:
+		topologies.clear()
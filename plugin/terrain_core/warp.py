@@ -0,0 +1,187 @@
+## warp.py
+# Puppet warp weights and deformation
+
+import numpy
+from terrain_core import falloff, progress, regions
+from terrain_core.raster import TerrainRaster
+
+## Calculate the squared radius of influence of each control point
+# A control point reaches as far as its third nearest neighbour, up to the maximum radius
+# @param _controlPoints An (N, 3) array of the original control point positions
+# @param _maxRadius The maximum radius of a control point
+# @return An array of squared radii
+def controlPointRadii(_controlPoints, _maxRadius):
+	controlPoints = numpy.asarray(_controlPoints, dtype=numpy.float64).reshape(-1, 3)
+	maxRadiusSquared = _maxRadius * _maxRadius
+	radii = numpy.full(len(controlPoints), maxRadiusSquared)
+	if len(controlPoints) > 3:
+		dX = controlPoints[:, numpy.newaxis, 0] - controlPoints[numpy.newaxis, :, 0]
+		dZ = controlPoints[:, numpy.newaxis, 2] - controlPoints[numpy.newaxis, :, 2]
+		# The nearest distance is the control point itself
+		fourthNearest = numpy.sort(dX * dX + dZ * dZ, axis=1)[:, 3]
+		radii = numpy.where(fourthNearest < maxRadiusSquared, fourthNearest, radii)
+	return radii
+
+## Get the falloff table of the weights
+# @param _falloff A terrain_core.falloff.FalloffTable, or None
+# @return The table, the quadratic kernel if none is given
+def falloffTable(_falloff):
+	return falloff.kernelTable(falloff.kQuadratic) if _falloff is None else _falloff
+
+## Calculate the soft selection weights of points around each control point
+# The squared radius is used for both the bounding box and the distance test
+# @param _points An (N, 3) array of positions
+# @param _controlPoints An (M, 3) array of the original control point positions
+# @param _radii The squared radius of each control point
+# @param _progress A ProgressToken checked after each control point, or None
+# @param _falloff The terrain_core.falloff.FalloffTable of the weights, or None for the quadratic kernel
+# @return A list of (point indices, weights) for each control point
+def controlPointWeights(_points, _controlPoints, _radii, _progress=None, _falloff=None):
+	points = numpy.asarray(_points, dtype=numpy.float64)
+	table = falloffTable(_falloff)
+	weights = []
+	for cp, radiusSquared in zip(numpy.asarray(_controlPoints, dtype=numpy.float64).reshape(-1, 3), _radii):
+		progress.check(_progress, len(weights), len(_radii))
+		dX = cp[0] - points[:, 0]
+		dZ = cp[2] - points[:, 2]
+		distanceSquared = dX * dX + dZ * dZ
+		indices = numpy.nonzero((numpy.abs(dX) < radiusSquared) & (numpy.abs(dZ) < radiusSquared) & (distanceSquared < radiusSquared))[0]
+		weights.append((indices, table.evaluate(distanceSquared[indices] / radiusSquared)))
+	return weights
+
+## Get the XZ bounds of the area the control points can move
+# @param _controlPoints An (M, 3) array of the original control point positions
+# @param _radii The squared radius of each control point, which is also the half size of its bounding box
+# @return The bounds (minX, minZ, maxX, maxZ), or None if there are no control points
+def influenceBounds(_controlPoints, _radii):
+	controlPoints = numpy.asarray(_controlPoints, dtype=numpy.float64).reshape(-1, 3)
+	if len(controlPoints) == 0:
+		return None
+	radii = numpy.asarray(_radii, dtype=numpy.float64)
+	return ((controlPoints[:, 0] - radii).min(), (controlPoints[:, 2] - radii).min(), (controlPoints[:, 0] + radii).max(), (controlPoints[:, 2] + radii).max())
+
+## Update the control point weights of points that have moved, keeping the weights of every other point
+# The cost is in proportion to the moved points and the points already weighted, rather than every point
+# @param _weights The control point weights before the points moved
+# @param _indices A sorted array of the indices of the moved points
+# @param _positions An (K, 3) array of the new positions of the moved points
+# @param _controlPoints An (M, 3) array of the original control point positions
+# @param _radii The squared radius of each control point
+# @param _falloff The terrain_core.falloff.FalloffTable the weights were calculated with, or None for the quadratic kernel
+# @return A new list of (point indices, weights) for each control point
+def updateControlPointWeights(_weights, _indices, _positions, _controlPoints, _radii, _falloff=None):
+	indices = numpy.asarray(_indices, dtype=numpy.int64)
+	if len(indices) == 0:
+		return list(_weights)
+	movedWeights = controlPointWeights(_positions, _controlPoints, _radii, _falloff=_falloff)
+	updated = []
+	for (pointIndices, weights), (movedSlots, movedValues) in zip(_weights, movedWeights):
+		pointIndices = numpy.asarray(pointIndices, dtype=numpy.int64)
+		# Drop the old weights of the moved points, then add their new weights
+		moved = regions.contains(indices, pointIndices)
+		pointIndices = numpy.concatenate((pointIndices[~moved], indices[movedSlots]))
+		weights = numpy.concatenate((numpy.asarray(weights, dtype=numpy.float64)[~moved], movedValues))
+		order = numpy.argsort(pointIndices, kind="mergesort")
+		updated.append((pointIndices[order], weights[order]))
+	return updated
+
+## Calculate the soft selection weights of raster samples around each control point
+# Only the samples inside the bounding box of each control point are visited
+# @param _raster The TerrainRaster to warp
+# @param _controlPoints An (M, 3) array of the original control point positions
+# @param _radii The squared radius of each control point
+# @param _progress A ProgressToken checked after each control point, or None
+# @param _falloff The terrain_core.falloff.FalloffTable of the weights, or None for the quadratic kernel
+# @return A list of (row major sample indices, weights) for each control point
+def rasterControlPointWeights(_raster, _controlPoints, _radii, _progress=None, _falloff=None):
+	table = falloffTable(_falloff)
+	xCoordinates = _raster.xCoordinates()
+	zCoordinates = _raster.zCoordinates()
+	numColumns = xCoordinates.size
+	weights = []
+	for cp, radiusSquared in zip(numpy.asarray(_controlPoints, dtype=numpy.float64).reshape(-1, 3), _radii):
+		progress.check(_progress, len(weights), len(_radii))
+		columns = numpy.nonzero(numpy.abs(xCoordinates - cp[0]) < radiusSquared)[0]
+		rows = numpy.nonzero(numpy.abs(zCoordinates - cp[2]) < radiusSquared)[0]
+		dX = (cp[0] - xCoordinates[columns])[numpy.newaxis, :]
+		dZ = (cp[2] - zCoordinates[rows])[:, numpy.newaxis]
+		distanceSquared = dX * dX + dZ * dZ
+		inside = distanceSquared < radiusSquared
+		indices = (rows[:, numpy.newaxis] * numColumns + columns[numpy.newaxis, :])[inside]
+		weights.append((indices, table.evaluate(distanceSquared[inside] / radiusSquared)))
+	return weights
+
+## Pack the control point weights into compressed sparse rows, one row per control point
+# @param _weights The control point weights
+# @return The row offsets, the point indices and the weights
+def weightsToCSR(_weights):
+	counts = numpy.array([len(indices) for indices, weights in _weights], dtype=numpy.int64)
+	offsets = numpy.concatenate(([0], numpy.cumsum(counts))).astype(numpy.int64)
+	if len(_weights) == 0:
+		return offsets, numpy.zeros(0, dtype=numpy.int64), numpy.zeros(0, dtype=numpy.float64)
+	indices = numpy.concatenate([numpy.asarray(indices, dtype=numpy.int64) for indices, weights in _weights])
+	values = numpy.concatenate([numpy.asarray(weights, dtype=numpy.float64) for indices, weights in _weights])
+	return offsets, indices, values
+
+## Unpack control point weights from compressed sparse rows
+# @param _offsets The row offsets
+# @param _indices The point indices
+# @param _values The weights
+# @return A list of (point indices, weights) for each control point
+def weightsFromCSR(_offsets, _indices, _values):
+	return [(_indices[start:end], _values[start:end]) for start, end in zip(_offsets[:-1], _offsets[1:])]
+
+## Find every point moved by at least one control point
+# @param _weights The control point weights
+# @return A sorted array of point indices
+def affectedIndices(_weights):
+	if len(_weights) == 0:
+		return numpy.zeros(0, dtype=numpy.int64)
+	return numpy.unique(numpy.concatenate([indices for indices, weights in _weights]))
+
+## Sum the weighted control point movements at the points that move
+# Unlike displacements, this does not make an array for every point
+# @param _weights The control point weights
+# @param _differences An (M, 3) array of how far each control point has moved
+# @return A sorted array of the indices of the moved points and an (K, 3) array of their displacements
+def affectedDisplacements(_weights, _differences):
+	indices = affectedIndices(_weights)
+	displacement = numpy.zeros((len(indices), 3), dtype=numpy.float64)
+	for (pointIndices, weights), difference in zip(_weights, numpy.asarray(_differences, dtype=numpy.float64).reshape(-1, 3)):
+		displacement[numpy.searchsorted(indices, pointIndices)] += numpy.asarray(weights)[:, numpy.newaxis] * difference
+	return indices, displacement
+
+## Sum the weighted control point movements at each point
+# @param _numPoints The number of points
+# @param _weights The control point weights
+# @param _differences An (M, 3) array of how far each control point has moved
+# @return An (N, 3) array of displacements
+def displacements(_numPoints, _weights, _differences):
+	displacement = numpy.zeros((_numPoints, 3), dtype=numpy.float64)
+	for (indices, weights), difference in zip(_weights, numpy.asarray(_differences, dtype=numpy.float64).reshape(-1, 3)):
+		displacement[indices] += weights[:, numpy.newaxis] * difference
+	return displacement
+
+## Warp points by the control point movements
+# @param _points An (N, 3) array of positions
+# @param _weights The control point weights
+# @param _differences An (M, 3) array of how far each control point has moved
+# @return A new (N, 3) array of positions
+def warpPoints(_points, _weights, _differences):
+	points = numpy.array(_points, dtype=numpy.float64)
+	points[:, :3] += displacements(len(points), _weights, _differences)
+	return points
+
+## Warp a raster by the control point movements
+# The horizontal movement is applied by sampling the heights at the backward displaced positions
+# @param _raster The TerrainRaster to warp
+# @param _weights The control point weights from rasterControlPointWeights
+# @param _differences An (M, 3) array of how far each control point has moved
+# @return A new warped TerrainRaster
+def warpRaster(_raster, _weights, _differences):
+	numRows, numColumns = _raster.resolution()
+	displacement = displacements(_raster.numSamples(), _weights, _differences)
+	sampleX = numpy.tile(_raster.xCoordinates(), numRows) - displacement[:, 0]
+	sampleZ = numpy.repeat(_raster.zCoordinates(), numColumns) - displacement[:, 2]
+	heights = _raster.sample(sampleX, sampleZ) + displacement[:, 1]
+	return TerrainRaster(heights.reshape(numRows, numColumns), _raster.m_origin, _raster.m_spacing)
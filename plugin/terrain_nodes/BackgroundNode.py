@@ -0,0 +1,37 @@
+## BackgroundNode.py
+# Helpers for nodes that compute on a background worker
+
+import maya.api.OpenMaya as om
+import maya.cmds as mc
+import maya.utils
+
+## Create a function that marks an output of a node dirty when a background job finishes
+# Maya can only be used from the main thread, so the output is marked dirty once Maya is idle
+# The node then computes again and picks up the finished result
+# @param _node The node instance, it must already be in the scene
+# @param _attribute The output attribute
+# @return A function taking the key of the finished job, safe to call from any thread
+def dirtyOnFinish(_node, _attribute):
+	nodeHandle = om.MObjectHandle(_node.thisMObject())
+	attributeName = om.MFnAttribute(_attribute).name
+
+	## Mark the output dirty, called on the main thread
+	def markDirty():
+		# The node may have been deleted while the job was running
+		if nodeHandle.isValid():
+			mc.dgdirty(om.MFnDependencyNode(nodeHandle.object()).name() + "." + attributeName)
+
+	return lambda _key: maya.utils.executeDeferred(markDirty)
+
+## Report the error of a failed background job of a node
+# If the current inputs failed, the pending and running jobs are dropped and the node keeps its last finished output until its inputs change
+# @param _node The node instance
+# @param _background The terrain_core.background.BackgroundCompute of the node
+# @param _key The fingerprint of the current job inputs
+def reportError(_node, _background, _key):
+	errorKey, error = _background.takeError()
+	if error is None:
+		return
+	if errorKey == _key:
+		_background.cancel()
+	om.MGlobal.displayError(om.MFnDependencyNode(_node.thisMObject()).name() + ": the background compute failed: " + str(error))
@@ -0,0 +1,34 @@
+## FrameCacheNode.py
+# Helpers for nodes that replay their computed frames from a terrain_core.framecache.FrameCache
+
+import maya.api.OpenMaya as om
+from terrain_core import framecache
+
+## Add the frame cache budget attribute to a node class, call this from the node initializer
+# The attribute is stored on the class as m_frameCacheBudget, it does not affect the outputs
+# @param _nodeClass The node class
+def addFrameCacheAttributes(_nodeClass):
+	numericAttr = om.MFnNumericAttribute()
+	_nodeClass.m_frameCacheBudget = numericAttr.create("frameCacheBudget", "fcb", om.MFnNumericData.kFloat, framecache.kDefaultBudget)
+	numericAttr.readable = False
+	numericAttr.writable = True
+	numericAttr.storable = True
+	numericAttr.setMin(0.0)
+	_nodeClass.addAttribute(_nodeClass.m_frameCacheBudget)
+
+## Get the time a compute is evaluated at
+# Playblasts and queries at other times evaluate in a context with its own time, rather than the current time
+# @param _dataBlock The data block of the compute
+# @return The time in the current time unit
+def evaluationTime(_dataBlock):
+	context = _dataBlock.context()
+	if context.isNormal():
+		return om.MAnimControl.currentTime().value
+	return context.getTime().value
+
+## Update the budget of a frame cache from the node attribute
+# @param _node The node instance
+# @param _frames The FrameCache
+# @param _dataBlock The data block of the compute
+def updateBudget(_node, _frames, _dataBlock):
+	_frames.setBudget(_dataBlock.inputValue(type(_node).m_frameCacheBudget).asFloat())
@@ -0,0 +1,75 @@
+## NodeBuffers.py
+# Helpers for nodes that pass shared vertex buffers to each other (terrain_core.buffers)
+# A node using this keeps the buffer it outputs in m_outBuffer and the buffer of its terrain in m_terrainBuffer, as the registry only holds them weakly
+
+import sys
+import numpy
+import maya.api.OpenMaya as om
+import TerrainRasterData
+from terrain_nodes import NodeFingerprints
+from terrain_core import buffers
+
+## Add the vertex buffer attributes to a node class, call this from the node initializer
+# The attributes are stored on the class as m_inBuffer and m_outBuffer, the node sets what they affect
+# @param _nodeClass The node class
+def addBufferAttributes(_nodeClass):
+	typedAttr = om.MFnTypedAttribute()
+	_nodeClass.m_inBuffer = typedAttr.create("inBuffer", "ib", TerrainRasterData.kBufferDataID)
+	typedAttr.readable = False
+	typedAttr.writable = True
+	typedAttr.storable = False
+	_nodeClass.addAttribute(_nodeClass.m_inBuffer)
+
+	_nodeClass.m_outBuffer = typedAttr.create("outBuffer", "ob", TerrainRasterData.kBufferDataID)
+	typedAttr.readable = True
+	typedAttr.writable = False
+	typedAttr.storable = False
+	_nodeClass.addAttribute(_nodeClass.m_outBuffer)
+
+## Check if a buffer is connected to the input buffer of a node
+# @param _node The node instance
+# @param _dataBlock The data block of the compute
+# @return Whether the node works on the connected buffer rather than its terrain
+def hasInputBuffer(_node, _dataBlock):
+	return TerrainRasterData.bufferFromDataHandle(_dataBlock.inputValue(type(_node).m_inBuffer)) is not None
+
+## Get the vertex buffer a node works on
+# This is the buffer connected to inBuffer, or a buffer of the terrain mesh at the start of a chain, which is kept until the terrain changes
+# @param _node The node instance
+# @param _dataBlock The data block of the compute
+# @param _inputs The InputFingerprints of the compute
+# @return The VertexBuffer
+def inputBuffer(_node, _dataBlock, _inputs):
+	nodeClass = type(_node)
+	buffer = TerrainRasterData.bufferFromDataHandle(_dataBlock.inputValue(nodeClass.m_inBuffer))
+	if buffer is not None:
+		return buffer
+	terrainFn = om.MFnMesh(_dataBlock.inputValue(nodeClass.m_terrain).asMesh())
+	terrainKey = NodeFingerprints.inputFingerprint(_inputs, nodeClass.m_terrain, NodeFingerprints.meshFingerprint, terrainFn)
+	if _node.m_terrainBuffer is None or _node.m_terrainBufferKey != terrainKey:
+		_node.m_terrainBuffer = buffers.fromPoints(TerrainRasterData.pointsAsArray(terrainFn))
+		_node.m_terrainBufferKey = terrainKey
+	return _node.m_terrainBuffer
+
+## Create the output mesh of a node in a chain of buffers, a copy of the terrain with the vertices moved to the buffer
+# Only the vertices that differ from the terrain are set, so the terrain has to be the mesh at the start of the chain
+# @param _nodeName The name of the node type, for errors
+# @param _terrainValue The terrain mesh data
+# @param _buffer The VertexBuffer
+# @return The mesh data MObject
+def meshFromBuffer(_nodeName, _terrainValue, _buffer):
+	terrainFn = om.MFnMesh(_terrainValue)
+	meshDataFn = om.MFnMeshData()
+	outTerrain = meshDataFn.create()
+	outTerrainFn = om.MFnMesh()
+	outTerrainFn.copy(_terrainValue, outTerrain)
+	if _buffer.numVertices() != terrainFn.numVertices:
+		sys.stderr.write(_nodeName + ": the input buffer does not have the same number of vertices as the terrain, connect the terrain to the mesh at the start of the chain\n")
+		return outTerrain
+
+	points = _buffer.points()
+	movedVertices = numpy.flatnonzero((points != TerrainRasterData.pointsAsArray(terrainFn)).any(axis=1))
+	TerrainRasterData.setPointsFromArray(outTerrainFn, points)
+	# Normals may be locked upstream (e.g. analytic height field normals), unlock them around the moved vertices
+	TerrainRasterData.unlockMovedNormals(outTerrainFn, movedVertices)
+	return outTerrain
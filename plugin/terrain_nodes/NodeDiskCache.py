@@ -0,0 +1,45 @@
+## NodeDiskCache.py
+# The on-disk cache of derived node state, kept in a folder next to the saved scene
+# Nothing is cached for a scene that has not been saved
+
+import os
+import maya.cmds as mc
+from terrain_core import diskcache
+
+# The size limit of each scene's cache folder in megabytes, set TERRAIN_DISK_CACHE_MB to change it or to 0 to turn the cache off
+maxSize = float(os.environ.get("TERRAIN_DISK_CACHE_MB", diskcache.kDefaultMaxSize))
+# The suffix of the cache folder, added to the scene file name without its extension
+kFolderSuffix = "_terrainCache"
+
+# The caches by folder
+caches = {}
+
+## Get the disk cache of the current scene
+# @return A DiskCache, or None if the scene has not been saved or the cache is turned off
+def sceneCache():
+	sceneName = mc.file(query=True, sceneName=True)
+	if not sceneName or maxSize <= 0:
+		return None
+	directory = os.path.splitext(sceneName)[0] + kFolderSuffix
+	if directory not in caches:
+		caches[directory] = diskcache.DiskCache(directory, maxSize)
+	return caches[directory]
+
+## Load derived state saved with the scene
+# @param _kind The kind of state
+# @param _key The digest of the inputs
+# @return A dictionary of arrays, or None if nothing matching has been saved
+def load(_kind, _key):
+	cache = sceneCache()
+	if cache is None:
+		return None
+	return cache.load(_kind, _key)
+
+## Save derived state with the scene
+# @param _kind The kind of state
+# @param _key The digest of the inputs
+# @param _arrays A dictionary of arrays
+def save(_kind, _key, _arrays):
+	cache = sceneCache()
+	if cache is not None:
+		cache.save(_kind, _key, _arrays)
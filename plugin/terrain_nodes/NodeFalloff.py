@@ -0,0 +1,45 @@
+## NodeFalloff.py
+# Helpers for nodes with a selectable soft selection falloff (terrain_core.falloff)
+# The falloff is read on every compute, it is one enum and, for the ramp kernel, a few samples of the ramp
+
+import numpy
+import maya.api.OpenMaya as om
+from terrain_core import falloff
+
+# The number of positions the falloff ramp is sampled at
+kRampSamples = 64
+
+## Add the falloff attributes to a node class, call this from the node initializer
+# The attributes are stored on the class as m_falloff and m_falloffRamp, the node sets what they affect
+# @param _nodeClass The node class
+# @param _defaultKernel The kernel of a new node, one of the terrain_core.falloff kernel constants
+def addFalloffAttributes(_nodeClass, _defaultKernel):
+	enumAttr = om.MFnEnumAttribute()
+	_nodeClass.m_falloff = enumAttr.create("falloff", "fo", _defaultKernel)
+	for value, name in enumerate(falloff.kKernelNames):
+		enumAttr.addField(name, value)
+	enumAttr.readable = False
+	enumAttr.writable = True
+	enumAttr.storable = True
+	_nodeClass.addAttribute(_nodeClass.m_falloff)
+
+	# The weight at each distance from the centre, as a fraction of the radius, used by the ramp kernel
+	_nodeClass.m_falloffRamp = om.MRampAttribute.createCurveRamp("falloffRamp", "fr")
+	_nodeClass.addAttribute(_nodeClass.m_falloffRamp)
+
+## Get the falloff table of a node
+# @param _node The node instance
+# @param _dataBlock The data block of the compute
+# @return The terrain_core.falloff.FalloffTable
+def falloffTable(_node, _dataBlock):
+	nodeClass = type(_node)
+	kernel = _dataBlock.inputValue(nodeClass.m_falloff).asShort()
+	if kernel != falloff.kRamp:
+		return falloff.kernelTable(kernel)
+	ramp = om.MRampAttribute(_node.thisMObject(), nodeClass.m_falloffRamp)
+	# A ramp without points falls off linearly
+	if ramp.numEntries() == 0:
+		return falloff.rampTable([0.0, 1.0], [1.0, 0.0])
+	# Sample the ramp rather than reading its points, so its interpolation is kept
+	positions = numpy.linspace(0.0, 1.0, kRampSamples)
+	return falloff.rampTable(positions, [ramp.getValueAtPosition(float(position)) for position in positions])
@@ -0,0 +1,79 @@
+## NodeFingerprints.py
+# Track which inputs of a node have been dirtied, so a compute only fingerprints the changed inputs and redoes the stages that depend on them
+# A node using this keeps a terrain_core.fingerprints.InputFingerprints in m_fingerprints, and forwards setDependentsDirty and preEvaluation here
+
+import numpy
+import maya.api.OpenMaya as om
+import TerrainRasterData
+from terrain_core import fingerprints
+
+## Get the attribute a plug belongs to, element and child plugs are tracked as their array or parent attribute
+# @param _plug The plug
+# @return The name of the attribute
+def attributeName(_plug):
+	plug = _plug
+	while plug.isElement or plug.isChild:
+		plug = plug.array() if plug.isElement else plug.parent()
+	return om.MFnAttribute(plug.attribute()).name
+
+## Record a dirtied input, call this from setDependentsDirty
+# @param _node The node instance
+# @param _plug The plug being dirtied
+def setDependentsDirty(_node, _plug):
+	_node.m_fingerprints.setDirty(attributeName(_plug))
+
+## Record the inputs dirtied for the evaluation manager, call this from preEvaluation
+# The evaluation manager does not call setDependentsDirty while it evaluates
+# @param _node The node instance
+# @param _evaluationNode The MEvaluationNode of the node
+# @param _attributes The input attributes to check
+def preEvaluation(_node, _evaluationNode, _attributes):
+	for attribute in _attributes:
+		if _evaluationNode.dirtyPlugExists(attribute):
+			_node.m_fingerprints.setDirty(om.MFnAttribute(attribute).name)
+
+## Get the input fingerprints to use in a compute
+# Maya only reports dirtied inputs for the normal context, so computes at other times (e.g. getAttr -time) fingerprint every input
+# @param _node The node instance
+# @param _dataBlock The data block of the compute
+# @return An InputFingerprints
+def computeFingerprints(_node, _dataBlock):
+	if _dataBlock.context().isNormal():
+		return _node.m_fingerprints
+	return fingerprints.InputFingerprints()
+
+## Get the fingerprint of an input, calculating it only if the input is dirty
+# @param _inputs The InputFingerprints of the compute
+# @param _attribute The input attribute
+# @param _function The function calculating the fingerprint
+# @param _args The arguments of the function
+# @return The fingerprint
+def inputFingerprint(_inputs, _attribute, _function, *_args):
+	return _inputs.fingerprint(om.MFnAttribute(_attribute).name, _function, *_args)
+
+## Get the version of an input, a number that changes every time it is dirtied
+# Used instead of a fingerprint when fingerprinting the input would cost more than the stage depending on it
+# @param _inputs The InputFingerprints of the compute
+# @param _attribute The input attribute
+# @return The version
+def inputVersion(_inputs, _attribute):
+	return _inputs.version(om.MFnAttribute(_attribute).name)
+
+## Calculate the fingerprint of a mesh, its positions and face connectivity
+# @param _meshFn The mesh function set
+# @return The fingerprint
+def meshFingerprint(_meshFn):
+	faceCounts, faceConnects = TerrainRasterData.facesAsArrays(_meshFn)
+	return (fingerprints.pointsFingerprint(TerrainRasterData.pointsAsArray(_meshFn)), fingerprints.topologyFingerprint(faceCounts, faceConnects))
+
+## Calculate the fingerprint of a curve in world space
+# @param _curveFn The curve function set
+# @return The fingerprint
+def curveFingerprint(_curveFn):
+	return fingerprints.curveFingerprint(numpy.array(_curveFn.cvPositions(om.MSpace.kWorld), dtype=numpy.float64), numpy.array(_curveFn.knots(), dtype=numpy.float64), _curveFn.degree)
+
+## Calculate the digest of a curve in world space, for keys kept across sessions
+# @param _curveFn The curve function set
+# @return The digest as a hexadecimal string
+def curveDigest(_curveFn):
+	return fingerprints.digest(numpy.array(_curveFn.cvPositions(om.MSpace.kWorld), dtype=numpy.float64)[:, :3], numpy.array(_curveFn.knots(), dtype=numpy.float64), _curveFn.degree)
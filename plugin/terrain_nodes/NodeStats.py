@@ -0,0 +1,62 @@
+## NodeStats.py
+# Read only output attributes that expose the compute statistics of a node
+
+import maya.api.OpenMaya as om
+from terrain_core import profiling
+
+# The name, short name and type of each statistics attribute
+kAttributes = [
+	("lastComputeTime", "lct", om.MFnNumericData.kDouble),
+	("totalComputeTime", "tct", om.MFnNumericData.kDouble),
+	("computeCount", "cpc", om.MFnNumericData.kInt),
+	("verticesProcessed", "vtp", om.MFnNumericData.kInt),
+	("raysCast", "rys", om.MFnNumericData.kInt),
+	("cacheHits", "chs", om.MFnNumericData.kInt)]
+
+## Add the statistics attributes to a node class, call this from the node initializer
+# The attributes are stored on the class as m_lastComputeTime, m_totalComputeTime, etc.
+# @param _nodeClass The node class
+def addStatsAttributes(_nodeClass):
+	numericAttr = om.MFnNumericAttribute()
+	for name, shortName, dataType in kAttributes:
+		attribute = numericAttr.create(name, shortName, dataType, 0)
+		numericAttr.readable = True
+		numericAttr.writable = False
+		numericAttr.storable = False
+		setattr(_nodeClass, "m_" + name, attribute)
+		_nodeClass.addAttribute(attribute)
+
+## Get the name of a node
+# @param _node The node instance
+# @return The name of the node in the scene
+def nodeName(_node):
+	return om.MFnDependencyNode(_node.thisMObject()).name()
+
+## Run the compute of a node, in a profiler only if a capture has been requested for the node or every node
+# The name of the node is only looked up while a capture is waiting, so the nodes pay nothing when nothing is profiled
+# @param _node The node instance, computing in computePlug
+# @param _plug The plug being computed
+# @param _dataBlock The data block of the compute
+def compute(_node, _plug, _dataBlock):
+	if profiling.isActive():
+		name = nodeName(_node)
+		if profiling.isRequested(name):
+			profiling.capture(name, _node.computePlug, _plug, _dataBlock)
+			return
+	_node.computePlug(_plug, _dataBlock)
+
+## Finish timing a compute and write the statistics to the node attributes
+# @param _node The node instance, with its ComputeStats in m_stats
+# @param _plug The plug being computed
+# @param _dataBlock The data block of the compute
+def endCompute(_node, _plug, _dataBlock):
+	stats = _node.m_stats
+	stats.end(nodeName(_node), _plug.partialName(useLongNames=True))
+	values = [stats.m_lastTime, stats.m_totalTime, stats.m_computeCount, stats.m_vertices, stats.m_rays, stats.m_cacheHits]
+	for (name, shortName, dataType), value in zip(kAttributes, values):
+		dataHandle = _dataBlock.outputValue(getattr(type(_node), "m_" + name))
+		if dataType == om.MFnNumericData.kDouble:
+			dataHandle.setDouble(value)
+		else:
+			dataHandle.setInt(value)
+		dataHandle.setClean()
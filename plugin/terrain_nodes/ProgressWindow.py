@@ -0,0 +1,67 @@
+## ProgressWindow.py
+# Show the progress of a long node compute in Maya's progress window, so the artist can cancel it with Esc
+
+import timeit
+import maya.api.OpenMaya as om
+import maya.cmds as mc
+from terrain_core import progress
+
+# Seconds before the window is shown, so quick computes do not flash it
+kShowDelay = 0.5
+# Seconds between updates of the window and checks for Esc
+kUpdateInterval = 0.1
+
+## A progress window for one long operation, used as a context manager around the loop
+# A cancelled loop is stopped at the end of its current chunk, and the Cancelled exception is caught when the block exits
+class ProgressWindow(object):
+
+	## Constructor
+	# @param _status The text shown in the window
+	def __init__(self, _status):
+		self.m_status = _status
+		self.m_interactive = om.MGlobal.mayaState() == om.MGlobal.kInteractive
+		self.m_startTime = timeit.default_timer()
+		self.m_lastUpdate = self.m_startTime
+		self.m_shown = False
+		self.m_cancelled = False
+
+	## Create a token for the loop
+	# @return A ProgressToken that updates this window
+	def token(self):
+		return progress.ProgressToken(self.report, self.isCancelled)
+
+	## Update the window, it is only shown once the operation has run for kShowDelay seconds
+	# @param _fraction The fraction of the work done
+	def report(self, _fraction):
+		now = timeit.default_timer()
+		if not self.m_interactive or now - self.m_startTime < kShowDelay or now - self.m_lastUpdate < kUpdateInterval:
+			return
+		self.m_lastUpdate = now
+		if not self.m_shown:
+			mc.progressWindow(title="Terrain Tools", status=self.m_status + " (Esc to cancel)", progress=0, maxValue=100, isInterruptable=True)
+			self.m_shown = True
+		mc.progressWindow(edit=True, progress=int(_fraction * 100))
+
+	## Check if the artist has pressed Esc
+	# @return Whether the operation should stop
+	def isCancelled(self):
+		if self.m_shown and mc.progressWindow(query=True, isCancelled=True):
+			self.m_cancelled = True
+		return self.m_cancelled
+
+	## Close the window
+	def close(self):
+		if self.m_shown:
+			mc.progressWindow(endProgress=True)
+			self.m_shown = False
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, _type, _value, _traceback):
+		self.close()
+		if _type is not None and issubclass(_type, progress.Cancelled):
+			self.m_cancelled = True
+			om.MGlobal.displayWarning(self.m_status + " cancelled")
+			return True
+		return False
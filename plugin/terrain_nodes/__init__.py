@@ -0,0 +1,5 @@
+## terrain_nodes
+# Maya helpers shared by the terrain nodes, kept out of the plugin folder so the Plug-in Manager only lists the plugins
+# These use Maya, the algorithms they call live in terrain_core
+
+from terrain_nodes import BackgroundNode, FrameCacheNode, NodeBuffers, NodeDiskCache, NodeFalloff, NodeFingerprints, NodeStats, ProgressWindow
@@ -0,0 +1,7 @@
+## conftest.py
+# The tests run outside Maya, so terrain_core is imported from the plugin folder
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "plugin"))
@@ -0,0 +1,72 @@
+## test_background.py
+# Tests of the background compute worker
+
+import threading
+import time
+
+from terrain_core import background
+
+## A BackgroundCompute whose finished jobs can be waited for
+class Worker(object):
+
+	## Constructor
+	def __init__(self):
+		self.m_finished = threading.Event()
+		self.m_compute = background.BackgroundCompute(lambda _key: self.m_finished.set())
+
+	## Submit a job and wait for it to finish
+	# @param _key The fingerprint of the job inputs
+	# @param _function The function to run
+	# @param _args The arguments of the function
+	def run(self, _key, _function, *_args):
+		self.m_finished.clear()
+		self.m_compute.submit(_key, _function, *_args)
+		assert self.m_finished.wait(5.0)
+
+def add(_a, _b, _progress):
+	return _a + _b
+
+def fail(_progress):
+	raise RuntimeError("no terrain")
+
+def test_result():
+	worker = Worker()
+	assert worker.m_compute.result() == (None, None)
+	worker.run(1, add, 2, 3)
+	assert worker.m_compute.result() == (1, 5)
+	assert worker.m_compute.takeError() == (None, None)
+
+def test_errorIsReportedOnce():
+	worker = Worker()
+	worker.run(1, add, 2, 3)
+	worker.run(2, fail)
+	errorKey, error = worker.m_compute.takeError()
+	assert errorKey == 2 and isinstance(error, RuntimeError)
+	assert worker.m_compute.takeError() == (None, None)
+	# The last result is kept, and the failed inputs are not run again
+	assert worker.m_compute.result() == (1, 5)
+	worker.m_finished.clear()
+	worker.m_compute.submit(2, fail)
+	assert not worker.m_finished.wait(0.2)
+	# Once another job has finished, the failed inputs run again
+	worker.run(3, add, 1, 1)
+	worker.run(2, fail)
+	assert worker.m_compute.takeError()[0] == 2
+
+def test_newerInputsCancelTheRunningJob():
+	started = threading.Event()
+	cancelled = []
+
+	def slow(_progress):
+		started.set()
+		while not _progress.isCancelled():
+			time.sleep(0.001)
+		cancelled.append(True)
+		_progress.check(0)
+
+	worker = Worker()
+	worker.m_compute.submit(1, slow)
+	assert started.wait(5.0)
+	worker.run(2, add, 1, 2)
+	assert cancelled == [True]
+	assert worker.m_compute.result() == (2, 3)
@@ -0,0 +1,33 @@
+## test_buffers.py
+# Tests of the copy-on-write vertex buffers
+
+import numpy
+
+from terrain_core import buffers
+
+def test_movedSharesUntouchedPages():
+	points = numpy.arange(3 * (buffers.kPageSize * 2 + 10), dtype=numpy.float64).reshape(-1, 3)
+	buffer = buffers.fromPoints(points)
+	moved = buffer.moved([1, buffers.kPageSize * 2 + 3, 1], [[1.0, 0.0, 0.0], [0.0, 2.0, 0.0], [1.0, 0.0, 0.0]])
+	expected = points.copy()
+	# A vertex listed twice moves by the sum of its offsets
+	expected[1, 0] += 2.0
+	expected[buffers.kPageSize * 2 + 3, 1] += 2.0
+	assert numpy.array_equal(moved.points(), expected)
+	assert numpy.array_equal(buffer.points(), points)
+	assert moved.m_pages[1] is buffer.m_pages[1]
+	assert moved.m_pages[0] is not buffer.m_pages[0]
+	assert moved.key() != buffer.key()
+	assert buffer.moved([], numpy.zeros((0, 3))) is buffer
+
+def test_dirtyRegion():
+	points = numpy.random.RandomState(2).rand(buffers.kPageSize + 100, 3)
+	buffer = buffers.fromPoints(points)
+	moved = buffer.moved([5, buffers.kPageSize + 7], [[0.0, 1.0, 0.0], [0.5, 0.0, 0.0]])
+	region = moved.dirtyRegion(buffer)
+	assert region.m_previousKey == buffer.key()
+	assert numpy.array_equal(region.m_indices, [5, buffers.kPageSize + 7])
+	assert region.intersects((points[5, 0], points[5, 2], points[5, 0], points[5, 2]))
+	assert buffer.dirtyRegion(buffer).isEmpty()
+	assert moved.dirtyRegion(None) is None
+	assert moved.dirtyRegion(buffers.fromPoints(points[:10])) is None
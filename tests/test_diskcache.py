@@ -0,0 +1,38 @@
+## test_diskcache.py
+# Tests of the on-disk cache of derived node state
+
+import os
+import time
+import numpy
+
+from terrain_core import diskcache, fingerprints
+
+def test_diskCacheRoundTrip(tmpdir):
+	cache = diskcache.DiskCache(str(tmpdir.join("cache")))
+	key = fingerprints.digest(numpy.arange(10.0), 2.5)
+	assert cache.load("weights", key) is None
+	assert cache.save("weights", key, {"values": numpy.arange(4)})
+	assert numpy.array_equal(cache.load("weights", key)["values"], numpy.arange(4))
+	assert cache.load("weights", fingerprints.digest(numpy.arange(10.0), 2.0)) is None
+
+def test_failedSaveRemovesTemporaryFile(tmpdir, monkeypatch):
+	cache = diskcache.DiskCache(str(tmpdir))
+	def failingSave(*_args, **_kwargs):
+		raise IOError("disk full")
+	monkeypatch.setattr(numpy, "savez_compressed", failingSave)
+	assert not cache.save("weights", "key", {"values": numpy.arange(4)})
+	assert tmpdir.listdir() == []
+
+def test_evictRemovesStaleTemporaryFiles(tmpdir):
+	cache = diskcache.DiskCache(str(tmpdir))
+	stale = tmpdir.join("stale.tmp")
+	stale.write("partial")
+	old = time.time() - diskcache.kStaleTemporaryAge - 60.0
+	os.utime(str(stale), (old, old))
+	# A recent temporary file may belong to a save in progress
+	recent = tmpdir.join("recent.tmp")
+	recent.write("partial")
+	assert cache.save("weights", "key", {"values": numpy.arange(4)})
+	assert not stale.exists()
+	assert recent.exists()
+	assert len(cache.files()) == 1
@@ -0,0 +1,33 @@
+## test_falloff.py
+# Tests of the soft selection falloff kernels and their lookup tables
+
+import numpy
+import pytest
+
+from terrain_core import falloff
+
+@pytest.mark.parametrize("kernel", [falloff.kSculpt, falloff.kQuadratic, falloff.kSmoothstep, falloff.kGaussian, falloff.kWendland])
+def test_kernelTableMatchesKernel(kernel):
+	fractions = numpy.linspace(0.0, 1.0, 101)
+	weights = falloff.kernelTable(kernel).evaluate(fractions * fractions)
+	assert numpy.allclose(weights, falloff.kernelValues(kernel, fractions), atol=1e-3)
+	assert weights[0] == pytest.approx(1.0)
+	assert weights[-1] == pytest.approx(0.0, abs=1e-9)
+
+def test_sculptKernelMatchesOriginalFalloff():
+	ratios = numpy.linspace(0.0, 1.0, 50)
+	assert numpy.allclose(falloff.kernelValues(falloff.kSculpt, numpy.sqrt(ratios)), 2.0 + 2.0 / (ratios - 2.0))
+
+def test_tableClipsOutsideTheRadius():
+	table = falloff.kernelTable(falloff.kQuadratic)
+	assert numpy.array_equal(table.evaluate([-1.0, 2.0]), [1.0, 0.0])
+
+def test_rampTable():
+	table = falloff.rampTable([1.0, 0.0], [0.0, 1.0])
+	fractions = numpy.linspace(0.0, 1.0, 11)
+	assert numpy.allclose(table.evaluate(fractions * fractions), 1.0 - fractions, atol=1e-3)
+	assert table.key() != falloff.kernelTable(falloff.kQuadratic).key()
+
+def test_unknownKernel():
+	with pytest.raises(ValueError):
+		falloff.kernelValues(falloff.kRamp, [0.5])
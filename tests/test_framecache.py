@@ -0,0 +1,40 @@
+## test_framecache.py
+# Tests of the memory bounded frame cache
+
+import numpy
+
+from terrain_core import framecache
+
+def test_sparseDeltaRoundTrip():
+	before = numpy.random.RandomState(6).rand(20, 3).astype(numpy.float32)
+	after = before.copy()
+	after[[3, 11]] += numpy.float32(0.25)
+	delta = framecache.sparseDelta(before, after)
+	assert numpy.array_equal(delta[0], [3, 11])
+	assert numpy.array_equal(framecache.applyDelta(before, delta), after)
+
+def test_leastRecentlyUsedFramesAreEvicted():
+	frame = (numpy.zeros(1024 * 32, dtype=numpy.float64),)
+	# Room for three frames
+	cache = framecache.FrameCache(3.0 * framecache.frameSize(frame) / (1024 * 1024))
+	for time in range(3):
+		cache.put(time, "key", frame)
+	assert cache.get(0, "key") is frame
+	cache.put(3, "key", frame)
+	assert len(cache) == 3
+	assert cache.get(1, "key") is None
+	assert cache.get(0, "key") is frame
+	assert cache.get(0, "other") is None
+	assert cache.m_hits == 2 and cache.m_misses == 2
+	assert cache.memory() == 3 * framecache.frameSize(frame)
+
+def test_budget():
+	cache = framecache.FrameCache(0.0)
+	cache.put(0, "key", (numpy.zeros(4),))
+	assert len(cache) == 0
+	cache.setBudget(1.0)
+	cache.put(0, "key", (numpy.zeros(4),))
+	cache.put(0, "key", (numpy.zeros(8),))
+	assert cache.memory() == 64
+	cache.setBudget(0.0)
+	assert len(cache) == 0 and cache.memory() == 0
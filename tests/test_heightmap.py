@@ -0,0 +1,68 @@
+## test_heightmap.py
+# Tests of the 16-bit heightmap writers and readers
+
+import struct
+import zlib
+import numpy
+import pytest
+
+from terrain_core import heightmap
+
+## Read the samples of a PNG heightmap, gathering the image data chunks and removing the filter bytes of the rows
+# @param _path The file to read
+# @param _numRows The number of rows
+# @param _numColumns The number of columns
+# @return A 2D array of the samples
+def readPng(_path, _numRows, _numColumns):
+	with open(_path, "rb") as pngFile:
+		data = pngFile.read()
+	assert data.startswith(heightmap.kPngSignature)
+	position = len(heightmap.kPngSignature)
+	imageData = b""
+	while position < len(data):
+		length, chunkType = struct.unpack(">I4s", data[position:position + 8])
+		if chunkType == b"IDAT":
+			imageData += data[position + 8:position + 8 + length]
+		position += 12 + length
+	rows = numpy.frombuffer(zlib.decompress(imageData), dtype=numpy.uint8).reshape(_numRows, _numColumns * 2 + 1)
+	return rows[:, 1:].copy().view(">u2")
+
+def test_rawHeightmap(tmpdir):
+	heights = numpy.random.RandomState(3).rand(37, 23) * 10.0 - 2.0
+	path = str(tmpdir.join("terrain.raw"))
+	# The heights are written in two strips
+	heightmap.exportHeightmap(path, [heights[:16], heights[16:]], 37, 23, -2.0, 8.0)
+	values = numpy.fromfile(path, dtype="<u2").reshape(37, 23)
+	assert numpy.array_equal(values, heightmap.quantize(heights, -2.0, 8.0))
+	# Quantizing loses at most half a step
+	assert numpy.abs(values / 65535.0 * 10.0 - 2.0 - heights).max() <= 10.0 / 65535.0
+
+def test_pgmHeightmap(tmpdir):
+	heights = numpy.random.RandomState(4).rand(5, 7)
+	path = str(tmpdir.join("terrain.pgm"))
+	heightmap.exportHeightmap(path, [heights], 5, 7, 0.0, 1.0)
+	with open(path, "rb") as pgmFile:
+		data = pgmFile.read()
+	header = b"P5\n7 5\n65535\n"
+	assert data.startswith(header)
+	assert numpy.array_equal(numpy.frombuffer(data[len(header):], dtype=">u2").reshape(5, 7), heightmap.quantize(heights, 0.0, 1.0))
+
+@pytest.mark.parametrize("heightmapFormat", ["raw", "pgm"])
+def test_heightmapRoundTrip(tmpdir, heightmapFormat):
+	heights = numpy.random.RandomState(5).rand(37, 23) * 10.0 - 2.0
+	path = str(tmpdir.join("terrain." + heightmapFormat))
+	heightmap.exportHeightmap(path, [heights[:16], heights[16:]], 37, 23, -2.0, 8.0)
+	values, maxValue = heightmap.mapHeightmap(path, 37, 23)
+	assert values.shape == (37, 23)
+	assert numpy.array_equal(values, heightmap.quantize(heights, -2.0, 8.0))
+	assert numpy.abs(values / float(maxValue) * 10.0 - 2.0 - heights).max() <= 10.0 / 65535.0
+
+def test_pngHeightmap(tmpdir):
+	heights = numpy.arange(12, dtype=numpy.float64).reshape(3, 4)
+	path = str(tmpdir.join("terrain.png"))
+	heightmap.exportHeightmap(path, [heights], 3, 4, 0.0, 11.0)
+	assert numpy.array_equal(readPng(path, 3, 4), heightmap.quantize(heights, 0.0, 11.0))
+
+def test_heightmapStripMustFit(tmpdir):
+	with pytest.raises(ValueError):
+		heightmap.exportHeightmap(str(tmpdir.join("terrain.raw")), [numpy.zeros((2, 5))], 2, 4, 0.0, 1.0)
@@ -0,0 +1,52 @@
+## test_masks.py
+# Tests of the curve mask distance fields and weight textures
+
+import numpy
+import pytest
+
+from terrain_core import masks
+
+## Calculate the signed distance of every texel by comparing it with every texel on the other side of the edge
+def bruteForceSignedDistance(_inside):
+	rows, columns = numpy.mgrid[0:_inside.shape[0], 0:_inside.shape[1]]
+	distances = numpy.zeros(_inside.shape)
+	for sign, features, texels in ((1.0, ~_inside, _inside), (-1.0, _inside, ~_inside)):
+		featureRows, featureColumns = numpy.nonzero(features)
+		if len(featureRows) == 0:
+			continue
+		squared = (rows[..., numpy.newaxis] - featureRows) ** 2 + (columns[..., numpy.newaxis] - featureColumns) ** 2
+		distances[texels] = sign * (numpy.sqrt(squared.min(axis=-1)) - 0.5)[texels]
+	return distances
+
+def test_signedDistanceMatchesBruteForce():
+	random = numpy.random.RandomState(1)
+	for trial in range(20):
+		shape = random.randint(1, 30, 2)
+		inside = random.rand(*shape) < random.rand()
+		if inside.all() or not inside.any():
+			continue
+		assert numpy.allclose(masks.signedDistance(inside, 1.0), bruteForceSignedDistance(inside), atol=1e-6)
+
+def test_signedDistanceScalesWithSpacing():
+	inside = numpy.zeros((9, 9), dtype=bool)
+	inside[2:7, 2:7] = True
+	assert numpy.allclose(masks.signedDistance(inside, 0.5), masks.signedDistance(inside, 1.0) * 0.5)
+
+def test_rasterizedCircleDistance():
+	angles = numpy.linspace(0.0, 2.0 * numpy.pi, 128, endpoint=False)
+	circle = numpy.stack((30.0 + 20.0 * numpy.cos(angles), numpy.zeros_like(angles), 50.0 + 20.0 * numpy.sin(angles)), axis=1)
+	mask = masks.rasterizeCurve(circle, (0.0, 0.0, 100.0, 100.0), 256)
+	numRows, numColumns = mask.m_distances.shape
+	x = mask.m_origin[0] + numpy.arange(numColumns) * mask.m_spacing
+	z = mask.m_origin[1] + numpy.arange(numRows) * mask.m_spacing
+	radius = numpy.sqrt((x[numpy.newaxis, :] - 30.0) ** 2 + (z[:, numpy.newaxis] - 50.0) ** 2)
+	# Within a texel of the true distance, the polyline cuts the corners of the circle
+	assert numpy.abs(mask.m_distances - (20.0 - radius)).max() < mask.m_spacing
+
+def test_combineWeights():
+	a = numpy.array([[0.0, 0.5], [1.0, 0.2]])
+	b = numpy.array([[0.3, 0.0], [0.5, 0.4]])
+	assert numpy.array_equal(masks.combineWeights([a, b], masks.kUnion), numpy.maximum(a, b))
+	assert numpy.array_equal(masks.combineWeights([a, b], masks.kIntersection), numpy.minimum(a, b))
+	with pytest.raises(ValueError):
+		masks.combineWeights([], masks.kUnion)
@@ -0,0 +1,46 @@
+## test_meshio.py
+# Tests of the streaming mesh writers
+
+import struct
+import numpy
+import pytest
+
+from terrain_core import meshio
+
+## Read a binary little endian PLY written by meshio.writePly
+# @param _path The file to read
+# @return An (N, 3) array of the vertex positions and a list of the vertex indices of each face
+def readPly(_path):
+	with open(_path, "rb") as plyFile:
+		data = plyFile.read()
+	headerEnd = data.index(b"end_header\n") + len(b"end_header\n")
+	header = data[:headerEnd].decode("ascii").split("\n")
+	numVertices = int([line for line in header if line.startswith("element vertex")][0].split()[-1])
+	numFaces = int([line for line in header if line.startswith("element face")][0].split()[-1])
+	points = numpy.frombuffer(data, dtype="<f4", count=numVertices * 3, offset=headerEnd).reshape(-1, 3)
+	position = headerEnd + numVertices * 12
+	faces = []
+	for face in range(numFaces):
+		count = struct.unpack("B", data[position:position + 1])[0]
+		faces.append(list(struct.unpack("<%di" % count, data[position + 1:position + 1 + 4 * count])))
+		position += 1 + 4 * count
+	assert position == len(data)
+	return points, faces
+
+@pytest.mark.parametrize("faceCounts", [[4, 4, 4], [3, 4, 5]])
+def test_writePly(tmpdir, faceCounts):
+	points = numpy.random.RandomState(4).rand(8, 3)
+	faceConnects = numpy.arange(sum(faceCounts)) % 8
+	path = str(tmpdir.join("terrain.ply"))
+	# A small chunk size writes the faces over several chunks
+	meshio.writePly(path, points, faceCounts, faceConnects, _chunkSize=2)
+	readPoints, faces = readPly(path)
+	assert numpy.allclose(readPoints, points.astype(numpy.float32))
+	offsets = meshio.faceOffsets(faceCounts)
+	assert faces == [faceConnects[offsets[i]:offsets[i + 1]].tolist() for i in range(len(faceCounts))]
+
+def test_writePlyWithoutFaces(tmpdir):
+	path = str(tmpdir.join("points.ply"))
+	meshio.writePly(path, numpy.zeros((2, 3)), [], [])
+	readPoints, faces = readPly(path)
+	assert len(readPoints) == 2 and faces == []
@@ -0,0 +1,55 @@
+## test_profiling.py
+# Tests of the on demand cProfile captures
+
+import pstats
+import pytest
+
+from terrain_core import profiling
+
+@pytest.fixture
+def captureDirectory(tmpdir):
+	profiling.cancelCapture()
+	directory = str(tmpdir)
+	yield directory
+	profiling.cancelCapture()
+
+## Count the calls of a function in a written capture
+# @param _path The .pstats file
+# @param _functionName The name of the function
+# @return The number of calls
+def numCalls(_path, _functionName):
+	stats = pstats.Stats(_path)
+	return sum(values[1] for (fileName, line, name), values in stats.stats.items() if name == _functionName)
+
+def upstreamWork():
+	return sum(range(100))
+
+def test_nodeRequest(captureDirectory):
+	profiling.requestCapture(2, "warp1", captureDirectory)
+	assert profiling.isActive()
+	assert profiling.isRequested("warp1") and not profiling.isRequested("sculpt1")
+	# Other nodes run unprofiled and do not use up the request
+	assert profiling.capture("sculpt1", upstreamWork) == 4950
+	assert not [path for path in profiling.captures if path.startswith(captureDirectory)]
+	for i in range(2):
+		profiling.capture("warp1", upstreamWork)
+	captured = [path for path in profiling.captures if path.startswith(captureDirectory)]
+	assert len(captured) == 2
+	assert not profiling.isActive()
+
+def test_nestedCaptureIsRecordedByTheOuterCapture(captureDirectory):
+	profiling.requestCapture(2, None, captureDirectory)
+
+	def downstreamCompute():
+		# A profiled node pulling another node, as happens for every node with a global request
+		assert not profiling.isActive() and not profiling.isRequested("upstream")
+		total = profiling.capture("upstream", upstreamWork)
+		return total + upstreamWork()
+
+	assert profiling.capture("downstream", downstreamCompute) == 9900
+	captured = [path for path in profiling.captures if path.startswith(captureDirectory)]
+	assert len(captured) == 1
+	# Both calls, before and after the nested compute, are in the one capture
+	assert numCalls(captured[0], "upstreamWork") == 2
+	# The nested compute did not use up the global request
+	assert profiling.isActive() and profiling.isRequested("another")
@@ -0,0 +1,42 @@
+## test_raster.py
+# Tests of the float32 terrain raster
+
+import numpy
+import pytest
+
+from terrain_core.raster import TerrainRaster
+
+def test_fromPointsRoundTrip():
+	raster = TerrainRaster(numpy.random.RandomState(3).rand(4, 5), (2.0, -1.0), (0.5, 0.25))
+	positions = raster.positions()
+	# Shuffled points still map back to their samples
+	order = numpy.random.RandomState(4).permutation(len(positions))
+	result, sampleIndices = TerrainRaster.fromPoints(positions[order])
+	assert result.resolution() == (4, 5)
+	assert result.bounds() == raster.bounds()
+	assert numpy.array_equal(sampleIndices, order)
+	assert numpy.array_equal(result.m_heights, raster.m_heights)
+
+def test_fromPointsRejectsIrregularPoints():
+	positions = TerrainRaster(numpy.zeros((3, 3))).positions()
+	assert TerrainRaster.fromPoints(positions[:-1]) == (None, None)
+	positions[4, 0] += 0.3
+	assert TerrainRaster.fromPoints(positions) == (None, None)
+
+def test_sampleInterpolatesAndClamps():
+	raster = TerrainRaster([[0.0, 1.0], [2.0, 3.0]], (10.0, 20.0), (2.0, 2.0))
+	heights = raster.sample([11.0, 10.0, 100.0], [21.0, 22.0, -5.0])
+	assert numpy.allclose(heights, [1.5, 2.0, 1.0])
+
+def test_gridFacesFaceUp():
+	raster = TerrainRaster(numpy.zeros((3, 4)))
+	faceCounts, faceConnects = raster.gridFaces()
+	assert len(faceCounts) == 6
+	positions = raster.positions()
+	corners = positions[faceConnects[:4]]
+	assert numpy.cross(corners[1] - corners[0], corners[3] - corners[0])[1] > 0.0
+	assert numpy.allclose(raster.normals(), [0.0, 1.0, 0.0])
+
+def test_heightsMustBe2D():
+	with pytest.raises(ValueError):
+		TerrainRaster(numpy.zeros(4))
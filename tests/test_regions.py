@@ -0,0 +1,40 @@
+## test_regions.py
+# Tests of the dirty regions passed between nodes
+
+import numpy
+
+from terrain_core import regions
+
+def test_fromPoints():
+	previous = numpy.random.RandomState(7).rand(10, 3)
+	points = previous.copy()
+	points[[2, 6], 1] += 1.0
+	points[6, 0] = 5.0
+	region = regions.fromPoints("key", previous, points)
+	assert region.m_previousKey == "key"
+	assert numpy.array_equal(region.m_indices, [2, 6])
+	assert region.m_bounds[2] == 5.0
+	assert region.intersects((4.0, 0.0, 6.0, 1.0))
+	assert not region.intersects((10.0, 10.0, 11.0, 11.0))
+	assert not region.intersects(None)
+	assert regions.fromPoints("key", previous, points[:5]) is None
+	assert regions.fromPoints("key", previous, previous).isEmpty()
+
+def test_regionWithoutBoundsIntersectsEverything():
+	assert regions.DirtyRegion("key", [1]).intersects((0.0, 0.0, 0.0, 0.0))
+	assert not regions.DirtyRegion("key", []).intersects((0.0, 0.0, 1.0, 1.0))
+
+def test_contains():
+	assert list(regions.contains([2, 5, 9], [0, 2, 9, 10])) == [False, True, True, False]
+	assert list(regions.contains([], [1])) == [False]
+
+def test_bounds():
+	assert regions.xzBounds(numpy.zeros((0, 3))) is None
+	assert regions.xzBounds([[0.0, 1.0, 2.0]], [[-1.0, 0.0, 3.0]]) == (-1.0, 2.0, 0.0, 3.0)
+	assert regions.boundsIntersect((0.0, 0.0, 1.0, 1.0), (1.0, 1.0, 2.0, 2.0))
+	assert not regions.boundsIntersect((0.0, 0.0, 1.0, 1.0), (1.5, 0.0, 2.0, 1.0))
+
+def test_changedOffsets():
+	# Vertex 3 moves by the same total, vertex 1 stops moving and vertex 8 starts
+	changed = regions.changedOffsets([1, 3, 3], [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 1.0, 0.0]], [3, 8], [[0.0, 2.0, 0.0], [0.0, 0.0, 1.0]])
+	assert list(changed) == [1, 8]
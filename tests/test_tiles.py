@@ -0,0 +1,43 @@
+## test_tiles.py
+# Tests of the memory mapped tiled terrain store
+
+import numpy
+import pytest
+
+from terrain_core.raster import TerrainRaster
+from terrain_core.tiles import TiledTerrainStore
+
+def test_windowsAcrossTiles(tmpdir):
+	path = str(tmpdir.join("terrain.tts"))
+	heights = numpy.random.RandomState(5).rand(10, 7).astype(numpy.float32)
+	with TiledTerrainStore.create(path, 10, 7, _tileSize=4, _fillValue=-1.0) as store:
+		assert store.tileGrid() == (3, 2)
+		store.writeWindow(2, 1, heights[2:9, 1:6])
+		# Unwritten samples read as the fill value
+		assert store.readWindow(0, 0, 1, 1)[0, 0] == -1.0
+	with TiledTerrainStore.open(path, _readOnly=True) as store:
+		assert store.resolution() == (10, 7)
+		assert numpy.array_equal(store.readWindow(2, 1, 7, 5), heights[2:9, 1:6])
+		with pytest.raises(IOError):
+			store.writeWindow(0, 0, heights[:1, :1])
+		with pytest.raises(IndexError):
+			store.readWindow(8, 0, 3, 1)
+
+def test_rastersKeepTheirPosition(tmpdir):
+	with TiledTerrainStore.create(str(tmpdir.join("terrain.tts")), 6, 6, _tileSize=4, _origin=(10.0, 20.0), _spacing=(2.0, 2.0)) as store:
+		raster = store.readRaster(2, 3, 3, 2)
+		assert raster.bounds() == (16.0, 18.0, 24.0, 28.0)
+		store.writeRaster(TerrainRaster(numpy.ones((3, 2)), raster.m_origin, raster.m_spacing))
+		assert store.readWindow(2, 3, 3, 2).sum() == 6.0
+		assert store.readWindow(0, 0, 6, 6).sum() == 6.0
+
+def test_processTilesSeesTheBorder(tmpdir):
+	with TiledTerrainStore.create(str(tmpdir.join("terrain.tts")), 8, 8, _tileSize=4) as store:
+		store.writeWindow(0, 0, numpy.arange(64, dtype=numpy.float32).reshape(8, 8))
+		sizes = []
+		def addOne(_raster):
+			sizes.append(_raster.resolution())
+			return TerrainRaster(_raster.m_heights + 1.0, _raster.m_origin, _raster.m_spacing)
+		store.processTiles(addOne, _border=1)
+		assert sizes == [(5, 5), (5, 5), (5, 5), (5, 5)]
+		assert numpy.array_equal(store.readWindow(0, 0, 8, 8), numpy.arange(64).reshape(8, 8) + 1.0)
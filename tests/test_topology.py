@@ -0,0 +1,48 @@
+## test_topology.py
+# Tests of the shared CSR mesh topology
+
+import numpy
+
+from terrain_core import topology
+from terrain_core.raster import TerrainRaster
+
+def gridTopology(_numRows, _numColumns):
+	raster = TerrainRaster(numpy.zeros((_numRows, _numColumns)))
+	faceCounts, faceVertices = raster.gridFaces()
+	return raster, topology.MeshTopology(faceCounts, faceVertices)
+
+def test_adjacency():
+	raster, mesh = gridTopology(3, 3)
+	assert mesh.numFaces() == 4 and mesh.numVertices() == 9
+	assert sorted(mesh.faceVertexIndices(0)) == [0, 1, 3, 4]
+	# The centre vertex is used by every face, a corner by one
+	assert sorted(mesh.vertexFaceIndices(4)) == [0, 1, 2, 3]
+	assert list(mesh.vertexFaceIndices(0)) == [0]
+	# Faces sharing only a vertex are not neighbours
+	assert sorted(mesh.faceNeighbours(0)) == [1, 2]
+	assert list(mesh.facesVertices([0, 3])) == [0, 1, 3, 4, 5, 7, 8]
+	assert list(mesh.verticesFaces([0, 8])) == [0, 3]
+
+def test_normals():
+	raster, mesh = gridTopology(4, 5)
+	points = raster.positions()
+	assert numpy.allclose(mesh.vertexNormals(points), [0.0, 1.0, 0.0])
+	# A face normal's length is twice the face area
+	assert numpy.allclose(mesh.faceNormals(points)[:, 1], 2.0)
+	assert numpy.allclose(mesh.faceCentres(points, [0]), [[0.5, 0.0, 0.5]])
+	points[7, 1] = 2.0
+	vertices = [1, 7, 12]
+	assert numpy.allclose(mesh.vertexNormalsOf(lambda _indices: points[_indices], vertices), mesh.vertexNormals(points)[vertices])
+
+def test_sharedTopologies():
+	topology.clearTopologies()
+	raster = TerrainRaster(numpy.zeros((3, 3)))
+	faceCounts, faceVertices = raster.gridFaces()
+	first = topology.meshTopology(faceCounts, faceVertices)
+	assert topology.meshTopology(faceCounts.copy(), faceVertices.copy()) is first
+	assert topology.meshTopology(faceCounts, faceVertices, 10) is not first
+	for size in range(topology.kMaxTopologies):
+		faceCounts, faceVertices = TerrainRaster(numpy.zeros((2, size + 2))).gridFaces()
+		topology.meshTopology(faceCounts, faceVertices)
+	assert len(topology.topologies) == topology.kMaxTopologies
+	topology.clearTopologies()